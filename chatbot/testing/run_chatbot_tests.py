@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""
+SIGNAL Chatbot - Evaluation Runner
+
+Runs the chatbot test suites unattended and in parallel:
+- Conversations C1-C12 from test_plan.md (initial prompt + follow-ups)
+- Logic prompts L1-L8 from ../CHATBOT.md
+
+Each conversation runs its turns in order (follow-ups need the history);
+conversations run concurrently. The search tool is served locally from
+enriched records (pbh_signal.local_search) behind the retrieval cache, so no
+Algolia access is needed.
+
+Model responses are cached by prompt-version hash (system prompt content),
+model, temperature and the full message history (earlier turns' tool calls
+and tool results included, as the model saw them), so re-running an unchanged
+prompt is free and a prompt edit only re-runs what it affects.
+
+Results are written in the v1/v2_test_results.csv column layout plus
+latency_ms, prompt_tokens and completion_tokens. The scoring columns are
+left blank for the reviewer. Full transcripts go to a matching .jsonl file.
+
+Usage:
+    python run_chatbot_tests.py --prompt v2 --model gpt-4.1-mini
+    python run_chatbot_tests.py --prompt v2 --suite logic --workers 8
+    python run_chatbot_tests.py --prompt v1 --only C3,C5
+    python run_chatbot_tests.py --prompts-csv my_prompts.csv --prompt v2
+    python run_chatbot_tests.py --prompt v2 --mock-model    # offline smoke test
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent
+CHATBOT_DIR = BASE_DIR.parent
+REPO_ROOT = CHATBOT_DIR.parent
+SYSTEM_DIR = REPO_ROOT / "system"
+TEST_PLAN_PATH = BASE_DIR / "test_plan.md"
+CHATBOT_DOC_PATH = CHATBOT_DIR / "CHATBOT.md"
+RESPONSE_CACHE_DIR = BASE_DIR / "response_cache"
+RUNS_DIR = BASE_DIR / "runs"
+DEFAULT_RECORDS_DIR = SYSTEM_DIR / "v7" / "testing" / "expected_outputs"
+
+sys.path.insert(0, str(SYSTEM_DIR))
+
+from pbh_signal.index_sync import to_search_record  # noqa: E402
+from pbh_signal.local_search import LocalSearchBackend  # noqa: E402
+from pbh_signal.records import iter_enriched_files, load_enriched  # noqa: E402
+from pbh_signal.retrieval_cache import CachedSearch, RetrievalCache  # noqa: E402
+
+PROMPT_FILES = {
+    "v1": CHATBOT_DIR / "chatbot_system_prompt_v1.md",
+    "v2": CHATBOT_DIR / "chatbot_system_prompt_v2.md",
+}
+
+# Existing results layout (v1_test_results.csv / v2_test_results.csv) + timing/token columns
+CSV_COLUMNS = [
+    'conversation_id', 'turn_number', 'prompt', 'timestamp', 'model',
+    'filter_used', 'filter_correct', 'data_returned', 'context_retained',
+    'insight_quality', 'strategic_relevance', 'citations', 'hallucination',
+    'failure_root_cause', 'prompt_gap_identified', 'notes',
+    'latency_ms', 'prompt_tokens', 'completion_tokens'
+]
+
+SEARCH_INDEX = "signal_posts"
+MAX_TOOL_ROUNDS = 4
+
+SEARCH_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "algolia_search",
+        "description": ("PBH social posts (all relevant/borderline). Use facet_filters: symptoms, "
+                        "conditions, treatments, emotions, audience_label, topics, engagement_label, "
+                        "bariatric_context. Example: [\"emotions:frustration\"]"),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "Free-text query"},
+                "facet_filters": {
+                    "type": ["array", "null"],
+                    "items": {"anyOf": [{"type": "string"},
+                                        {"type": "array", "items": {"type": "string"}}]}
+                },
+                "number_of_results": {"type": "integer"}
+            },
+            "required": ["query"]
+        }
+    }
+}
+
+
+# ----------------------------------------------------------------------
+# Suite loading
+# ----------------------------------------------------------------------
+
+def load_conversations(test_plan_path: Path = TEST_PLAN_PATH) -> list:
+    """Parse C1..Cn conversations (initial + numbered follow-ups) from test_plan.md"""
+    conversations = []
+    current = None
+    in_followups = False
+
+    with open(test_plan_path, 'r') as f:
+        for line in f:
+            line = line.rstrip("\n")
+            header = re.match(r"^###\s+(C\d+):\s*(.+)$", line)
+            if header:
+                current = {"id": header.group(1), "title": header.group(2).strip(), "turns": []}
+                conversations.append(current)
+                in_followups = False
+                continue
+            if current is None:
+                continue
+            if line.startswith("## ") or line.startswith("**What this tests"):
+                in_followups = False
+                if line.startswith("## "):
+                    current = None
+                continue
+            initial = re.match(r"^\*\*Initial:\*\*\s*(.+)$", line)
+            if initial:
+                current["turns"].append(initial.group(1).strip())
+                continue
+            if line.startswith("**Follow-ups:**"):
+                in_followups = True
+                continue
+            followup = re.match(r"^\d+\.\s+(.+)$", line)
+            if in_followups and followup:
+                current["turns"].append(followup.group(1).strip())
+
+    return [c for c in conversations if c["turns"]]
+
+
+def load_logic_prompts(chatbot_doc_path: Path = CHATBOT_DOC_PATH) -> list:
+    """Parse the L1-L8 logic prompt table from CHATBOT.md (one turn each)"""
+    prompts = []
+    with open(chatbot_doc_path, 'r') as f:
+        for line in f:
+            row = re.match(r'^\|\s*(L\d+)\s*\|\s*"(.+?)"\s*\|\s*(.+?)\s*\|$', line.strip())
+            if row:
+                prompts.append({"id": row.group(1), "title": row.group(3), "turns": [row.group(2)]})
+    return prompts
+
+
+def load_prompts_csv(csv_path: Path) -> list:
+    """Load a suite from CSV with conversation_id, turn_number, prompt columns"""
+    by_conversation = {}
+    with open(csv_path, 'r') as f:
+        for row in csv.DictReader(f):
+            if not row.get("prompt"):
+                continue
+            turns = by_conversation.setdefault(row["conversation_id"], [])
+            turns.append((int(row.get("turn_number") or len(turns) + 1), row["prompt"]))
+    return [{"id": cid, "title": cid, "turns": [p for _, p in sorted(turns)]}
+            for cid, turns in by_conversation.items()]
+
+
+# ----------------------------------------------------------------------
+# Mock retrieval tool
+# ----------------------------------------------------------------------
+
+def build_search_tool(records_dir: Path) -> CachedSearch:
+    """Serve enriched records from the local search stand-in behind the retrieval cache"""
+    backend = LocalSearchBackend()
+    objects = []
+    for path in iter_enriched_files(records_dir):
+        record = load_enriched(path)
+        record.setdefault("source_id", path.stem.replace('_enriched', ''))
+        objects.append(to_search_record(record))
+    backend.save_objects(SEARCH_INDEX, objects)
+    return CachedSearch(backend, index=SEARCH_INDEX, cache=RetrievalCache())
+
+
+def run_search_tool(search: CachedSearch, arguments: dict) -> dict:
+    """Execute one tool call; returns the payload sent back to the model"""
+    result = search.search(query=arguments.get("query", ""),
+                           facet_filters=arguments.get("facet_filters"),
+                           number_of_results=arguments.get("number_of_results") or 20)
+    hits = [{k: hit.get(k) for k in ("objectID", "url", "source", "published_at", "text",
+                                     "audience_label", "sentiment_label", "emotions",
+                                     "symptoms", "conditions", "treatments", "topics",
+                                     "engagement_label", "key_phrases")}
+            for hit in result["hits"]]
+    return {"nbHits": result["nbHits"], "hits": hits}
+
+
+# ----------------------------------------------------------------------
+# Response cache
+# ----------------------------------------------------------------------
+
+def prompt_version_hash(system_prompt: str) -> str:
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """On-disk cache of turn results keyed by prompt version, model, temperature and history"""
+
+    def __init__(self, cache_dir: Path = RESPONSE_CACHE_DIR, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, prompt_hash: str, model: str, temperature: float, messages: list) -> str:
+        payload = json.dumps([prompt_hash, model, temperature, messages],
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> dict:
+        path = self.cache_dir / f"{key}.json"
+        if self.enabled and path.exists():
+            with open(path, 'r') as f:
+                entry = json.load(f)
+            with self._lock:
+                self.hits += 1
+            return entry
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, entry: dict):
+        if not self.enabled:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_dir / f"{key}.json.tmp.{threading.get_ident()}"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        tmp_path.replace(self.cache_dir / f"{key}.json")
+
+
+# ----------------------------------------------------------------------
+# Model clients
+# ----------------------------------------------------------------------
+
+class OpenAIChatModel:
+    """Chat Completions client with tool calling (openai imported lazily)"""
+
+    def __init__(self, model: str, temperature: float):
+        from openai import OpenAI
+        from dotenv import load_dotenv
+
+        env_path = REPO_ROOT / ".env"
+        load_dotenv(env_path)
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            print(f"❌ OPENAI_API_KEY not found. Checked: {env_path}")
+            sys.exit(1)
+        self.client = OpenAI(api_key=api_key)
+        self.model = model
+        self.temperature = temperature
+
+    def complete(self, messages: list) -> tuple:
+        """Returns (assistant message dict, prompt_tokens, completion_tokens)"""
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            tools=[SEARCH_TOOL],
+            temperature=self.temperature
+        )
+        message = response.choices[0].message
+        out = {"role": "assistant", "content": message.content}
+        if message.tool_calls:
+            out["tool_calls"] = [{
+                "id": call.id,
+                "type": "function",
+                "function": {"name": call.function.name, "arguments": call.function.arguments}
+            } for call in message.tool_calls]
+        usage = response.usage
+        return out, (usage.prompt_tokens if usage else 0), (usage.completion_tokens if usage else 0)
+
+
+class MockChatModel:
+    """Offline stand-in: one search with no filters, then a canned answer"""
+
+    def __init__(self, model: str = "mock", temperature: float = 0.0):
+        self.model = model
+        self.temperature = temperature
+
+    def complete(self, messages: list) -> tuple:
+        last = messages[-1]
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in messages) // 4
+        if last["role"] == "user":
+            call_id = "call_" + hashlib.sha1(last["content"].encode("utf-8")).hexdigest()[:8]
+            arguments = json.dumps({"query": "", "facet_filters": None, "number_of_results": 30})
+            return ({"role": "assistant", "content": None, "tool_calls": [{
+                "id": call_id, "type": "function",
+                "function": {"name": "algolia_search", "arguments": arguments}}]},
+                    prompt_tokens, 20)
+        hits = json.loads(last["content"]).get("nbHits", 0)
+        return {"role": "assistant", "content": f"📊 Mock answer over {hits} posts."}, prompt_tokens, 10
+
+
+# ----------------------------------------------------------------------
+# Runner
+# ----------------------------------------------------------------------
+
+def run_turn(model, search: CachedSearch, messages: list) -> dict:
+    """Run one user turn to completion, executing tool calls; returns turn details"""
+    prompt_tokens = completion_tokens = 0
+    tool_calls = []
+    started = time.perf_counter()
+
+    for _ in range(MAX_TOOL_ROUNDS + 1):
+        message, p_tokens, c_tokens = model.complete(messages)
+        prompt_tokens += p_tokens
+        completion_tokens += c_tokens
+        messages.append(message)
+        if not message.get("tool_calls"):
+            break
+        for call in message["tool_calls"]:
+            try:
+                arguments = json.loads(call["function"]["arguments"] or "{}")
+            except json.JSONDecodeError:
+                arguments = {}
+            result = run_search_tool(search, arguments)
+            tool_calls.append({"arguments": arguments, "nbHits": result["nbHits"],
+                               "returned": len(result["hits"])})
+            messages.append({"role": "tool", "tool_call_id": call["id"],
+                             "content": json.dumps(result, ensure_ascii=False)})
+
+    return {
+        "response": messages[-1].get("content") or "",
+        "tool_calls": tool_calls,
+        "latency_ms": round((time.perf_counter() - started) * 1000),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens
+    }
+
+
+def filter_used(tool_calls: list) -> str:
+    """Map tool calls onto the filter_used column (yes / no / null / n/a)"""
+    if not tool_calls:
+        return "n/a"
+    filters = [c["arguments"].get("facet_filters", "missing") for c in tool_calls]
+    if any(f for f in filters if f not in (None, "missing")):
+        return "yes"
+    if any(f is None for f in filters):
+        return "null"
+    return "no"
+
+
+def run_conversation(conversation: dict, model, search: CachedSearch, system_prompt: str,
+                     prompt_hash: str, cache: ResponseCache) -> list:
+    """Run all turns of one conversation in order"""
+    messages = [{"role": "system", "content": system_prompt}]
+    rows = []
+
+    for turn_number, prompt in enumerate(conversation["turns"], 1):
+        messages.append({"role": "user", "content": prompt})
+        # System prompt content is represented by its hash in the key
+        key = cache.key(prompt_hash, model.model, model.temperature, messages[1:])
+        entry = cache.get(key)
+        # Entries cached before the turn transcript was stored cannot rebuild the history
+        if entry is not None and "messages" not in entry:
+            entry = None
+        cached = entry is not None
+
+        if entry is None:
+            turn_messages = list(messages)
+            result = run_turn(model, search, turn_messages)
+            entry = {
+                "response": result["response"],
+                # Assistant tool calls, tool results and the final answer, carried into later turns
+                "messages": turn_messages[len(messages):],
+                "tool_calls": result["tool_calls"],
+                "latency_ms": result["latency_ms"],
+                "prompt_tokens": result["prompt_tokens"],
+                "completion_tokens": result["completion_tokens"],
+                "timestamp": datetime.now().isoformat(timespec="seconds")
+            }
+            cache.put(key, entry)
+
+        messages.extend(entry["messages"])
+        rows.append({
+            "conversation_id": conversation["id"],
+            "turn_number": turn_number,
+            "prompt": prompt,
+            "entry": entry,
+            "cached": cached
+        })
+
+    return rows
+
+
+def write_results(rows: list, csv_path: Path, model_name: str, prompt_name: str, prompt_hash: str):
+    """Write the results CSV and a JSONL transcript next to it"""
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            entry = row["entry"]
+            writer.writerow({
+                'conversation_id': row["conversation_id"],
+                'turn_number': row["turn_number"],
+                'prompt': row["prompt"],
+                'timestamp': entry["timestamp"],
+                'model': model_name,
+                'filter_used': filter_used(entry["tool_calls"]),
+                'data_returned': sum(c["returned"] for c in entry["tool_calls"]),
+                'notes': "cached response" if row["cached"] else "",
+                'latency_ms': entry["latency_ms"],
+                'prompt_tokens': entry["prompt_tokens"],
+                'completion_tokens': entry["completion_tokens"],
+            })
+
+    transcript_path = csv_path.with_suffix(".jsonl")
+    with open(transcript_path, 'w') as f:
+        for row in rows:
+            f.write(json.dumps({
+                "prompt_version": prompt_name,
+                "prompt_hash": prompt_hash,
+                "conversation_id": row["conversation_id"],
+                "turn_number": row["turn_number"],
+                "prompt": row["prompt"],
+                "cached": row["cached"],
+                **row["entry"]
+            }, ensure_ascii=False) + "\n")
+    return transcript_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run chatbot test suites in parallel")
+    parser.add_argument("--prompt", default="v2",
+                        help="Prompt version (v1, v2) or path to a system prompt file")
+    parser.add_argument("--model", default="gpt-4.1-mini", help="Model (default: gpt-4.1-mini)")
+    parser.add_argument("--temp", type=float, default=0.2, help="Temperature (default: 0.2)")
+    parser.add_argument("--suite", choices=["conversations", "logic", "all"], default="all")
+    parser.add_argument("--prompts-csv", type=Path, help="Load prompts from CSV instead of the test plan")
+    parser.add_argument("--only", help="Comma-separated conversation IDs, e.g. C1,L5")
+    parser.add_argument("--records", type=Path, default=DEFAULT_RECORDS_DIR,
+                        help="Enriched records served by the mock search tool")
+    parser.add_argument("--workers", type=int, default=4, help="Conversations run in parallel")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached responses")
+    parser.add_argument("--mock-model", action="store_true", help="Use the offline mock model")
+    parser.add_argument("--output", type=Path, help="Results CSV path (default: runs/<prompt>_<model>_<date>.csv)")
+    args = parser.parse_args()
+
+    prompt_path = PROMPT_FILES.get(args.prompt, Path(args.prompt))
+    if not prompt_path.exists():
+        print(f"❌ Prompt file not found: {prompt_path}")
+        sys.exit(1)
+    with open(prompt_path, 'r') as f:
+        system_prompt = f.read()
+    prompt_hash = prompt_version_hash(system_prompt)
+
+    if args.prompts_csv:
+        suite = load_prompts_csv(args.prompts_csv)
+    else:
+        suite = []
+        if args.suite in ("logic", "all"):
+            suite += load_logic_prompts()
+        if args.suite in ("conversations", "all"):
+            suite += load_conversations()
+    if args.only:
+        wanted = {s.strip() for s in args.only.split(",")}
+        suite = [c for c in suite if c["id"] in wanted]
+    if not suite:
+        print("❌ No prompts to run")
+        sys.exit(1)
+
+    if not args.records.exists():
+        print(f"❌ Records directory not found: {args.records}")
+        sys.exit(1)
+    search = build_search_tool(args.records)
+
+    model = MockChatModel(temperature=args.temp) if args.mock_model else OpenAIChatModel(args.model, args.temp)
+    cache = ResponseCache(enabled=not args.no_cache)
+
+    output = args.output or RUNS_DIR / f"{prompt_path.stem}_{model.model}_{datetime.now():%Y-%m-%d}.csv"
+    total_turns = sum(len(c["turns"]) for c in suite)
+
+    print(f"\n{'='*70}")
+    print(f"  CHATBOT EVALUATION RUN")
+    print(f"{'='*70}")
+    print(f"  Prompt: {prompt_path.name} (hash {prompt_hash})")
+    print(f"  Model: {model.model} @ temp {args.temp}")
+    print(f"  Conversations: {len(suite)} ({total_turns} turns), workers: {args.workers}")
+
+    started = time.perf_counter()
+    results = {}
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {c["id"]: pool.submit(run_conversation, c, model, search, system_prompt,
+                                        prompt_hash, cache) for c in suite}
+        for conversation in suite:
+            try:
+                results[conversation["id"]] = futures[conversation["id"]].result()
+                print(f"  {conversation['id']}: ✅ {len(conversation['turns'])} turns")
+            except Exception as e:
+                print(f"  {conversation['id']}: ❌ Error: {e}")
+    elapsed = time.perf_counter() - started
+
+    rows = [row for c in suite for row in results.get(c["id"], [])]
+    transcript_path = write_results(rows, output, model.model, args.prompt, prompt_hash)
+
+    latencies = sorted(r["entry"]["latency_ms"] for r in rows if not r["cached"])
+    print(f"\n{'='*70}")
+    print(f"SUMMARY")
+    print(f"{'='*70}")
+    print(f"Turns:        {len(rows)}/{total_turns}")
+    print(f"Cached:       {cache.hits} hits, {cache.misses} misses")
+    if latencies:
+        print(f"Latency:      p50 {latencies[len(latencies) // 2]} ms, max {latencies[-1]} ms")
+    print(f"Tokens:       {sum(r['entry']['prompt_tokens'] for r in rows):,} prompt, "
+          f"{sum(r['entry']['completion_tokens'] for r in rows):,} completion")
+    print(f"Search cache: {search.cache.hit_rate()*100:.1f}% hit rate")
+    print(f"Wall time:    {elapsed:.1f}s")
+    print(f"\nResults:    {output}")
+    print(f"Transcript: {transcript_path}")
+
+    if len(rows) < total_turns:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+"""
+PBH SIGNAL - shared pipeline modules
+
+Library code used by the versioned runners and evaluators under system/v*/
+and by the chatbot tooling. Modules are imported directly, e.g.:
+
+    from pbh_signal.facet_cubes import FacetCubes
+"""
@@ -0,0 +1,131 @@
+"""
+PBH SIGNAL - Safety Alert Sinks
+
+Destinations for confirmed adverse_event / crisis flags. Every sink
+de-duplicates on (source, source_id, flag), so the same post raised by the
+safety fast lane and again by full enrichment produces one alert.
+
+- FileAlertSink: appends JSON lines to a local file (seen keys rebuilt from it)
+- WebhookAlertSink: POSTs each alert as JSON (stand-in for the PV intake
+  endpoint), with retry + backoff; seen keys kept in an optional state file
+"""
+
+import hashlib
+import json
+import threading
+import time
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+def alert_key(post: dict, flag: str) -> str:
+    """De-duplication key for one flag on one post"""
+    raw = f"{post.get('source')}:{post.get('source_id')}:{flag}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def make_alert(post: dict, flag: str, lane: str, ingested_at: float = None,
+               evidence: str = "", confidence: float = None) -> dict:
+    """Alert payload; ingested_at is a time.time() timestamp used for latency"""
+    now = time.time()
+    alert = {
+        "alert_id": alert_key(post, flag),
+        "flag": flag,
+        "source": post.get("source"),
+        "source_id": post.get("source_id"),
+        "url": post.get("url"),
+        "published_at": post.get("published_at"),
+        "evidence": evidence,
+        "confidence": confidence,
+        "lane": lane,
+        "alerted_at": datetime.fromtimestamp(now, timezone.utc).isoformat(),
+    }
+    if ingested_at is not None:
+        alert["ingested_at"] = datetime.fromtimestamp(ingested_at, timezone.utc).isoformat()
+        alert["latency_s"] = round(now - ingested_at, 3)
+    return alert
+
+
+class AlertSink:
+    """Base sink: de-duplicates, then delivers"""
+
+    def __init__(self):
+        self._seen = set()
+        self._lock = threading.Lock()
+        self.stats = {"emitted": 0, "duplicates": 0, "failed": 0}
+
+    def emit(self, alert: dict) -> bool:
+        """Deliver an alert unless already sent; returns True if delivered"""
+        with self._lock:
+            if alert["alert_id"] in self._seen:
+                self.stats["duplicates"] += 1
+                return False
+            self._seen.add(alert["alert_id"])
+        try:
+            self._deliver(alert)
+        except Exception:
+            with self._lock:
+                self._seen.discard(alert["alert_id"])
+                self.stats["failed"] += 1
+            raise
+        with self._lock:
+            self.stats["emitted"] += 1
+        return True
+
+    def _deliver(self, alert: dict):
+        raise NotImplementedError
+
+
+class FileAlertSink(AlertSink):
+    """Append alerts to a JSON lines file"""
+
+    def __init__(self, path: Path):
+        super().__init__()
+        self.path = Path(path)
+        if self.path.exists():
+            with open(self.path, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        self._seen.add(json.loads(line)["alert_id"])
+
+    def _deliver(self, alert: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        line = json.dumps(alert, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line)
+
+
+class WebhookAlertSink(AlertSink):
+    """POST alerts as JSON to a webhook URL"""
+
+    def __init__(self, url: str, state_path: Path = None, timeout: float = 10,
+                 max_retries: int = 3, backoff: float = 0.5):
+        super().__init__()
+        self.url = url
+        self.state_path = Path(state_path) if state_path else None
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        if self.state_path and self.state_path.exists():
+            with open(self.state_path, 'r') as f:
+                self._seen.update(line.strip() for line in f if line.strip())
+
+    def _deliver(self, alert: dict):
+        body = json.dumps(alert).encode("utf-8")
+        for attempt in range(1, self.max_retries + 2):
+            request = urllib.request.Request(self.url, data=body, method="POST",
+                                             headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout):
+                    break
+            except Exception:
+                if attempt > self.max_retries:
+                    raise
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+        if self.state_path:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                with open(self.state_path, 'a') as f:
+                    f.write(alert["alert_id"] + "\n")
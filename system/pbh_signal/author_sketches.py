@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Distinct-Author Sketches (HyperLogLog)
+
+Answers "how many unique users are discussing PBH?" (chatbot test L4) from
+fixed-size HyperLogLog sketches instead of scanning posts.
+
+One sketch is kept per (scope, source, ISO week), where scope is "all" or a
+facet value such as "conditions:PBH" or "treatments:acarbose". Authors are
+hashed as "<source>|<author.id>" (ids are only unique within a platform).
+A query unions (register-wise max) the sketches for the requested sources
+and weeks, so cost depends on the number of sketches touched, never on the
+number of posts. Sketches from different shards or runs merge the same way.
+
+Error: each sketch has 2^PRECISION one-byte registers, giving a relative
+standard error of 1.04 / sqrt(2^p): 1.6% at the default p=12, at most
+4 KB per sketch (small sketches are stored sparse). About 95% of estimates
+fall within ±2 standard errors. Counts use Ertl's improved estimator, which
+stays unbiased at small and mid-range cardinalities where raw HLL needs
+linear counting or bias tables.
+
+Sketches are insert-only: adding the same author twice changes nothing,
+so re-enriched posts are harmless, but an author whose post loses a facet
+value stays counted under it until the sketches are rebuilt.
+
+Usage:
+    python -m pbh_signal.author_sketches build --input v7/testing/api_test_outputs/v7
+    python -m pbh_signal.author_sketches count --where conditions:PBH
+    python -m pbh_signal.author_sketches count --where conditions:PBH --source reddit.com --week 2025-W49
+    python -m pbh_signal.author_sketches merge --from shard_a.json --from shard_b.json
+    python -m pbh_signal.author_sketches bench --authors 1000000
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import math
+import sys
+import time
+from pathlib import Path
+
+from pbh_signal.facet_cubes import parse_facet_filter
+from pbh_signal.records import FACET_FIELDS, facet_values, iter_enriched_files, load_enriched, week_bucket
+
+BASE_DIR = Path(__file__).parent
+DEFAULT_SKETCH_PATH = BASE_DIR.parent / "cache" / "author_sketches.json"
+
+SKETCH_FORMAT_VERSION = 1
+
+PRECISION = 12
+SPARSE_FRACTION = 8
+ALL_SCOPE = "all"
+UNKNOWN_AUTHORS = {"", "unknown", "none", "null", "anonymous", "[deleted]"}
+
+
+def author_key(record: dict) -> str:
+    """"<source>|<author id>" or None when the post has no usable author"""
+    author = record.get("author")
+    if isinstance(author, dict):
+        author_id = author.get("id") or author.get("handle")
+    else:
+        author_id = author
+    if author_id is None or str(author_id).strip().lower() in UNKNOWN_AUTHORS:
+        return None
+    return f"{record.get('source') or 'unknown'}|{author_id}"
+
+
+def hash64(item: str) -> int:
+    return int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _sigma(x: float) -> float:
+    if x == 1.0:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _tau(x: float) -> float:
+    if x == 0.0 or x == 1.0:
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+
+class HyperLogLog:
+    """
+    HyperLogLog with 2^precision one-byte registers and a 64-bit hash.
+
+    Starts sparse ({register: rank}) and switches to a dense bytearray once
+    more than 1/SPARSE_FRACTION of the registers are set, so the many small
+    per-week/per-value sketches cost bytes rather than 4 KB each.
+    """
+
+    def __init__(self, precision: int = PRECISION):
+        if not 4 <= precision <= 16:
+            raise ValueError(f"precision must be 4-16, got {precision}")
+        self.precision = precision
+        self.m = 1 << precision
+        self.sparse = {}
+        self.registers = None
+
+    @property
+    def std_error(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, item: str):
+        self.add_hash(hash64(item))
+
+    def add_hash(self, h: int):
+        q = 64 - self.precision
+        index = h >> q
+        # Position of the leftmost 1-bit in the remaining 64-p bits
+        rank = q - (h & ((1 << q) - 1)).bit_length() + 1
+        if self.registers is not None:
+            if rank > self.registers[index]:
+                self.registers[index] = rank
+        elif rank > self.sparse.get(index, 0):
+            self.sparse[index] = rank
+            if len(self.sparse) > self.m // SPARSE_FRACTION:
+                self._densify()
+
+    def _densify(self):
+        self.registers = bytearray(self.m)
+        for index, rank in self.sparse.items():
+            self.registers[index] = rank
+        self.sparse = {}
+
+    def merge(self, other: "HyperLogLog"):
+        """Union in place (register-wise max)"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precision")
+        if other.registers is not None:
+            if self.registers is None:
+                self._densify()
+            self.registers = bytearray(map(max, self.registers, other.registers))
+            return
+        for index, rank in other.sparse.items():
+            if self.registers is not None:
+                if rank > self.registers[index]:
+                    self.registers[index] = rank
+            elif rank > self.sparse.get(index, 0):
+                self.sparse[index] = rank
+        if self.registers is None and len(self.sparse) > self.m // SPARSE_FRACTION:
+            self._densify()
+
+    def count(self) -> int:
+        """
+        Ertl's improved estimator ("New cardinality estimation algorithms for
+        HyperLogLog sketches", 2017): unbiased from small to large counts
+        without the empirical bias tables of HLL++.
+        """
+        q = 64 - self.precision
+        m = self.m
+        histogram = [0] * (q + 2)
+        if self.registers is not None:
+            for r in self.registers:
+                histogram[r] += 1
+        else:
+            for r in self.sparse.values():
+                histogram[r] += 1
+            histogram[0] = m - len(self.sparse)
+        z = m * _tau(1 - histogram[q + 1] / m)
+        for k in range(q, 0, -1):
+            z = 0.5 * (z + histogram[k])
+        z += m * _sigma(histogram[0] / m)
+        return int(round(m * m / (2 * math.log(2)) / z))
+
+    def copy(self) -> "HyperLogLog":
+        sketch = HyperLogLog(self.precision)
+        sketch.sparse = dict(self.sparse)
+        sketch.registers = bytearray(self.registers) if self.registers is not None else None
+        return sketch
+
+    def to_json(self):
+        """Dense: base64 registers; sparse: flat [index, rank, ...] list"""
+        if self.registers is not None:
+            return base64.b64encode(bytes(self.registers)).decode("ascii")
+        return [v for item in sorted(self.sparse.items()) for v in item]
+
+    @classmethod
+    def from_json(cls, data, precision: int = PRECISION) -> "HyperLogLog":
+        sketch = cls(precision)
+        if isinstance(data, str):
+            sketch.registers = bytearray(base64.b64decode(data))
+        else:
+            sketch.sparse = dict(zip(data[::2], data[1::2]))
+        return sketch
+
+
+class AuthorSketches:
+    """HyperLogLog sketches per (scope, source, week), maintained incrementally"""
+
+    def __init__(self, facets: list = None, precision: int = PRECISION):
+        self.facets = list(facets or FACET_FIELDS)
+        self.precision = precision
+        self.sketches = {}          # (scope, source, week) -> HyperLogLog
+        self.high_water_mark = 0    # max source-file mtime_ns folded in
+        self.stats = {"posts": 0, "no_author": 0}
+
+    def scopes(self, record: dict) -> list:
+        scopes = [ALL_SCOPE]
+        for field in self.facets:
+            scopes.extend(f"{field}:{value}" for value in facet_values(record, field))
+        return scopes
+
+    def add_record(self, record: dict, mtime_ns: int = None) -> bool:
+        """
+        Fold one enriched record in; False if it has no usable author. Pass
+        the mtime_ns of the record's file to advance the high-water mark, so
+        a later build does not fold (and count) the file again.
+        """
+        if mtime_ns is not None:
+            self.high_water_mark = max(self.high_water_mark, mtime_ns)
+        key = author_key(record)
+        if key is None:
+            self.stats["no_author"] += 1
+            return False
+        h = hash64(key)
+        source = record.get("source") or "unknown"
+        week = week_bucket(record.get("published_at"))
+        for scope in self.scopes(record):
+            sketch = self.sketches.get((scope, source, week))
+            if sketch is None:
+                sketch = self.sketches[(scope, source, week)] = HyperLogLog(self.precision)
+            sketch.add_hash(h)
+        self.stats["posts"] += 1
+        return True
+
+    def update_from_dir(self, directory: Path, since: int = None) -> dict:
+        """
+        Fold *_enriched.json files modified after `since` (mtime_ns, default
+        the high-water mark). When updating from several directories, pass
+        the same `since` to each: the mark only advances once all are read.
+        """
+        since = self.high_water_mark if since is None else since
+        stats = {"scanned": 0, "added": 0, "skipped": 0, "no_author": 0}
+        newest = self.high_water_mark
+        for path in iter_enriched_files(directory):
+            stats["scanned"] += 1
+            mtime_ns = path.stat().st_mtime_ns
+            if mtime_ns <= since:
+                stats["skipped"] += 1
+                continue
+            newest = max(newest, mtime_ns)
+            stats["added" if self.add_record(load_enriched(path)) else "no_author"] += 1
+        self.high_water_mark = newest
+        return stats
+
+    def merge(self, other: "AuthorSketches"):
+        """Union another shard's sketches into this one"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precision")
+        for key, sketch in other.sketches.items():
+            if key in self.sketches:
+                self.sketches[key].merge(sketch)
+            else:
+                self.sketches[key] = sketch.copy()
+        self.high_water_mark = max(self.high_water_mark, other.high_water_mark)
+        for k, v in other.stats.items():
+            self.stats[k] = self.stats.get(k, 0) + v
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def union(self, where: str = None, sources: list = None, weeks: list = None) -> HyperLogLog:
+        """Union of the sketches in scope"""
+        scope = ALL_SCOPE
+        if where:
+            field, value = parse_facet_filter(where)
+            if field not in self.facets:
+                raise ValueError(f"Unknown facet: {field} (available: {', '.join(self.facets)})")
+            scope = f"{field}:{value}"
+        result = HyperLogLog(self.precision)
+        for (s, source, week), sketch in self.sketches.items():
+            if s == scope and (not sources or source in sources) and (not weeks or week in weeks):
+                result.merge(sketch)
+        return result
+
+    def query(self, request: dict) -> dict:
+        """
+        JSON entry point for the chatbot tool.
+
+        request: {"where": "conditions:PBH", "sources": [...], "weeks": [...]}
+        """
+        sketch = self.union(request.get("where"), request.get("sources"), request.get("weeks"))
+        estimate = sketch.count()
+        error = sketch.std_error
+        return {
+            "where": request.get("where"),
+            "sources": request.get("sources"),
+            "weeks": request.get("weeks"),
+            "distinct_authors": estimate,
+            "std_error": round(error, 4),
+            "range_95": [round(estimate * (1 - 2 * error)), round(estimate * (1 + 2 * error))],
+        }
+
+    def weeks(self) -> list:
+        return sorted({w for (_, _, w) in self.sketches})
+
+    def sources(self) -> list:
+        return sorted({s for (_, s, _) in self.sketches})
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def to_dict(self) -> dict:
+        return {
+            "version": SKETCH_FORMAT_VERSION,
+            "facets": self.facets,
+            "precision": self.precision,
+            "high_water_mark": self.high_water_mark,
+            "stats": self.stats,
+            "sketches": [[scope, source, week, sketch.to_json()]
+                         for (scope, source, week), sketch in self.sketches.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "AuthorSketches":
+        if data.get("version") != SKETCH_FORMAT_VERSION:
+            raise ValueError(f"Unsupported sketch format version: {data.get('version')}")
+        sketches = cls(facets=data["facets"], precision=data["precision"])
+        sketches.high_water_mark = data["high_water_mark"]
+        sketches.stats = data["stats"]
+        for scope, source, week, registers in data["sketches"]:
+            sketches.sketches[(scope, source, week)] = HyperLogLog.from_json(registers, data["precision"])
+        return sketches
+
+    def save(self, path: Path = DEFAULT_SKETCH_PATH):
+        """Write sketches atomically"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_SKETCH_PATH) -> "AuthorSketches":
+        """Load sketches from disk, or return empty sketches if none exist yet"""
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+
+def bench(authors: int, precision: int = PRECISION) -> dict:
+    """Estimate error against exact counts at increasing cardinalities"""
+    sketch = HyperLogLog(precision)
+    checkpoints = sorted({n for n in (100, 1_000, 10_000, 100_000, authors) if n <= authors})
+    rows = []
+    started = time.perf_counter()
+    added = 0
+    for n in checkpoints:
+        for i in range(added, n):
+            sketch.add(f"reddit.com|{i}")
+        added = n
+        estimate = sketch.count()
+        rows.append({"exact": n, "estimate": estimate, "error_pct": (estimate - n) / n * 100})
+    return {"rows": rows, "std_error_pct": sketch.std_error * 100, "bytes": sketch.m,
+            "us_per_add": (time.perf_counter() - started) / authors * 1e6}
+
+
+def print_result(result: dict):
+    print(f"\n{'='*70}")
+    scope = result["where"] or "all posts"
+    print(f"  DISTINCT AUTHORS: {scope}")
+    print(f"{'='*70}")
+    if result["sources"]:
+        print(f"  Sources: {', '.join(result['sources'])}")
+    if result["weeks"]:
+        print(f"  Weeks:   {', '.join(result['weeks'])}")
+    low, high = result["range_95"]
+    print(f"  ~{result['distinct_authors']:,} unique authors "
+          f"(±{result['std_error'] * 100:.1f}% std error; 95% range {low:,}-{high:,})\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HyperLogLog distinct-author counts per facet, source and week")
+    parser.add_argument("--sketches", type=Path, default=DEFAULT_SKETCH_PATH, help="Sketch file path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Fold enriched outputs into the sketches")
+    build.add_argument("--input", type=Path, required=True, action="append",
+                       help="Directory of *_enriched.json files (repeatable)")
+    build.add_argument("--rebuild", action="store_true", help="Discard existing sketches first")
+
+    count = sub.add_parser("count", help="Estimate distinct authors")
+    count.add_argument("--where", help="Facet value, e.g. conditions:PBH (default: all posts)")
+    count.add_argument("--source", action="append", dest="sources", help="Limit to source (repeatable)")
+    count.add_argument("--week", action="append", dest="weeks", help="Limit to ISO week (repeatable)")
+    count.add_argument("--json", action="store_true", help="Print raw JSON")
+
+    merge = sub.add_parser("merge", help="Merge sketch files from other shards into --sketches")
+    merge.add_argument("--from", type=Path, required=True, action="append", dest="sources",
+                       help="Sketch file to merge (repeatable)")
+
+    bench_cmd = sub.add_parser("bench", help="Error versus exact counts on synthetic authors")
+    bench_cmd.add_argument("--authors", type=int, default=1_000_000)
+
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        result = bench(args.authors)
+        print(f"  p={PRECISION}: {result['bytes']:,} bytes/sketch, expected std error "
+              f"{result['std_error_pct']:.2f}%, {result['us_per_add']:.2f} µs/add")
+        for row in result["rows"]:
+            print(f"    {row['exact']:>10,} exact  {row['estimate']:>10,} estimated  {row['error_pct']:>+6.2f}%")
+        return
+
+    if args.command == "build":
+        sketches = AuthorSketches() if args.rebuild else AuthorSketches.load(args.sketches)
+        since = sketches.high_water_mark
+        for directory in args.input:
+            if not directory.exists():
+                print(f"❌ Input directory not found: {directory}")
+                sys.exit(1)
+            stats = sketches.update_from_dir(directory, since=since)
+            print(f"  {directory}: {stats['added']} added, {stats['skipped']} unchanged, "
+                  f"{stats['no_author']} without author ({stats['scanned']} scanned)")
+        sketches.save(args.sketches)
+        print(f"✅ Sketches saved: {args.sketches} ({len(sketches.sketches)} sketches, "
+              f"{sketches.stats['posts']} posts)")
+        return
+
+    if args.command == "merge":
+        sketches = AuthorSketches.load(args.sketches)
+        for path in args.sources:
+            if not path.exists():
+                print(f"❌ Sketch file not found: {path}")
+                sys.exit(1)
+            try:
+                sketches.merge(AuthorSketches.load(path))
+            except ValueError as e:
+                print(f"❌ {path}: {e}")
+                sys.exit(1)
+        sketches.save(args.sketches)
+        print(f"✅ Merged {len(args.sources)} shard(s) into {args.sketches} ({len(sketches.sketches)} sketches)")
+        return
+
+    sketches = AuthorSketches.load(args.sketches)
+    if not sketches.sketches:
+        print(f"❌ No sketches found at {args.sketches} - run 'build' first")
+        sys.exit(1)
+    try:
+        result = sketches.query({"where": args.where, "sources": args.sources, "weeks": args.weeks})
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    else:
+        print_result(result)
+
+
+if __name__ == "__main__":
+    main()
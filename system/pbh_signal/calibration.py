@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Confidence Calibration and Review Routing
+
+Checks whether relevance_confidence, audience_confidence and
+sentiment_confidence mean what they say: for each field, the confidence is
+compared with whether the paired label matched the expected output.
+
+- Reliability diagram: accuracy vs mean confidence per confidence bin
+- ECE (expected calibration error): bin-weighted |accuracy - confidence|
+- Accuracy-at-threshold: coverage and accuracy of posts kept above each cut
+
+Runs are loaded into per-field columns (confidence list, correct list) once,
+so any number of runs/models are scored in a single pass.
+
+Review routing ranks posts by uncertainty (lowest field confidence, then
+mean confidence) and picks the cut that sends only the least-certain N% to
+human or second-pass review.
+
+Usage:
+    python -m pbh_signal.calibration --expected v7/testing/expected_outputs \\
+        --run v7/testing/api_test_outputs/v7 --run v7/testing/api_test_outputs/cascade
+    python -m pbh_signal.calibration --route v7/testing/api_test_outputs/v7 --review-pct 10
+"""
+
+import argparse
+import bisect
+import json
+import sys
+from pathlib import Path
+
+from pbh_signal.compact_records import load_compact
+from pbh_signal.records import iter_enriched_files, load_enriched
+
+# Confidence field -> label it qualifies
+CONFIDENCE_FIELDS = {
+    "relevance_confidence": "relevance_label",
+    "audience_confidence": "audience_label",
+    "sentiment_confidence": "sentiment_label",
+}
+
+DEFAULT_BINS = 10
+DEFAULT_THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.9]
+
+
+def load_columns(run_dir: Path, expected_dir: Path) -> dict:
+    """Per field: {"confidence": [...], "correct": [...]} for posts with expected outputs"""
+    columns = {field: {"confidence": [], "correct": []} for field in CONFIDENCE_FIELDS}
+    for path in iter_enriched_files(run_dir):
+        expected_path = Path(expected_dir) / path.name
+        if not expected_path.exists():
+            continue
+        actual = load_enriched(path)
+        expected = load_enriched(expected_path)
+        for field, label in CONFIDENCE_FIELDS.items():
+            confidence = actual.get(field)
+            if not isinstance(confidence, (int, float)):
+                continue
+            columns[field]["confidence"].append(float(confidence))
+            columns[field]["correct"].append(actual.get(label) == expected.get(label))
+    return columns
+
+
+def reliability_bins(confidence: list, correct: list, n_bins: int = DEFAULT_BINS) -> list:
+    """Equal-width confidence bins: [{lo, hi, count, mean_confidence, accuracy}]"""
+    counts = [0] * n_bins
+    conf_sums = [0.0] * n_bins
+    hits = [0] * n_bins
+    for c, ok in zip(confidence, correct):
+        i = min(n_bins - 1, max(0, int(c * n_bins)))
+        counts[i] += 1
+        conf_sums[i] += c
+        hits[i] += ok
+    return [{
+        "lo": i / n_bins,
+        "hi": (i + 1) / n_bins,
+        "count": counts[i],
+        "mean_confidence": conf_sums[i] / counts[i] if counts[i] else None,
+        "accuracy": hits[i] / counts[i] if counts[i] else None,
+    } for i in range(n_bins)]
+
+
+def expected_calibration_error(bins: list) -> float:
+    """Count-weighted mean |accuracy - confidence| over non-empty bins"""
+    total = sum(b["count"] for b in bins)
+    if not total:
+        return 0.0
+    return sum(b["count"] * abs(b["accuracy"] - b["mean_confidence"]) for b in bins if b["count"]) / total
+
+
+def accuracy_at_thresholds(confidence: list, correct: list, thresholds: list = None) -> list:
+    """For each cut: share of posts kept (confidence >= cut) and their accuracy"""
+    rows = []
+    n = len(confidence)
+    for t in thresholds or DEFAULT_THRESHOLDS:
+        kept = [ok for c, ok in zip(confidence, correct) if c >= t]
+        rows.append({
+            "threshold": t,
+            "coverage": len(kept) / n if n else 0.0,
+            "accuracy": sum(kept) / len(kept) if kept else None,
+        })
+    return rows
+
+
+def calibrate(columns: dict, n_bins: int = DEFAULT_BINS, thresholds: list = None) -> dict:
+    """Reliability bins, ECE, accuracy and accuracy-at-threshold per field"""
+    report = {}
+    for field, col in columns.items():
+        n = len(col["confidence"])
+        bins = reliability_bins(col["confidence"], col["correct"], n_bins)
+        report[field] = {
+            "n": n,
+            "accuracy": sum(col["correct"]) / n if n else None,
+            "mean_confidence": sum(col["confidence"]) / n if n else None,
+            "ece": expected_calibration_error(bins),
+            "bins": bins,
+            "at_threshold": accuracy_at_thresholds(col["confidence"], col["correct"], thresholds),
+        }
+    return report
+
+
+def uncertainty_key(record: dict) -> tuple:
+    """Sort key, least certain first: (lowest field confidence, mean confidence)"""
+    values = [record.get(f) for f in CONFIDENCE_FIELDS]
+    values = [float(v) for v in values if isinstance(v, (int, float))]
+    if not values:
+        return (0.0, 0.0)
+    return (min(values), sum(values) / len(values))
+
+
+def route_for_review(records: list, review_pct: float) -> dict:
+    """
+    Pick the least-certain review_pct% of records. Returns the routed
+    source_ids and the (min, mean) confidence cut: records ranking at or
+    below the cut go to review.
+    """
+    keyed = sorted(((uncertainty_key(r), r) for r in records), key=lambda x: x[0])
+    ranked = [r for _, r in keyed]
+    n_review = int(len(ranked) * review_pct / 100)
+    routed = ranked[:n_review]
+    cut = keyed[n_review - 1][0] if routed else None
+    # The largest plain min-confidence threshold that stays within budget (for static routing rules)
+    mins = [key[0] for key, _ in keyed]
+    static = None
+    static_routed = 0
+    for candidate in sorted(set(mins), reverse=True):
+        below = bisect.bisect_left(mins, candidate)
+        if below <= n_review:
+            static, static_routed = candidate, below
+            break
+    return {
+        "total": len(ranked),
+        "review_pct": review_pct,
+        "routed": [r.get("source_id") for r in routed],
+        "cut": {"min_confidence": cut[0], "mean_confidence": cut[1]} if cut else None,
+        "static_threshold": static,
+        "static_routed": static_routed,
+    }
+
+
+def print_calibration(name: str, report: dict):
+    print(f"\n{'='*70}")
+    print(f"  CALIBRATION: {name}")
+    print(f"{'='*70}")
+    for field, stats in report.items():
+        if not stats["n"]:
+            continue
+        print(f"\n  {field} (n={stats['n']}): accuracy {stats['accuracy']*100:.1f}%, "
+              f"mean confidence {stats['mean_confidence']*100:.1f}%, ECE {stats['ece']:.3f}")
+        print(f"    {'bin':<11} {'n':>4} {'conf':>6} {'acc':>6}  reliability")
+        for b in stats["bins"]:
+            if not b["count"]:
+                continue
+            bar = "█" * round(b["accuracy"] * 20)
+            print(f"    {b['lo']:.1f}-{b['hi']:.1f}   {b['count']:>4} {b['mean_confidence']:>6.2f} "
+                  f"{b['accuracy']:>6.2f}  {bar:<20}|")
+        print(f"    {'cut':<11} {'kept':>6} {'acc':>6}")
+        for row in stats["at_threshold"]:
+            accuracy = "-" if row["accuracy"] is None else f"{row['accuracy']*100:.0f}%"
+            print(f"    ≥ {row['threshold']:.2f}      {row['coverage']*100:>5.0f}% {accuracy:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confidence calibration and review routing")
+    parser.add_argument("--run", type=Path, action="append", default=[], help="Run output directory (repeatable)")
+    parser.add_argument("--expected", type=Path, help="Expected outputs directory")
+    parser.add_argument("--route", type=Path, help="Directory of enriched posts to route for review")
+    parser.add_argument("--review-pct", type=float, default=10.0, help="Share of posts to send to review")
+    parser.add_argument("--bins", type=int, default=DEFAULT_BINS)
+    parser.add_argument("--output", type=Path, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    if not args.run and not args.route:
+        print("❌ Must specify --run (with --expected) or --route")
+        sys.exit(1)
+    if args.run and not args.expected:
+        print("❌ --run needs --expected")
+        sys.exit(1)
+
+    output = {}
+    for run_dir in args.run:
+        if not run_dir.exists():
+            print(f"❌ Run directory not found: {run_dir}")
+            sys.exit(1)
+        report = calibrate(load_columns(run_dir, args.expected), args.bins)
+        print_calibration(run_dir.name, report)
+        output[run_dir.name] = report
+
+    if args.route:
+        records = list(load_compact(args.route).values())
+        routing = route_for_review(records, args.review_pct)
+        print(f"\n{'='*70}")
+        print(f"  REVIEW ROUTING: {args.route.name} ({args.review_pct:.0f}% budget)")
+        print(f"{'='*70}")
+        print(f"  Routed {len(routing['routed'])}/{routing['total']} least-certain posts")
+        if routing["cut"]:
+            print(f"  Cut: min confidence ≤ {routing['cut']['min_confidence']:.2f} "
+                  f"(mean ≤ {routing['cut']['mean_confidence']:.2f})")
+        if routing["static_threshold"] is not None:
+            print(f"  Static rule: min confidence < {routing['static_threshold']:.2f} "
+                  f"routes {routing['static_routed']} posts")
+        for source_id in routing["routed"]:
+            print(f"    - {source_id}")
+        output["routing"] = routing
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Model Cascade
+
+Enrich with a small model first and escalate to the large model only when
+the cheap answer is not good enough:
+- the output fails schema validation (pbh_signal.schema_validator)
+- relevance_confidence / audience_confidence below threshold
+- a Tier 1 field is non-trivial: any flags, or relevance_label "borderline"
+
+Stats are computed against expected outputs: escalation rate, token cost
+versus running every post on the large model, and Tier 1 / Tier 2 pass
+rates versus a full-large run (e.g. api_test_outputs/v7).
+
+Usage (the run itself is v7/testing/run_api_test.py --cascade):
+    python -m pbh_signal.cascade --run v7/testing/api_test_outputs/cascade \\
+        --baseline v7/testing/api_test_outputs/v7 --expected v7/testing/expected_outputs
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from pbh_signal.schema_validator import needs_model_repair
+from pbh_signal.streaming import SAFETY_FIELDS
+
+DEFAULT_SMALL_MODEL = "gpt-4o-mini"
+DEFAULT_LARGE_MODEL = "gpt-4o"
+
+# USD per 1M tokens (input, output); update when list prices change
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-2024-11-20": (2.50, 10.00),
+}
+
+DEFAULT_THRESHOLDS = {
+    "relevance_confidence": 0.75,
+    "audience_confidence": 0.7,
+}
+
+# Same tiers as v7/testing/compare_v7.py
+TIER1_FIELDS = SAFETY_FIELDS
+TIER2_FIELDS = ['audience_label', 'sentiment_label', 'themes', 'conditions',
+                'treatments', 'companies', 'symptoms', 'topics', 'engagement_label', 'emotions']
+
+CASCADE_LOG = "cascade_log.json"
+
+
+def token_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """USD cost of one call (0 for unknown models)"""
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+def escalation_reasons(enriched: dict, violations: list, thresholds: dict = None) -> list:
+    """Why a small-model answer should go to the large model (empty = accept)"""
+    thresholds = thresholds or DEFAULT_THRESHOLDS
+    reasons = []
+    if needs_model_repair(violations):
+        reasons.append("invalid")
+    for field, minimum in thresholds.items():
+        value = enriched.get(field)
+        if not isinstance(value, (int, float)) or value < minimum:
+            reasons.append(f"{field}<{minimum}")
+    if enriched.get("flags"):
+        reasons.append("flags")
+    if enriched.get("relevance_label") == "borderline":
+        reasons.append("relevance_borderline")
+    return reasons
+
+
+class Cascade:
+    """Small model first, large model on escalation (final answer is validated/repaired by the caller)"""
+
+    def __init__(self, call, validator, small_model: str = DEFAULT_SMALL_MODEL,
+                 large_model: str = DEFAULT_LARGE_MODEL, thresholds: dict = None):
+        self.call = call    # call(model, post) -> (enriched, {"prompt_tokens", "completion_tokens"})
+        self.validator = validator
+        self.small_model = small_model
+        self.large_model = large_model
+        self.thresholds = thresholds or DEFAULT_THRESHOLDS
+
+    def enrich(self, post: dict) -> tuple:
+        """Returns (enriched, log entry)"""
+        enriched, usage = self.call(self.small_model, post)
+        violations = self.validator.validate(enriched)
+        reasons = escalation_reasons(enriched, violations, self.thresholds)
+        entry = {
+            "model": self.small_model,
+            "large_model": self.large_model,
+            "reasons": reasons,
+            "calls": [{"model": self.small_model, **usage}],
+        }
+        if reasons:
+            enriched, usage = self.call(self.large_model, post)
+            entry["model"] = self.large_model
+            entry["calls"].append({"model": self.large_model, **usage})
+        return enriched, entry
+
+
+def compare_value(expected, actual) -> bool:
+    """Field equality as the compare scripts score it (lists compared as sets)"""
+    if isinstance(expected, list) and isinstance(actual, list):
+        return set(expected) == set(actual)
+    return expected == actual
+
+
+def tier_pass_rates(output_dir: Path, expected_dir: Path, source_ids: list = None) -> dict:
+    """Tier 1 / Tier 2 pass rates of a run directory against expected outputs"""
+    total = tier1 = tier2 = 0
+    for expected_path in sorted(Path(expected_dir).glob("*_enriched.json")):
+        source_id = expected_path.stem.replace('_enriched', '')
+        actual_path = Path(output_dir) / expected_path.name
+        if (source_ids is not None and source_id not in source_ids) or not actual_path.exists():
+            continue
+        with open(expected_path, 'r') as f:
+            expected = json.load(f)
+        with open(actual_path, 'r') as f:
+            actual = json.load(f)
+        total += 1
+        tier1 += all(compare_value(expected.get(k), actual.get(k)) for k in TIER1_FIELDS)
+        tier2 += all(compare_value(expected.get(k), actual.get(k)) for k in TIER2_FIELDS)
+    return {
+        "total": total,
+        "tier1_pct": tier1 / total * 100 if total else 0.0,
+        "tier2_pct": tier2 / total * 100 if total else 0.0,
+    }
+
+
+def cascade_report(run_dir: Path, expected_dir: Path, baseline_dir: Path = None) -> dict:
+    """Escalation rate, cost versus all-large, and tier deltas versus a full-large run"""
+    with open(Path(run_dir) / CASCADE_LOG, 'r') as f:
+        log = json.load(f)
+
+    escalated = {sid: e for sid, e in log.items() if len(e["calls"]) > 1}
+    reasons = {}
+    for entry in escalated.values():
+        for reason in entry["reasons"]:
+            key = reason.split("<")[0]
+            reasons[key] = reasons.get(key, 0) + 1
+
+    actual_cost = 0.0
+    all_large_cost = 0.0
+    for entry in log.values():
+        for call in entry["calls"]:
+            actual_cost += token_cost(call["model"], call["prompt_tokens"], call["completion_tokens"])
+        # Posts kept on the small model are priced as if the large model had produced the same tokens
+        final = entry["calls"][-1]
+        all_large_cost += token_cost(entry["large_model"], final["prompt_tokens"], final["completion_tokens"])
+
+    source_ids = set(log)
+    report = {
+        "posts": len(log),
+        "escalated": len(escalated),
+        "escalation_rate": len(escalated) / len(log) if log else 0.0,
+        "escalation_reasons": dict(sorted(reasons.items(), key=lambda x: -x[1])),
+        "cost_usd": actual_cost,
+        "all_large_cost_usd": all_large_cost,
+        "cost_saved_pct": (1 - actual_cost / all_large_cost) * 100 if all_large_cost else 0.0,
+        "cascade": tier_pass_rates(run_dir, expected_dir, source_ids),
+    }
+    if baseline_dir and Path(baseline_dir).exists():
+        baseline = tier_pass_rates(baseline_dir, expected_dir, source_ids)
+        report["full_large"] = baseline
+        report["tier1_delta"] = report["cascade"]["tier1_pct"] - baseline["tier1_pct"]
+        report["tier2_delta"] = report["cascade"]["tier2_pct"] - baseline["tier2_pct"]
+    return report
+
+
+def print_cascade_report(report: dict):
+    """Print cascade stats"""
+    print(f"\n{'='*70}")
+    print(f"  MODEL CASCADE")
+    print(f"{'='*70}")
+    print(f"  Posts:            {report['posts']}")
+    print(f"  Escalated:        {report['escalated']} ({report['escalation_rate']*100:.1f}%)")
+    for reason, count in report["escalation_reasons"].items():
+        print(f"    - {reason}: {count}")
+    print(f"  Cost:             ${report['cost_usd']:.4f} vs ${report['all_large_cost_usd']:.4f} all-large "
+          f"({report['cost_saved_pct']:.1f}% saved)")
+    cascade = report["cascade"]
+    print(f"\n  {'':<14} {'Tier 1':>8} {'Tier 2':>8}   (n={cascade['total']} with expected outputs)")
+    print(f"  {'Cascade':<14} {cascade['tier1_pct']:>7.1f}% {cascade['tier2_pct']:>7.1f}%")
+    if "full_large" in report:
+        baseline = report["full_large"]
+        print(f"  {'Full large':<14} {baseline['tier1_pct']:>7.1f}% {baseline['tier2_pct']:>7.1f}%")
+        print(f"  {'Delta':<14} {report['tier1_delta']:>+7.1f}  {report['tier2_delta']:>+7.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cascade stats for a run_api_test.py --cascade output directory")
+    parser.add_argument("--run", type=Path, required=True, help="Cascade output directory (with cascade_log.json)")
+    parser.add_argument("--expected", type=Path, required=True, help="Expected outputs directory")
+    parser.add_argument("--baseline", type=Path, help="Full large-model output directory")
+    args = parser.parse_args()
+
+    if not (args.run / CASCADE_LOG).exists():
+        print(f"❌ {CASCADE_LOG} not found in {args.run}")
+        sys.exit(1)
+
+    print_cascade_report(cascade_report(args.run, args.expected, args.baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Command Line
+
+One `signal` command in front of the versioned runners/evaluators and the
+pbh_signal tools. Subcommands resolve their script or module from the
+shared versioned configuration (pbh_signal.config) and import it only when
+they run, so offline subcommands never load openai/dotenv and start fast.
+
+Subcommands (arguments after the subcommand's own are passed through):
+    enrich   [--version v7]  run a version's enrichment test runner
+    sweep    [--version v6]  run the runner once per test config or model × temperature
+    compare  [--version v7]  compare a version's outputs with expected outputs
+                             (--sources: v6 dev pipeline + all model_* runs)
+    analyze  [--version v6]  precision/recall and confusion analysis
+    report   [--version v5]  phase 1 report from the results CSV
+    index    <target>        build/query local indexes (cubes, search, similar, authors, trends, dictionary)
+    bench    <target>        micro-benchmarks (similar, authors, trends, dictionary, fuzzy, records)
+    versions                 list configured versions and their subcommands
+
+Usage (from system/):
+    ./signal compare --details
+    ./signal compare --version v6 --test 3
+    ./signal enrich --all --samples 3
+    ./signal sweep --version v6 --tests 1 3 -- --all
+    ./signal sweep --version v6 --models gpt-4o gpt-4o-2024-11-20 --temps 0.1 0.3 -- --count 5
+    ./signal index cubes build --input v7/testing/api_test_outputs/v7
+    ./signal bench similar --posts 20000
+    python -m pbh_signal.cli versions
+"""
+
+import argparse
+import importlib
+import runpy
+import sys
+
+from pbh_signal.config import CONFIG_VERSION, LATEST_VERSION, VERSIONS
+
+# signal index <target> -> pbh_signal module (its own CLI)
+INDEX_MODULES = {
+    "cubes": "facet_cubes",
+    "search": "index_sync",
+    "similar": "similar_posts",
+    "authors": "author_sketches",
+    "trends": "trends",
+    "dictionary": "dictionary_artifact",
+}
+
+# signal bench <target> -> (pbh_signal module, leading arguments)
+BENCH_MODULES = {
+    "similar": ("similar_posts", ["bench"]),
+    "authors": ("author_sketches", ["bench"]),
+    "trends": ("trends", ["bench"]),
+    "dictionary": ("dictionary_artifact", ["bench"]),
+    "fuzzy": ("fuzzy_match", ["--bench"]),
+    "records": ("compact_records", ["bench"]),
+}
+
+SCRIPT_COMMANDS = ["enrich", "compare", "analyze", "report"]
+
+
+def default_version(command: str) -> str:
+    """Newest configured version that provides a script for the command"""
+    for version in reversed(list(VERSIONS)):
+        if command in VERSIONS[version]["scripts"]:
+            return version
+    return LATEST_VERSION
+
+
+def run_script(version: str, command: str, args: list):
+    """Run a versioned script as if invoked directly with args"""
+    scripts = VERSIONS[version]["scripts"]
+    if command not in scripts:
+        available = [v for v in VERSIONS if command in VERSIONS[v]["scripts"]]
+        print(f"❌ {version} has no '{command}' script (available for: {', '.join(available) or 'none'})")
+        sys.exit(1)
+    script = scripts[command]
+    argv = sys.argv
+    sys.argv = [str(script)] + list(args)
+    try:
+        runpy.run_path(str(script), run_name="__main__")
+    finally:
+        sys.argv = argv
+
+
+def run_module(module: str, args: list):
+    """Run a pbh_signal module's main() with args"""
+    argv = sys.argv
+    sys.argv = [f"pbh_signal.{module}"] + list(args)
+    try:
+        importlib.import_module(f"pbh_signal.{module}").main()
+    finally:
+        sys.argv = argv
+
+
+def sweep(version: str, tests: list, models: list, temps: list, args: list):
+    """Run the version's runner once per test config, or per model × temperature (model_test mode)"""
+    config = VERSIONS[version]
+    if "runs" not in config:
+        sweepable = [v for v in VERSIONS if "runs" in VERSIONS[v]]
+        print(f"❌ {version} has no sweepable run configurations (available for: {', '.join(sweepable)})")
+        sys.exit(1)
+
+    if models or temps:
+        grid = [["--mode", "model_test", "--model", model, "--temp", str(temp)]
+                for model in models or [config["model"]] for temp in temps or [config["temperature"]]]
+    else:
+        grid = [["--test", str(test)] for test in tests or config["runs"]]
+
+    failed = []
+    for i, run_args in enumerate(grid, 1):
+        print(f"\n▶ sweep {i}/{len(grid)}: {' '.join(run_args)}")
+        try:
+            run_script(version, "enrich", run_args + list(args))
+        except SystemExit as e:
+            if e.code:
+                failed.append(" ".join(run_args))
+
+    print(f"\n{'='*70}")
+    print(f"  SWEEP: {len(grid) - len(failed)}/{len(grid)} runs completed")
+    print(f"{'='*70}")
+    for run_args in failed:
+        print(f"  ❌ {run_args}")
+    if failed:
+        sys.exit(1)
+
+
+def print_versions():
+    print(f"\n{'='*70}")
+    print(f"  CONFIGURED VERSIONS (config v{CONFIG_VERSION})")
+    print(f"{'='*70}")
+    for version, config in VERSIONS.items():
+        print(f"  {version:<4} {config['description']}")
+        print(f"       prompt: {config['prompt']}")
+        print(f"       schema: {config['schema']}")
+        print(f"       model:  {config['model']} @ {config['temperature']}")
+        print(f"       subcommands: {', '.join(config['scripts'])}")
+    print(f"\n  index targets: {', '.join(INDEX_MODULES)}")
+    print(f"  bench targets: {', '.join(BENCH_MODULES)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="signal", description="PBH SIGNAL runners, evaluators and local tools",
+        epilog="Arguments after the subcommand's own options are passed to the underlying script; "
+               "use `--` before options that clash (e.g. `signal compare -- --help`).")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for command, help_text in (("enrich", "Run a version's enrichment test runner"),
+                               ("compare", "Compare outputs against expected outputs"),
+                               ("analyze", "Detailed precision/recall analysis"),
+                               ("report", "Generate a test report from results")):
+        cmd = sub.add_parser(command, help=help_text)
+        cmd.add_argument("--version", choices=list(VERSIONS),
+                         help="Pipeline version (default: newest version with this subcommand)")
+        if command == "compare":
+            cmd.add_argument("--sources", action="store_true",
+                             help="Compare all sources (dev pipeline + model_* runs)")
+
+    sweep_cmd = sub.add_parser("sweep", help="Run the runner across test configs or model × temperature")
+    sweep_cmd.add_argument("--version", choices=list(VERSIONS),
+                           default=next(v for v in reversed(list(VERSIONS)) if "runs" in VERSIONS[v]))
+    sweep_cmd.add_argument("--tests", type=int, nargs="+", help="Test configurations (default: all)")
+    sweep_cmd.add_argument("--models", nargs="+", help="Models for model_test mode")
+    sweep_cmd.add_argument("--temps", type=float, nargs="+", help="Temperatures for model_test mode")
+
+    index = sub.add_parser("index", help="Build/query local indexes")
+    index.add_argument("target", choices=list(INDEX_MODULES))
+
+    bench = sub.add_parser("bench", help="Run a micro-benchmark")
+    bench.add_argument("target", choices=list(BENCH_MODULES))
+
+    sub.add_parser("versions", help="List configured versions")
+
+    args, rest = parser.parse_known_args()
+    if rest[:1] == ["--"]:
+        rest = rest[1:]
+
+    if args.command in SCRIPT_COMMANDS:
+        command = "compare-sources" if getattr(args, "sources", False) else args.command
+        run_script(args.version or default_version(command), command, rest)
+    elif args.command == "sweep":
+        sweep(args.version, args.tests, args.models, args.temps, rest)
+    elif args.command == "index":
+        run_module(INDEX_MODULES[args.target], rest)
+    elif args.command == "bench":
+        module, leading = BENCH_MODULES[args.target]
+        run_module(module, leading + rest)
+    else:
+        print_versions()
+
+
+if __name__ == "__main__":
+    main()
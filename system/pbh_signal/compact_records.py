@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Compact Enriched Records
+
+Holds enriched records in memory at a fraction of the size of the dicts
+json.load returns, so a year of outputs fits in RAM for analysis.
+
+A CompactRecord keeps only what evaluators and analysis read:
+- label, source, country and language fields as uint16 codes
+- entity/enum list fields (topics, symptoms, flags, ...) as uint16 codes,
+  all in one bytes object per record
+- confidences as exact uint16 fixed-point (4 decimals), published_at as
+  epoch seconds, engagement_score as is
+
+Codes come from a Codebook shared by all stores (seeded with the v7 schema
+enums; values the schema does not list are added on first sight), so every
+decoded label is the same interned string. Any value the compact form
+cannot reproduce exactly (a non-canonical date, a number label, ...) is
+kept as is in a per-record overflow dict, so decoding is lossless.
+
+Passthrough fields (text, title, url, author, metrics, key_phrases,
+relevance_reason, debug_matches, ...) are not held at all: the first read
+of one loads the record's file, and the last LOAD_CACHE_SIZE loaded
+records are kept so further reads of the same record do not hit the disk.
+record.load() returns a copy of the whole record.
+
+Records are read-only Mappings of field -> value (keys/items/iteration
+cover passthrough fields too, via the file), so code written against
+json.load dicts (the evaluators, calibration routing) takes them
+unchanged. CompactRecords is a Mapping of source_id -> record.
+
+Usage:
+    python -m pbh_signal.compact_records stats --input v7/testing/api_test_outputs/v7
+    python -m pbh_signal.compact_records bench [--records 20000]
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from array import array
+from collections import OrderedDict
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from pbh_signal.config import LATEST_VERSION, VERSIONS
+from pbh_signal.records import LIST_FACETS, iter_enriched_files, load_enriched, parse_published_at
+
+# Scalar string fields held as codes (0 = None)
+CODED_FIELDS = ['source', 'country', 'language', 'engagement_label', 'bariatric_context',
+                'relevance_label', 'audience_label', 'sentiment_label', 'sentiment_raw']
+CONFIDENCE_FIELDS = ['relevance_confidence', 'audience_confidence', 'sentiment_confidence']
+LIST_FIELDS = LIST_FACETS
+COMPACT_FIELDS = ['source_id', 'published_at', 'engagement_score'] + CODED_FIELDS + CONFIDENCE_FIELDS + LIST_FIELDS
+
+LOAD_CACHE_SIZE = 64            # full records kept per store after a passthrough read
+MISSING = 0xFFFF                # field absent from the record
+NULL_CONFIDENCE = 0xFFFE        # confidence present but None
+MAX_CODE = 0xFFFD
+CONFIDENCE_SCALE = 10000
+PUBLISHED_FORMAT = "%Y-%m-%d %H:%M:%S"
+_EPOCH = datetime(1970, 1, 1)
+_FIXED = len(CODED_FIELDS) + len(CONFIDENCE_FIELDS)
+_POSITIONS = {field: i for i, field in enumerate(CODED_FIELDS + CONFIDENCE_FIELDS)}
+_LIST_INDEX = {field: i for i, field in enumerate(LIST_FIELDS)}
+_ABSENT = object()
+
+
+class Codebook:
+    """Per-field value <-> small integer codes (1-based; 0 is None)"""
+
+    def __init__(self):
+        self._codes = {}        # field -> {value: code}
+        self._values = {}       # field -> [None, value for code 1, ...]
+
+    def encode(self, field: str, value) -> int:
+        """Code for a string value (None -> 0), adding new values; None if not codable"""
+        if value is None:
+            return 0
+        if not isinstance(value, str):
+            return None
+        codes = self._codes.setdefault(field, {})
+        code = codes.get(value)
+        if code is None:
+            values = self._values.setdefault(field, [None])
+            if len(values) > MAX_CODE:
+                return None
+            code = codes[value] = len(values)
+            values.append(sys.intern(value))
+        return code
+
+    def decode(self, field: str, code: int):
+        return self._values[field][code] if code else None
+
+    def __len__(self):
+        return sum(len(codes) for codes in self._codes.values())
+
+    @classmethod
+    def from_schema(cls, schema_path: Path) -> "Codebook":
+        """Codebook seeded with the enum values of a response-format schema, in schema order"""
+        codebook = cls()
+        with open(schema_path, 'r') as f:
+            schema = json.load(f)
+        schema = schema.get("json_schema", schema).get("schema", schema)
+        for field, spec in schema.get("properties", {}).items():
+            for value in spec.get("enum") or spec.get("items", {}).get("enum") or []:
+                codebook.encode(field, value)
+        return codebook
+
+
+_codebook = None
+
+
+def get_codebook() -> Codebook:
+    """Process-wide codebook seeded from the latest version's schema"""
+    global _codebook
+    if _codebook is None:
+        config = VERSIONS[LATEST_VERSION]
+        schema_path = config["enrichment_dir"] / config["schema"]
+        _codebook = Codebook.from_schema(schema_path) if schema_path.exists() else Codebook()
+    return _codebook
+
+
+class CompactRecord(Mapping):
+    """Read-only enriched record: coded labels in memory, passthrough fields read from disk"""
+
+    __slots__ = ("source_id", "_store", "_codes", "_published", "_score", "_extra")
+
+    def __init__(self, source_id: str, store: "CompactRecords", codes: bytes, published, score, extra):
+        self.source_id = source_id
+        self._store = store
+        self._codes = codes
+        self._published = published
+        self._score = score
+        self._extra = extra
+
+    def _compact(self, field: str):
+        """Value of an in-memory field (_ABSENT if missing from the record)"""
+        codes = memoryview(self._codes).cast("H")
+        position = _POSITIONS.get(field)
+        if position is not None:
+            code = codes[position]
+            if code == MISSING:
+                return _ABSENT
+            if position < len(CODED_FIELDS):
+                return self._store.codebook.decode(field, code)
+            return None if code == NULL_CONFIDENCE else code / CONFIDENCE_SCALE
+        position = _FIXED
+        for _ in range(_LIST_INDEX[field]):
+            n = codes[position]
+            position += 1 if n == MISSING else n + 1
+        n = codes[position]
+        if n == MISSING:
+            return _ABSENT
+        decode = self._store.codebook.decode
+        return [decode(field, code) for code in codes[position + 1:position + 1 + n]]
+
+    def __getitem__(self, field: str):
+        if self._extra is not None and field in self._extra:
+            return self._extra[field]
+        if field == "source_id":
+            return self.source_id
+        if field == "published_at":
+            value = self._published
+            if value is _ABSENT:
+                raise KeyError(field)
+            return None if value is None else (_EPOCH + timedelta(seconds=value)).strftime(PUBLISHED_FORMAT)
+        if field == "engagement_score":
+            value = self._score
+        elif field in _POSITIONS or field in _LIST_INDEX:
+            value = self._compact(field)
+        else:
+            return self._store.full(self.source_id)[field]
+        if value is _ABSENT:
+            raise KeyError(field)
+        return value
+
+    def get(self, field: str, default=None):
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def __contains__(self, field: str) -> bool:
+        return self.get(field, _ABSENT) is not _ABSENT
+
+    def __iter__(self):
+        """Every field of the record (in-memory only when the store has no directory)"""
+        if self._store.directory is None:
+            return iter(self.to_dict())
+        return iter(self._store.full(self.source_id))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> dict:
+        """The in-memory fields as a plain dict (no passthrough fields)"""
+        record = {}
+        for field in COMPACT_FIELDS:
+            value = self.get(field, _ABSENT)
+            if value is not _ABSENT:
+                record[field] = value
+        if self._extra:
+            record.update(self._extra)
+        return record
+
+    def load(self) -> dict:
+        """The full record from its file (a copy; safe to modify)"""
+        return self._store.load(self.source_id)
+
+    def __repr__(self):
+        return f"CompactRecord({self.source_id!r})"
+
+
+class CompactRecords(Mapping):
+    """source_id -> CompactRecord for one directory of enriched outputs"""
+
+    def __init__(self, directory: Path = None, codebook: Codebook = None):
+        self.directory = Path(directory) if directory is not None else None
+        self.codebook = codebook or get_codebook()
+        self._records = {}
+        self._loaded = OrderedDict()    # source_id -> full record, least recently read first
+
+    def add(self, record: dict, source_id: str = None) -> CompactRecord:
+        """Encode a record (source_id defaults to the record's own)"""
+        source_id = source_id or record.get("source_id")
+        codebook = self.codebook
+        codes = []
+        extra = {}
+        if record.get("source_id", _ABSENT) != source_id:
+            extra["source_id"] = record.get("source_id")
+
+        for field in CODED_FIELDS:
+            if field not in record:
+                codes.append(MISSING)
+                continue
+            code = codebook.encode(field, record[field])
+            if code is None:
+                extra[field] = record[field]
+                code = MISSING
+            codes.append(code)
+
+        for field in CONFIDENCE_FIELDS:
+            value = record.get(field, _ABSENT)
+            if value is _ABSENT:
+                code = MISSING
+            elif value is None:
+                code = NULL_CONFIDENCE
+            elif (isinstance(value, (int, float)) and not isinstance(value, bool) and 0 <= value <= 1
+                  and round(value * CONFIDENCE_SCALE) / CONFIDENCE_SCALE == value):
+                code = round(value * CONFIDENCE_SCALE)
+            else:
+                extra[field] = value
+                code = MISSING
+            codes.append(code)
+
+        for field in LIST_FIELDS:
+            values = record.get(field, _ABSENT)
+            item_codes = None
+            if isinstance(values, list) and len(values) < MISSING:
+                item_codes = [codebook.encode(field, v) if v is not None else None for v in values]
+                if None in item_codes:
+                    item_codes = None
+            if item_codes is None:
+                if values is not _ABSENT:
+                    extra[field] = values
+                codes.append(MISSING)
+            else:
+                codes.append(len(item_codes))
+                codes.extend(item_codes)
+
+        published = record.get("published_at", _ABSENT)
+        if isinstance(published, str):
+            dt = parse_published_at(published)
+            if dt is not None and dt.strftime(PUBLISHED_FORMAT) == published:
+                published = int((dt - _EPOCH).total_seconds())
+            else:
+                extra["published_at"] = published
+                published = _ABSENT
+        elif published is not None and published is not _ABSENT:
+            extra["published_at"] = published
+            published = _ABSENT
+
+        score = record.get("engagement_score", _ABSENT)
+        if not isinstance(score, (int, float)) and score is not None and score is not _ABSENT:
+            extra["engagement_score"] = score
+            score = _ABSENT
+
+        compact = CompactRecord(source_id, self, array("H", codes).tobytes(), published, score, extra or None)
+        self._records[source_id] = compact
+        return compact
+
+    def full(self, source_id: str) -> dict:
+        """Full record from the store's directory (shared cached dict - do not modify)"""
+        record = self._loaded.get(source_id)
+        if record is not None:
+            self._loaded.move_to_end(source_id)
+            return record
+        if self.directory is None:
+            raise KeyError(f"{source_id}: passthrough fields need a source directory")
+        record = load_enriched(self.directory / f"{source_id}_enriched.json")
+        self._loaded[source_id] = record
+        if len(self._loaded) > LOAD_CACHE_SIZE:
+            self._loaded.popitem(last=False)
+        return record
+
+    def load(self, source_id: str) -> dict:
+        """Full record from the store's directory"""
+        return dict(self.full(source_id))
+
+    @classmethod
+    def from_directory(cls, directory: Path, codebook: Codebook = None) -> "CompactRecords":
+        """Load every <source_id>_enriched.json in a directory"""
+        store = cls(directory, codebook)
+        for path in iter_enriched_files(directory):
+            store.add(load_enriched(path), path.stem[:-len("_enriched")])
+        return store
+
+    def __getitem__(self, source_id: str) -> CompactRecord:
+        return self._records[source_id]
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+
+def load_compact(directory: Path) -> CompactRecords:
+    """Compact records of a directory of enriched outputs, keyed by source_id"""
+    return CompactRecords.from_directory(directory)
+
+
+def measure(build) -> tuple:
+    """(result, bytes allocated and still held by it)"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, held
+
+
+def print_memory(title: str, n: int, dict_bytes: int, compact_bytes: int, timings: dict = None):
+    print(f"\n{'='*70}")
+    print(f"  {title}")
+    print(f"{'='*70}")
+    print(f"  Records:          {n:,}")
+    print(f"  json.load dicts:  {dict_bytes / 2**20:>9.1f} MB ({dict_bytes / max(n, 1):,.0f} B/record)")
+    print(f"  CompactRecords:   {compact_bytes / 2**20:>9.1f} MB ({compact_bytes / max(n, 1):,.0f} B/record)")
+    print(f"  Reduction:        {dict_bytes / max(compact_bytes, 1):.1f}x")
+    for label, seconds in (timings or {}).items():
+        print(f"  {label + ':':<18}{seconds * 1e6 / max(n, 1):>9.2f} µs/record")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact in-memory enriched records")
+    sub = parser.add_subparsers(dest="command", required=True)
+    stats = sub.add_parser("stats", help="Memory of a directory as dicts vs compact records")
+    stats.add_argument("--input", type=Path, required=True)
+    bench = sub.add_parser("bench", help="Memory and Tier 1 read cost on synthetic records")
+    bench.add_argument("--records", type=int, default=20000)
+    bench.add_argument("--seed", type=Path, default=VERSIONS[LATEST_VERSION]["expected_dir"],
+                       help="Directory of enriched records to replicate")
+    args = parser.parse_args()
+
+    directory = args.input if args.command == "stats" else args.seed
+    if not directory.exists():
+        print(f"❌ Not found: {directory}")
+        sys.exit(1)
+    # One-time costs (schema codebook, strptime's compiled formats) are not per-record memory
+    get_codebook()
+    parse_published_at("2025-01-01 00:00:00")
+
+    if args.command == "stats":
+        dicts, dict_bytes = measure(lambda: {p.stem: load_enriched(p) for p in iter_enriched_files(directory)})
+        store, compact_bytes = measure(lambda: load_compact(directory))
+        mismatched = [sid for sid, record in dicts.items()
+                      if store[sid[:-len("_enriched")]].to_dict() !=
+                      {field: value for field, value in record.items() if field in COMPACT_FIELDS}]
+        print_memory(f"COMPACT RECORDS: {directory.name}", len(store), dict_bytes, compact_bytes)
+        print(f"  Overflow values:  {sum(len(r._extra or ()) for r in store.values())}")
+        print(f"  Lossless:         {'yes' if not mismatched else 'NO - ' + ', '.join(mismatched[:5])}")
+        if mismatched:
+            sys.exit(1)
+        return
+
+    seeds = [path.read_text() for path in iter_enriched_files(directory)]
+    if not seeds:
+        print(f"❌ No enriched records in {directory}")
+        sys.exit(1)
+
+    def texts():
+        for i in range(args.records):
+            seed = json.loads(seeds[i % len(seeds)])
+            seed["source_id"] = f"t3_{i:07d}"
+            yield json.dumps(seed)
+
+    dicts, dict_bytes = measure(lambda: [json.loads(text) for text in texts()])
+
+    def build():
+        store = CompactRecords()
+        for text in texts():
+            store.add(json.loads(text))
+        return store
+    store, compact_bytes = measure(build)
+
+    tier1 = ['flags', 'relevance_label', 'bariatric_context']
+    started = time.perf_counter()
+    for record in dicts:
+        for field in tier1:
+            record.get(field)
+    dict_read = time.perf_counter() - started
+    started = time.perf_counter()
+    for record in store.values():
+        for field in tier1:
+            record.get(field)
+    compact_read = time.perf_counter() - started
+
+    print_memory(f"COMPACT RECORDS BENCH ({len(seeds)} seed records)", args.records, dict_bytes, compact_bytes,
+                 {"Tier 1 (dict)": dict_read, "Tier 1 (compact)": compact_read})
+    print(f"  Codebook:         {len(store.codebook)} values")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+PBH SIGNAL - Versioned Run Configuration
+
+One place for the paths, prompt/schema files, default model settings and
+scripts of each pipeline version, shared by the v5/v6/v7 runners and
+evaluators and by the `signal` command (pbh_signal.cli). Scripts read their
+section instead of hard-coding path constants:
+
+    from pbh_signal.config import VERSIONS
+    V7 = VERSIONS["v7"]
+    schema = load_schema(V7["enrichment_dir"] / V7["schema"])
+
+Also holds the schema/input loaders that were copy-pasted across the
+runners; prompts and request templates come from pbh_signal.prompt_registry.
+Stdlib only, so importing it costs next to nothing.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# Bump when keys are renamed or removed; scripts may check it
+CONFIG_VERSION = 1
+
+SYSTEM_DIR = Path(__file__).parent.parent
+ENV_PATH = SYSTEM_DIR.parent / ".env"
+
+_V5 = SYSTEM_DIR / "v5"
+_V6 = SYSTEM_DIR / "v6"
+_V7 = SYSTEM_DIR / "v7"
+
+VERSIONS = {
+    "v5": {
+        "description": "v5.3.4 prompt + embedded dictionary, Chat Completions, fixture test sets",
+        "enrichment_dir": _V5 / "enrichment",
+        "testing_dir": _V5 / "testing",
+        "prompt": "openai_assistant_system_prompt_v5.3.4.md",
+        "dictionary": "PBH_SIGNAL_DICTIONARY_v5.txt",
+        "schema": "openai_assistant_response_format_v5_wrapped.json",
+        "model": "gpt-4o-2024-11-20",
+        "temperature": 0.3,
+        "user_prefix": "Enrich this normalized post:\n\n",
+        "env_path": _V5 / "testing" / "phase1" / ".env",
+        "test_data_dir": _V5 / "enrichment-test-data-v5",
+        "test_sets": ["ae-test-cases", "platform-coverage", "edge-cases",
+                      "dictionary-tests", "classification-tests", "flag-tests"],
+        "expected_dir": _V5 / "enrichment-test-data-v5" / "expected-outputs",
+        "output_dir": _V5 / "testing" / "actual_outputs",
+        "results_csv": _V5 / "testing" / "phase1_test_results.csv",
+        "report": _V5 / "testing" / "phase1_test_report.md",
+        "scripts": {
+            "enrich": _V5 / "testing" / "phase1" / "run_tests_chat.py",
+            "compare": _V5 / "testing" / "phase1" / "compare_results.py",
+            "report": _V5 / "testing" / "shared" / "generate_report.py",
+        },
+    },
+    "v6": {
+        "description": "v6/v6.1 prompt + schema combinations and model/temperature comparison",
+        "enrichment_dir": _V6 / "enrichment",
+        "testing_dir": _V6 / "testing",
+        "prompt": "openai_assistant_system_prompt_v6.1_with_dictionary.md",
+        "schema": "openai_assistant_response_format_v6.1.json",
+        "model": "gpt-4o-2024-11-20",
+        "temperature": 0.1,
+        "env_path": ENV_PATH,
+        "normalized_dir": _V6 / "testing" / "normalized_inputs",
+        "expected_dir": _V6 / "testing" / "expected_outputs",
+        "output_dir": _V6 / "testing" / "api_test_outputs",
+        "dev_pipeline_dir": _V6 / "testing" / "from-dev-pipeline",
+        # run_api_test.py --test N; model_test mode uses the version prompt/schema above
+        "runs": {
+            1: {
+                "name": "test1_v6prompt_v6schema",
+                "prompt": "openai_assistant_system_prompt_v6_with_dictionary.md",
+                "schema": "openai_assistant_response_format_v6.json",
+                "description": "v6 prompt + v6 schema"
+            },
+            2: {
+                "name": "test2_v61prompt_v6schema",
+                "prompt": "openai_assistant_system_prompt_v6.1_with_dictionary.md",
+                "schema": "openai_assistant_response_format_v6.json",
+                "description": "v6.1 prompt + v6 schema"
+            },
+            3: {
+                "name": "test3_v61prompt_v61schema",
+                "prompt": "openai_assistant_system_prompt_v6.1_with_dictionary.md",
+                "schema": "openai_assistant_response_format_v6.1.json",
+                "description": "v6.1 prompt + v6.1 schema"
+            },
+        },
+        "scripts": {
+            "enrich": _V6 / "testing" / "run_api_test.py",
+            "compare": _V6 / "testing" / "compare_v6_only.py",
+            "compare-sources": _V6 / "testing" / "compare_all_sources.py",
+            "analyze": _V6 / "testing" / "analyze_detailed.py",
+        },
+    },
+    "v7": {
+        "description": "v7 prompt + v7 schema",
+        "enrichment_dir": _V7 / "enrichment",
+        "testing_dir": _V7 / "testing",
+        "name": "v7",
+        "prompt": "openai_assistant_system_prompt_v7_with_dictionary.md",
+        "schema": "openai_assistant_response_format_v7.json",
+        "model": "gpt-4o",
+        "temperature": 0.1,
+        "env_path": ENV_PATH,
+        "normalized_dir": _V7 / "testing" / "normalized_inputs",
+        "expected_dir": _V7 / "testing" / "expected_outputs",
+        "output_dir": _V7 / "testing" / "api_test_outputs",
+        "scripts": {
+            "enrich": _V7 / "testing" / "run_api_test.py",
+            "compare": _V7 / "testing" / "compare_v7.py",
+        },
+    },
+}
+
+LATEST_VERSION = "v7"
+
+
+def load_schema(schema_path: Path) -> dict:
+    """Load the JSON schema for structured outputs"""
+    if not schema_path.exists():
+        print(f"❌ Schema file not found: {schema_path}")
+        sys.exit(1)
+    with open(schema_path, 'r') as f:
+        return json.load(f)
+
+
+def load_normalized_inputs(normalized_dir: Path, count: int = None, source_id: str = None,
+                           run_all: bool = False) -> list:
+    """Load normalized input files"""
+    if source_id:
+        file_path = normalized_dir / f"{source_id}.json"
+        if not file_path.exists():
+            print(f"❌ Input file not found: {file_path}")
+            sys.exit(1)
+        with open(file_path, 'r') as f:
+            return [json.load(f)]
+
+    files = sorted(normalized_dir.glob("*.json"))
+    if count and not run_all:
+        files = files[:count]
+
+    inputs = []
+    for f in files:
+        with open(f, 'r') as fp:
+            inputs.append(json.load(fp))
+
+    return inputs
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Tier 1 Self-Consistency
+
+The model is nondeterministic even at temperature 0.1, and the Tier 1
+fields (flags, relevance_label, bariatric_context) are safety-critical.
+Instead of re-running whole suites, request n completions in one call
+(the prompt is billed once) and majority-vote the Tier 1 fields:
+
+- relevance_label / bariatric_context: plurality value (ties go to the
+  earliest sample that gave a tied value)
+- flags: each flag kept when more than half of the samples raise it;
+  alert flags (adverse_event, crisis) are kept when any sample raises them
+
+The saved record is the first sample whose Tier 1 fields already equal the
+consensus (so Tier 2 fields stay internally coherent), with Tier 1
+overwritten by the vote when no sample matches exactly.
+
+Per post, agreement is the share of samples whose Tier 1 fields all equal
+the consensus; per field, the share agreeing on that field. Alert flags
+raised by only a minority of samples are listed separately - the vote
+kept them, but they deserve a human look.
+
+Usage (the run itself is v7/testing/run_api_test.py --samples N):
+    python -m pbh_signal.consistency --run v7/testing/api_test_outputs/v7_consistency \\
+        [--expected v7/testing/expected_outputs] [--threshold 1.0]
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from pbh_signal.cascade import TIER1_FIELDS, compare_value
+from pbh_signal.streaming import ALERT_FLAGS
+
+CONSISTENCY_LOG = "consistency.json"
+
+# Posts whose agreement is below this are reported as unstable
+DEFAULT_THRESHOLD = 1.0
+
+
+def _key(value) -> str:
+    """Hashable, order-insensitive vote key for a field value"""
+    if isinstance(value, list):
+        value = sorted(value)
+    return json.dumps(value, sort_keys=True)
+
+
+def vote_field(field: str, values: list):
+    """Consensus value of one Tier 1 field across samples"""
+    if field == "flags":
+        counts = {}
+        for flags in values:
+            for flag in set(flags or []):
+                counts[flag] = counts.get(flag, 0) + 1
+        # Keep the order of first appearance for a stable output; a missed
+        # alert costs more than a false one, so one sample is enough for those
+        ordered = []
+        for flags in values:
+            for flag in flags or []:
+                if (flag in ALERT_FLAGS or counts[flag] * 2 > len(values)) and flag not in ordered:
+                    ordered.append(flag)
+        return ordered
+
+    counts = {}
+    for value in values:
+        counts[_key(value)] = counts.get(_key(value), 0) + 1
+    best = max(counts.values())
+    return next(value for value in values if counts[_key(value)] == best)
+
+
+def majority_vote(samples: list, fields: list = TIER1_FIELDS) -> tuple:
+    """Returns (consensus enrichment, log entry) for n sampled enrichments"""
+    consensus = {field: vote_field(field, [s.get(field) for s in samples]) for field in fields}
+
+    def matches(sample, field):
+        return compare_value(consensus[field], sample.get(field))
+
+    agreeing = [s for s in samples if all(matches(s, f) for f in fields)]
+    enriched = dict(agreeing[0] if agreeing else samples[0])
+    enriched.update(consensus)
+
+    raised = [flag for s in samples for flag in ALERT_FLAGS.intersection(s.get("flags") or [])]
+    minority_alerts = sorted({flag for flag in raised if raised.count(flag) * 2 <= len(samples)})
+    entry = {
+        "n": len(samples),
+        "agreement": len(agreeing) / len(samples),
+        "field_agreement": {f: sum(matches(s, f) for s in samples) / len(samples) for f in fields},
+        "consensus": consensus,
+        "samples": [{f: s.get(f) for f in fields} for s in samples],
+        "minority_alerts": minority_alerts,
+    }
+    return enriched, entry
+
+
+def flakiness_report(log: dict, expected_dir: Path = None, threshold: float = DEFAULT_THRESHOLD) -> dict:
+    """Stability across the test set: mean agreement per field and the unstable cases"""
+    posts = len(log)
+    fields = list(next(iter(log.values()))["field_agreement"]) if log else list(TIER1_FIELDS)
+    report = {
+        "posts": posts,
+        "samples": sum(e["n"] for e in log.values()),
+        "mean_agreement": sum(e["agreement"] for e in log.values()) / posts if posts else 0.0,
+        "unanimous": sum(e["agreement"] == 1.0 for e in log.values()),
+        "field_agreement": {f: sum(e["field_agreement"][f] for e in log.values()) / posts if posts else 0.0
+                            for f in fields},
+        "unstable_by_field": {f: sum(e["field_agreement"][f] < 1.0 for e in log.values()) for f in fields},
+        "unstable": sorted(({"source_id": sid, "agreement": e["agreement"],
+                             "fields": [f for f in fields if e["field_agreement"][f] < 1.0],
+                             "votes": {f: _votes([s[f] for s in e["samples"]]) for f in fields
+                                       if e["field_agreement"][f] < 1.0}}
+                            for sid, e in log.items() if e["agreement"] < threshold),
+                           key=lambda u: (u["agreement"], u["source_id"])),
+        "minority_alerts": {sid: e["minority_alerts"] for sid, e in log.items() if e.get("minority_alerts")},
+    }
+
+    prompt_tokens = sum(e.get("usage", {}).get("prompt_tokens", 0) for e in log.values())
+    completion_tokens = sum(e.get("usage", {}).get("completion_tokens", 0) for e in log.values())
+    if prompt_tokens:
+        report["tokens"] = {
+            "prompt": prompt_tokens,
+            "completion": completion_tokens,
+            # Same samples as n separate requests: the prompt is billed n times
+            "separate_requests": sum(e.get("usage", {}).get("prompt_tokens", 0) * e["n"]
+                                     for e in log.values()) + completion_tokens,
+        }
+
+    if expected_dir and Path(expected_dir).exists():
+        first = vote = total = 0
+        for sid, entry in log.items():
+            expected_path = Path(expected_dir) / f"{sid}_enriched.json"
+            if not expected_path.exists():
+                continue
+            with open(expected_path, 'r') as f:
+                expected = json.load(f)
+            total += 1
+            first += all(compare_value(expected.get(f), entry["samples"][0][f]) for f in fields)
+            vote += all(compare_value(expected.get(f), entry["consensus"][f]) for f in fields)
+        report["tier1_vs_expected"] = {
+            "total": total,
+            "single_sample_pct": first / total * 100 if total else 0.0,
+            "majority_vote_pct": vote / total * 100 if total else 0.0,
+        }
+    return report
+
+
+def _votes(values: list) -> dict:
+    counts = {}
+    for value in values:
+        counts[_key(value)] = counts.get(_key(value), 0) + 1
+    return dict(sorted(counts.items(), key=lambda x: -x[1]))
+
+
+def print_flakiness_report(report: dict):
+    """Print Tier 1 stability stats"""
+    print(f"\n{'='*70}")
+    print(f"  TIER 1 SELF-CONSISTENCY")
+    print(f"{'='*70}")
+    print(f"  Posts:            {report['posts']} ({report['samples']} samples)")
+    print(f"  Mean agreement:   {report['mean_agreement']*100:.1f}%")
+    print(f"  Unanimous:        {report['unanimous']}/{report['posts']}")
+    print(f"\n  {'Field':<20} {'Agreement':>10} {'Unstable posts':>15}")
+    for field, agreement in report["field_agreement"].items():
+        print(f"  {field:<20} {agreement*100:>9.1f}% {report['unstable_by_field'][field]:>15}")
+
+    if "tokens" in report:
+        tokens = report["tokens"]
+        billed = tokens["prompt"] + tokens["completion"]
+        print(f"\n  Tokens:           {billed:,} vs {tokens['separate_requests']:,} as separate requests "
+              f"({(1 - billed / tokens['separate_requests']) * 100:.1f}% saved)")
+
+    if "tier1_vs_expected" in report:
+        accuracy = report["tier1_vs_expected"]
+        print(f"\n  Tier 1 vs expected (n={accuracy['total']}): single sample "
+              f"{accuracy['single_sample_pct']:.1f}%, majority vote {accuracy['majority_vote_pct']:.1f}%")
+
+    if report["minority_alerts"]:
+        print(f"\n  🚨 Alert flags raised by a minority of samples (kept, review):")
+        for source_id, flags in report["minority_alerts"].items():
+            print(f"    {source_id:<20} {', '.join(flags)}")
+
+    if report["unstable"]:
+        print(f"\n  Unstable cases ({len(report['unstable'])}):")
+        for case in report["unstable"]:
+            votes = "; ".join(f"{field} {' / '.join(f'{v}×{c}' for v, c in counts.items())}"
+                              for field, counts in case["votes"].items())
+            print(f"    {case['source_id']:<20} {case['agreement']*100:>5.0f}%  {votes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tier 1 stability report for a run_api_test.py --samples run")
+    parser.add_argument("--run", type=Path, required=True, help="Output directory (with consistency.json)")
+    parser.add_argument("--expected", type=Path, help="Expected outputs directory")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Report posts with agreement below this (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args()
+
+    log_path = args.run / CONSISTENCY_LOG
+    if not log_path.exists():
+        print(f"❌ {CONSISTENCY_LOG} not found in {args.run}")
+        sys.exit(1)
+    with open(log_path, 'r') as f:
+        log = json.load(f)
+
+    print_flakiness_report(flakiness_report(log, args.expected, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Negation / Hypothetical / Historical Scoping
+
+NegEx-style context for local dictionary hits. Trigger phrases open a scope
+over the next (or, for post-triggers, the previous) few tokens of the same
+clause; a dictionary hit inside a scope is tagged:
+
+- negated:      "NOT having shakiness", "nausea is gone"
+- hypothetical: "it MIGHT cause nausea", "I'm GOING TO get dizzy" (modal/future)
+- speculative:  "what if I get dizzy", "I HEARD it causes...", "worried about..."
+- historical:   "I USED TO have sweating", "before starting acarbose"
+- third_person: "my husband gets shaky", "some people experience dizziness"
+
+Clauses end at sentence punctuation, commas and clause conjunctions ("but",
+"because", "and I"...). Triggers are phrases, not bare auxiliaries or
+pronouns: "was", "may" and "her" are too common to scope on their own.
+Pseudo-triggers ("not only", "didn't help", "can't stop") match first so
+they never open a scope. All triggers, terminators and hits are found with
+compiled regexes and resolved in one sweep over the text.
+
+Tags are then resolved per category with POLICY, mirroring the v7 prompt's
+"Contextual Suppression" rules: symptoms are only extracted for actual
+reported events (historical ones count), negated/hypothetical condition
+mentions go to the model, every other category is mention-level. Labels
+with only "escalate" hits are returned for model review; everything else is
+deterministic.
+
+Usage:
+    python -m pbh_signal.context_scope --text "I'm NOT having shakiness anymore but it MIGHT cause nausea"
+    python -m pbh_signal.context_scope --tests --fuzzy
+"""
+
+import argparse
+import bisect
+import json
+import re
+import sys
+from pathlib import Path
+
+from pbh_signal.dictionary import post_text
+from pbh_signal.dictionary_artifact import load_compiled
+from pbh_signal.fuzzy_match import FuzzyMatcher
+
+BASE_DIR = Path(__file__).parent
+V5_TEST_DATA = BASE_DIR.parent / "v5" / "enrichment-test-data-v5"
+
+# v5 dictionary fixtures that exercise context
+SCOPE_TESTS = ['dict_1_negation', 'dict_2_hypothetical', 'dict_3_exclusion_context', 'dict_4_past_tense']
+SCOPE_TEST_FIELDS = ['symptoms', 'conditions', 'treatments', 'companies']
+
+# Sentence fixtures: (text, {(category, label): expected action})
+SCOPE_SENTENCES = [
+    ("If I eat carbs I get shaky and dizzy",
+     {("symptoms", "shakiness"): "keep", ("symptoms", "dizziness"): "keep"}),
+    ("I am not so dizzy anymore", {("symptoms", "dizziness"): "drop"}),
+    ("No doctor believed me, I have PBH", {("conditions", "PBH"): "keep"}),
+    ("I don't get dizzy and I get shaky", {("symptoms", "dizziness"): "drop", ("symptoms", "shakiness"): "keep"}),
+    ("The new diet might make me shaky", {("symptoms", "shakiness"): "drop"}),
+    ("What if I get dizzy at work", {("symptoms", "dizziness"): "escalate"}),
+    ("My husband gets shaky after lunch", {("symptoms", "shakiness"): "escalate"}),
+]
+
+NEGATED = "negated"
+HYPOTHETICAL = "hypothetical"
+SPECULATIVE = "speculative"
+HISTORICAL = "historical"
+THIRD_PERSON = "third_person"
+
+# Pre-triggers scope forward, post-triggers scope backward
+PRE_TRIGGERS = {
+    NEGATED: [
+        "no", "not", "never", "without", "none", "nor", "no longer", "no more", "free of", "absence of",
+        "denies", "deny", "don't", "dont", "doesn't", "doesnt", "didn't", "didnt", "haven't", "havent",
+        "hasn't", "hasnt", "isn't", "isnt", "aren't", "arent", "wasn't", "wasnt", "zero",
+    ],
+    # Bare "if" is not a trigger: "if I eat carbs I get shaky" is the typical PBH report
+    HYPOTHETICAL: [
+        "might", "may cause", "may get", "could cause", "could get", "would cause", "would get",
+        "would have", "going to", "will i", "in the future",
+    ],
+    SPECULATIVE: [
+        "what if", "in case", "worried", "afraid", "scared", "heard", "read that", "risk of",
+        "can cause", "side effects include", "possible", "possibly", "chance of", "supposedly",
+        "wondering if",
+    ],
+    HISTORICAL: [
+        "used to", "previously", "in the past", "back then", "at the time", "before starting",
+        "before treatment", "before surgery", "before my surgery", "history of", "had been",
+    ],
+    THIRD_PERSON: [
+        "he has", "he had", "he gets", "she has", "she had", "she gets", "they have", "they get",
+        "someone", "some people", "people", "others",
+        "my husband", "my wife", "my partner", "my mom", "my mother", "my dad", "my father", "my son",
+        "my daughter", "my brother", "my sister", "my friend", "my child", "my kid", "my aunt", "my uncle",
+        "my grandma", "my grandmother", "my grandpa", "my cousin", "my patient", "my patients",
+        "a friend", "a patient", "patients",
+    ],
+}
+
+POST_TRIGGERS = {
+    NEGATED: ["is gone", "are gone", "went away", "have stopped", "has stopped", "resolved", "no longer an issue"],
+    SPECULATIVE: ["is possible", "is a risk", "as a side effect"],
+    HISTORICAL: ["in the past", "years ago", "months ago", "before surgery", "back then"],
+}
+
+# Never open a scope (matched in preference to the shorter trigger inside them)
+PSEUDO_TRIGGERS = [
+    "not only", "not just", "not sure", "no idea", "no doubt", "no matter", "not necessarily", "if only",
+    "didn't help", "didnt help", "doesn't help", "doesnt help", "not help", "not helping", "not working",
+    "no relief", "no improvement", "not improve", "not better", "not go away", "won't go away",
+    "wont go away", "doesn't stop", "not stop", "can't stop", "cant stop", "couldn't stop", "no one knows",
+    "may be why", "could be", "would be",
+]
+
+# Tokens a scope reaches (NegEx default is 5; third-person subjects carry further)
+WINDOWS = {NEGATED: 6, HYPOTHETICAL: 8, SPECULATIVE: 8, HISTORICAL: 8, THIRD_PERSON: 12}
+
+CLAUSE_TERMINATORS = ["but", "however", "although", "though", "except", "yet", "now", "still",
+                      "which", "whereas", "apart from", "aside from", "because", "since", "so i",
+                      "and i", "and now", "and then"]
+
+# Per category: tag -> "drop" | "escalate" | "keep" (unlisted tags / categories keep)
+POLICY = {
+    "symptoms": {NEGATED: "drop", HYPOTHETICAL: "drop", SPECULATIVE: "escalate", THIRD_PERSON: "escalate",
+                 HISTORICAL: "keep"},
+    "conditions": {NEGATED: "escalate", HYPOTHETICAL: "escalate", SPECULATIVE: "escalate"},
+}
+
+_ACTION_RANK = {"keep": 0, "escalate": 1, "drop": 2}
+
+_TOKEN_RE = re.compile(r"\w+(?:['’]\w+)?")
+_SENTENCE_RE = re.compile(r"[.!?;:,\n]+|\s[-–—]\s")
+
+
+def _phrase_pattern(phrases) -> str:
+    parts = []
+    for phrase in sorted(set(phrases), key=len, reverse=True):
+        parts.append(r"\s+".join(re.escape(word) for word in phrase.split()).replace("'", "['’]"))
+    return r"(?<!\w)(?:" + "|".join(parts) + r")(?!\w)"
+
+
+class ScopeTagger:
+    """Tags dictionary hits as negated / hypothetical / speculative / historical / third-person"""
+
+    def __init__(self, matcher=None, windows: dict = None, policy: dict = None):
+        self.matcher = matcher or load_compiled()
+        self.windows = windows or WINDOWS
+        self.policy = policy if policy is not None else POLICY
+
+        # phrase -> (kind, direction); pseudo-triggers have kind None
+        self._triggers = {}
+        for direction, table in ((1, PRE_TRIGGERS), (-1, POST_TRIGGERS)):
+            for kind, phrases in table.items():
+                for phrase in phrases:
+                    self._triggers.setdefault(phrase, (kind, direction))
+        for phrase in PSEUDO_TRIGGERS:
+            self._triggers[phrase] = (None, 0)
+        for phrase in CLAUSE_TERMINATORS:
+            self._triggers[phrase] = ("terminator", 0)
+        self._trigger_re = re.compile(_phrase_pattern(self._triggers), re.IGNORECASE)
+
+    def _key(self, phrase: str) -> str:
+        return " ".join(phrase.lower().replace("’", "'").split())
+
+    def tag(self, text: str) -> list:
+        """Dictionary hits with a "context" list of tags, in text order"""
+        hits = self.matcher.match(text)
+        if not hits:
+            return hits
+        token_starts = [m.start() for m in _TOKEN_RE.finditer(text)]
+
+        # Clause boundaries: sentence punctuation + terminator words
+        boundaries = [m.start() for m in _SENTENCE_RE.finditer(text)]
+        triggers = []
+        for m in self._trigger_re.finditer(text):
+            kind, direction = self._triggers.get(self._key(m.group(0)), (None, 0))
+            if kind == "terminator":
+                boundaries.append(m.start())
+            elif kind is not None:
+                triggers.append((m.start(), m.end(), kind, direction))
+        boundaries.sort()
+
+        def clause(pos):
+            return bisect.bisect_right(boundaries, pos)
+
+        def token_index(pos):
+            return bisect.bisect_left(token_starts, pos)
+
+        # Group triggers by clause once; each hit then only looks at its own clause
+        by_clause = {}
+        for start, end, kind, direction in triggers:
+            by_clause.setdefault(clause(start), []).append((token_index(start), token_index(end), start, kind, direction))
+
+        for hit in hits:
+            tags = []
+            hit_first, hit_last = token_index(hit["start"]), token_index(hit["end"])
+            for t_first, t_end, t_start, kind, direction in by_clause.get(clause(hit["start"]), ()):
+                if kind in tags:
+                    continue
+                window = self.windows.get(kind, 0)
+                if direction > 0 and t_start < hit["start"] and 0 <= hit_first - t_end <= window:
+                    tags.append(kind)
+                elif direction < 0 and t_start >= hit["end"] and 0 <= t_first - hit_last <= window:
+                    tags.append(kind)
+            hit["context"] = tags
+        return hits
+
+    def action(self, hit: dict) -> str:
+        """keep / escalate / drop for one tagged hit (strictest tag wins)"""
+        rules = self.policy.get(hit["category"], {})
+        actions = [rules.get(tag, "keep") for tag in hit.get("context", ())]
+        return max(actions, key=_ACTION_RANK.get, default="keep")
+
+    def extract(self, text: str) -> dict:
+        """
+        Resolve tagged hits into labels per category. A label is kept if any
+        hit keeps it, escalated if its strongest hit is "escalate", dropped
+        otherwise.
+        """
+        best = {}
+        hits = self.tag(text)
+        for hit in hits:
+            key = (hit["category"], hit["label"])
+            action = self.action(hit)
+            if key not in best or _ACTION_RANK[action] < _ACTION_RANK[best[key]]:
+                best[key] = action
+        result = {"labels": {}, "escalate": {}, "dropped": {}, "hits": hits}
+        target = {"keep": "labels", "escalate": "escalate", "drop": "dropped"}
+        for (category, label), action in best.items():
+            result[target[action]].setdefault(category, []).append(label)
+        result["needs_model"] = bool(result["escalate"])
+        return result
+
+
+def run_sentence_tests(tagger: ScopeTagger, sentences: list = None) -> list:
+    """Sentence fixtures whose resolved action differs from the expected one"""
+    failures = []
+    target = {"labels": "keep", "escalate": "escalate", "dropped": "drop"}
+    for text, expected in sentences or SCOPE_SENTENCES:
+        result = tagger.extract(text)
+        actions = {(category, label): action for bucket, action in target.items()
+                   for category, labels in result[bucket].items() for label in labels}
+        for key, action in expected.items():
+            if actions.get(key) != action:
+                failures.append({"text": text, "label": "/".join(key), "expected": action,
+                                 "got": actions.get(key, "no hit")})
+    return failures
+
+
+def run_tests(tagger: ScopeTagger, tests: list = None) -> list:
+    """Naive vs scoped labels against the v5 dictionary fixtures' expected outputs"""
+    results = []
+    for name in tests or SCOPE_TESTS:
+        with open(V5_TEST_DATA / "dictionary-tests" / f"{name}.json", 'r') as f:
+            post = json.load(f)
+        with open(V5_TEST_DATA / "expected-outputs" / "dictionary-tests" / f"{name}_expected.json", 'r') as f:
+            expected = json.load(f)
+        text = post_text(post)
+        scoped = tagger.extract(text)
+        naive = tagger.matcher.labels(text)
+        fields = {}
+        for field in SCOPE_TEST_FIELDS:
+            wanted = set(expected.get(field) or [])
+            fields[field] = {
+                "expected": sorted(wanted),
+                "naive_extra": sorted(set(naive.get(field, [])) - wanted),
+                "scoped_extra": sorted(set(scoped["labels"].get(field, [])) - wanted),
+                "scoped_missing": sorted(wanted & set(naive.get(field, [])) - set(scoped["labels"].get(field, []))),
+                "escalated": sorted(scoped["escalate"].get(field, [])),
+            }
+        results.append({
+            "test": name,
+            "fields": fields,
+            "tagged": [f"{h['term']} -> {h['label']} [{', '.join(h['context'])}]"
+                       for h in scoped["hits"] if h["context"]],
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Negation / hypothetical / historical scoping of dictionary hits")
+    parser.add_argument("--text", help="Tag a single text")
+    parser.add_argument("--tests", action="store_true", help="Run the v5 dictionary context fixtures")
+    parser.add_argument("--fuzzy", action="store_true", help="Tag typo-tolerant hits (pbh_signal.fuzzy_match)")
+    args = parser.parse_args()
+
+    if not (args.text or args.tests):
+        print("❌ Must specify --text or --tests")
+        sys.exit(1)
+
+    tagger = ScopeTagger(FuzzyMatcher() if args.fuzzy else None)
+
+    if args.text:
+        for hit in tagger.tag(args.text):
+            print(f"    {hit['category']:<16} {hit['label']:<28} \"{hit['term']}\" "
+                  f"{tagger.action(hit):<9} {', '.join(hit['context'])}")
+
+    if args.tests:
+        print(f"\n{'='*70}")
+        print(f"  CONTEXT SCOPING FIXTURES")
+        print(f"{'='*70}")
+        naive_errors = scoped_errors = 0
+        for result in run_tests(tagger):
+            print(f"\n  {result['test']}")
+            for line in result["tagged"]:
+                print(f"    ~ {line}")
+            for field, row in result["fields"].items():
+                naive_errors += len(row["naive_extra"])
+                scoped_errors += len(row["scoped_extra"]) + len(row["scoped_missing"])
+                notes = []
+                if row["naive_extra"]:
+                    notes.append(f"naive over-extracts {row['naive_extra']}")
+                if row["scoped_extra"]:
+                    notes.append(f"scoped over-extracts {row['scoped_extra']}")
+                if row["scoped_missing"]:
+                    notes.append(f"scoped drops {row['scoped_missing']}")
+                if row["escalated"]:
+                    notes.append(f"escalated {row['escalated']}")
+                if notes:
+                    print(f"    {field:<11} {'; '.join(notes)}")
+        print(f"\n  Label errors: naive {naive_errors}, scoped {scoped_errors}")
+
+        failures = run_sentence_tests(tagger)
+        print(f"  Sentence fixtures: {len(SCOPE_SENTENCES) - len({f['text'] for f in failures})}"
+              f"/{len(SCOPE_SENTENCES)} correct")
+        for failure in failures:
+            print(f"    ✗ \"{failure['text']}\" {failure['label']}: "
+                  f"expected {failure['expected']}, got {failure['got']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Dictionary Loader and Local Matcher
+
+Parses the PBH SIGNAL DICTIONARY (reference_schemas/PBH_SIGNAL_DICTIONARY_v*.csv,
+standalone PBH_SIGNAL_DICTIONARY_v*.txt, or the copy embedded in
+openai_assistant_system_prompt_*_with_dictionary.md) into entries and
+matches their Variations against post text locally.
+
+This is a literal matcher: it finds the listed Variations only. The model
+still does the semantic extraction; local hits are used for cheap
+pre-scoring and routing before any API call.
+
+Matching rules:
+- Case-insensitive on word boundaries, except short all-caps acronyms
+  (PBH, RH, AZ, ER...) which must match case-sensitively
+- Terms ending in a letter also match their plural ("sugar crashes")
+- A hit is suppressed when one of the entry's Exclude terms occurs within
+  EXCLUDE_WINDOW characters ("nearby context" in the prompt)
+
+Usage:
+    python -m pbh_signal.dictionary --text "3 months post-op and my sugar crashes every afternoon"
+"""
+
+import argparse
+import csv
+import re
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent
+DEFAULT_DICTIONARY = BASE_DIR.parent / "v7" / "enrichment" / "openai_assistant_system_prompt_v7_with_dictionary.md"
+DEFAULT_DICTIONARY_CSV = BASE_DIR.parent.parent / "reference_schemas" / "PBH_SIGNAL_DICTIONARY_v6.1.csv"
+
+CATEGORIES = ['audience_anchor', 'companies', 'conditions', 'symptoms', 'treatments', 'topics']
+
+# Characters either side of a hit searched for Exclude terms
+EXCLUDE_WINDOW = 40
+
+# Acronyms up to this length are matched case-sensitively
+ACRONYM_MAX_LEN = 4
+
+_FIELD_RE = re.compile(r"^(ENTRY|Category|Label|Variations|Exclude|Note):\s*(.*)$")
+
+
+def parse_dictionary(text: str) -> list:
+    """Parse ENTRY blocks into dicts: id, category, label, variations, exclude, note"""
+    entries = []
+    current = None
+    last_field = None
+
+    for raw_line in text.splitlines():
+        line = raw_line.rstrip()
+        match = _FIELD_RE.match(line.strip())
+        if match:
+            field, value = match.group(1), match.group(2).strip()
+            if field == "ENTRY":
+                current = {"id": value, "category": None, "label": None,
+                           "variations": "", "exclude": "", "note": ""}
+                entries.append(current)
+            elif current is not None:
+                current[field.lower()] = value
+            last_field = field.lower()
+            continue
+
+        # Continuation lines of a wrapped Variations/Exclude list are indented
+        if current is not None and line.startswith((" ", "\t")) and last_field in ("variations", "exclude"):
+            current[last_field] = f"{current[last_field]} {line.strip()}"
+            continue
+
+        if not line.strip() or line.startswith(("[", "=", "-")):
+            last_field = None
+
+    for entry in entries:
+        _split_terms(entry)
+    return [e for e in entries if e["category"] and e["label"]]
+
+
+def _split_terms(entry: dict):
+    for field in ("variations", "exclude"):
+        terms = [t.strip() for t in entry[field].split("|")]
+        entry[field] = [t for t in dict.fromkeys(terms) if t]
+
+
+def parse_dictionary_csv(path: Path) -> list:
+    """Parse a dictionary CSV (Entry_ID, Category, Label, Variations, Exclude, Note)"""
+    entries = []
+    with open(path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            category = (row.get("Category") or "").strip()
+            label = (row.get("Label") or "").strip()
+            if not category or not label:
+                continue
+            entry = {
+                # Same semantic IDs as the prompt copy / debug_matches (e.g. companies_Amylyx_003)
+                "id": f"{category}_{label}_{(row.get('Entry_ID') or '').strip()}",
+                "category": category,
+                "label": label,
+                "variations": row.get("Variations") or "",
+                "exclude": row.get("Exclude") or "",
+                "note": (row.get("Note") or "").strip(),
+            }
+            _split_terms(entry)
+            entries.append(entry)
+    return entries
+
+
+def load_dictionary(path: Path = DEFAULT_DICTIONARY) -> list:
+    """Load dictionary entries from a CSV, a dictionary .txt or a prompt with an embedded dictionary"""
+    if Path(path).suffix.lower() == ".csv":
+        return parse_dictionary_csv(path)
+    with open(path, 'r') as f:
+        text = f.read()
+    marker = text.find("PBH SIGNAL DICTIONARY")
+    return parse_dictionary(text[marker:] if marker >= 0 else text)
+
+
+def _is_acronym(term: str) -> bool:
+    return len(term) <= ACRONYM_MAX_LEN and term.isupper()
+
+
+def _term_pattern(terms: list):
+    """Compile one alternation for a list of terms, or None if empty"""
+    if not terms:
+        return None
+    parts = []
+    for term in sorted(terms, key=len, reverse=True):
+        escaped = r"\s+".join(re.escape(word) for word in term.split())
+        if _is_acronym(term):
+            parts.append(escaped)
+        else:
+            plural = "(?:e?s)?" if term[-1].isalpha() else ""
+            parts.append(f"(?i:{escaped}{plural})")
+    return re.compile(r"(?<!\w)(?:" + "|".join(parts) + r")(?!\w)")
+
+
+class DictionaryMatcher:
+    """Variation matcher compiled once from dictionary entries"""
+
+    def __init__(self, entries: list, exclude_window: int = EXCLUDE_WINDOW):
+        self.entries = entries
+        self.exclude_window = exclude_window
+        self._compiled = [(entry, _term_pattern(entry["variations"]), _term_pattern(entry["exclude"]))
+                          for entry in entries]
+
+    def match(self, text: str) -> list:
+        """All non-excluded hits: [{category, label, term, start, end}] in text order"""
+        hits = []
+        if not text:
+            return hits
+        for entry, pattern, exclude in self._compiled:
+            if pattern is None:
+                continue
+            for m in pattern.finditer(text):
+                if exclude is not None:
+                    lo = max(0, m.start() - self.exclude_window)
+                    if exclude.search(text, lo, m.end() + self.exclude_window):
+                        continue
+                hits.append({"category": entry["category"], "label": entry["label"],
+                             "term": m.group(0), "start": m.start(), "end": m.end()})
+        hits.sort(key=lambda h: h["start"])
+        return hits
+
+    def labels(self, text: str) -> dict:
+        """Matched labels per category: {category: [label, ...]}"""
+        found = {}
+        for hit in self.match(text):
+            labels = found.setdefault(hit["category"], [])
+            if hit["label"] not in labels:
+                labels.append(hit["label"])
+        return found
+
+
+def post_text(post: dict) -> str:
+    """Searchable text of a normalized post (title + body)"""
+    return "\n".join(part for part in (post.get("title"), post.get("text")) if part)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Match dictionary Variations against text")
+    parser.add_argument("--dictionary", type=Path, default=DEFAULT_DICTIONARY)
+    parser.add_argument("--text", required=True)
+    args = parser.parse_args()
+
+    entries = load_dictionary(args.dictionary)
+    matcher = DictionaryMatcher(entries)
+    print(f"  {len(entries)} entries loaded from {args.dictionary.name}")
+    for hit in matcher.match(args.text):
+        print(f"    {hit['category']:<16} {hit['label']:<28} \"{hit['term']}\"")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Compiled Dictionary Artifact
+
+Compiles a dictionary CSV (reference_schemas/PBH_SIGNAL_DICTIONARY_v*.csv)
+into a binary artifact holding a character trie over every Variation and
+Exclude term, plus the pattern and label tables. The artifact is
+memory-mapped at load: processes start without parsing or building anything
+and share the same pages. Hits must start at a word boundary, so the trie is
+walked from the root at candidate word starts only (no failure links).
+
+Artifacts live in system/cache/dictionary/ and are named by source stem,
+SHA-256 of the CSV and ARTIFACT_VERSION. Loading hashes the CSV, and any
+change to it (or to the format version) triggers an automatic rebuild.
+
+Layout (little-endian):
+    MAGIC | uint32 header length | JSON header (padded to 4 bytes) | int32 arrays
+The header holds entries, pattern terms and each array's offset/count.
+
+Matching follows pbh_signal.dictionary.DictionaryMatcher (same hits):
+word boundaries, case-sensitive short acronyms, plural forms, Exclude
+suppression within EXCLUDE_WINDOW, leftmost-longest hits per entry.
+
+Usage:
+    python -m pbh_signal.dictionary_artifact build
+    python -m pbh_signal.dictionary_artifact info
+    python -m pbh_signal.dictionary_artifact bench --input v6/testing/normalized_inputs
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from array import array
+from pathlib import Path
+
+from pbh_signal.dictionary import (ACRONYM_MAX_LEN, DEFAULT_DICTIONARY_CSV, EXCLUDE_WINDOW,
+                                   DictionaryMatcher, load_dictionary, post_text)
+
+BASE_DIR = Path(__file__).parent
+DEFAULT_ARTIFACT_DIR = BASE_DIR.parent / "cache" / "dictionary"
+
+MAGIC = b"PBHDICT\x00"
+ARTIFACT_VERSION = 2
+
+# Pattern kinds
+VARIATION = 0
+EXCLUDE = 1
+
+_ARRAYS = ['edge_start', 'edge_char', 'edge_next', 'out_start', 'out_pattern',
+           'pat_entry', 'pat_kind', 'pat_exact']
+
+_WHITESPACE_RUN = re.compile(r"\s+")
+_WORD_RUN = re.compile(r"\w+")
+
+
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _collapse(term: str) -> str:
+    return " ".join(term.split())
+
+
+class _Offsets:
+    """Collapsed -> original text positions, from the whitespace runs that were shortened"""
+
+    __slots__ = ("_spaces", "_removed")
+
+    def __init__(self, spaces: list, removed: list):
+        self._spaces = spaces       # collapsed position of each shortened run's space
+        self._removed = removed     # characters removed up to and including that run
+
+    def __getitem__(self, pos: int) -> int:
+        k = bisect.bisect_left(self._spaces, pos)
+        return pos + (self._removed[k - 1] if k else 0)
+
+
+def _fold(text: str) -> tuple:
+    """
+    Collapse whitespace runs to one space and lowercase. Returns
+    (folded, collapsed, offsets) where offsets maps collapsed positions back
+    to the original text (None when no collapsing was needed).
+    """
+    offsets = None
+    collapsed = text
+    if _WHITESPACE_RUN.search(text) and re.search(r"[^\S ]|  ", text):
+        collapsed = _WHITESPACE_RUN.sub(" ", text)
+        if len(collapsed) != len(text):
+            spaces, removed = [], []
+            total = 0
+            for m in _WHITESPACE_RUN.finditer(text):
+                if m.end() - m.start() > 1:
+                    spaces.append(m.start() - total)
+                    total += m.end() - m.start() - 1
+                    removed.append(total)
+            offsets = _Offsets(spaces, removed)
+    folded = collapsed.lower()
+    if len(folded) != len(collapsed):
+        # A few characters change length when lowercased; fold them one at a time
+        folded = "".join(c if len(c.lower()) != 1 else c.lower() for c in collapsed)
+    return folded, collapsed, offsets
+
+
+def _term_forms(term: str) -> list:
+    """(key, exact) forms of a term: acronyms match exactly, other terms also as plurals"""
+    collapsed = _collapse(term)
+    if len(term) <= ACRONYM_MAX_LEN and term.isupper():
+        return [(collapsed.lower(), collapsed)]
+    key = collapsed.lower()
+    forms = [(key, None)]
+    if key[-1].isalpha():
+        forms += [(key + "s", None), (key + "es", None)]
+    return forms
+
+
+def file_sha256(path: Path) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def artifact_path(source: Path, sha256: str, artifact_dir: Path = DEFAULT_ARTIFACT_DIR) -> Path:
+    return Path(artifact_dir) / f"{Path(source).stem}.{sha256[:16]}.v{ARTIFACT_VERSION}.pbhdict"
+
+
+def build_artifact(source: Path, out_path: Path, sha256: str = None) -> Path:
+    """Compile a dictionary file into an artifact (atomic write)"""
+    sha256 = sha256 or file_sha256(source)
+    entries = load_dictionary(source)
+
+    # Pattern table: one row per distinct (entry, kind, key, exact) form
+    patterns = []
+    seen = set()
+    for ei, entry in enumerate(entries):
+        for kind, terms in ((VARIATION, entry["variations"]), (EXCLUDE, entry["exclude"])):
+            for term in terms:
+                for key, exact in _term_forms(term):
+                    if (ei, kind, key, exact) in seen:
+                        continue
+                    seen.add((ei, kind, key, exact))
+                    patterns.append({"entry": ei, "kind": kind, "key": key, "exact": exact, "term": term})
+
+    # Trie; a state's outputs are the patterns whose key ends exactly there
+    children = [{}]
+    outputs = [[]]
+    for pi, pattern in enumerate(patterns):
+        state = 0
+        for ch in pattern["key"]:
+            nxt = children[state].get(ch)
+            if nxt is None:
+                nxt = len(children)
+                children[state][ch] = nxt
+                children.append({})
+                outputs.append([])
+            state = nxt
+        outputs[state].append(pi)
+
+    arrays = {name: array('i') for name in _ARRAYS}
+    for state, edges in enumerate(children):
+        arrays["edge_start"].append(len(arrays["edge_char"]))
+        for ch in sorted(edges, key=ord):
+            arrays["edge_char"].append(ord(ch))
+            arrays["edge_next"].append(edges[ch])
+        arrays["out_start"].append(len(arrays["out_pattern"]))
+        arrays["out_pattern"].extend(outputs[state])
+    arrays["edge_start"].append(len(arrays["edge_char"]))
+    arrays["out_start"].append(len(arrays["out_pattern"]))
+    for pattern in patterns:
+        arrays["pat_entry"].append(pattern["entry"])
+        arrays["pat_kind"].append(pattern["kind"])
+        arrays["pat_exact"].append(1 if pattern["exact"] else 0)
+
+    layout = {}
+    offset = 0
+    for name in _ARRAYS:
+        layout[name] = [offset, len(arrays[name])]
+        offset += len(arrays[name]) * 4
+
+    header = {
+        "version": ARTIFACT_VERSION,
+        "source": Path(source).name,
+        "source_sha256": sha256,
+        "built_at": time.time(),
+        "byteorder": sys.byteorder,
+        "states": len(children),
+        "entries": [{k: e[k] for k in ("id", "category", "label", "variations", "exclude")} for e in entries],
+        "patterns": [[p["term"], p["exact"]] for p in patterns],
+        "arrays": layout,
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    header_bytes += b" " * (-(len(MAGIC) + 4 + len(header_bytes)) % 4)
+
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_name(f"{out_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        for name in _ARRAYS:
+            data = arrays[name]
+            if sys.byteorder != "little":
+                data = array('i', data)
+                data.byteswap()
+            f.write(data.tobytes())
+    tmp_path.replace(out_path)
+    return out_path
+
+
+class CompiledDictionary:
+    """Memory-mapped dictionary trie; same match()/labels() interface as DictionaryMatcher"""
+
+    def __init__(self, path: Path, exclude_window: int = EXCLUDE_WINDOW):
+        self.path = Path(path)
+        self.exclude_window = exclude_window
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a dictionary artifact: {self.path}")
+        (header_len,) = struct.unpack_from("<I", self._mm, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(bytes(self._mm[start:start + header_len]))
+        if self.header["version"] != ARTIFACT_VERSION or self.header["byteorder"] != sys.byteorder:
+            raise ValueError(f"Incompatible dictionary artifact: {self.path}")
+        base = start + header_len
+        view = memoryview(self._mm)
+        for name in _ARRAYS:
+            offset, count = self.header["arrays"][name]
+            setattr(self, f"_{name}", view[base + offset:base + offset + count * 4].cast('i'))
+        self.entries = self.header["entries"]
+        self._terms = self.header["patterns"]
+        self.source_sha256 = self.header["source_sha256"]
+        self.rebuilt = False
+
+        # Hits start at a word boundary, so a key can only start where a text word equals its
+        # leading word run: one C-level regex pass finds those starts and the trie is only
+        # walked from them (keys starting with a non-word character get their own pattern)
+        self._first_words = set()
+        leading = set()
+        for entry in self.entries:
+            for term in entry["variations"] + entry["exclude"]:
+                for key, _ in _term_forms(term):
+                    word = _WORD_RUN.match(key)
+                    if word:
+                        self._first_words.add(word.group())
+                    else:
+                        leading.add(key[0])
+        self._leading_re = re.compile("[" + "".join(re.escape(c) for c in sorted(leading)) + "]") if leading else None
+
+    def _starts(self, folded: str) -> list:
+        """Positions where some key can start (word runs equal to a key's leading word)"""
+        first_words = self._first_words
+        starts = [m.start() for m in _WORD_RUN.finditer(folded) if m.group() in first_words]
+        if self._leading_re is not None:
+            starts = sorted(starts + [m.start() for m in self._leading_re.finditer(folded)])
+        return starts
+
+    def _scan(self, folded: str, collapsed: str) -> list:
+        """All boundary-checked pattern hits: [(pattern, start, end)] in collapsed coordinates"""
+        edge_start, edge_char, edge_next = self._edge_start, self._edge_char, self._edge_next
+        out_start, out_pattern = self._out_start, self._out_pattern
+        pat_exact = self._pat_exact
+        n = len(folded)
+        found = []
+        for begin in self._starts(folded):
+            if begin > 0 and _is_word(folded[begin - 1]):
+                continue
+            # Trie walk from the root: every output on the path is a key starting at `begin`
+            state = 0
+            end = begin
+            while end < n:
+                code = ord(folded[end])
+                lo, hi = edge_start[state], edge_start[state + 1]
+                i = bisect.bisect_left(edge_char, code, lo, hi)
+                if i == hi or edge_char[i] != code:
+                    break
+                state = edge_next[i]
+                end += 1
+                for k in range(out_start[state], out_start[state + 1]):
+                    p = out_pattern[k]
+                    if end < n and _is_word(folded[end]):
+                        continue
+                    if pat_exact[p] and collapsed[begin:end] != self._terms[p][1]:
+                        continue
+                    found.append((p, begin, end))
+        return found
+
+    def match(self, text: str) -> list:
+        """All non-excluded hits: [{category, label, term, start, end}] in text order"""
+        if not text:
+            return []
+        folded, collapsed, offsets = _fold(text)
+        by_entry = {}
+        excludes = {}
+        for p, begin, end in self._scan(folded, collapsed):
+            entry = self._pat_entry[p]
+            target = excludes if self._pat_kind[p] == EXCLUDE else by_entry
+            target.setdefault(entry, []).append((begin, end))
+
+        hits = []
+        window = self.exclude_window
+        for ei, spans in by_entry.items():
+            entry = self.entries[ei]
+            # Leftmost-longest, non-overlapping (as a regex alternation would)
+            spans.sort(key=lambda s: (s[0], -s[1]))
+            last_end = -1
+            for begin, end in spans:
+                if begin < last_end:
+                    continue
+                last_end = end
+                if offsets is not None:
+                    begin, end = offsets[begin], offsets[end - 1] + 1
+                if any(xb >= begin - window and xe <= end + window
+                       for xb, xe in self._original_spans(excludes.get(ei, ()), offsets)):
+                    continue
+                hits.append({"category": entry["category"], "label": entry["label"],
+                             "term": text[begin:end], "start": begin, "end": end})
+        hits.sort(key=lambda h: h["start"])
+        return hits
+
+    @staticmethod
+    def _original_spans(spans, offsets):
+        if offsets is None:
+            return spans
+        return [(offsets[b], offsets[e - 1] + 1) for b, e in spans]
+
+    def labels(self, text: str) -> dict:
+        """Matched labels per category: {category: [label, ...]}"""
+        found = {}
+        for hit in self.match(text):
+            labels = found.setdefault(hit["category"], [])
+            if hit["label"] not in labels:
+                labels.append(hit["label"])
+        return found
+
+    def close(self):
+        for name in _ARRAYS:
+            getattr(self, f"_{name}").release()
+        self._mm.close()
+
+
+def load_compiled(source: Path = DEFAULT_DICTIONARY_CSV,
+                  artifact_dir: Path = DEFAULT_ARTIFACT_DIR) -> CompiledDictionary:
+    """Map the artifact for a dictionary file, compiling it first if missing or stale"""
+    sha256 = file_sha256(source)
+    path = artifact_path(source, sha256, artifact_dir)
+    rebuilt = False
+    if not path.exists():
+        build_artifact(source, path, sha256)
+        rebuilt = True
+        for stale in Path(artifact_dir).glob(f"{Path(source).stem}.*.pbhdict"):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+    compiled = CompiledDictionary(path)
+    compiled.rebuilt = rebuilt
+    return compiled
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build/inspect the compiled dictionary artifact")
+    parser.add_argument("command", choices=["build", "info", "bench"])
+    parser.add_argument("--dictionary", type=Path, default=DEFAULT_DICTIONARY_CSV, help="Dictionary CSV")
+    parser.add_argument("--artifact-dir", type=Path, default=DEFAULT_ARTIFACT_DIR)
+    parser.add_argument("--input", type=Path, help="Normalized posts for bench (*.json)")
+    args = parser.parse_args()
+
+    if not args.dictionary.exists():
+        print(f"❌ Dictionary not found: {args.dictionary}")
+        sys.exit(1)
+
+    if args.command == "build":
+        sha256 = file_sha256(args.dictionary)
+        path = build_artifact(args.dictionary, artifact_path(args.dictionary, sha256, args.artifact_dir), sha256)
+        print(f"✅ Built {path} ({path.stat().st_size:,} bytes)")
+        return
+
+    started = time.perf_counter()
+    compiled = load_compiled(args.dictionary, args.artifact_dir)
+    load_ms = (time.perf_counter() - started) * 1000
+    header = compiled.header
+    print(f"  Artifact:  {compiled.path}")
+    print(f"  Source:    {header['source']} (sha256 {header['source_sha256'][:16]})")
+    print(f"  Entries:   {len(header['entries'])}, patterns {len(header['patterns'])}, states {header['states']}")
+    print(f"  Load:      {load_ms:.2f} ms{' (rebuilt)' if compiled.rebuilt else ''}")
+
+    if args.command == "bench":
+        started = time.perf_counter()
+        matcher = DictionaryMatcher(load_dictionary(args.dictionary))
+        parse_ms = (time.perf_counter() - started) * 1000
+        print(f"  Parse+compile regex matcher: {parse_ms:.2f} ms")
+        if args.input:
+            texts = []
+            for path in sorted(args.input.glob("*.json")):
+                with open(path, 'r') as f:
+                    texts.append(post_text(json.load(f)))
+            mismatches = 0
+            for text in texts:
+                a = [(h["label"], h["start"], h["end"]) for h in matcher.match(text)]
+                b = [(h["label"], h["start"], h["end"]) for h in compiled.match(text)]
+                mismatches += sorted(a) != sorted(b)
+            for name, fn in (("regex", matcher.match), ("trie", compiled.match)):
+                started = time.perf_counter()
+                for text in texts:
+                    fn(text)
+                elapsed = time.perf_counter() - started
+                print(f"  {name:<10} {len(texts) / elapsed:>10,.0f} posts/s")
+            print(f"  Hit mismatches vs regex matcher: {mismatches}/{len(texts)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Facet Aggregation Cubes
+
+Precomputes exact post counts across facet × source × ISO week from enriched
+outputs, so aggregate chatbot questions ("are people frustrated?", "emotions
+by audience") are answered from counts instead of sampling 30-50 posts.
+
+Two cubes are kept:
+- 1-D: (facet, value, source, week) -> posts
+- 2-D: (facet_a, value_a, facet_b, value_b, source, week) -> posts
+
+Updates are incremental: each record's facet snapshot is kept, so a changed
+record is subtracted and re-added, and unchanged files are skipped by mtime.
+Snapshots remember their input directory; records whose file has since been
+removed from it are subtracted.
+
+Usage:
+    python -m pbh_signal.facet_cubes build --input v7/testing/api_test_outputs/v7
+    python -m pbh_signal.facet_cubes query --facet emotions
+    python -m pbh_signal.facet_cubes query --facet emotions --by audience_label
+    python -m pbh_signal.facet_cubes query --facet emotions --where audience_label:community --by source
+"""
+
+import argparse
+import json
+import sys
+from itertools import combinations
+from pathlib import Path
+
+from pbh_signal.records import (FACET_FIELDS, facet_values, iter_enriched_files,
+                                load_enriched, week_bucket)
+
+BASE_DIR = Path(__file__).parent
+DEFAULT_CUBE_PATH = BASE_DIR.parent / "cache" / "facet_cubes.json"
+
+CUBE_FORMAT_VERSION = 1
+
+# Dimensions that can be used in `by` besides another facet
+TIME_SOURCE_DIMS = ['source', 'week']
+
+
+class FacetCubes:
+    """Incrementally maintained count cubes over enriched records"""
+
+    def __init__(self, facets: list = None):
+        self.facets = list(facets or FACET_FIELDS)
+        self._facet_order = {f: i for i, f in enumerate(self.facets)}
+        self.totals = {}   # (source, week) -> posts
+        self.cells1 = {f: {} for f in self.facets}
+        self.cells2 = {pair: {} for pair in combinations(self.facets, 2)}
+        self.records = {}  # source_id -> snapshot
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def snapshot(self, record: dict) -> dict:
+        """Reduce a record to the dimensions the cubes need"""
+        return {
+            "source": record.get("source") or "unknown",
+            "week": week_bucket(record.get("published_at")),
+            "facets": {f: facet_values(record, f) for f in self.facets}
+        }
+
+    def _apply(self, snap: dict, delta: int):
+        """Add (delta=1) or subtract (delta=-1) a snapshot from every cube"""
+        source, week = snap["source"], snap["week"]
+        facets = snap["facets"]
+
+        _bump(self.totals, (source, week), delta)
+
+        for field in self.facets:
+            cells = self.cells1[field]
+            for value in facets.get(field, []):
+                _bump(cells, (value, source, week), delta)
+
+        for (field_a, field_b), cells in self.cells2.items():
+            values_a = facets.get(field_a, [])
+            values_b = facets.get(field_b, [])
+            for va in values_a:
+                for vb in values_b:
+                    _bump(cells, (va, vb, source, week), delta)
+
+    def add_record(self, record: dict, mtime_ns: int = None) -> str:
+        """Add or replace a record; returns "added", "updated" or "unchanged" """
+        source_id = record.get("source_id")
+        if not source_id:
+            raise ValueError("Record has no source_id")
+
+        snap = self.snapshot(record)
+        snap["mtime_ns"] = mtime_ns
+
+        old = self.records.get(source_id)
+        if old is not None:
+            if old["source"] == snap["source"] and old["week"] == snap["week"] \
+                    and old["facets"] == snap["facets"]:
+                old["mtime_ns"] = mtime_ns
+                return "unchanged"
+            self._apply(old, -1)
+            status = "updated"
+        else:
+            status = "added"
+
+        self._apply(snap, 1)
+        self.records[source_id] = snap
+        return status
+
+    def remove_record(self, source_id: str) -> bool:
+        """Remove a record from the cubes"""
+        old = self.records.pop(source_id, None)
+        if old is None:
+            return False
+        self._apply(old, -1)
+        return True
+
+    def update_from_dir(self, directory: Path) -> dict:
+        """Fold new or modified *_enriched.json files into the cubes, removing deleted ones"""
+        stats = {"scanned": 0, "added": 0, "updated": 0, "unchanged": 0, "skipped": 0, "removed": 0}
+        known_mtimes = {sid: snap.get("mtime_ns") for sid, snap in self.records.items()}
+        directory_key = str(Path(directory).resolve())
+        present = set()
+
+        for path in iter_enriched_files(directory):
+            stats["scanned"] += 1
+            source_id = path.stem.replace('_enriched', '')
+            present.add(source_id)
+            mtime_ns = path.stat().st_mtime_ns
+            if known_mtimes.get(source_id) == mtime_ns:
+                stats["skipped"] += 1
+            else:
+                record = load_enriched(path)
+                record.setdefault("source_id", source_id)
+                stats[self.add_record(record, mtime_ns=mtime_ns)] += 1
+            self.records[source_id]["directory"] = directory_key
+
+        missing = [sid for sid, snap in self.records.items()
+                   if snap.get("directory") == directory_key and sid not in present]
+        for source_id in missing:
+            stats["removed"] += self.remove_record(source_id)
+        return stats
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def total(self, where: str = None, sources: list = None, weeks: list = None) -> int:
+        """Number of posts, optionally restricted to a facet value"""
+        if where:
+            field, value = parse_facet_filter(where)
+            self._check_facet(field)
+            return sum(n for (v, s, w), n in self.cells1[field].items()
+                       if v == value and _keep(s, w, sources, weeks))
+        return sum(n for (s, w), n in self.totals.items() if _keep(s, w, sources, weeks))
+
+    def count(self, facet: str, where: str = None, by: str = None,
+              sources: list = None, weeks: list = None) -> dict:
+        """
+        Exact post counts for each value of `facet`.
+
+        where:  optional "field:value" restriction on a second facet
+        by:     optional breakdown - "source", "week" or another facet
+        Returns {value: n} or, with `by`, {value: {by_value: n}}.
+        """
+        self._check_facet(facet)
+        where_field = where_value = None
+        if where:
+            where_field, where_value = parse_facet_filter(where)
+            self._check_facet(where_field)
+            if where_field == facet:
+                raise ValueError("where must reference a different facet than the one counted")
+        if by is not None and by not in TIME_SOURCE_DIMS:
+            self._check_facet(by)
+            if by == facet:
+                raise ValueError("by must reference a different facet than the one counted")
+            if where_field is not None:
+                raise ValueError("where and a facet breakdown cannot be combined (cubes are 2-D)")
+
+        result = {}
+
+        if where_field is None and (by is None or by in TIME_SOURCE_DIMS):
+            for (value, source, week), n in self.cells1[facet].items():
+                if _keep(source, week, sources, weeks):
+                    _accumulate(result, value, _dim(by, source, week), n)
+            return result
+
+        other = where_field or by
+        pair, facet_first = self._pair(facet, other)
+        for key, n in self.cells2[pair].items():
+            va, vb, source, week = key
+            value, other_value = (va, vb) if facet_first else (vb, va)
+            if not _keep(source, week, sources, weeks):
+                continue
+            if where_field is not None:
+                if other_value != where_value:
+                    continue
+                _accumulate(result, value, _dim(by, source, week), n)
+            else:
+                _accumulate(result, value, other_value, n)
+        return result
+
+    def weeks(self) -> list:
+        """All week buckets present, sorted"""
+        return sorted({w for (_, w) in self.totals})
+
+    def sources(self) -> list:
+        """All sources present, sorted"""
+        return sorted({s for (s, _) in self.totals})
+
+    def query(self, request: dict) -> dict:
+        """
+        JSON entry point for the chatbot tool.
+
+        request: {"facet": "emotions", "where": "audience_label:community",
+                  "by": "source", "sources": [...], "weeks": [...]}
+        """
+        facet = request.get("facet")
+        if not facet:
+            raise ValueError("query requires 'facet'")
+        kwargs = {
+            "where": request.get("where"),
+            "sources": request.get("sources"),
+            "weeks": request.get("weeks"),
+        }
+        counts = self.count(facet, by=request.get("by"), **kwargs)
+        return {
+            "facet": facet,
+            "where": kwargs["where"],
+            "by": request.get("by"),
+            "total_posts": self.total(where=kwargs["where"], sources=kwargs["sources"],
+                                      weeks=kwargs["weeks"]),
+            "counts": counts
+        }
+
+    def _check_facet(self, field: str):
+        if field not in self._facet_order:
+            raise ValueError(f"Unknown facet: {field} (available: {', '.join(self.facets)})")
+
+    def _pair(self, field_a: str, field_b: str) -> tuple:
+        """Return the 2-D cube key for two facets and whether field_a comes first"""
+        if self._facet_order[field_a] < self._facet_order[field_b]:
+            return (field_a, field_b), True
+        return (field_b, field_a), False
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def to_dict(self) -> dict:
+        return {
+            "version": CUBE_FORMAT_VERSION,
+            "facets": self.facets,
+            "totals": [[s, w, n] for (s, w), n in self.totals.items()],
+            "cells1": {f: [list(k) + [n] for k, n in cells.items()]
+                       for f, cells in self.cells1.items()},
+            "cells2": {f"{a}|{b}": [list(k) + [n] for k, n in cells.items()]
+                       for (a, b), cells in self.cells2.items()},
+            "records": self.records
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FacetCubes":
+        if data.get("version") != CUBE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported cube format version: {data.get('version')}")
+        cubes = cls(facets=data["facets"])
+        cubes.totals = {(s, w): n for s, w, n in data["totals"]}
+        for field, rows in data["cells1"].items():
+            cubes.cells1[field] = {tuple(row[:-1]): row[-1] for row in rows}
+        for pair_key, rows in data["cells2"].items():
+            pair = tuple(pair_key.split("|"))
+            cubes.cells2[pair] = {tuple(row[:-1]): row[-1] for row in rows}
+        cubes.records = data["records"]
+        return cubes
+
+    def save(self, path: Path = DEFAULT_CUBE_PATH):
+        """Write cubes atomically"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_CUBE_PATH, facets: list = None) -> "FacetCubes":
+        """Load cubes from disk, or return empty cubes if none exist yet"""
+        path = Path(path)
+        if not path.exists():
+            return cls(facets=facets)
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+
+def parse_facet_filter(expr: str) -> tuple:
+    """Split an Algolia-style "field:value" filter"""
+    if not isinstance(expr, str) or ":" not in expr:
+        raise ValueError(f"Expected 'field:value', got: {expr!r}")
+    field, value = expr.split(":", 1)
+    return field.strip(), value.strip()
+
+
+def _bump(cells: dict, key: tuple, delta: int):
+    n = cells.get(key, 0) + delta
+    if n:
+        cells[key] = n
+    else:
+        cells.pop(key, None)
+
+
+def _keep(source: str, week: str, sources: list, weeks: list) -> bool:
+    return (not sources or source in sources) and (not weeks or week in weeks)
+
+
+def _dim(by: str, source: str, week: str):
+    if by == "source":
+        return source
+    if by == "week":
+        return week
+    return None
+
+
+def _accumulate(result: dict, value: str, sub_key, n: int):
+    if sub_key is None:
+        result[value] = result.get(value, 0) + n
+    else:
+        inner = result.setdefault(value, {})
+        inner[sub_key] = inner.get(sub_key, 0) + n
+
+
+def print_counts(result: dict):
+    """Print a query result as a sorted table"""
+    print(f"\n{'='*70}")
+    title = f"  {result['facet']}"
+    if result["where"]:
+        title += f" where {result['where']}"
+    if result["by"]:
+        title += f" by {result['by']}"
+    print(title)
+    print(f"{'='*70}")
+    print(f"  Posts in scope: {result['total_posts']}\n")
+
+    counts = result["counts"]
+    rows = sorted(counts.items(), key=lambda x: -(sum(x[1].values()) if isinstance(x[1], dict) else x[1]))
+    for value, n in rows:
+        if isinstance(n, dict):
+            breakdown = ", ".join(f"{k}={v}" for k, v in sorted(n.items(), key=lambda x: -x[1]))
+            print(f"  {value:<30} {sum(n.values()):>6}   ({breakdown})")
+        else:
+            print(f"  {value:<30} {n:>6}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query facet aggregation cubes")
+    parser.add_argument("--cubes", type=Path, default=DEFAULT_CUBE_PATH, help="Cube file path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Fold enriched outputs into the cubes")
+    build.add_argument("--input", type=Path, required=True, action="append",
+                       help="Directory of *_enriched.json files (repeatable)")
+    build.add_argument("--rebuild", action="store_true", help="Discard existing cubes first")
+
+    query = sub.add_parser("query", help="Query counts")
+    query.add_argument("--facet", required=True, help="Facet to count, e.g. emotions")
+    query.add_argument("--where", help="Restrict to field:value, e.g. audience_label:community")
+    query.add_argument("--by", help="Breakdown: source, week or another facet")
+    query.add_argument("--source", action="append", dest="sources", help="Limit to source (repeatable)")
+    query.add_argument("--week", action="append", dest="weeks", help="Limit to ISO week (repeatable)")
+    query.add_argument("--json", action="store_true", help="Print raw JSON")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        cubes = FacetCubes() if args.rebuild else FacetCubes.load(args.cubes)
+        for directory in args.input:
+            if not directory.exists():
+                print(f"❌ Input directory not found: {directory}")
+                sys.exit(1)
+            stats = cubes.update_from_dir(directory)
+            print(f"  {directory}: {stats['added']} added, {stats['updated']} updated, "
+                  f"{stats['removed']} removed, {stats['unchanged'] + stats['skipped']} unchanged "
+                  f"({stats['scanned']} scanned)")
+        cubes.save(args.cubes)
+        print(f"✅ Cubes saved: {args.cubes} ({len(cubes.records)} posts)")
+        return
+
+    cubes = FacetCubes.load(args.cubes)
+    if not cubes.records:
+        print(f"❌ No cubes found at {args.cubes} - run 'build' first")
+        sys.exit(1)
+    try:
+        result = cubes.query({"facet": args.facet, "where": args.where, "by": args.by,
+                              "sources": args.sources, "weeks": args.weeks})
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    else:
+        print_counts(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Typo-Tolerant Dictionary Matching
+
+Finds dictionary terms in casual / misspelled text ("dizzyness", "acerbose",
+"avexitid") without enumerating every misspelling in Variations.
+
+SymSpell-style deletion index over the words of every Variation and Exclude
+term (plus the label itself for entity categories, e.g. "shakiness"): each
+vocabulary word is stored under its deletes (up to MAX_EDITS, on the first
+PREFIX_LEN characters). A text token is looked up by its own deletes and the
+candidates are verified with a bounded Damerau-Levenshtein distance. Token
+lookups are memoized per distinct token, and only tokens with a candidate
+are walked, so matching stays linear in text length.
+
+Throughput is pure-Python scale, not tens of thousands of posts/s: on the
+v6 inputs (~1.1 KB each, --bench) about 3k posts/s exact and 1.1-1.3k
+posts/s exact+fuzzy on one core. Fan out over processes for more.
+
+Rules:
+- Allowed edits per word by length: <= 5 chars exact, 6-9 chars 1, 10+ chars 2;
+  at most MAX_EDITS per term. Fuzzy words must keep their first letter.
+- Acronyms (PBH, RH, CGM...) match exactly and case-sensitively
+- Multi-word terms match consecutive tokens ("post-op" = "post op"), not
+  across sentence punctuation
+- Exclude terms are matched the same way (so misspelled excludes still
+  suppress) within EXCLUDE_WINDOW characters of the hit
+
+Exact hits come from the compiled dictionary (pbh_signal.dictionary_artifact);
+fuzzy hits are added where no exact hit of the same entry overlaps. Every hit
+carries "distance" (0 = exact) and the "variation" it matched.
+
+Usage:
+    python -m pbh_signal.fuzzy_match --text "Getting shakines and dizzyness, my endo prescribed acerbose"
+    python -m pbh_signal.fuzzy_match --tests
+    python -m pbh_signal.fuzzy_match --bench v6/testing/normalized_inputs
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+from pbh_signal.dictionary import ACRONYM_MAX_LEN, EXCLUDE_WINDOW, post_text
+from pbh_signal.dictionary_artifact import load_compiled
+
+BASE_DIR = Path(__file__).parent
+V5_TEST_DATA = BASE_DIR.parent / "v5" / "enrichment-test-data-v5"
+
+# v5 fixtures that exercise misspellings and casual language: (input, expected output)
+FUZZY_TESTS = [
+    ("edge-cases/edge_misspellings_abbreviations.json",
+     "expected-outputs/edge-cases/edge_misspellings_abbreviations_expected.json"),
+    ("dictionary-tests/dict_5_casual_language.json",
+     "expected-outputs/dictionary-tests/dict_5_casual_language_expected.json"),
+]
+
+MAX_EDITS = 2
+PREFIX_LEN = 7
+
+# Categories whose label is itself a surface form worth matching ("shakiness", "acarbose")
+LABEL_TERM_CATEGORIES = ['companies', 'conditions', 'symptoms', 'treatments']
+
+# Longest run of separators allowed between the words of a multi-word term
+MAX_GAP = 3
+
+# Everyday words one edit away from a dictionary word; never read as typos
+NOT_TYPOS = {"appear", "appears", "appeared", "sharing", "shaping", "extensive", "sweeping"}
+
+# Sentence punctuation may not sit between the words of a multi-word term
+_BREAK_RE = re.compile(r"[.,;:!?]")
+
+# Memoized token lookups are dropped past this many distinct tokens
+TOKEN_CACHE_SIZE = 200_000
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+VARIATION = 0
+EXCLUDE = 1
+
+
+def allowed_edits(word: str) -> int:
+    """Edit budget for one word by length"""
+    if len(word) <= 5:
+        return 0
+    return 1 if len(word) <= 9 else 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, or limit + 1 once it exceeds limit"""
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            value = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, prev2[j - 2] + 1)
+            cur[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1] if prev[-1] <= limit else limit + 1
+
+
+def _deletes(word: str, depth: int) -> set:
+    """word plus every string reachable by deleting up to depth characters"""
+    found = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - found
+        found |= frontier
+    return found
+
+
+class FuzzyMatcher:
+    """Deletion-index fuzzy matcher over dictionary terms, on top of an exact matcher"""
+
+    def __init__(self, exact=None, max_edits: int = MAX_EDITS, exclude_window: int = EXCLUDE_WINDOW):
+        self.exact = exact or load_compiled()
+        self.max_edits = max_edits
+        self.exclude_window = exclude_window
+        self.entries = self.exact.entries
+
+        # terms: (entry index, kind, variation, [words], [acronym flags])
+        self.terms = []
+        for ei, entry in enumerate(self.entries):
+            variations = list(entry["variations"])
+            if entry["category"] in LABEL_TERM_CATEGORIES:
+                variations.append(entry["label"].replace("_", " "))
+            for kind, terms in ((VARIATION, variations), (EXCLUDE, entry["exclude"])):
+                for term in dict.fromkeys(terms):
+                    words = _TOKEN_RE.findall(term)
+                    if words:
+                        acronym = [len(w) <= ACRONYM_MAX_LEN and w.isupper() for w in words]
+                        self.terms.append((ei, kind, term, [w.lower() for w in words], acronym))
+
+        # First word -> terms starting with it; deletion index over all words
+        self._by_first = {}
+        vocabulary = set()
+        for ti, (_, _, _, words, _) in enumerate(self.terms):
+            self._by_first.setdefault(words[0], []).append(ti)
+            vocabulary.update(words)
+        self._deletes = {}
+        for word in vocabulary:
+            for key in _deletes(word[:PREFIX_LEN], min(allowed_edits(word), max_edits)):
+                self._deletes.setdefault(key, []).append(word)
+        self._cache = {}
+        self._plural_cache = {}
+        self._live = set()          # tokens with at least one single-token candidate
+
+    def _word_matches(self, token: str) -> dict:
+        """Vocabulary words within their edit budget of a lowercased token: {word: distance}"""
+        found = self._cache.get(token)
+        if found is not None:
+            return found
+        found = {}
+        limit = min(allowed_edits(token) + 1, self.max_edits)
+        for key in _deletes(token[:PREFIX_LEN], limit):
+            for word in self._deletes.get(key, ()):
+                if word in found:
+                    continue
+                budget = min(allowed_edits(word), self.max_edits)
+                if word != token and (not budget or word[0] != token[0] or token in NOT_TYPOS):
+                    continue
+                d = edit_distance(token, word, budget)
+                if d <= budget:
+                    found[word] = d
+        if len(self._cache) >= TOKEN_CACHE_SIZE:
+            self._cache.clear()
+            self._plural_cache.clear()
+            self._live.clear()
+        self._cache[token] = found
+        return found
+
+    def _token_matches(self, token: str, last: bool) -> dict:
+        """Like _word_matches; the last word of a term may also be plural"""
+        found = self._word_matches(token)
+        if last and len(token) > 3 and token.endswith("s"):
+            for stem in (token[:-1], token[:-2] if token.endswith("es") else None):
+                if stem:
+                    for word, d in self._word_matches(stem).items():
+                        if d < found.get(word, MAX_EDITS + 1):
+                            found = {**found, word: d}
+        return found
+
+    def scan(self, text: str) -> list:
+        """Token-level hits for every term: [(entry, kind, variation, start, end, distance)]"""
+        if text.isascii():
+            lowered = _TOKEN_RE.findall(text.lower())
+        else:
+            lowered = [t.lower() for t in _TOKEN_RE.findall(text)]
+        # Most tokens match nothing: resolve each distinct token once, then visit only live ones
+        plural_cache = self._plural_cache
+        for token in set(lowered):
+            if token not in plural_cache:
+                plural_cache[token] = self._token_matches(token, True)
+                if plural_cache[token]:
+                    self._live.add(token)
+        live = self._live.intersection(lowered)
+        if not live:
+            return []
+        tokens = [(m.group(0), m.start(), m.end()) for m in _TOKEN_RE.finditer(text)]
+        found = []
+        for i in [i for i, token in enumerate(lowered) if token in live]:
+            token = lowered[i]
+            for word, d_single in plural_cache[token].items():
+                for ti in self._by_first.get(word, ()):
+                    ei, kind, variation, words, acronym = self.terms[ti]
+                    if len(words) == 1:
+                        total = d_single
+                    else:
+                        total = self._word_matches(token).get(word)
+                    if total is None or (acronym[0] and not self._same_acronym(tokens[i][0], variation, 0)):
+                        continue
+                    end_index = i
+                    for k in range(1, len(words)):
+                        j = i + k
+                        gap = text[tokens[j - 1][2]:tokens[j][1]] if j < len(tokens) else ""
+                        if j >= len(tokens) or len(gap) > MAX_GAP or (_BREAK_RE.search(gap) and gap not in variation):
+                            total = None
+                            break
+                        d = self._token_matches(lowered[j], k == len(words) - 1).get(words[k])
+                        if d is None or (acronym[k] and not self._same_acronym(tokens[j][0], variation, k)):
+                            total = None
+                            break
+                        total += d
+                        end_index = j
+                    if total is not None and total <= self.max_edits:
+                        found.append((ei, kind, variation, tokens[i][1], tokens[end_index][2], total))
+        return found
+
+    @staticmethod
+    def _same_acronym(token: str, variation: str, k: int) -> bool:
+        """Acronym words must appear exactly as written (optionally pluralized: "CGMs")"""
+        word = _TOKEN_RE.findall(variation)[k]
+        return token == word or token == word + "s"
+
+    def match(self, text: str) -> list:
+        """Exact hits plus fuzzy hits: [{category, label, term, start, end, distance, variation}]"""
+        if not text:
+            return []
+        hits = []
+        exact_spans = {}
+        for hit in self.exact.match(text):
+            hits.append({**hit, "distance": 0, "variation": hit["term"]})
+            exact_spans.setdefault(hit["label"], []).append((hit["start"], hit["end"]))
+
+        scanned = self.scan(text)
+        excludes = {}
+        for ei, kind, _, start, end, _ in scanned:
+            if kind == EXCLUDE:
+                excludes.setdefault(ei, []).append((start, end))
+
+        window = self.exclude_window
+        best = {}
+        for ei, kind, variation, start, end, distance in scanned:
+            if kind != VARIATION:
+                continue
+            entry = self.entries[ei]
+            if any(s < end and start < e for s, e in exact_spans.get(entry["label"], ())):
+                continue
+            if any(xs >= start - window and xe <= end + window for xs, xe in excludes.get(ei, ())):
+                continue
+            # Keep the longest, then closest, fuzzy hit per (entry, start)
+            key = (ei, start)
+            current = best.get(key)
+            if current is None or (end, -distance) > (current["end"], -current["distance"]):
+                best[key] = {"category": entry["category"], "label": entry["label"],
+                             "term": text[start:end], "start": start, "end": end,
+                             "distance": distance, "variation": variation}
+
+        taken = {}
+        for hit in sorted(best.values(), key=lambda h: (h["start"], -h["end"])):
+            spans = taken.setdefault(hit["label"], [])
+            if any(s < hit["end"] and hit["start"] < e for s, e in spans):
+                continue
+            spans.append((hit["start"], hit["end"]))
+            hits.append(hit)
+        hits.sort(key=lambda h: h["start"])
+        return hits
+
+    def labels(self, text: str) -> dict:
+        """Matched labels per category: {category: [label, ...]}"""
+        found = {}
+        for hit in self.match(text):
+            labels = found.setdefault(hit["category"], [])
+            if hit["label"] not in labels:
+                labels.append(hit["label"])
+        return found
+
+
+def run_tests(matcher: FuzzyMatcher, tests: list = None) -> list:
+    """Expected-label recall of exact vs fuzzy matching on the v5 fixtures"""
+    results = []
+    for input_rel, expected_rel in tests or FUZZY_TESTS:
+        with open(V5_TEST_DATA / input_rel, 'r') as f:
+            post = json.load(f)
+        with open(V5_TEST_DATA / expected_rel, 'r') as f:
+            expected = json.load(f)
+        text = post_text(post)
+        wanted = {(c, l) for c in LABEL_TERM_CATEGORIES + ['topics'] for l in expected.get(c) or []}
+        exact = {(h["category"], h["label"]) for h in matcher.exact.match(text)}
+        fuzzy_hits = matcher.match(text)
+        fuzzy = {(h["category"], h["label"]) for h in fuzzy_hits}
+        results.append({
+            "test": Path(input_rel).stem,
+            "expected": len(wanted),
+            "exact_found": len(wanted & exact),
+            "fuzzy_found": len(wanted & fuzzy),
+            "missing": sorted(f"{c}:{l}" for c, l in wanted - fuzzy),
+            "unexpected": sorted(f"{c}:{l}" for c, l in fuzzy - wanted - exact),
+            "fuzzy_hits": [f"{h['term']} -> {h['label']} (d={h['distance']})"
+                           for h in fuzzy_hits if h["distance"] or h["variation"] != h["term"]],
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Typo-tolerant dictionary matching")
+    parser.add_argument("--text", help="Match a single text")
+    parser.add_argument("--tests", action="store_true", help="Run the v5 misspelling/casual-language fixtures")
+    parser.add_argument("--bench", type=Path, help="Throughput over a directory of normalized posts")
+    parser.add_argument("--repeat", type=int, default=50, help="Passes over the bench directory")
+    args = parser.parse_args()
+
+    if not (args.text or args.tests or args.bench):
+        print("❌ Must specify --text, --tests or --bench")
+        sys.exit(1)
+
+    matcher = FuzzyMatcher()
+
+    if args.text:
+        for hit in matcher.match(args.text):
+            print(f"    {hit['category']:<16} {hit['label']:<28} \"{hit['term']}\" (d={hit['distance']})")
+
+    if args.tests:
+        print(f"\n{'='*70}")
+        print(f"  FUZZY MATCHING FIXTURES")
+        print(f"{'='*70}")
+        for result in run_tests(matcher):
+            print(f"\n  {result['test']}: expected labels found exact {result['exact_found']}/{result['expected']}, "
+                  f"fuzzy {result['fuzzy_found']}/{result['expected']}")
+            for line in result["fuzzy_hits"]:
+                print(f"    + {line}")
+            if result["missing"]:
+                print(f"    missing:    {', '.join(result['missing'])}")
+            if result["unexpected"]:
+                print(f"    unexpected: {', '.join(result['unexpected'])}")
+
+    if args.bench:
+        if not args.bench.exists():
+            print(f"❌ Directory not found: {args.bench}")
+            sys.exit(1)
+        texts = []
+        for path in sorted(args.bench.glob("*.json")):
+            with open(path, 'r') as f:
+                texts.append(post_text(json.load(f)))
+        for name, fn in (("exact", matcher.exact.match), ("exact+fuzzy", matcher.match)):
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                for text in texts:
+                    fn(text)
+            elapsed = time.perf_counter() - started
+            print(f"  {name:<12} {len(texts) * args.repeat / elapsed:>10,.0f} posts/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Incremental Search Index Sync
+
+Pushes enriched records to the search backend used by the chatbot.
+
+- High-water mark: only files modified after the last successful sync of the
+  same input directory are read (one mark per directory)
+- Content hashes: records whose searchable content is unchanged are not resent
+- Deletes: synced records whose file is no longer in their input directory
+  are deleted (each record remembers the directory it was synced from)
+- Batching: upserts are grouped into batches bounded by record count and bytes
+- Concurrency: batches are sent in parallel, each with retry + backoff
+- Full reindex: builds a shadow index, then atomically swaps it into place
+
+Sync state is stored per index in system/cache/index_sync/<index>.json.
+
+Usage:
+    python -m pbh_signal.index_sync --input v7/testing/api_test_outputs/v7
+    python -m pbh_signal.index_sync --input v7/testing/api_test_outputs/v7 --reindex
+    python -m pbh_signal.index_sync --input ... --index signal_posts --workers 8
+    python -m pbh_signal.index_sync --input ... --inject-failures 3     # exercise retry/backoff
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pbh_signal.local_search import LocalSearchBackend, SearchBackend
+from pbh_signal.records import iter_enriched_files, load_enriched
+
+BASE_DIR = Path(__file__).parent
+CACHE_DIR = BASE_DIR.parent / "cache"
+DEFAULT_STATE_DIR = CACHE_DIR / "index_sync"
+DEFAULT_LOCAL_SEARCH_DIR = CACHE_DIR / "local_search"
+
+DEFAULT_INDEX = "signal_posts"
+
+# Algolia recommends batches of ~1,000 records / a few MB
+BATCH_MAX_RECORDS = 500
+BATCH_MAX_BYTES = 4 * 1024 * 1024
+
+# Fields not sent to the search index
+EXCLUDED_FIELDS = ['debug_matches']
+
+
+def to_search_record(record: dict) -> dict:
+    """Convert an enriched record to a search object keyed by objectID"""
+    obj = {k: v for k, v in record.items() if k not in EXCLUDED_FIELDS}
+    obj["objectID"] = record["source_id"]
+    return obj
+
+
+def canonical_json(obj: dict) -> str:
+    """Stable JSON encoding used for hashing and batch sizing"""
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def content_hash(obj: dict) -> str:
+    """SHA-256 of the canonical encoding"""
+    return hashlib.sha256(canonical_json(obj).encode("utf-8")).hexdigest()
+
+
+class SyncState:
+    """Persisted high-water marks and per-object content hashes for one index"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.high_water_mark = 0       # max source-file mtime_ns fully synced, over all directories
+        self.directories = {}          # resolved input directory -> its high-water mark
+        self.generation = 0            # bumped whenever index content changes
+        self.hashes = {}               # objectID -> content hash
+        self.sources = {}              # objectID -> input directory it was synced from
+        self.last_sync = None
+
+    @classmethod
+    def load(cls, path: Path) -> "SyncState":
+        state = cls(path)
+        if state.path.exists():
+            with open(state.path, 'r') as f:
+                data = json.load(f)
+            state.high_water_mark = data.get("high_water_mark", 0)
+            state.directories = data.get("directories", {})
+            state.generation = data.get("generation", 0)
+            state.hashes = data.get("hashes", {})
+            state.sources = data.get("sources", {})
+            state.last_sync = data.get("last_sync")
+        return state
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                "high_water_mark": self.high_water_mark,
+                "directories": self.directories,
+                "generation": self.generation,
+                "hashes": self.hashes,
+                "sources": self.sources,
+                "last_sync": self.last_sync
+            }, f)
+        tmp_path.replace(self.path)
+
+    @property
+    def token(self) -> str:
+        """Opaque version token for caches keyed on index content"""
+        return f"{self.generation}:{self.high_water_mark}"
+
+
+def make_batches(objects: list, max_records: int = BATCH_MAX_RECORDS,
+                 max_bytes: int = BATCH_MAX_BYTES) -> list:
+    """Group (object, size) pairs into batches bounded by count and bytes"""
+    batches = []
+    current = []
+    current_bytes = 0
+    for obj, size in objects:
+        if current and (len(current) >= max_records or current_bytes + size > max_bytes):
+            batches.append(current)
+            current = []
+            current_bytes = 0
+        current.append(obj)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+class IndexSync:
+    """Incremental, batched, concurrent sync of enriched records to a search index"""
+
+    def __init__(self, backend: SearchBackend, index: str = DEFAULT_INDEX,
+                 state_path: Path = None, workers: int = 4,
+                 max_records: int = BATCH_MAX_RECORDS, max_bytes: int = BATCH_MAX_BYTES,
+                 max_retries: int = 4, backoff: float = 0.5):
+        self.backend = backend
+        self.index = index
+        self.state = SyncState.load(state_path or DEFAULT_STATE_DIR / f"{index}.json")
+        self.workers = workers
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    def _collect(self, directory: Path, since: int) -> list:
+        """Read files modified after `since`; returns [(mtime_ns, search_object)]"""
+        changed = []
+        for path in iter_enriched_files(directory):
+            mtime_ns = path.stat().st_mtime_ns
+            if mtime_ns <= since:
+                continue
+            record = load_enriched(path)
+            record.setdefault("source_id", path.stem.replace('_enriched', ''))
+            changed.append((mtime_ns, to_search_record(record)))
+        return changed
+
+    def _send(self, index: str, batch: list) -> int:
+        """Upsert one batch with retry and exponential backoff; returns attempts used"""
+        return self._retry(self.backend.save_objects, index, batch)
+
+    def _retry(self, call, *args) -> int:
+        """Run a backend write with retry and exponential backoff; returns attempts used"""
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                call(*args)
+                return attempt
+            except Exception:
+                if attempt > self.max_retries:
+                    raise
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+
+    def _push(self, index: str, batches: list) -> tuple:
+        """Send batches concurrently; returns (succeeded batches, failed batches, retries)"""
+        succeeded, failed, retries = [], [], 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self._send, index, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    retries += future.result() - 1
+                    succeeded.append(batch)
+                except Exception as e:
+                    failed.append((batch, e))
+        return succeeded, failed, retries
+
+    def sync(self, directory: Path) -> dict:
+        """Send records changed since the directory's high-water mark"""
+        started = time.time()
+        key = str(Path(directory).resolve())
+        since = self.state.directories.get(key, 0)
+        changed = self._collect(directory, since)
+
+        pending = []
+        mtimes = {}
+        hashes = {}
+        for mtime_ns, obj in changed:
+            object_id = obj["objectID"]
+            digest = content_hash(obj)
+            if self.state.hashes.get(object_id) == digest:
+                continue
+            hashes[object_id] = digest
+            mtimes[object_id] = mtime_ns
+            pending.append((obj, len(canonical_json(obj).encode("utf-8"))))
+
+        batches = make_batches(pending, self.max_records, self.max_bytes)
+        succeeded, failed, retries = self._push(self.index, batches)
+
+        for batch in succeeded:
+            for obj in batch:
+                self.state.hashes[obj["objectID"]] = hashes[obj["objectID"]]
+
+        present = {path.stem.replace('_enriched', '') for path in iter_enriched_files(directory)}
+        present.update(obj["objectID"] for _, obj in changed)
+        for object_id in present:
+            if object_id in self.state.hashes:
+                self.state.sources[object_id] = key
+
+        # Records synced from this directory whose file is gone; kept (and retried) if the delete fails
+        deleted = sorted(object_id for object_id, source in self.state.sources.items()
+                         if source == key and object_id not in present)
+        delete_errors = []
+        if deleted:
+            try:
+                retries += self._retry(self.backend.delete_objects, self.index, deleted) - 1
+                for object_id in deleted:
+                    self.state.hashes.pop(object_id, None)
+                    del self.state.sources[object_id]
+            except Exception as e:
+                delete_errors.append(e)
+                deleted = []
+
+        # Advance the directory's high-water mark only past files that were fully synced
+        new_hwm = max((m for m, _ in changed), default=since)
+        failed_mtimes = [mtimes[obj["objectID"]] for batch, _ in failed for obj in batch]
+        if failed_mtimes:
+            new_hwm = min(failed_mtimes) - 1
+        self.state.directories[key] = max(since, new_hwm)
+        self.state.high_water_mark = max(self.state.high_water_mark, self.state.directories[key])
+
+        sent = sum(len(b) for b in succeeded)
+        if sent or deleted:
+            self.state.generation += 1
+        self.state.last_sync = datetime.now(timezone.utc).isoformat()
+        self.state.save()
+
+        return {
+            "mode": "incremental",
+            "scanned_changed": len(changed),
+            "unchanged": len(changed) - len(pending),
+            "sent": sent,
+            "deleted": len(deleted),
+            "batches": len(batches),
+            "failed_batches": len(failed),
+            "failed_records": sum(len(b) for b, _ in failed),
+            "failed_deletes": len(delete_errors),
+            "errors": [str(e) for _, e in failed] + [str(e) for e in delete_errors],
+            "retries": retries,
+            "elapsed_s": time.time() - started
+        }
+
+    def reindex(self, directory: Path) -> dict:
+        """Rebuild into a shadow index and atomically swap it over the live index"""
+        started = time.time()
+        changed = self._collect(directory, since=-1)
+        shadow = f"{self.index}_shadow_{int(started)}"
+
+        objects = [(obj, len(canonical_json(obj).encode("utf-8"))) for _, obj in changed]
+        batches = make_batches(objects, self.max_records, self.max_bytes)
+
+        self.backend.clear_index(shadow)
+        succeeded, failed, retries = self._push(shadow, batches)
+        if failed:
+            self.backend.delete_index(shadow)
+            return {
+                "mode": "reindex",
+                "swapped": False,
+                "sent": sum(len(b) for b in succeeded),
+                "batches": len(batches),
+                "failed_batches": len(failed),
+                "errors": [str(e) for _, e in failed],
+                "retries": retries,
+                "elapsed_s": time.time() - started
+            }
+
+        self.backend.move_index(shadow, self.index)
+
+        key = str(Path(directory).resolve())
+        self.state.hashes = {obj["objectID"]: content_hash(obj) for _, obj in changed}
+        self.state.sources = {obj["objectID"]: key for _, obj in changed}
+        self.state.high_water_mark = max((m for m, _ in changed), default=0)
+        self.state.directories = {key: self.state.high_water_mark}
+        self.state.generation += 1
+        self.state.last_sync = datetime.now(timezone.utc).isoformat()
+        self.state.save()
+
+        return {
+            "mode": "reindex",
+            "swapped": True,
+            "sent": len(objects),
+            "batches": len(batches),
+            "failed_batches": 0,
+            "errors": [],
+            "retries": retries,
+            "elapsed_s": time.time() - started
+        }
+
+
+def print_stats(stats: dict, index: str):
+    """Print a sync summary"""
+    print(f"\n{'='*70}")
+    print(f"  INDEX SYNC ({stats['mode']}): {index}")
+    print(f"{'='*70}")
+    if stats["mode"] == "incremental":
+        print(f"  Changed since HWM: {stats['scanned_changed']}")
+        print(f"  Unchanged (hash):  {stats['unchanged']}")
+        print(f"  Deleted:           {stats['deleted']}" + (" (delete failed)" if stats["failed_deletes"] else ""))
+    else:
+        print(f"  Swapped:           {'✅' if stats['swapped'] else '❌'}")
+    print(f"  Sent:              {stats['sent']} in {stats['batches']} batches")
+    print(f"  Retries:           {stats['retries']}")
+    print(f"  Failed batches:    {stats['failed_batches']}")
+    for error in stats["errors"][:5]:
+        print(f"     • {error}")
+    print(f"  Elapsed:           {stats['elapsed_s']:.2f}s")
+
+
+class FlakyBackend(SearchBackend):
+    """Wraps a backend and fails its next N writes (for exercising retry/backoff)"""
+
+    def __init__(self, backend: SearchBackend, failures: int):
+        self.backend = backend
+        self.failures = failures
+
+    def _maybe_fail(self):
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("Injected failure (--inject-failures)")
+
+    def save_objects(self, index: str, objects: list) -> dict:
+        self._maybe_fail()
+        return self.backend.save_objects(index, objects)
+
+    def delete_objects(self, index: str, object_ids: list) -> dict:
+        self._maybe_fail()
+        return self.backend.delete_objects(index, object_ids)
+
+    def clear_index(self, index: str):
+        return self.backend.clear_index(index)
+
+    def delete_index(self, index: str):
+        return self.backend.delete_index(index)
+
+    def move_index(self, source: str, destination: str):
+        return self.backend.move_index(source, destination)
+
+    def search(self, index: str, query: str = "", facet_filters: list = None,
+               number_of_results: int = 20) -> dict:
+        return self.backend.search(index, query, facet_filters, number_of_results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync enriched records to the search index")
+    parser.add_argument("--input", type=Path, required=True, help="Directory of *_enriched.json files")
+    parser.add_argument("--index", default=DEFAULT_INDEX, help=f"Index name (default: {DEFAULT_INDEX})")
+    parser.add_argument("--reindex", action="store_true", help="Full rebuild via shadow index + swap")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent batches (default: 4)")
+    parser.add_argument("--batch-records", type=int, default=BATCH_MAX_RECORDS)
+    parser.add_argument("--batch-bytes", type=int, default=BATCH_MAX_BYTES)
+    parser.add_argument("--local-dir", type=Path, default=DEFAULT_LOCAL_SEARCH_DIR,
+                        help="Data directory for the local search stand-in")
+    parser.add_argument("--inject-failures", type=int, default=0, metavar="N",
+                        help="Fail the next N backend writes (retry testing)")
+    args = parser.parse_args()
+
+    if not args.input.exists():
+        print(f"❌ Input directory not found: {args.input}")
+        sys.exit(1)
+
+    backend = LocalSearchBackend(data_dir=args.local_dir)
+    target = FlakyBackend(backend, args.inject_failures) if args.inject_failures else backend
+    syncer = IndexSync(target, index=args.index, workers=args.workers,
+                       max_records=args.batch_records, max_bytes=args.batch_bytes)
+
+    stats = syncer.reindex(args.input) if args.reindex else syncer.sync(args.input)
+    print_stats(stats, args.index)
+    print(f"  High-water mark:   {syncer.state.high_water_mark} (generation {syncer.state.generation})")
+    print(f"  Index size:        {backend.count(args.index)} records")
+
+    if stats["failed_batches"] or stats.get("failed_deletes"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Local Key-Phrase Extraction
+
+Builds key_phrases locally instead of having the model write them (it is one
+of the most output-heavy fields). Candidates come from n-gram windows around
+dictionary hits plus a few anchor patterns, and are grouped and ranked with
+the prompt's 5-category strategy:
+
+1. Symptom + Context:   symptom hit + adjacent words / timing ("shaky after eating")
+2. Treatment + Outcome: treatment and dietary_modification hits ("acarbose trial",
+                        "small frequent meals")
+3. Timing Patterns:     "90 minutes after eating", "60 days post-op", "one year ago"
+4. Diagnostic Terms:    diagnostics_monitoring hits ("continuous glucose monitor")
+5. Medical Conditions:  condition and bariatric procedure hits ("gastric bypass surgery")
+
+Windows grow from the hit over adjacent modifiers (LEFT_MODIFIERS, acronyms)
+and heads (RIGHT_HEADS), never across punctuation, up to MAX_PHRASE_WORDS.
+Phrases follow the prompt's normalization rules: lowercase except acronyms,
+abbreviations expanded ("cgm" -> "continuous glucose monitor"), bare
+symptoms completed ("shaky" -> "feeling shaky"), "sleeve" -> "sleeve
+gastrectomy" only with bariatric context. A phrase contained in a longer
+kept phrase is dropped.
+
+With run_api_test.py --local-key-phrases the response schema omits
+key_phrases and this extractor fills them in, so the model no longer spends
+output tokens on them.
+
+Usage:
+    python -m pbh_signal.key_phrases --input v6/testing/normalized_inputs
+    python -m pbh_signal.key_phrases --evaluate v7/testing/expected_outputs
+"""
+
+import argparse
+import copy
+import json
+import math
+import re
+import sys
+from pathlib import Path
+
+from pbh_signal.dictionary import post_text
+from pbh_signal.dictionary_artifact import load_compiled
+
+MAX_KEY_PHRASES = 10
+MAX_PHRASE_WORDS = 5
+
+# 5-category strategy: name -> rank weight
+PHRASE_CATEGORIES = {
+    "medical_condition": 5,
+    "symptom_context": 4,
+    "treatment_outcome": 4,
+    "diagnostic": 3,
+    "timing": 3,
+}
+
+# Dictionary category / label -> phrase category
+HIT_CATEGORIES = {
+    "conditions": "medical_condition",
+    "symptoms": "symptom_context",
+    "treatments": "treatment_outcome",
+    ("topics", "dietary_modification"): "treatment_outcome",
+    ("topics", "diagnostics_monitoring"): "diagnostic",
+    ("topics", "bariatric_surgery"): "medical_condition",
+}
+
+ABBREVIATIONS = {
+    "cgm": "continuous glucose monitor",
+    "pbh": "post-bariatric hypoglycemia",
+    "rh": "reactive hypoglycemia",
+    "ogtt": "oral glucose tolerance test",
+    "mmtt": "mixed meal tolerance test",
+    "wls": "weight loss surgery",
+    "rygb": "RNY gastric bypass",
+}
+
+# Only with bariatric context (any bariatric_surgery hit)
+BARIATRIC_ABBREVIATIONS = {
+    "sleeve": "sleeve gastrectomy",
+    "vsg": "vertical sleeve gastrectomy",
+    "bypass": "gastric bypass",
+}
+
+SYMPTOM_FORMS = {
+    "shaky": "feeling shaky",
+    "jittery": "feeling jittery",
+    "dizzy": "dizziness",
+    "lightheaded": "lightheadedness",
+    "light-headed": "lightheadedness",
+    "sweaty": "sweating",
+    "clammy": "clammy skin",
+    "nauseous": "nausea",
+    "woozy": "feeling woozy",
+}
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "but", "if", "so", "of", "to", "in", "on", "at", "by", "for", "with",
+    "from", "as", "is", "am", "are", "was", "were", "be", "been", "being", "have", "has", "had", "do",
+    "does", "did", "i", "i'm", "im", "i've", "ive", "me", "my", "mine", "you", "your", "he", "she", "it",
+    "its", "it's", "we", "our", "they", "their", "them", "this", "that", "these", "those", "there",
+    "here", "what", "which", "who", "when", "where", "why", "how", "not", "no", "just", "really", "very",
+    "so", "too", "also", "all", "any", "some", "get", "got", "getting", "can", "could", "would",
+    "should", "will", "might", "may", "about", "after", "before", "then", "than", "like", "up", "out",
+    "into", "over", "again", "still", "even", "much", "more", "most", "lot", "lots", "anyone", "else",
+    "know", "think", "feel", "went", "go", "going", "been", "because", "while", "since",
+}
+
+# Words a window may grow over: modifiers to the left of a hit, heads to its right
+LEFT_MODIFIERS = {
+    "severe", "mild", "moderate", "chronic", "constant", "occasional", "frequent", "terrible", "bad",
+    "extreme", "repeated", "sudden", "late", "early", "delayed", "revision", "modified", "mini", "vertical",
+    "gastric", "reactive", "post", "post-bariatric", "postprandial", "feeling", "low", "soft", "full",
+    "small", "cold", "night", "dose", "daily", "weekly", "starting", "higher", "lower", "new",
+}
+RIGHT_HEADS = {
+    "surgery", "trial", "trials", "dose", "doses", "dosage", "diet", "episode", "episodes", "readings",
+    "reading", "syndrome", "stage", "attack", "attacks", "test", "testing", "monitor", "sensor", "levels",
+    "drops", "crash", "crashes", "spikes", "side", "effects", "injections", "pills", "meals", "revision",
+    "complications", "symptoms",
+}
+
+_WORD_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9'’/-]*")
+_CONTEXT_RE = re.compile(
+    r"\s+((?:\d+(?:[-–]\d+)?\s*(?:min(?:ute)?s?|hours?|hrs?)\s+)?(?:after|post)[- ]?"
+    r"(?:eating|meals?|breakfast|lunch|dinner|carbs|food))", re.IGNORECASE)
+_NUMBER = r"(?:\d+|one|two|three|four|five|six|seven|eight|nine|ten|twelve|a few|few)"
+_TIMING_RES = [
+    re.compile(rf"(?<!\w){_NUMBER}(?:[-–]\d+)?\s*(?:min(?:ute)?s?|hours?|hrs?)\s+(?:after|post)[- ]?"
+               rf"(?:eating|meals?|breakfast|lunch|dinner)(?!\w)", re.IGNORECASE),
+    re.compile(rf"(?<!\w){_NUMBER}\s+(?:days?|weeks?|months?|mos?|years?|yrs?)\s+(?:post[- ]?op|postop|"
+               rf"post[- ]?surgery|out)(?!\w)", re.IGNORECASE),
+    re.compile(rf"(?<!\w){_NUMBER}\s+(?:days?|weeks?|months?|years?)\s+ago(?!\w)", re.IGNORECASE),
+]
+
+
+def _phrase_category(hit: dict):
+    return HIT_CATEGORIES.get((hit["category"], hit["label"])) or HIT_CATEGORIES.get(hit["category"])
+
+
+def _is_acronym(word: str) -> bool:
+    return 2 <= len(word) <= 5 and word.isupper() and word.isalpha()
+
+
+def normalize_phrase(phrase: str, bariatric: bool = False) -> str:
+    """Canonical form: acronyms kept, rest lowercase, abbreviations / bare symptoms expanded"""
+    words = [w if _is_acronym(w) else w.lower() for w in phrase.replace("’", "'").split()]
+    phrase = " ".join(words)
+    key = phrase.lower()
+    if key in ABBREVIATIONS:
+        return ABBREVIATIONS[key]
+    if bariatric and key in BARIATRIC_ABBREVIATIONS:
+        return BARIATRIC_ABBREVIATIONS[key]
+    if key in SYMPTOM_FORMS:
+        return SYMPTOM_FORMS[key]
+    return phrase
+
+
+class KeyPhraseExtractor:
+    """Dictionary-anchored key-phrase candidates ranked with the 5-category strategy"""
+
+    def __init__(self, matcher=None, max_phrases: int = MAX_KEY_PHRASES):
+        self.matcher = matcher or load_compiled()
+        self.max_phrases = max_phrases
+
+    @staticmethod
+    def _grows(word: str, allowed: set) -> bool:
+        return word.lower() in allowed or _is_acronym(word)
+
+    def _window(self, text: str, words: list, hit: dict, category: str) -> str:
+        """Grow the hit over adjacent modifiers / heads on both sides"""
+        inside = [i for i, (s, e) in enumerate(words) if s < hit["end"] and e > hit["start"]]
+        if not inside:
+            return text[hit["start"]:hit["end"]]
+        first, last = inside[0], inside[-1]
+        while (first > 0 and last - first + 1 < MAX_PHRASE_WORDS and
+               not text[words[first - 1][1]:words[first][0]].strip() and
+               self._grows(text[words[first - 1][0]:words[first - 1][1]], LEFT_MODIFIERS)):
+            first -= 1
+        while (last + 1 < len(words) and last - first + 1 < MAX_PHRASE_WORDS and
+               not text[words[last][1]:words[last + 1][0]].strip() and
+               self._grows(text[words[last + 1][0]:words[last + 1][1]], RIGHT_HEADS)):
+            last += 1
+        phrase = text[words[first][0]:words[last][1]]
+        if category == "symptom_context":
+            context = _CONTEXT_RE.match(text, words[last][1])
+            if context:
+                phrase = f"{phrase} {context.group(1)}"
+        return phrase
+
+    def candidates(self, text: str) -> list:
+        """[(phrase, phrase category, position)] before ranking"""
+        words = [(m.start(), m.end()) for m in _WORD_RE.finditer(text)]
+        hits = self.matcher.match(text)
+        bariatric = any(h["label"] == "bariatric_surgery" for h in hits)
+        found = []
+        for hit in hits:
+            category = _phrase_category(hit)
+            if category is None:
+                continue
+            phrase = self._window(text, words, hit, category)
+            # A window that only added words to an abbreviation is kept as the expansion
+            term = normalize_phrase(hit["term"], bariatric)
+            if term != " ".join(hit["term"].lower().split()) and phrase.lower() != hit["term"].lower():
+                found.append((term, category, hit["start"]))
+            found.append((normalize_phrase(phrase, bariatric), category, hit["start"]))
+        for pattern in _TIMING_RES:
+            for m in pattern.finditer(text):
+                found.append((normalize_phrase(m.group(0)), "timing", m.start()))
+        return [c for c in found if c[0] and not c[0].isdigit()]
+
+    def extract(self, post: dict) -> list:
+        """Ranked, de-duplicated key phrases for one post"""
+        stats = {}
+        for phrase, category, position in self.candidates(post_text(post)):
+            key = phrase.lower()
+            if key not in stats:
+                stats[key] = {"phrase": phrase, "category": category, "count": 0, "first": position}
+            stats[key]["count"] += 1
+            stats[key]["first"] = min(stats[key]["first"], position)
+
+        def score(s):
+            words = len(s["phrase"].split())
+            return PHRASE_CATEGORIES[s["category"]] + math.log2(s["count"]) + (0.5 if words > 1 else 0)
+
+        ranked = sorted(stats.values(), key=lambda s: (-score(s), s["first"]))
+        selected = []
+        for s in ranked:
+            key = s["phrase"].lower()
+            # Skip phrases already covered by a kept (longer) phrase and vice versa
+            if any(key in k.lower() or k.lower() in key for k in selected):
+                continue
+            selected.append(s["phrase"])
+            if len(selected) >= self.max_phrases:
+                break
+        return selected
+
+    def extract_batch(self, posts) -> list:
+        """Key phrases for many posts with one matcher"""
+        return [self.extract(post) for post in posts]
+
+
+def drop_key_phrases(schema: dict) -> dict:
+    """Copy of a response format (or bare JSON schema) without key_phrases"""
+    reduced = copy.deepcopy(schema)
+    target = reduced.get("schema", reduced)
+    target.get("properties", {}).pop("key_phrases", None)
+    if "required" in target:
+        target["required"] = [f for f in target["required"] if f != "key_phrases"]
+    return reduced
+
+
+def _soft_match(a: str, b: str) -> bool:
+    """Same phrase up to case, containment, or at least half the words shared"""
+    a, b = a.lower(), b.lower()
+    if a in b or b in a:
+        return True
+    wa, wb = set(a.split()) - STOPWORDS, set(b.split()) - STOPWORDS
+    return bool(wa and wb) and len(wa & wb) / len(wa | wb) >= 0.5
+
+
+def evaluate(extractor: KeyPhraseExtractor, expected_dir: Path) -> dict:
+    """Soft precision/recall against expected key_phrases, and model output tokens the field costs"""
+    posts = matched_expected = matched_local = n_expected = n_local = 0
+    field_chars = 0
+    for path in sorted(Path(expected_dir).glob("*_enriched.json")):
+        with open(path, 'r') as f:
+            expected = json.load(f)
+        wanted = expected.get("key_phrases") or []
+        local = extractor.extract(expected)
+        posts += 1
+        n_expected += len(wanted)
+        n_local += len(local)
+        matched_expected += sum(any(_soft_match(w, l) for l in local) for w in wanted)
+        matched_local += sum(any(_soft_match(l, w) for w in wanted) for l in local)
+        field_chars += len(json.dumps({"key_phrases": wanted}, ensure_ascii=False))
+    return {
+        "posts": posts,
+        "expected_phrases": n_expected,
+        "local_phrases": n_local,
+        "recall": matched_expected / n_expected if n_expected else 0.0,
+        "precision": matched_local / n_local if n_local else 0.0,
+        # ~4 characters per token, as in pbh_signal.segment
+        "output_tokens_per_post": field_chars / 4 / posts if posts else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local key-phrase extraction around dictionary hits")
+    parser.add_argument("--input", type=Path, help="Directory of normalized posts")
+    parser.add_argument("--evaluate", type=Path, help="Expected outputs directory to score against")
+    args = parser.parse_args()
+
+    if not (args.input or args.evaluate):
+        print("❌ Must specify --input or --evaluate")
+        sys.exit(1)
+
+    extractor = KeyPhraseExtractor()
+
+    if args.input:
+        paths = sorted(args.input.glob("*.json"))
+        posts = []
+        for path in paths:
+            with open(path, 'r') as f:
+                posts.append(json.load(f))
+        for post, phrases in zip(posts, extractor.extract_batch(posts)):
+            print(f"  {post.get('source_id'):<14} {', '.join(phrases)}")
+
+    if args.evaluate:
+        result = evaluate(extractor, args.evaluate)
+        print(f"\n{'='*70}")
+        print(f"  KEY PHRASES vs {args.evaluate.name} (n={result['posts']})")
+        print(f"{'='*70}")
+        print(f"  Phrases:   {result['local_phrases']} local, {result['expected_phrases']} expected")
+        print(f"  Recall:    {result['recall']*100:.1f}% of expected phrases matched (soft)")
+        print(f"  Precision: {result['precision']*100:.1f}% of local phrases matched (soft)")
+        print(f"  Model output spent on key_phrases: ~{result['output_tokens_per_post']:.0f} tokens/post")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Language Identification and Routing
+
+Fills or verifies the normalized `language` field locally (no network)
+before enrichment, and routes posts the English v7 prompt and dictionary
+cannot handle away from full-prompt calls.
+
+Detection:
+- Non-Latin scripts (Cyrillic, Arabic, CJK...) are decided by script alone
+- Latin-script text is scored with a character 1-3-gram naive Bayes model
+  built at import from short seed texts per language (SEED_TEXTS)
+- The score is the per-n-gram log-likelihood margin of the best language
+  over the runner-up (nats per n-gram). Below OTHER_MARGIN no seed
+  language fits (Indonesian, Polish, Swedish...) and the text is OTHER
+- Text shorter than MIN_LETTERS letters is not judged; the declared
+  language (if any) is kept
+
+Declared codes are normalized to ISO 639-1 (YouScan sends "eng", "en" and
+"unl" for unknown). A declared language is overridden only when detection
+disagrees with a margin >= OVERRIDE_MARGIN on at least OVERRIDE_MIN_LETTERS
+letters (short titles are too easy to misread).
+
+Routes:
+- enrich:           English (or undetermined short text) → v7 prompt
+- alternate_prompt: a language listed in ALTERNATE_PROMPTS
+- translate_later:  a language in TRANSLATE_LATER (markets worth translating)
+- review:           OTHER (low margin: unseeded language or unclear text)
+- skip:             anything else
+
+Usage:
+    python -m pbh_signal.language_id --text "Tengo hipoglucemia después del bypass gástrico"
+    python -m pbh_signal.language_id --input v6/testing/normalized_inputs
+    python -m pbh_signal.language_id --csv v5/testing/phase2/data-everything.csv
+"""
+
+import argparse
+import csv
+import json
+import math
+import re
+import sys
+import unicodedata
+from collections import Counter
+from pathlib import Path
+
+from pbh_signal.dictionary import post_text
+
+ENRICH = "enrich"
+ALTERNATE_PROMPT = "alternate_prompt"
+TRANSLATE_LATER = "translate_later"
+REVIEW = "review"
+SKIP = "skip"
+
+ENRICH_LANGUAGES = {"en"}
+# language -> prompt file for languages with their own prompt (none yet)
+ALTERNATE_PROMPTS = {}
+TRANSLATE_LATER_LANGUAGES = {"es", "pt", "fr", "de", "it", "nl"}
+
+LANGUAGE_LOG = "language_routing.json"
+
+MIN_LETTERS = 20
+# Per-n-gram log-likelihood margins (nats). Seeded languages score 0.2+ on
+# forum posts; Indonesian/Polish/Swedish/Turkish text scores under 0.06.
+OTHER_MARGIN = 0.06
+OVERRIDE_MARGIN = 0.15
+OVERRIDE_MIN_LETTERS = 60
+NGRAM_ORDERS = (1, 2, 3)
+UNKNOWN = None
+OTHER = "other"
+
+# ISO 639-2/3 and other source codes -> ISO 639-1
+CODE_ALIASES = {
+    "eng": "en", "spa": "es", "fra": "fr", "fre": "fr", "deu": "de", "ger": "de", "por": "pt",
+    "ita": "it", "nld": "nl", "dut": "nl", "rus": "ru", "ukr": "uk", "ara": "ar", "heb": "he",
+    "ell": "el", "gre": "el", "zho": "zh", "chi": "zh", "jpn": "ja", "kor": "ko", "hin": "hi",
+    "tha": "th", "pol": "pl", "swe": "sv", "tur": "tr",
+    "unl": UNKNOWN, "und": UNKNOWN, "unk": UNKNOWN, "string": UNKNOWN, "": UNKNOWN,
+}
+
+# Script -> language for scripts used (almost) only by one language in our sources
+SCRIPT_LANGUAGES = {
+    "CYRILLIC": "ru", "ARABIC": "ar", "HEBREW": "he", "GREEK": "el", "HANGUL": "ko",
+    "HIRAGANA": "ja", "KATAKANA": "ja", "CJK": "zh", "DEVANAGARI": "hi", "THAI": "th",
+}
+
+# Short health-forum style seed texts per Latin-script language
+SEED_TEXTS = {
+    "en": "I had gastric bypass surgery two years ago and now my blood sugar drops after eating. "
+          "I feel shaky, sweaty and dizzy about an hour after meals. My doctor thinks it is "
+          "post-bariatric hypoglycemia. Has anyone else had this? What helped you? I am trying to "
+          "eat more protein and fewer carbs but it is still happening. The endocrinologist wants me "
+          "to wear a glucose monitor for two weeks. I was so tired and I could not work. Thank you "
+          "for sharing your story, it really helps to know that I am not alone with this.",
+    "es": "Me hicieron un bypass gástrico hace dos años y ahora el azúcar en la sangre me baja "
+          "después de comer. Me siento tembloroso, sudoroso y mareado una hora después de las "
+          "comidas. Mi médico piensa que es hipoglucemia posbariátrica. ¿Alguien más ha tenido "
+          "esto? ¿Qué les ayudó? Estoy intentando comer más proteína y menos carbohidratos pero "
+          "sigue pasando. El endocrinólogo quiere que use un monitor de glucosa durante dos "
+          "semanas. Estaba muy cansada y no podía trabajar. Gracias por compartir su historia.",
+    "pt": "Fiz a cirurgia de bypass gástrico há dois anos e agora o meu açúcar no sangue cai depois "
+          "de comer. Fico trêmula, suada e tonta cerca de uma hora depois das refeições. O meu "
+          "médico acha que é hipoglicemia pós-bariátrica. Mais alguém já teve isso? O que ajudou "
+          "vocês? Estou tentando comer mais proteína e menos carboidratos mas ainda acontece. O "
+          "endocrinologista quer que eu use um sensor de glicose por duas semanas. Eu estava tão "
+          "cansada que não conseguia trabalhar. Obrigada por compartilhar a sua história.",
+    "fr": "J'ai eu un bypass gastrique il y a deux ans et maintenant ma glycémie chute après les "
+          "repas. Je me sens tremblante, en sueur et j'ai des vertiges environ une heure après "
+          "avoir mangé. Mon médecin pense que c'est une hypoglycémie post-bariatrique. Quelqu'un "
+          "d'autre a-t-il vécu cela? Qu'est-ce qui vous a aidé? J'essaie de manger plus de "
+          "protéines et moins de glucides mais cela continue. L'endocrinologue veut que je porte un "
+          "capteur de glucose pendant deux semaines. J'étais tellement fatiguée que je ne pouvais "
+          "pas travailler. Merci de partager votre histoire.",
+    "de": "Ich hatte vor zwei Jahren eine Magenbypass-Operation und jetzt fällt mein Blutzucker "
+          "nach dem Essen ab. Ich fühle mich zittrig, verschwitzt und schwindelig etwa eine Stunde "
+          "nach den Mahlzeiten. Mein Arzt glaubt, dass es eine postbariatrische Hypoglykämie ist. "
+          "Hat das noch jemand erlebt? Was hat euch geholfen? Ich versuche mehr Eiweiß und weniger "
+          "Kohlenhydrate zu essen, aber es passiert immer noch. Der Endokrinologe möchte, dass ich "
+          "zwei Wochen lang einen Glukosesensor trage. Ich war so müde und konnte nicht arbeiten. "
+          "Danke, dass du deine Geschichte teilst.",
+    "it": "Ho fatto un bypass gastrico due anni fa e adesso la glicemia mi scende dopo aver "
+          "mangiato. Mi sento tremante, sudata e con le vertigini circa un'ora dopo i pasti. Il mio "
+          "medico pensa che sia un'ipoglicemia post-bariatrica. Qualcun altro ha avuto questo "
+          "problema? Cosa vi ha aiutato? Sto cercando di mangiare più proteine e meno carboidrati "
+          "ma succede ancora. L'endocrinologo vuole che porti un sensore della glicemia per due "
+          "settimane. Ero così stanca che non riuscivo a lavorare. Grazie per aver condiviso la "
+          "tua storia.",
+    "nl": "Ik heb twee jaar geleden een maagbypass gehad en nu daalt mijn bloedsuiker na het eten. "
+          "Ik voel me trillerig, bezweet en duizelig ongeveer een uur na de maaltijden. Mijn arts "
+          "denkt dat het een postbariatrische hypoglykemie is. Heeft iemand anders dit ook gehad? "
+          "Wat heeft jullie geholpen? Ik probeer meer eiwitten en minder koolhydraten te eten maar "
+          "het gebeurt nog steeds. De endocrinoloog wil dat ik twee weken een glucosesensor draag. "
+          "Ik was zo moe dat ik niet kon werken. Bedankt voor het delen van je verhaal.",
+}
+
+_LETTERS_RE = re.compile(r"[^\W\d_]+")
+_URL_RE = re.compile(r"https?://\S+|www\.\S+|[@#]\w+")
+
+
+def normalize_code(code) -> str:
+    """Declared language code as ISO 639-1 (None when unknown)"""
+    if code is None:
+        return UNKNOWN
+    code = str(code).strip().lower().split("-")[0].split("_")[0]
+    if code in CODE_ALIASES:
+        return CODE_ALIASES[code]
+    return code if len(code) == 2 and code.isalpha() else UNKNOWN
+
+
+def _ngrams(text: str) -> Counter:
+    grams = Counter()
+    for word in _LETTERS_RE.findall(text.lower()):
+        padded = f" {word} "
+        for n in NGRAM_ORDERS:
+            for i in range(len(padded) - n + 1):
+                gram = padded[i:i + n]
+                if gram != " ":
+                    grams[gram] += 1
+    return grams
+
+
+def _script(ch: str):
+    name = unicodedata.name(ch, "")
+    if name.startswith("CJK"):
+        return "CJK"
+    word = name.split(" ")[0]
+    return word if word in SCRIPT_LANGUAGES else ("LATIN" if word == "LATIN" else None)
+
+
+class LanguageIdentifier:
+    """Character n-gram naive Bayes over SEED_TEXTS plus script detection"""
+
+    def __init__(self, seeds: dict = None):
+        self.languages = sorted((seeds or SEED_TEXTS))
+        self._log_probs = {}
+        self._unseen = {}
+        vocabulary = set()
+        counts = {}
+        for language in self.languages:
+            counts[language] = _ngrams((seeds or SEED_TEXTS)[language])
+            vocabulary.update(counts[language])
+        for language in self.languages:
+            total = sum(counts[language].values()) + len(vocabulary) + 1
+            self._log_probs[language] = {g: math.log((c + 1) / total) for g, c in counts[language].items()}
+            self._unseen[language] = math.log(1 / total)
+
+    def detect(self, text: str) -> tuple:
+        """(ISO 639-1 code, OTHER or None, margin)"""
+        language, margin, _ = self.detect_with_length(text)
+        return language, margin
+
+    def detect_with_length(self, text: str) -> tuple:
+        """
+        (ISO 639-1 code, OTHER or None, margin, letters scored). The margin is
+        per n-gram for Latin text and the script's share of letters otherwise.
+        """
+        text = _URL_RE.sub(" ", text or "")
+        letters = "".join(_LETTERS_RE.findall(text))
+        if len(letters) < MIN_LETTERS:
+            return UNKNOWN, 0.0, len(letters)
+
+        scripts = Counter(_script(ch) for ch in letters)
+        scripts.pop(None, None)
+        if scripts:
+            script, count = scripts.most_common(1)[0]
+            if script != "LATIN" and count / len(letters) >= 0.5:
+                # Kana marks Japanese even when Han characters dominate
+                if script == "CJK" and (scripts["HIRAGANA"] or scripts["KATAKANA"]):
+                    return "ja", count / len(letters), len(letters)
+                return SCRIPT_LANGUAGES[script], count / len(letters), len(letters)
+
+        grams = _ngrams(text)
+        scores = {}
+        for language in self.languages:
+            table, unseen = self._log_probs[language], self._unseen[language]
+            scores[language] = sum(table.get(g, unseen) * c for g, c in grams.items())
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        margin = (scores[ranked[0]] - scores[ranked[1]]) / max(1, sum(grams.values()))
+        if margin < OTHER_MARGIN:
+            return OTHER, margin, len(letters)
+        return ranked[0], margin, len(letters)
+
+
+def route_for(language) -> str:
+    if language is UNKNOWN or language in ENRICH_LANGUAGES:
+        return ENRICH
+    if language == OTHER:
+        return REVIEW
+    if language in ALTERNATE_PROMPTS:
+        return ALTERNATE_PROMPT
+    if language in TRANSLATE_LATER_LANGUAGES:
+        return TRANSLATE_LATER
+    return SKIP
+
+
+class LanguageRouter:
+    """Fills/verifies `language` and assigns each post a route"""
+
+    def __init__(self, identifier: LanguageIdentifier = None, override_margin: float = OVERRIDE_MARGIN):
+        self.identifier = identifier or LanguageIdentifier()
+        self.override_margin = override_margin
+
+    def resolve(self, post: dict) -> dict:
+        """Routing record: declared, detected, margin, language, action, route"""
+        declared = normalize_code(post.get("language"))
+        detected, margin, letters = self.identifier.detect_with_length(post_text(post))
+        route = None
+        if detected is UNKNOWN:
+            language, action = declared, "kept"
+        elif detected == OTHER:
+            # No seed language fits; keep any declared code but send for review
+            language, action, route = declared, "uncertain", REVIEW
+        elif declared is UNKNOWN:
+            language, action = detected, "filled"
+        elif (detected != declared and margin >= self.override_margin
+              and letters >= OVERRIDE_MIN_LETTERS):
+            language, action = detected, "corrected"
+        else:
+            language, action = declared, "verified" if detected == declared else "kept"
+        return {
+            "source_id": post.get("source_id"),
+            "declared": post.get("language"),
+            "detected": detected,
+            "margin": round(margin, 3),
+            "language": language,
+            "action": action,
+            "route": route or route_for(language),
+        }
+
+    def route_batch(self, posts: list) -> tuple:
+        """
+        Returns ({route: [post, ...]}, [routing record]). Posts get the
+        resolved ISO 639-1 `language` (the source value when undetermined).
+        """
+        queues = {ENRICH: [], ALTERNATE_PROMPT: [], TRANSLATE_LATER: [], REVIEW: [], SKIP: []}
+        records = []
+        for post in posts:
+            record = self.resolve(post)
+            if record["language"] is not UNKNOWN:
+                post = {**post, "language": record["language"]}
+            queues[record["route"]].append(post)
+            records.append(record)
+        return queues, records
+
+
+def print_routing(records: list):
+    print(f"\n{'='*70}")
+    print(f"  LANGUAGE ROUTING (n={len(records)})")
+    print(f"{'='*70}")
+    for name, counts in (("Route", Counter(r["route"] for r in records)),
+                         ("Action", Counter(r["action"] for r in records)),
+                         ("Language", Counter(str(r["language"]) for r in records))):
+        print(f"  {name + ':':<10} " + ", ".join(f"{k} {v}" for k, v in counts.most_common()))
+    for r in records:
+        if r["action"] == "corrected" or r["route"] != ENRICH:
+            print(f"    {str(r['source_id']):<20} declared {str(r['declared']):<6} detected {str(r['detected']):<4} "
+                  f"({r['margin']:.2f}) → {r['route']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local language identification and routing")
+    parser.add_argument("--text", help="Detect a single text")
+    parser.add_argument("--input", type=Path, help="Directory of normalized posts")
+    parser.add_argument("--csv", type=Path, help="CSV export with text/title/language columns")
+    parser.add_argument("--output", type=Path, help="Write routing records as JSON")
+    args = parser.parse_args()
+
+    if not (args.text or args.input or args.csv):
+        print("❌ Must specify --text, --input or --csv")
+        sys.exit(1)
+
+    router = LanguageRouter()
+    if args.text:
+        language, margin = router.identifier.detect(args.text)
+        print(f"  {language} ({margin:.2f}) → {route_for(language)}")
+        return
+
+    posts = []
+    if args.input:
+        for path in sorted(args.input.glob("*.json")):
+            with open(path, 'r') as f:
+                posts.append(json.load(f))
+    if args.csv:
+        with open(args.csv, 'r', encoding='utf-8', errors='replace', newline='') as f:
+            posts.extend(csv.DictReader(f))
+
+    _, records = router.route_batch(posts)
+    print_routing(records)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(records, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+PBH SIGNAL - Local Faceted Search Stand-in
+
+In-process stand-in for the chatbot's search backend (Algolia, see
+chatbot/algolia_search_config.md). Implements the small surface the pipeline
+needs so sync and retrieval code can be exercised without network access:
+
+- save_objects(index, objects)      upsert by objectID
+- delete_objects(index, object_ids)
+- clear_index(index)
+- delete_index(index)
+- move_index(source, destination)   atomic rename, replacing destination
+- search(index, query, facet_filters, number_of_results)
+
+facet_filters follow Algolia syntax: top-level entries are ANDed, nested
+lists are ORed, e.g. [["symptoms:shakiness", "symptoms:dizziness"], "audience_label:community"].
+"""
+
+import json
+import threading
+from pathlib import Path
+
+
+class SearchBackend:
+    """Interface implemented by search backends used for sync and retrieval"""
+
+    def save_objects(self, index: str, objects: list) -> dict:
+        raise NotImplementedError
+
+    def delete_objects(self, index: str, object_ids: list) -> dict:
+        raise NotImplementedError
+
+    def clear_index(self, index: str):
+        raise NotImplementedError
+
+    def delete_index(self, index: str):
+        raise NotImplementedError
+
+    def move_index(self, source: str, destination: str):
+        raise NotImplementedError
+
+    def search(self, index: str, query: str = "", facet_filters: list = None,
+               number_of_results: int = 20) -> dict:
+        raise NotImplementedError
+
+
+class LocalSearchBackend(SearchBackend):
+    """Dict-backed search backend, optionally persisted to <data_dir>/<index>.json"""
+
+    SEARCH_FIELDS = ['title', 'text', 'key_phrases']
+
+    def __init__(self, data_dir: Path = None):
+        self.data_dir = Path(data_dir) if data_dir else None
+        self.indices = {}
+        self.calls = {"save_objects": 0, "delete_objects": 0, "search": 0}
+        self._lock = threading.Lock()
+
+    def _index(self, name: str) -> dict:
+        if name not in self.indices:
+            self.indices[name] = self._read(name)
+        return self.indices[name]
+
+    def _path(self, name: str) -> Path:
+        return self.data_dir / f"{name}.json"
+
+    def _read(self, name: str) -> dict:
+        if self.data_dir is None or not self._path(name).exists():
+            return {}
+        with open(self._path(name), 'r') as f:
+            return json.load(f)
+
+    def _write(self, name: str):
+        if self.data_dir is None:
+            return
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path(name).with_suffix(".json.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.indices.get(name, {}), f, ensure_ascii=False)
+        tmp_path.replace(self._path(name))
+
+    def save_objects(self, index: str, objects: list) -> dict:
+        with self._lock:
+            self.calls["save_objects"] += 1
+            records = self._index(index)
+            for obj in objects:
+                object_id = obj.get("objectID")
+                if not object_id:
+                    raise ValueError("Object is missing objectID")
+                records[object_id] = obj
+            self._write(index)
+            return {"objectIDs": [obj["objectID"] for obj in objects]}
+
+    def delete_objects(self, index: str, object_ids: list) -> dict:
+        with self._lock:
+            self.calls["delete_objects"] += 1
+            records = self._index(index)
+            for object_id in object_ids:
+                records.pop(object_id, None)
+            self._write(index)
+            return {"objectIDs": list(object_ids)}
+
+    def clear_index(self, index: str):
+        with self._lock:
+            self.indices[index] = {}
+            self._write(index)
+
+    def delete_index(self, index: str):
+        with self._lock:
+            self.indices.pop(index, None)
+            if self.data_dir is not None and self._path(index).exists():
+                self._path(index).unlink()
+
+    def move_index(self, source: str, destination: str):
+        with self._lock:
+            self.indices[destination] = self._index(source)
+            self.indices.pop(source, None)
+            if self.data_dir is not None:
+                self._write(destination)
+                if self._path(source).exists():
+                    self._path(source).unlink()
+
+    def count(self, index: str) -> int:
+        with self._lock:
+            return len(self._index(index))
+
+    def get_object(self, index: str, object_id: str) -> dict:
+        with self._lock:
+            return self._index(index).get(object_id)
+
+    def search(self, index: str, query: str = "", facet_filters: list = None,
+               number_of_results: int = 20) -> dict:
+        with self._lock:
+            self.calls["search"] += 1
+            records = list(self._index(index).values())
+
+        terms = [t for t in (query or "").lower().split() if t]
+        hits = []
+        for record in records:
+            if facet_filters and not matches_facet_filters(record, facet_filters):
+                continue
+            if terms:
+                haystack = " ".join(_as_text(record.get(f)) for f in self.SEARCH_FIELDS).lower()
+                if not all(t in haystack for t in terms):
+                    continue
+            hits.append(record)
+
+        return {"nbHits": len(hits), "hits": hits[:number_of_results]}
+
+
+def matches_facet_filters(record: dict, facet_filters: list) -> bool:
+    """Evaluate Algolia-style facet_filters (AND of entries, OR within nested lists)"""
+    for clause in facet_filters:
+        if isinstance(clause, list):
+            if not any(_matches_one(record, expr) for expr in clause):
+                return False
+        elif not _matches_one(record, clause):
+            return False
+    return True
+
+
+def _matches_one(record: dict, expr: str) -> bool:
+    negate = expr.startswith("-")
+    field, _, value = expr.lstrip("-").partition(":")
+    actual = record.get(field)
+    if isinstance(actual, list):
+        hit = value in actual
+    else:
+        hit = actual is not None and str(actual) == value
+    return hit != negate
+
+
+def _as_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return " ".join(str(v) for v in value)
+    return str(value)
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Prompt/Schema Registry
+
+Every system prompt and response schema under the configured versions'
+enrichment directories (pbh_signal.config), addressed by name and by
+content hash:
+
+- name:  from the filename, e.g. openai_assistant_system_prompt_v6.1_with_dictionary.md
+         -> "v6.1_with_dictionary"; openai_assistant_response_format_v7_safety.json
+         -> "v7_safety"
+- ref:   a name, a filename, a prefix of a name ("v6.1", "v5.3.4"), a
+         config version ("v7" -> that version's configured prompt/schema) or
+         a SHA-256 prefix of at least 8 hex characters
+
+For each (prompt, schema, model, temperature) the registry builds one
+immutable RequestTemplate the first time it is asked for: system message,
+response_format and model params are frozen, so building the request for a
+post only splices the post payload into the user message. Template
+metadata (names, hashes, template_id) is what cache keys and run telemetry
+should record instead of file paths. When a version embeds its dictionary
+into the prompt (v5), prompt_sha256 and template_id hash the prompt as
+sent, and the dictionary file and its hash are recorded alongside.
+
+Usage:
+    python -m pbh_signal.prompt_registry list
+    python -m pbh_signal.prompt_registry show v7 [--schema v7_safety]
+    python -m pbh_signal.prompt_registry bench [--posts 2000]
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+from pbh_signal.config import VERSIONS
+
+USER_PREFIX = "Process this normalized post and return enriched JSON:\n\n"
+
+PROMPT_GLOB = "*system_prompt*.md"
+SCHEMA_GLOB = "*response_format*.json"
+
+# Minimum hex characters for a hash-prefix reference
+MIN_HASH_PREFIX = 8
+
+_NAME_RE = re.compile(r"_(v\d+(?:\.\d+)*(?:_[A-Za-z0-9]+)*)$")
+
+
+class FrozenDict(dict):
+    """Read-only dict; still a dict, so json and HTTP clients serialize it as-is"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("request templates are immutable")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+    __ior__ = _readonly
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def freeze(value):
+    """Recursively convert dicts to FrozenDict and lists to tuples"""
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def artifact_name(path: Path) -> str:
+    """Registry name from a prompt/schema filename"""
+    match = _NAME_RE.search(Path(path).stem)
+    return match.group(1) if match else Path(path).stem
+
+
+def embed_dictionary(prompt: str, dictionary: str) -> str:
+    """v5: replace the File Search reference and append the dictionary to the prompt"""
+    prompt = prompt.replace(
+        "Dictionary-based entity extraction using PBH SIGNAL DICTIONARY (File Search)",
+        "Dictionary-based entity extraction using PBH SIGNAL DICTIONARY (embedded below)"
+    )
+    prompt += "\n\n" + "=" * 80 + "\n"
+    prompt += "PBH SIGNAL DICTIONARY (FOR ENTITY EXTRACTION)\n"
+    prompt += "=" * 80 + "\n\n"
+    return prompt + dictionary
+
+
+def _sha256(data: str) -> str:
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class RequestTemplate:
+    """Immutable chat.completions request for one prompt/schema/model/temperature"""
+
+    def __init__(self, prompt: dict, schema: dict, model: str, temperature: float,
+                 user_prefix: str = USER_PREFIX):
+        self._system_message = freeze({"role": "system", "content": prompt["content"]})
+        response_format = schema["content"]
+        if "type" not in response_format:
+            response_format = {"type": "json_schema", "json_schema": response_format}
+        self._response_format = freeze(response_format)
+        self._params = FrozenDict(model=model, temperature=temperature)
+        self._user_prefix = user_prefix
+        self._prompt = prompt
+        self._schema = schema
+
+        template_id = _sha256(json.dumps([prompt["sha256"], schema["sha256"], model, temperature, user_prefix]))[:16]
+        self._metadata = FrozenDict(
+            template_id=template_id,
+            prompt=prompt["name"],
+            prompt_file=prompt["file"],
+            prompt_sha256=prompt["sha256"],
+            schema=schema["name"],
+            schema_file=schema["file"],
+            schema_sha256=schema["sha256"],
+            dictionary=prompt.get("dictionary"),
+            dictionary_sha256=prompt.get("dictionary_sha256"),
+            model=model,
+            temperature=temperature,
+        )
+
+    @property
+    def metadata(self) -> FrozenDict:
+        """Version metadata for cache keys and telemetry"""
+        return self._metadata
+
+    @property
+    def template_id(self) -> str:
+        return self._metadata["template_id"]
+
+    @property
+    def system_prompt(self) -> str:
+        return self._system_message["content"]
+
+    @property
+    def response_format(self) -> FrozenDict:
+        return self._response_format
+
+    @property
+    def json_schema(self) -> dict:
+        """The response schema, unwrapped (name/strict/schema)"""
+        return self._response_format["json_schema"]
+
+    def request(self, post: dict, followup: list = None, **params) -> dict:
+        """Keyword arguments for client.chat.completions.create; params override model/temperature or add n/stream"""
+        messages = [self._system_message,
+                    {"role": "user", "content": f"{self._user_prefix}{json.dumps(post, indent=2)}"}]
+        if followup:
+            messages.extend(followup)
+        return {**self._params, **params, "messages": messages, "response_format": self._response_format}
+
+    def cache_key(self, post: dict, **params) -> str:
+        """Response cache key: template_id + request params + canonical post payload"""
+        return _sha256(json.dumps([self.template_id, params, post], sort_keys=True, ensure_ascii=False))
+
+    def derive(self, schema: dict = None, model: str = None, temperature: float = None) -> "RequestTemplate":
+        """Template with an in-memory schema variant (e.g. reordered or with fields dropped) or other params"""
+        derived = self._schema
+        if schema is not None:
+            text = json.dumps(schema, sort_keys=True)
+            sha = _sha256(text)
+            derived = {"kind": "schema", "name": f"{self._schema['name']}~{sha[:8]}", "file": None,
+                       "sha256": sha, "content": schema}
+        return RequestTemplate(self._prompt, derived,
+                               model if model is not None else self._params["model"],
+                               temperature if temperature is not None else self._params["temperature"],
+                               self._user_prefix)
+
+
+class PromptRegistry:
+    """Prompts and schemas of all configured versions, by name and content hash"""
+
+    def __init__(self, versions: dict = None):
+        self.versions = versions if versions is not None else VERSIONS
+        self.prompts = {}           # name -> artifact
+        self.schemas = {}
+        self._templates = {}        # (prompt sha, schema sha, model, temperature, prefix) -> RequestTemplate
+        self._dictionaries = {}     # path -> (text, sha256) of dictionaries embedded into prompts
+        seen = set()
+        for version, config in self.versions.items():
+            enrichment_dir = config["enrichment_dir"]
+            if enrichment_dir in seen:
+                continue
+            seen.add(enrichment_dir)
+            for path in sorted(enrichment_dir.glob(PROMPT_GLOB)):
+                self._add(self.prompts, "prompt", path, version, path.read_text(encoding="utf-8"))
+            for path in sorted(enrichment_dir.glob(SCHEMA_GLOB)):
+                with open(path, 'r') as f:
+                    content = json.load(f)
+                self._add(self.schemas, "schema", path, version, content)
+
+    def _add(self, table: dict, kind: str, path: Path, version: str, content):
+        raw = path.read_bytes()
+        table[artifact_name(path)] = {
+            "kind": kind,
+            "name": artifact_name(path),
+            "file": path.name,
+            "path": path,
+            "version": version,
+            "sha256": hashlib.sha256(raw).hexdigest(),
+            "content": content,
+        }
+
+    def _resolve(self, table: dict, kind: str, ref: str) -> dict:
+        if ref.endswith((".md", ".json")):
+            # Filenames must name an existing file, never a version's configured one
+            for artifact in table.values():
+                if artifact["file"] == Path(ref).name:
+                    return artifact
+            raise KeyError(f"Unknown {kind} file {ref!r} (known: {', '.join(sorted(a['file'] for a in table.values()))})")
+        if ref in table:
+            return table[ref]
+        if ref in self.versions:
+            return table[artifact_name(self.versions[ref][kind])]
+        if len(ref) >= MIN_HASH_PREFIX and re.fullmatch(r"[0-9a-f]+", ref):
+            matches = [a for a in table.values() if a["sha256"].startswith(ref)]
+            if len(matches) == 1:
+                return matches[0]
+        matches = sorted((a for a in table.values() if a["name"].startswith(f"{ref}_")), key=lambda a: len(a["name"]))
+        if matches:
+            return matches[0]
+        raise KeyError(f"Unknown {kind} {ref!r} (known: {', '.join(sorted(table))})")
+
+    def prompt(self, ref: str) -> dict:
+        return self._resolve(self.prompts, "prompt", ref)
+
+    def schema(self, ref: str) -> dict:
+        return self._resolve(self.schemas, "schema", ref)
+
+    def template(self, prompt: str, schema: str = None, model: str = None,
+                 temperature: float = None, user_prefix: str = None) -> RequestTemplate:
+        """
+        Request template for a prompt/schema pair, built once and reused.
+        schema/model/temperature default to those configured for the
+        version the prompt belongs to.
+        """
+        prompt_artifact = self.prompt(prompt)
+        config = self.versions[prompt if prompt in self.versions else prompt_artifact["version"]]
+        schema_artifact = self.schema(schema or artifact_name(config["schema"]))
+        model = model if model is not None else config["model"]
+        temperature = temperature if temperature is not None else config["temperature"]
+        user_prefix = user_prefix if user_prefix is not None else config.get("user_prefix", USER_PREFIX)
+
+        if config.get("dictionary") and prompt_artifact["file"] == config["prompt"]:
+            # The embedded prompt is what is sent, so it is what the template is hashed on
+            dictionary, dictionary_sha = self._dictionary(config["enrichment_dir"] / config["dictionary"])
+            content = embed_dictionary(prompt_artifact["content"], dictionary)
+            prompt_artifact = {**prompt_artifact, "content": content, "sha256": _sha256(content),
+                               "dictionary": config["dictionary"], "dictionary_sha256": dictionary_sha}
+
+        key = (prompt_artifact["sha256"], schema_artifact["sha256"], model, temperature, user_prefix)
+        if key not in self._templates:
+            self._templates[key] = RequestTemplate(prompt_artifact, schema_artifact, model, temperature, user_prefix)
+        return self._templates[key]
+
+    def _dictionary(self, path: Path) -> tuple:
+        """(text, sha256) of a dictionary file, read once"""
+        if path not in self._dictionaries:
+            raw = path.read_bytes()
+            self._dictionaries[path] = (raw.decode("utf-8"), hashlib.sha256(raw).hexdigest())
+        return self._dictionaries[path]
+
+
+_registry = None
+
+
+def get_registry() -> PromptRegistry:
+    """Process-wide registry (files are read and hashed once)"""
+    global _registry
+    if _registry is None:
+        _registry = PromptRegistry()
+    return _registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt/schema registry and request templates")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="List registered prompts and schemas")
+    show = sub.add_parser("show", help="Show a request template's metadata")
+    show.add_argument("prompt", help="Prompt ref (name, prefix, version or hash prefix)")
+    show.add_argument("--schema", help="Schema ref (default: the version's configured schema)")
+    show.add_argument("--model")
+    show.add_argument("--temperature", type=float)
+    bench = sub.add_parser("bench", help="Request building: template vs re-reading files per post")
+    bench.add_argument("--prompt", default="v7")
+    bench.add_argument("--posts", type=int, default=2000)
+    args = parser.parse_args()
+
+    registry = get_registry()
+    try:
+        if args.command == "list":
+            print(f"\n{'='*70}")
+            print(f"  PROMPT/SCHEMA REGISTRY")
+            print(f"{'='*70}")
+            for title, table in (("Prompts", registry.prompts), ("Schemas", registry.schemas)):
+                print(f"\n  {title}:")
+                for name, artifact in table.items():
+                    print(f"    {name:<28} {artifact['version']:<4} {artifact['sha256'][:12]}  {artifact['file']}")
+        elif args.command == "show":
+            template = registry.template(args.prompt, args.schema, args.model, args.temperature)
+            print(json.dumps(dict(template.metadata), indent=2))
+            print(f"  system prompt: {len(template.system_prompt):,} chars")
+        else:
+            template = registry.template(args.prompt)
+            post = {"source_id": "t3_bench", "title": "Bench post", "text": "Low blood sugar after eating " * 40}
+            prompt_path = template.metadata["prompt_file"]
+            config = next(c for c in VERSIONS.values() if (c["enrichment_dir"] / prompt_path).exists())
+
+            started = time.perf_counter()
+            for _ in range(args.posts):
+                system_prompt = (config["enrichment_dir"] / prompt_path).read_text(encoding="utf-8")
+                with open(config["enrichment_dir"] / template.metadata["schema_file"], 'r') as f:
+                    schema = json.load(f)
+                {"model": template.metadata["model"], "temperature": template.metadata["temperature"],
+                 "messages": [{"role": "system", "content": system_prompt},
+                              {"role": "user", "content": f"{USER_PREFIX}{json.dumps(post, indent=2)}"}],
+                 "response_format": {"type": "json_schema", "json_schema": schema}}
+            rebuilt = (time.perf_counter() - started) / args.posts
+
+            started = time.perf_counter()
+            for _ in range(args.posts):
+                template.request(post)
+            templated = (time.perf_counter() - started) / args.posts
+
+            print(f"\n{'='*70}")
+            print(f"  REQUEST BUILD ({args.posts} posts, template {template.template_id})")
+            print(f"{'='*70}")
+            print(f"  Files per post:  {rebuilt*1e6:>9.1f} µs/request")
+            print(f"  Template:        {templated*1e6:>9.1f} µs/request ({rebuilt/templated:.0f}x)")
+    except KeyError as e:
+        print(f"❌ {e.args[0]}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Helpers for reading enriched records produced by the runners.
+
+Enriched outputs are one JSON file per post, named <source_id>_enriched.json
+(see v6/v7 run_api_test.py). To hold many records in memory at once, use
+pbh_signal.compact_records.load_compact instead of a dict per record.
+"""
+
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+# Facet fields exposed to the chatbot search tool (chatbot/algolia_search_config.md)
+# plus the remaining enum fields from the v7 schema.
+LIST_FACETS = ['symptoms', 'conditions', 'treatments', 'companies', 'topics',
+               'themes', 'emotions', 'intent', 'flags']
+SCALAR_FACETS = ['audience_label', 'sentiment_label', 'engagement_label',
+                 'bariatric_context', 'relevance_label']
+FACET_FIELDS = LIST_FACETS + SCALAR_FACETS
+
+
+def iter_enriched_files(directory: Path) -> Iterator[Path]:
+    """Yield enriched JSON files in a directory, sorted by name"""
+    yield from sorted(Path(directory).glob("*_enriched.json"))
+
+
+def load_enriched(path: Path) -> dict:
+    """Load a single enriched record"""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def facet_values(record: dict, field: str) -> list:
+    """Return the values of a facet field as a deduplicated list"""
+    value = record.get(field)
+    if value is None or value == "":
+        return []
+    if isinstance(value, list):
+        return sorted(set(v for v in value if v is not None))
+    return [value]
+
+
+def parse_published_at(value: str) -> datetime:
+    """Parse published_at ("2025-12-05 02:52:56" or ISO 8601); None if unparseable"""
+    if not value:
+        return None
+    text = value.strip().replace("T", " ").rstrip("Z")
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text[:26], fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def week_bucket(published_at: str) -> str:
+    """ISO week bucket for a published_at value, e.g. "2025-W49" ("unknown" if missing)"""
+    dt = parse_published_at(published_at)
+    if dt is None:
+        return "unknown"
+    year, week, _ = dt.isocalendar()
+    return f"{year}-W{week:02d}"
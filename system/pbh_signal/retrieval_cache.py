@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Chatbot Retrieval Cache
+
+Caches search results for the chatbot's retrieval tool. Repeated analyst
+questions (e.g. L5 "Show me posts about shakiness") issue the same
+facet_filters queries many times; those are answered from memory instead of
+a search round trip.
+
+Keys are built from normalized facet filters (AND groups sorted, OR members
+sorted and deduplicated) plus normalized query text, index and result count,
+so ["audience_label:hcp", ["symptoms:b", "symptoms:a"]] and
+[["symptoms:a", "symptoms:b"], "audience_label:hcp"] share an entry.
+
+Entries expire after a TTL and the whole cache is dropped when the index
+sync token (pbh_signal.index_sync.SyncState.token) changes.
+
+Usage:
+    python -m pbh_signal.retrieval_cache --index signal_posts --repeat 3 \\
+        --filters '[["symptoms:shakiness", "symptoms:dizziness"]]'
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from pbh_signal.index_sync import DEFAULT_INDEX, DEFAULT_LOCAL_SEARCH_DIR, DEFAULT_STATE_DIR
+from pbh_signal.local_search import LocalSearchBackend, SearchBackend
+
+DEFAULT_TTL_SECONDS = 15 * 60
+DEFAULT_MAX_ENTRIES = 1024
+
+
+def normalize_facet_filters(facet_filters: list) -> list:
+    """Canonical form of Algolia-style facet_filters"""
+    if not facet_filters:
+        return []
+    groups = set()
+    for clause in facet_filters:
+        if isinstance(clause, (list, tuple)):
+            members = tuple(sorted({m.strip() for m in clause if m and m.strip()}))
+            if not members:
+                continue
+            groups.add(members[0] if len(members) == 1 else members)
+        elif clause and clause.strip():
+            groups.add(clause.strip())
+    # Strings and OR-groups sort together by their JSON encoding
+    return [list(g) if isinstance(g, tuple) else g
+            for g in sorted(groups, key=lambda g: json.dumps(g))]
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace"""
+    return " ".join((query or "").lower().split())
+
+
+def cache_key(index: str, query: str, facet_filters: list, number_of_results: int) -> str:
+    """Stable key for one retrieval call"""
+    payload = json.dumps([index, normalize_query(query), normalize_facet_filters(facet_filters),
+                          number_of_results], separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SyncTokenWatcher:
+    """Reads the index sync token, re-checking the state file at most every `interval` seconds"""
+
+    def __init__(self, state_path: Path, interval: float = 1.0):
+        self.state_path = Path(state_path)
+        self.interval = interval
+        self._checked_at = 0.0
+        self._mtime_ns = None
+        self._token = None
+        self._lock = threading.Lock()
+
+    def __call__(self) -> str:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked_at < self.interval:
+                return self._token
+            self._checked_at = now
+            try:
+                mtime_ns = self.state_path.stat().st_mtime_ns
+            except FileNotFoundError:
+                self._mtime_ns, self._token = None, None
+                return None
+            if mtime_ns != self._mtime_ns:
+                with open(self.state_path, 'r') as f:
+                    data = json.load(f)
+                self._token = f"{data.get('generation', 0)}:{data.get('high_water_mark', 0)}"
+                self._mtime_ns = mtime_ns
+            return self._token
+
+
+class RetrievalCache:
+    """LRU + TTL cache invalidated by the index sync token"""
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, version_fn=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version_fn = version_fn
+        self._entries = OrderedDict()   # key -> (stored_at, value)
+        self._version = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "invalidations": 0, "evictions": 0}
+
+    def _check_version(self):
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self._version:
+            if self._entries:
+                self.stats["invalidations"] += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key: str):
+        """Return a cached value or None"""
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key: str, value):
+        with self._lock:
+            self._check_version()
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def report(self) -> dict:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "hit_rate": self.hit_rate()}
+
+
+class CachedSearch:
+    """Retrieval tool wrapper: search backend behind a RetrievalCache"""
+
+    def __init__(self, backend: SearchBackend, index: str = DEFAULT_INDEX,
+                 cache: RetrievalCache = None):
+        self.backend = backend
+        self.index = index
+        self.cache = cache or RetrievalCache()
+
+    def search(self, query: str = "", facet_filters: list = None,
+               number_of_results: int = 20) -> dict:
+        key = cache_key(self.index, query, facet_filters, number_of_results)
+        result = self.cache.get(key)
+        if result is not None:
+            return result
+        result = self.backend.search(self.index, query=query,
+                                     facet_filters=normalize_facet_filters(facet_filters),
+                                     number_of_results=number_of_results)
+        self.cache.put(key, result)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exercise the retrieval cache against the local search stand-in")
+    parser.add_argument("--index", default=DEFAULT_INDEX)
+    parser.add_argument("--filters", default="[]", help="facet_filters as JSON")
+    parser.add_argument("--query", default="")
+    parser.add_argument("--results", type=int, default=30, help="number_of_results")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--local-dir", type=Path, default=DEFAULT_LOCAL_SEARCH_DIR)
+    args = parser.parse_args()
+
+    backend = LocalSearchBackend(data_dir=args.local_dir)
+    cache = RetrievalCache(version_fn=SyncTokenWatcher(DEFAULT_STATE_DIR / f"{args.index}.json"))
+    search = CachedSearch(backend, index=args.index, cache=cache)
+    facet_filters = json.loads(args.filters)
+
+    for i in range(args.repeat):
+        started = time.perf_counter()
+        result = search.search(args.query, facet_filters, args.results)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"[{i+1}/{args.repeat}] {result['nbHits']} hits in {elapsed_ms:.2f} ms")
+
+    report = cache.report()
+    print(f"\n  Hit rate: {report['hit_rate']*100:.1f}% "
+          f"({report['hits']} hits, {report['misses']} misses, {report['invalidations']} invalidations)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Evaluation Run History
+
+Records every evaluation run's per-case, per-field outcomes in a local
+SQLite warehouse (system/cache/run_history.sqlite), so cross-run questions
+are answered by indexed queries instead of re-running old comparisons:
+
+- "when did emotions regress?"            history / regressions --field emotions
+- "which cases flipped between v6.1 and v7?"  flips --from v6.1 --to v7
+
+Tables:
+- runs:      one row per recorded run - label (v6.1, v7, cascade...), run
+             date, prompt file + SHA-256, schema file + version + SHA-256,
+             model, temperature, output directory, Tier 1/Tier 2 totals
+- outcomes:  (run, case, field) -> tier, passed, expected and actual JSON;
+             indexed by field and by case
+
+Outcomes use the comparator of the compare_* scripts (cascade.compare_value:
+set equality for lists, equality otherwise) over the Tier 1 and Tier 2
+fields. compare_v7.py, v6 compare_v6_only.py and compare_all_sources.py
+record their runs with --record. Recording
+the same outputs (same files and contents) with the same prompt, schema,
+model and temperature again replaces the earlier run instead of adding a
+duplicate; a fresh run into the same directory is recorded as a new run.
+
+The hand-kept project-docs/ENRICHMENT_TEST_RESULTS.csv can be imported
+(one run per date/version/model/temperature, field "overall").
+
+Usage:
+    python -m pbh_signal.run_history record --label v7 --output-dir v7/testing/api_test_outputs/v7 \\
+        --expected v7/testing/expected_outputs --prompt v7/enrichment/openai_assistant_system_prompt_v7_with_dictionary.md \\
+        --schema v7/enrichment/openai_assistant_response_format_v7.json --model gpt-4o --temperature 0.1
+    python -m pbh_signal.run_history runs
+    python -m pbh_signal.run_history history --field emotions
+    python -m pbh_signal.run_history regressions --field emotions
+    python -m pbh_signal.run_history flips --from v6.1 --to v7 [--field emotions]
+    python -m pbh_signal.run_history import-csv --csv ../project-docs/ENRICHMENT_TEST_RESULTS.csv
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pbh_signal.cascade import TIER1_FIELDS, TIER2_FIELDS, compare_value
+from pbh_signal.records import iter_enriched_files, load_enriched
+
+BASE_DIR = Path(__file__).parent
+DEFAULT_DB_PATH = BASE_DIR.parent / "cache" / "run_history.sqlite"
+
+OVERALL_FIELD = "overall"
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id          INTEGER PRIMARY KEY,
+    label           TEXT NOT NULL,
+    run_date        TEXT NOT NULL,
+    recorded_at     TEXT NOT NULL,
+    prompt_file     TEXT,
+    prompt_hash     TEXT,
+    schema_file     TEXT,
+    schema_version  TEXT,
+    schema_hash     TEXT,
+    model           TEXT,
+    temperature     REAL,
+    output_dir      TEXT,
+    origin          TEXT NOT NULL,
+    cases           INTEGER NOT NULL,
+    tier1_pass      INTEGER,
+    tier2_pass      INTEGER,
+    fingerprint     TEXT UNIQUE
+);
+CREATE INDEX IF NOT EXISTS runs_label ON runs (label, run_date);
+CREATE INDEX IF NOT EXISTS runs_date ON runs (run_date);
+CREATE INDEX IF NOT EXISTS runs_prompt ON runs (prompt_hash);
+
+CREATE TABLE IF NOT EXISTS outcomes (
+    run_id    INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    case_id   TEXT NOT NULL,
+    field     TEXT NOT NULL,
+    tier      INTEGER NOT NULL,
+    passed    INTEGER NOT NULL,
+    expected  TEXT,
+    actual    TEXT,
+    PRIMARY KEY (run_id, case_id, field)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS outcomes_field ON outcomes (field, run_id, passed);
+CREATE INDEX IF NOT EXISTS outcomes_case ON outcomes (case_id, field, run_id);
+"""
+
+
+def file_sha256(path: Path) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def outputs_sha256(output_dir: Path) -> str:
+    """Hash of every enriched output (name + content) in a run directory"""
+    digest = hashlib.sha256()
+    for path in iter_enriched_files(output_dir):
+        digest.update(path.name.encode("utf-8"))
+        digest.update(bytes.fromhex(file_sha256(path)))
+    return digest.hexdigest()
+
+
+def schema_version(path: Path) -> str:
+    """Version from a schema filename, e.g. ..._format_v6.1.json -> "v6.1" """
+    match = re.search(r"_v(\d+(?:\.\d+)*)", Path(path).stem)
+    return f"v{match.group(1)}" if match else Path(path).stem
+
+
+def _json(value) -> str:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+
+def connect(path: Path = DEFAULT_DB_PATH) -> sqlite3.Connection:
+    """Open (and create if needed) the warehouse"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(SCHEMA_SQL)
+    return conn
+
+
+def case_outcomes(output_dir: Path, expected_dir: Path) -> list:
+    """[(case_id, field, tier, passed, expected, actual)] for every expected case with an output"""
+    rows = []
+    for expected_path in iter_enriched_files(expected_dir):
+        actual_path = Path(output_dir) / expected_path.name
+        if not actual_path.exists():
+            continue
+        case_id = expected_path.stem.replace('_enriched', '')
+        expected, actual = load_enriched(expected_path), load_enriched(actual_path)
+        for tier, fields in ((1, TIER1_FIELDS), (2, TIER2_FIELDS)):
+            for field in fields:
+                exp, act = expected.get(field), actual.get(field)
+                rows.append((case_id, field, tier, int(compare_value(exp, act)), _json(exp), _json(act)))
+    return rows
+
+
+def _insert_run(conn: sqlite3.Connection, run: dict, rows: list) -> int:
+    """Insert a run and its outcomes, replacing a run with the same fingerprint"""
+    with conn:
+        conn.execute("DELETE FROM runs WHERE fingerprint = ?", (run["fingerprint"],))
+        columns = ", ".join(run)
+        cursor = conn.execute(f"INSERT INTO runs ({columns}) VALUES ({', '.join('?' * len(run))})",
+                              tuple(run.values()))
+        run_id = cursor.lastrowid
+        conn.executemany("INSERT INTO outcomes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         [(run_id, *row) for row in rows])
+    return run_id
+
+
+def record_run(conn: sqlite3.Connection, label: str, output_dir: Path, expected_dir: Path,
+               prompt: Path = None, schema: Path = None, model: str = None,
+               temperature: float = None, run_date: str = None, origin: str = "record") -> dict:
+    """Compare a run directory against expected outputs and store every (case, field) outcome"""
+    rows = case_outcomes(output_dir, expected_dir)
+    if not rows:
+        raise ValueError(f"No outputs in {output_dir} match expected cases in {expected_dir}")
+    if run_date is None:
+        # The run happened when its outputs were written
+        newest = max(p.stat().st_mtime for p in iter_enriched_files(output_dir))
+        run_date = datetime.fromtimestamp(newest, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+    cases = {}
+    for case_id, _, tier, passed, _, _ in rows:
+        t1, t2 = cases.get(case_id, (True, True))
+        cases[case_id] = (t1 and (tier != 1 or bool(passed)), t2 and (tier != 2 or bool(passed)))
+
+    run = {
+        "label": label,
+        "run_date": run_date,
+        "recorded_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        "prompt_file": Path(prompt).name if prompt else None,
+        "prompt_hash": file_sha256(prompt) if prompt else None,
+        "schema_file": Path(schema).name if schema else None,
+        "schema_version": schema_version(schema) if schema else None,
+        "schema_hash": file_sha256(schema) if schema else None,
+        "model": model,
+        "temperature": temperature,
+        "output_dir": str(Path(output_dir).resolve()),
+        "origin": origin,
+        "cases": len(cases),
+        "tier1_pass": sum(t1 for t1, _ in cases.values()),
+        "tier2_pass": sum(t2 for _, t2 in cases.values()),
+    }
+    # Same directory re-recorded after a fresh run is a new run; only identical outputs replace one
+    identity = [run[k] for k in ("label", "output_dir", "prompt_hash", "schema_hash", "model", "temperature")]
+    identity.append(outputs_sha256(output_dir))
+    run["fingerprint"] = hashlib.sha256(_json(identity).encode("utf-8")).hexdigest()
+    run["run_id"] = _insert_run(conn, run, rows)
+    return run
+
+
+def import_results_csv(conn: sqlite3.Connection, path: Path) -> list:
+    """Import the hand-kept ENRICHMENT_TEST_RESULTS.csv: one run per date/version/model/temperature"""
+    groups = {}
+    with open(path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+        for row in csv.DictReader(f):
+            if not row.get("Test_Case"):
+                continue
+            key = (row["Date"], row["Version"], row["Model"], row["Temperature"])
+            groups.setdefault(key, []).append(row)
+
+    runs = []
+    for (run_date, version, model, temperature), rows in groups.items():
+        outcomes = {}
+        for row in rows:
+            # PARTIAL counts as a fail; the latest row for a case wins
+            outcomes[row["Test_Case"]] = (row["Test_Case"], OVERALL_FIELD, 0,
+                                          int(row["Pass_Fail"].strip().upper() == "PASS"),
+                                          None, _json(row["Pass_Fail"].strip()))
+        run = {
+            "label": version,
+            "run_date": run_date,
+            "recorded_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+            "model": model,
+            "temperature": float(temperature) if temperature else None,
+            "origin": f"csv:{Path(path).name}",
+            "cases": len(outcomes),
+        }
+        identity = [run[k] for k in ("label", "run_date", "model", "temperature", "origin")]
+        run["fingerprint"] = hashlib.sha256(_json(identity).encode("utf-8")).hexdigest()
+        run["run_id"] = _insert_run(conn, run, list(outcomes.values()))
+        runs.append(run)
+    return runs
+
+
+# ----------------------------------------------------------------------
+# Queries
+# ----------------------------------------------------------------------
+
+def list_runs(conn: sqlite3.Connection, label: str = None) -> list:
+    sql = "SELECT * FROM runs" + (" WHERE label = ?" if label else "") + " ORDER BY run_date, run_id"
+    return [dict(r) for r in conn.execute(sql, (label,) if label else ())]
+
+
+def field_history(conn: sqlite3.Connection, field: str) -> list:
+    """Pass rate of one field per run, oldest first"""
+    return [dict(r) for r in conn.execute(
+        """SELECT r.run_id, r.label, r.run_date, r.model, r.temperature, r.prompt_hash,
+                  SUM(o.passed) AS passed, COUNT(*) AS cases
+           FROM outcomes o JOIN runs r USING (run_id)
+           WHERE o.field = ?
+           GROUP BY r.run_id ORDER BY r.run_date, r.run_id""", (field,))]
+
+
+def flips(conn: sqlite3.Connection, from_run: int, to_run: int, field: str = None) -> list:
+    """(case, field) outcomes that changed between two runs"""
+    sql = """SELECT a.case_id, a.field, a.tier, a.passed AS before, b.passed AS after,
+                    a.actual AS before_actual, b.actual AS after_actual, b.expected
+             FROM outcomes a JOIN outcomes b
+               ON b.run_id = ? AND b.case_id = a.case_id AND b.field = a.field
+             WHERE a.run_id = ? AND a.passed != b.passed"""
+    params = [to_run, from_run]
+    if field:
+        sql += " AND a.field = ?"
+        params.append(field)
+    return [dict(r) for r in conn.execute(sql + " ORDER BY a.tier, a.field, a.case_id", params)]
+
+
+def regressions(conn: sqlite3.Connection, field: str, label: str = None) -> list:
+    """
+    Consecutive run pairs (by run date, optionally within one label) where
+    the field's pass rate on shared cases dropped, with the cases that broke.
+    """
+    runs = [r for r in field_history(conn, field) if not label or r["label"] == label]
+    found = []
+    for before, after in zip(runs, runs[1:]):
+        changed = flips(conn, before["run_id"], after["run_id"], field)
+        broke = [c["case_id"] for c in changed if c["before"] and not c["after"]]
+        fixed = [c["case_id"] for c in changed if not c["before"] and c["after"]]
+        if len(broke) > len(fixed):
+            found.append({"before": before, "after": after, "broke": broke, "fixed": fixed})
+    return found
+
+
+def latest_run(conn: sqlite3.Connection, label: str) -> dict:
+    """Most recent run with a label, or a run id given as a number"""
+    if label.isdigit():
+        row = conn.execute("SELECT * FROM runs WHERE run_id = ?", (int(label),)).fetchone()
+    else:
+        row = conn.execute("SELECT * FROM runs WHERE label = ? ORDER BY run_date DESC, run_id DESC LIMIT 1",
+                           (label,)).fetchone()
+    if row is None:
+        raise ValueError(f"No run found for {label!r}")
+    return dict(row)
+
+
+# ----------------------------------------------------------------------
+# Reports
+# ----------------------------------------------------------------------
+
+def _run_name(run: dict) -> str:
+    parts = [f"#{run['run_id']} {run['label']}", run["run_date"][:16]]
+    if run.get("model"):
+        parts.append(f"{run['model']}@{run['temperature']}")
+    if run.get("prompt_hash"):
+        parts.append(f"prompt {run['prompt_hash'][:8]}")
+    return "  ".join(parts)
+
+
+def print_runs(runs: list):
+    print(f"\n{'='*70}")
+    print(f"  RECORDED RUNS ({len(runs)})")
+    print(f"{'='*70}")
+    for run in runs:
+        tiers = ""
+        if run["tier1_pass"] is not None:
+            tiers = f"T1 {run['tier1_pass']}/{run['cases']}  T2 {run['tier2_pass']}/{run['cases']}"
+        else:
+            tiers = f"{run['cases']} cases ({run['origin']})"
+        print(f"  {_run_name(run):<58} {tiers}")
+
+
+def print_history(field: str, history: list):
+    print(f"\n{'='*70}")
+    print(f"  {field}: PASS RATE BY RUN")
+    print(f"{'='*70}")
+    previous = None
+    for run in history:
+        rate = run["passed"] / run["cases"] * 100
+        delta = f"{rate - previous:+6.1f}" if previous is not None else ""
+        print(f"  {_run_name(run):<58} {rate:>6.1f}% {delta}")
+        previous = rate
+
+
+def print_flips(before: dict, after: dict, changed: list):
+    print(f"\n{'='*70}")
+    print(f"  FLIPS: {_run_name(before)}")
+    print(f"      →  {_run_name(after)}")
+    print(f"{'='*70}")
+    broke = [c for c in changed if c["before"] and not c["after"]]
+    fixed = [c for c in changed if not c["before"] and c["after"]]
+    for title, cases in (("Broke", broke), ("Fixed", fixed)):
+        print(f"\n  {title} ({len(cases)}):")
+        for c in cases:
+            print(f"    [T{c['tier']}] {c['field']:<18} {c['case_id']:<16} "
+                  f"{c['before_actual']} → {c['after_actual']} (exp {c['expected']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluation run-history warehouse (SQLite)")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB_PATH, help="Warehouse path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    record = sub.add_parser("record", help="Record a run directory's per-case, per-field outcomes")
+    record.add_argument("--label", required=True, help="Run label, e.g. v7, v6.1, cascade")
+    record.add_argument("--output-dir", type=Path, required=True, help="Directory of *_enriched.json outputs")
+    record.add_argument("--expected", type=Path, required=True, help="Expected outputs directory")
+    record.add_argument("--prompt", type=Path, help="System prompt file used for the run")
+    record.add_argument("--schema", type=Path, help="Response schema file used for the run")
+    record.add_argument("--model", help="Model used for the run")
+    record.add_argument("--temperature", type=float, help="Temperature used for the run")
+    record.add_argument("--run-date", help="Run date (default: newest output mtime)")
+
+    importer = sub.add_parser("import-csv", help="Import the hand-kept ENRICHMENT_TEST_RESULTS.csv")
+    importer.add_argument("--csv", type=Path, required=True)
+
+    runs = sub.add_parser("runs", help="List recorded runs")
+    runs.add_argument("--label", help="Only runs with this label")
+
+    history = sub.add_parser("history", help="Pass rate of a field across runs")
+    history.add_argument("--field", required=True)
+
+    regress = sub.add_parser("regressions", help="Run pairs where a field's pass rate dropped")
+    regress.add_argument("--field", required=True)
+    regress.add_argument("--label", help="Only compare runs with this label")
+
+    flip = sub.add_parser("flips", help="Cases whose outcome changed between two runs")
+    flip.add_argument("--from", dest="from_run", required=True, help="Label (latest run) or run id")
+    flip.add_argument("--to", dest="to_run", required=True, help="Label (latest run) or run id")
+    flip.add_argument("--field", help="Only this field")
+
+    args = parser.parse_args()
+    conn = connect(args.db)
+
+    try:
+        if args.command == "record":
+            for path in [args.output_dir, args.expected] + [p for p in (args.prompt, args.schema) if p]:
+                if not path.exists():
+                    print(f"❌ Not found: {path}")
+                    sys.exit(1)
+            run = record_run(conn, args.label, args.output_dir, args.expected, args.prompt, args.schema,
+                             args.model, args.temperature, args.run_date)
+            print(f"✅ Recorded run #{run['run_id']} {run['label']}: {run['cases']} cases, "
+                  f"T1 {run['tier1_pass']}/{run['cases']}, T2 {run['tier2_pass']}/{run['cases']}")
+        elif args.command == "import-csv":
+            if not args.csv.exists():
+                print(f"❌ Not found: {args.csv}")
+                sys.exit(1)
+            imported = import_results_csv(conn, args.csv)
+            print(f"✅ Imported {len(imported)} runs ({sum(r['cases'] for r in imported)} cases) from {args.csv}")
+        elif args.command == "runs":
+            print_runs(list_runs(conn, args.label))
+        elif args.command == "history":
+            print_history(args.field, field_history(conn, args.field))
+        elif args.command == "regressions":
+            found = regressions(conn, args.field, args.label)
+            print(f"\n{'='*70}")
+            print(f"  {args.field}: REGRESSIONS ({len(found)})")
+            print(f"{'='*70}")
+            for r in found:
+                print(f"  {_run_name(r['before'])}")
+                print(f"    → {_run_name(r['after'])}: broke {len(r['broke'])}, fixed {len(r['fixed'])}")
+                print(f"      broke: {', '.join(r['broke'])}")
+        else:
+            before, after = latest_run(conn, args.from_run), latest_run(conn, args.to_run)
+            print_flips(before, after, flips(conn, before["run_id"], after["run_id"], args.field))
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Adverse Event / Crisis Fast Lane
+
+Candidate posts are screened by a dedicated safety prompt with a tiny schema
+(v7/enrichment/openai_assistant_system_prompt_v7_safety.md +
+openai_assistant_response_format_v7_safety.json) instead of waiting for full
+enrichment. Confirmed adverse_event / crisis flags are pushed to an alert
+sink (pbh_signal.alerts) with de-duplication.
+
+Candidates (local, no API call):
+- adverse_event: avexitide or Amylyx dictionary hit
+- crisis: self-harm lexicon (pbh_signal.scheduler) or distress cues
+
+Ingest-to-alert latency is recorded per alert (from the post's own
+submission time) and reported as p50/p95/p99, with the count and share of
+alerts over the SLA threshold (--alert-sla). Alerts the sink fails to
+deliver are counted, kept and retried when the lane closes; any still
+undelivered are listed in the report.
+
+Acceptance set: v5 ae-test-cases + flag-tests, scored against the flags in
+their expected outputs (adverse_event/crisis only).
+
+Usage:
+    python -m pbh_signal.safety_lane --acceptance
+    python -m pbh_signal.safety_lane --acceptance --oracle     # no API calls
+    python -m pbh_signal.safety_lane --acceptance --oracle --alert-sla 5
+    python -m pbh_signal.safety_lane --input v6/testing/normalized_inputs --webhook http://localhost:8080/alerts
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from pbh_signal.alerts import FileAlertSink, WebhookAlertSink, make_alert
+from pbh_signal.dictionary import DictionaryMatcher, post_text
+from pbh_signal.dictionary_artifact import load_compiled
+from pbh_signal.prompt_registry import get_registry
+from pbh_signal.scheduler import SELF_HARM_TERMS
+from pbh_signal.streaming import ALERT_FLAGS, percentile
+
+BASE_DIR = Path(__file__).parent
+SYSTEM_DIR = BASE_DIR.parent
+ENRICHMENT_DIR = SYSTEM_DIR / "v7" / "enrichment"
+SAFETY_PROMPT = ENRICHMENT_DIR / "openai_assistant_system_prompt_v7_safety.md"
+SAFETY_SCHEMA = ENRICHMENT_DIR / "openai_assistant_response_format_v7_safety.json"
+DEFAULT_ALERTS_PATH = SYSTEM_DIR / "cache" / "alerts" / "alerts.jsonl"
+
+V5_TEST_DATA = SYSTEM_DIR / "v5" / "enrichment-test-data-v5"
+ACCEPTANCE_SETS = ['ae-test-cases', 'flag-tests']
+
+# Ingest-to-alert SLA (seconds); alerts slower than this are reported as breaches
+DEFAULT_ALERT_SLA = 60.0
+
+# Distress cues that make a post a crisis candidate (the model decides)
+DISTRESS_TERMS = [
+    "can't take this anymore", "cant take this anymore", "can't do this anymore", "cant do this anymore",
+    "living like this", "want it to stop", "way forward", "no way out", "hopeless", "no hope",
+    "give up", "giving up", "trapped", "destroying my life", "ruining my life", "killing me",
+    "not worth it", "can't cope", "cant cope", "breaking point",
+]
+
+_CRISIS_RE = re.compile(r"(?<!\w)(?:" + "|".join(re.escape(t) for t in SELF_HARM_TERMS + DISTRESS_TERMS) +
+                        r")(?!\w)", re.IGNORECASE)
+
+
+def candidate_flags(post: dict, matcher: DictionaryMatcher) -> list:
+    """Flags a post could plausibly carry, from local signals only"""
+    text = post_text(post)
+    labels = matcher.labels(text)
+    candidates = []
+    if "avexitide" in labels.get("treatments", []) or "Amylyx" in labels.get("companies", []):
+        candidates.append("adverse_event")
+    if _CRISIS_RE.search(text):
+        candidates.append("crisis")
+    return candidates
+
+
+class OpenAIScreen:
+    """Safety screen via the tiny safety prompt/schema"""
+
+    def __init__(self, client, model: str = "gpt-4o", prompt_path: Path = SAFETY_PROMPT,
+                 schema_path: Path = SAFETY_SCHEMA):
+        self.client = client
+        self.model = model
+        self.template = get_registry().template(Path(prompt_path).name, Path(schema_path).name, model, 0,
+                                                user_prefix="Screen this post:\n\n")
+
+    def __call__(self, post: dict) -> dict:
+        screened = {k: post.get(k) for k in ("source", "title", "text", "parent_source", "subsource")}
+        response = self.client.chat.completions.create(**self.template.request(screened))
+        return json.loads(response.choices[0].message.content)
+
+
+class OracleScreen:
+    """Offline stand-in answering with known flags (checks gating, dedupe and alert plumbing)"""
+
+    def __init__(self, expected: dict):
+        self.expected = expected    # source_id -> flags
+
+    def __call__(self, post: dict) -> dict:
+        flags = [f for f in self.expected.get(post.get("source_id"), []) if f in ALERT_FLAGS]
+        return {"flags": flags, "evidence": "", "confidence": 1.0}
+
+
+class SafetyLane:
+    """Screen candidate posts concurrently and alert on confirmed flags"""
+
+    def __init__(self, screen, sink, matcher: DictionaryMatcher = None, workers: int = 4,
+                 alert_sla: float = DEFAULT_ALERT_SLA):
+        self.screen = screen
+        self.sink = sink
+        self.alert_sla = alert_sla
+        self.matcher = matcher or load_compiled()
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.latencies = []         # ingest -> alert, seconds
+        self.screen_latencies = []  # model call only
+        self.stats = {"seen": 0, "candidates": 0, "screened": 0, "confirmed": 0, "alerts": 0, "errors": 0,
+                      "alert_errors": 0, "sla_breaches": 0}
+        self.alerts_by_lane = {}    # lane -> alerts delivered
+        self.results = {}           # source_id -> confirmed flags
+        self.ingested_at = {}       # source_id -> submission time
+        self.undelivered = []       # alerts whose delivery failed, kept for retry
+        self._lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def submit(self, post: dict, ingested_at: float = None):
+        """Queue a post (stamped now unless ingested_at is given); returns a future, or None if it is not a candidate"""
+        ingested_at = ingested_at or time.time()
+        self.ingested_at[post.get("source_id")] = ingested_at
+        self._count("seen")
+        candidates = candidate_flags(post, self.matcher)
+        if not candidates:
+            self.results.setdefault(post.get("source_id"), [])
+            return None
+        self._count("candidates")
+        return self.pool.submit(self._process, post, ingested_at)
+
+    def _process(self, post: dict, ingested_at: float) -> list:
+        started = time.time()
+        try:
+            screened = self.screen(post)
+        except Exception as e:
+            self._count("errors")
+            print(f"   ❌ safety screen failed for {post.get('source_id')}: {e}")
+            return []
+        self.screen_latencies.append(time.time() - started)
+        self._count("screened")
+
+        confirmed = [f for f in dict.fromkeys(screened.get("flags", [])) if f in ALERT_FLAGS]
+        self.results[post.get("source_id")] = confirmed
+        if confirmed:
+            self._count("confirmed")
+        for flag in confirmed:
+            self.alert(post, flag, "fast_lane", ingested_at, screened.get("evidence", ""),
+                       screened.get("confidence"))
+        return confirmed
+
+    def alert(self, post: dict, flag: str, lane: str, ingested_at: float = None,
+              evidence: str = "", confidence: float = None) -> bool:
+        """Send one alert through the sink (also used for flags from full enrichment)"""
+        if ingested_at is None:
+            ingested_at = self.ingested_at.get(post.get("source_id"))
+        return self._deliver(post, make_alert(post, flag, lane, ingested_at, evidence, confidence))
+
+    def _deliver(self, post: dict, alert: dict) -> bool:
+        try:
+            sent = self.sink.emit(alert)
+        except Exception as e:
+            # A confirmed AE/crisis must not vanish with the exception: keep it for retry
+            self._count("alert_errors")
+            with self._lock:
+                self.undelivered.append((post, alert))
+            print(f"   ❌ alert delivery failed for {alert['source_id']} ({alert['flag']}): {e} - kept for retry")
+            return False
+        if sent:
+            self._count("alerts")
+            with self._lock:
+                self.alerts_by_lane[alert["lane"]] = self.alerts_by_lane.get(alert["lane"], 0) + 1
+            if "latency_s" in alert:
+                self.latencies.append(alert["latency_s"])
+                if alert["latency_s"] > self.alert_sla:
+                    self._count("sla_breaches")
+        return sent
+
+    def retry_undelivered(self) -> int:
+        """Redeliver alerts whose delivery failed; returns how many are still undelivered"""
+        with self._lock:
+            pending, self.undelivered = self.undelivered, []
+        for post, alert in pending:
+            ingested_at = self.ingested_at.get(alert["source_id"])
+            self._deliver(post, make_alert(post, alert["flag"], alert["lane"], ingested_at,
+                                           alert["evidence"], alert["confidence"]))
+        return len(self.undelivered)
+
+    def close(self):
+        """Wait for queued screens to finish, then retry failed alert deliveries once"""
+        self.pool.shutdown(wait=True)
+        self.retry_undelivered()
+
+    def report(self) -> dict:
+        return {
+            **self.stats,
+            "duplicates_suppressed": self.sink.stats["duplicates"],
+            "undelivered": [alert for _, alert in self.undelivered],
+            "alerts_by_lane": dict(self.alerts_by_lane),
+            "alert_sla_s": self.alert_sla,
+            "sla_breach_rate": self.stats["sla_breaches"] / len(self.latencies) if self.latencies else 0.0,
+            "ingest_to_alert_s": {f"p{p}": percentile(self.latencies, p) for p in (50, 95, 99)},
+            "screen_call_s": {f"p{p}": percentile(self.screen_latencies, p) for p in (50, 95, 99)},
+        }
+
+
+def print_lane_report(report: dict):
+    """Print lane counts and latency"""
+    print(f"\n{'='*70}")
+    print(f"  SAFETY FAST LANE")
+    print(f"{'='*70}")
+    print(f"  Posts seen:       {report['seen']}")
+    print(f"  Candidates:       {report['candidates']}")
+    print(f"  Screened:         {report['screened']} ({report['errors']} errors)")
+    print(f"  Confirmed posts:  {report['confirmed']}")
+    print(f"  Alerts sent:      {report['alerts']} ({report['duplicates_suppressed']} duplicates suppressed)")
+    if report["alerts_by_lane"]:
+        print(f"  By lane:          {', '.join(f'{k} {v}' for k, v in sorted(report['alerts_by_lane'].items()))}")
+    print(f"  Delivery errors:  {report['alert_errors']} ({len(report['undelivered'])} still undelivered)")
+    for alert in report["undelivered"]:
+        print(f"    ⚠️  {alert['source_id']} {alert['flag']} ({alert['lane']})")
+    print(f"\n  {'Latency (s)':<18} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for label, key in (("Ingest → alert", "ingest_to_alert_s"), ("Screen call", "screen_call_s")):
+        values = report[key]
+        print(f"  {label:<18} {values['p50']:>8.2f} {values['p95']:>8.2f} {values['p99']:>8.2f}")
+    mark = "⚠️ " if report["sla_breaches"] else "✅"
+    print(f"\n  {mark} SLA {report['alert_sla_s']:.0f}s: {report['sla_breaches']} breaches "
+          f"({report['sla_breach_rate']*100:.1f}% of timed alerts)")
+
+
+def load_acceptance_set() -> tuple:
+    """v5 AE/flag fixtures; returns (posts, expected flags by case id)"""
+    posts = []
+    expected = {}
+    for name in ACCEPTANCE_SETS:
+        for path in sorted((V5_TEST_DATA / name).glob("*.json")):
+            with open(path, 'r') as f:
+                post = json.load(f)
+            expected_path = V5_TEST_DATA / "expected-outputs" / name / f"{path.stem}_expected.json"
+            with open(expected_path, 'r') as f:
+                flags = json.load(f).get("flags", [])
+            # Fixture source_ids repeat across files (001, 005...); key cases by file name
+            post["source_id"] = path.stem
+            posts.append(post)
+            expected[path.stem] = [flag for flag in flags if flag in ALERT_FLAGS]
+    return posts, expected
+
+
+def score_acceptance(expected: dict, actual: dict) -> dict:
+    """Per-case pass/fail and per-flag precision/recall"""
+    cases = {}
+    counts = {flag: {"tp": 0, "fp": 0, "fn": 0} for flag in sorted(ALERT_FLAGS)}
+    for case_id, want in expected.items():
+        got = actual.get(case_id, [])
+        cases[case_id] = {"expected": want, "actual": got, "pass": set(want) == set(got)}
+        for flag in counts:
+            if flag in want and flag in got:
+                counts[flag]["tp"] += 1
+            elif flag in got:
+                counts[flag]["fp"] += 1
+            elif flag in want:
+                counts[flag]["fn"] += 1
+    for c in counts.values():
+        c["precision"] = c["tp"] / (c["tp"] + c["fp"]) if c["tp"] + c["fp"] else 1.0
+        c["recall"] = c["tp"] / (c["tp"] + c["fn"]) if c["tp"] + c["fn"] else 1.0
+    passed = sum(1 for c in cases.values() if c["pass"])
+    return {"cases": cases, "flags": counts, "passed": passed, "total": len(cases)}
+
+
+def print_acceptance(result: dict):
+    print(f"\n{'='*70}")
+    print(f"  ACCEPTANCE (v5 {' + '.join(ACCEPTANCE_SETS)})")
+    print(f"{'='*70}")
+    for case_id, case in result["cases"].items():
+        mark = "✅" if case["pass"] else "❌"
+        print(f"  {mark} {case_id:<40} expected={case['expected']} actual={case['actual']}")
+    print()
+    for flag, c in result["flags"].items():
+        print(f"  {flag:<15} precision {c['precision']*100:5.1f}%  recall {c['recall']*100:5.1f}%  "
+              f"(tp {c['tp']}, fp {c['fp']}, fn {c['fn']})")
+    print(f"\n  Passed: {result['passed']}/{result['total']}")
+
+
+def make_openai_client():
+    from openai import OpenAI
+    from dotenv import load_dotenv
+
+    env_path = SYSTEM_DIR.parent / ".env"
+    load_dotenv(env_path)
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        print(f"❌ OPENAI_API_KEY not found. Checked: {env_path}")
+        sys.exit(1)
+    return OpenAI(api_key=api_key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AE/crisis fast lane with alerting")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--acceptance", action="store_true", help="Run the v5 ae-test-cases + flag-tests fixtures")
+    source.add_argument("--input", type=Path, help="Directory of normalized *.json posts")
+    parser.add_argument("--oracle", action="store_true",
+                        help="Answer from expected outputs instead of calling the API (acceptance only)")
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--alerts", type=Path, default=DEFAULT_ALERTS_PATH, help="Alert JSONL file sink")
+    parser.add_argument("--webhook", help="POST alerts to this URL instead of the file sink")
+    parser.add_argument("--alert-sla", type=float, default=DEFAULT_ALERT_SLA,
+                        help=f"Ingest-to-alert SLA in seconds (default: {DEFAULT_ALERT_SLA:.0f})")
+    args = parser.parse_args()
+
+    if args.acceptance:
+        posts, expected = load_acceptance_set()
+    else:
+        if not args.input.exists():
+            print(f"❌ Input directory not found: {args.input}")
+            sys.exit(1)
+        posts, expected = [], {}
+        for path in sorted(args.input.glob("*.json")):
+            with open(path, 'r') as f:
+                posts.append(json.load(f))
+
+    if args.oracle and not args.acceptance:
+        print("❌ --oracle needs --acceptance (expected flags come from the fixtures)")
+        sys.exit(1)
+    screen = OracleScreen(expected) if args.oracle else OpenAIScreen(make_openai_client(), model=args.model)
+
+    if args.webhook:
+        sink = WebhookAlertSink(args.webhook, state_path=args.alerts.with_suffix(".sent"))
+    else:
+        sink = FileAlertSink(args.alerts)
+
+    lane = SafetyLane(screen, sink, workers=args.workers, alert_sla=args.alert_sla)
+    for post in posts:
+        lane.submit(post)
+    lane.close()
+
+    print_lane_report(lane.report())
+    if args.acceptance:
+        result = score_acceptance(expected, lane.results)
+        print_acceptance(result)
+        if result["passed"] < result["total"]:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
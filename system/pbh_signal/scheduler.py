@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Priority Enrichment Scheduler
+
+Orders enrichment work by local risk pre-score instead of filename order, so
+safety-relevant posts (self-harm language, avexitide/Amylyx mentions,
+first-person PBH reports) are sent to the model first during backfills.
+
+Pre-score (pbh_signal.dictionary hits, no API call):
+- self-harm lexicon                         → critical
+- avexitide / Amylyx mention                → high
+- PBH conditions, severe symptoms, first-person anchors add weight
+
+Aging: a waiting item gains AGING_PER_MINUTE points per minute, so low
+priority work is never starved by a steady stream of high-priority posts.
+Because every item ages at the same rate, ordering by
+score - rate * enqueued_at is equivalent and never needs re-heaping.
+
+Per-class latency (enqueue → done) is reported as p50/p95.
+
+Usage:
+    python -m pbh_signal.scheduler --input v6/testing/normalized_inputs
+    python -m pbh_signal.scheduler --input v6/testing/normalized_inputs --simulate-ms 800
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+from pbh_signal.dictionary import DictionaryMatcher, post_text
+from pbh_signal.dictionary_artifact import load_compiled
+from pbh_signal.streaming import percentile
+
+# Priority classes, highest first, with the minimum score for each
+PRIORITY_CLASSES = [('critical', 100), ('high', 40), ('normal', 15), ('low', 0)]
+
+# Score weights for local signals
+WEIGHTS = {
+    "self_harm": 100,
+    "avexitide": 40,
+    "Amylyx": 40,
+    "PBH": 25,
+    "condition": 15,
+    "severe_symptom": 15,
+    "treatment_with_symptom": 20,
+    "symptom": 5,
+    "patient_anchor": 10,
+    "hcp_anchor": 5,
+}
+
+SEVERE_SYMPTOMS = {'fainting', 'seizures'}
+
+# Self-harm / severe distress lexicon (the dictionary has no crisis category)
+SELF_HARM_TERMS = [
+    "kill myself", "killing myself", "end my life", "ending my life", "end it all",
+    "suicide", "suicidal", "want to die", "wanna die", "wish i was dead", "wish i were dead",
+    "better off dead", "no reason to live", "don't want to live", "dont want to live",
+    "don't want to be here anymore", "hurt myself", "hurting myself", "self harm", "self-harm",
+    "can't go on", "cant go on", "take my own life",
+]
+
+AGING_PER_MINUTE = 2.0
+
+_SELF_HARM_RE = re.compile(r"(?<!\w)(?:" + "|".join(re.escape(t) for t in SELF_HARM_TERMS) + r")(?!\w)",
+                           re.IGNORECASE)
+
+
+def priority_class(score: float) -> str:
+    """Priority class name for a risk score"""
+    for name, minimum in PRIORITY_CLASSES:
+        if score >= minimum:
+            return name
+    return PRIORITY_CLASSES[-1][0]
+
+
+def risk_score(post: dict, matcher: DictionaryMatcher) -> tuple:
+    """Local pre-score for a normalized post; returns (score, reasons)"""
+    text = post_text(post)
+    labels = matcher.labels(text)
+    score = 0
+    reasons = []
+
+    def add(reason, weight):
+        nonlocal score
+        score += weight
+        reasons.append(reason)
+
+    if _SELF_HARM_RE.search(text):
+        add("self_harm", WEIGHTS["self_harm"])
+    if "avexitide" in labels.get("treatments", []):
+        add("avexitide", WEIGHTS["avexitide"])
+    if "Amylyx" in labels.get("companies", []):
+        add("Amylyx", WEIGHTS["Amylyx"])
+
+    conditions = labels.get("conditions", [])
+    if "PBH" in conditions:
+        add("PBH", WEIGHTS["PBH"])
+    elif conditions:
+        add(f"condition:{conditions[0]}", WEIGHTS["condition"])
+
+    symptoms = labels.get("symptoms", [])
+    severe = SEVERE_SYMPTOMS.intersection(symptoms)
+    if severe:
+        add(f"severe_symptom:{sorted(severe)[0]}", WEIGHTS["severe_symptom"])
+    elif symptoms:
+        add("symptom", WEIGHTS["symptom"])
+    # Treatment + symptom is the shape of an adverse event report
+    if symptoms and labels.get("treatments"):
+        add("treatment_with_symptom", WEIGHTS["treatment_with_symptom"])
+
+    for anchor in labels.get("audience_anchor", []):
+        add(anchor, WEIGHTS.get(anchor, 0))
+
+    return score, reasons
+
+
+class PriorityScheduler:
+    """Thread-safe priority queue of posts with aging and per-class latency"""
+
+    def __init__(self, matcher: DictionaryMatcher = None, aging_per_minute: float = AGING_PER_MINUTE,
+                 clock=time.monotonic):
+        self.matcher = matcher or load_compiled()
+        self.aging_per_second = aging_per_minute / 60
+        self.clock = clock
+        self._heap = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.latencies = {name: [] for name, _ in PRIORITY_CLASSES}
+
+    def push(self, post: dict) -> dict:
+        """Score and enqueue a post; returns the queue item"""
+        score, reasons = risk_score(post, self.matcher)
+        now = self.clock()
+        item = {
+            "post": post,
+            "source_id": post.get("source_id"),
+            "score": score,
+            "priority": priority_class(score),
+            "reasons": reasons,
+            "enqueued_at": now,
+        }
+        with self._lock:
+            heapq.heappush(self._heap, (-(score - self.aging_per_second * now), next(self._seq), item))
+        return item
+
+    def pop(self) -> dict:
+        """Highest effective-priority item, or None when empty"""
+        with self._lock:
+            if not self._heap:
+                return None
+            item = heapq.heappop(self._heap)[2]
+        item["started_at"] = self.clock()
+        return item
+
+    def done(self, item: dict):
+        """Record completion latency for a popped item"""
+        item["latency_s"] = self.clock() - item["enqueued_at"]
+        with self._lock:
+            self.latencies[item["priority"]].append(item["latency_s"])
+
+    def drain(self):
+        """Yield posts in priority order; each is marked done when the next is requested"""
+        while True:
+            item = self.pop()
+            if item is None:
+                return
+            yield item["post"]
+            self.done(item)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def report(self) -> dict:
+        """Per-class count and p50/p95 latency (seconds)"""
+        with self._lock:
+            return {name: {"count": len(values),
+                           "p50_s": percentile(values, 50),
+                           "p95_s": percentile(values, 95),
+                           "max_s": max(values, default=0.0)}
+                    for name, values in self.latencies.items()}
+
+
+def print_latency_report(report: dict, title: str = "LATENCY BY PRIORITY CLASS"):
+    """Print per-class latency"""
+    print(f"\n{'='*70}")
+    print(f"  {title}")
+    print(f"{'='*70}")
+    print(f"  {'Class':<10} {'Posts':>6} {'p50 (s)':>10} {'p95 (s)':>10} {'max (s)':>10}")
+    for name, stats in report.items():
+        if stats["count"]:
+            print(f"  {name:<10} {stats['count']:>6} {stats['p50_s']:>10.2f} "
+                  f"{stats['p95_s']:>10.2f} {stats['max_s']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show priority dispatch order for normalized posts")
+    parser.add_argument("--input", type=Path, required=True, help="Directory of normalized *.json posts")
+    parser.add_argument("--aging", type=float, default=AGING_PER_MINUTE, help="Aging points per minute")
+    parser.add_argument("--simulate-ms", type=float, default=0,
+                        help="Simulated enrichment time per post; reports per-class latency vs filename order")
+    args = parser.parse_args()
+
+    if not args.input.exists():
+        print(f"❌ Input directory not found: {args.input}")
+        sys.exit(1)
+
+    posts = []
+    for path in sorted(args.input.glob("*.json")):
+        with open(path, 'r') as f:
+            posts.append(json.load(f))
+
+    matcher = load_compiled()
+
+    if args.simulate_ms:
+        # Virtual clock: each post takes simulate_ms; all posts are enqueued at t=0
+        for mode in ("filename order", "priority order"):
+            now = [0.0]
+            scheduler = PriorityScheduler(matcher, aging_per_minute=args.aging, clock=lambda: now[0])
+            items = [scheduler.push(post) for post in posts]
+            if mode == "filename order":
+                for item in items:
+                    now[0] += args.simulate_ms / 1000
+                    scheduler.done(item)
+            else:
+                for _ in scheduler.drain():
+                    now[0] += args.simulate_ms / 1000
+            print_latency_report(scheduler.report(), f"SIMULATED LATENCY ({mode}, {args.simulate_ms:.0f} ms/post)")
+        return
+
+    scheduler = PriorityScheduler(matcher, aging_per_minute=args.aging)
+    for post in posts:
+        scheduler.push(post)
+    print(f"\n  Dispatch order ({len(scheduler)} posts):")
+    position = 0
+    while True:
+        item = scheduler.pop()
+        if item is None:
+            break
+        position += 1
+        print(f"  {position:>4}. {item['source_id']:<14} {item['priority']:<9} {item['score']:>4}  "
+              f"{', '.join(item['reasons'])}")
+
+
+if __name__ == "__main__":
+    main()
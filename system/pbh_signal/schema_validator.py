@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Compiled Response Validator
+
+Compiles the structured-output JSON schema (e.g.
+v7/enrichment/openai_assistant_response_format_v7.json) once into nested
+closures, so validating a response is a handful of dict lookups and set
+membership tests rather than a schema walk per call.
+
+On top of the JSON schema it enforces the limits from the enrichment
+schema reference (reference_schemas/PBH_SIGNAL_ENRICHMENT_SCHEMA_*.csv,
+e.g. flags "max 5", key_phrases "max 40") that OpenAI structured outputs
+cannot express, and the prompt's "deduplicate all arrays" rule.
+
+Violations carry a code so they can be routed:
+- local repair (dedupe, truncate overlong arrays, drop invalid array items)
+- targeted API retry for anything else (missing fields, bad scalar enums)
+
+Usage:
+    python -m pbh_signal.schema_validator --schema v7/enrichment/openai_assistant_response_format_v7.json \\
+        --input v7/testing/api_test_outputs/v7
+"""
+
+import argparse
+import csv
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent
+REFERENCE_SCHEMAS_DIR = BASE_DIR.parent.parent / "reference_schemas"
+DEFAULT_FIELD_SPEC = REFERENCE_SCHEMAS_DIR / "PBH_SIGNAL_ENRICHMENT_SCHEMA_v6.1.csv"
+
+# Arrays the prompt requires to be deduplicated (VALIDATION & FORMATTING)
+UNIQUE_ARRAYS = ['topics', 'symptoms', 'treatments', 'conditions', 'companies', 'key_phrases',
+                 'themes', 'emotions', 'intent', 'flags', 'debug_matches']
+
+# Violation codes that can be fixed without another model call
+LOCALLY_REPAIRABLE = {'duplicate', 'max_items', 'array_enum'}
+
+_PY_TYPES = {
+    "string": (str,),
+    "number": (int, float),
+    "integer": (int,),
+    "boolean": (bool,),
+    "object": (dict,),
+    "array": (list,),
+    "null": (type(None),),
+}
+
+
+def _type_check(type_names: list):
+    """Single isinstance-based check for one or more JSON types (bool is not a number)"""
+    py_types = tuple(t for name in type_names for t in _PY_TYPES[name])
+    allow_bool = "boolean" in type_names
+
+    def check(value) -> bool:
+        return isinstance(value, py_types) and (allow_bool or not isinstance(value, bool))
+    return check
+
+
+def load_field_limits(spec_csv: Path = DEFAULT_FIELD_SPEC) -> dict:
+    """Read "max N" item limits per field from an enrichment schema CSV"""
+    limits = {}
+    if not spec_csv or not Path(spec_csv).exists():
+        return limits
+    with open(spec_csv, 'r') as f:
+        for row in csv.DictReader(f):
+            match = re.search(r"max\s+(\d+)", row.get("Allowed/Format") or "")
+            if match and (row.get("Type") or "").strip() == "array":
+                limits[row["Field"].strip()] = int(match.group(1))
+    return limits
+
+
+def _violation(path: str, code: str, message: str) -> dict:
+    field = re.split(r"[.\[]", path, maxsplit=1)[0] if path else ""
+    return {"path": path, "field": field, "code": code, "message": message}
+
+
+def _compile(node: dict, limits: dict, unique: set):
+    """Compile one schema node into check(value, path, out)"""
+
+    if "anyOf" in node and all(set(sub) == {"type"} and isinstance(sub["type"], str)
+                               for sub in node["anyOf"]):
+        # Nullable scalars ({"anyOf": [{"type": "string"}, {"type": "null"}]}) become one type check
+        return _compile({"type": [sub["type"] for sub in node["anyOf"]]}, limits, unique)
+
+    if "anyOf" in node:
+        branches = [_compile(sub, limits, unique) for sub in node["anyOf"]]
+
+        def check_any(value, path, out):
+            for branch in branches:
+                trial = []
+                branch(value, path, trial)
+                if not trial:
+                    return
+            out.append(_violation(path, "type", f"does not match any allowed type: {value!r:.60}"))
+        return check_any
+
+    types = node.get("type")
+    if types:
+        type_names = types if isinstance(types, list) else [types]
+        type_check = _type_check(type_names)
+        type_name = "|".join(type_names)
+    else:
+        type_check = None
+        type_name = None
+
+    enum = frozenset(node["enum"]) if "enum" in node else None
+
+    if types == "object":
+        props = {name: _compile(sub, limits, unique) for name, sub in node.get("properties", {}).items()}
+        required = tuple(node.get("required", ()))
+        closed = node.get("additionalProperties") is False
+
+        def check_object(value, path, out):
+            if not isinstance(value, dict):
+                out.append(_violation(path, "type", f"expected object, got {type(value).__name__}"))
+                return
+            prefix = f"{path}." if path else ""
+            for name in required:
+                if name not in value:
+                    out.append(_violation(prefix + name, "required", "missing required field"))
+            for name, item in value.items():
+                checker = props.get(name)
+                if checker is not None:
+                    checker(item, prefix + name, out)
+                elif closed:
+                    out.append(_violation(prefix + name, "additional", "field not allowed by schema"))
+        return check_object
+
+    if types == "array":
+        item_node = node.get("items", {})
+        item_check = _compile(item_node, limits, unique)
+        item_enum = frozenset(item_node["enum"]) if "enum" in item_node else None
+        # Plain {"type": "..."} items are checked inline without building a path
+        simple_type = _type_check([item_node["type"]]) \
+            if set(item_node) == {"type"} and isinstance(item_node["type"], str) else None
+        max_items = node.get("maxItems")
+        min_items = node.get("minItems")
+
+        def check_array(value, path, out):
+            if not isinstance(value, list):
+                out.append(_violation(path, "type", f"expected array, got {type(value).__name__}"))
+                return
+            field = path.split(".")[-1]
+            limit = limits.get(field, max_items) if "." not in path else max_items
+            if limit is not None and len(value) > limit:
+                out.append(_violation(path, "max_items", f"{len(value)} items (max {limit})"))
+            if min_items is not None and len(value) < min_items:
+                out.append(_violation(path, "min_items", f"{len(value)} items (min {min_items})"))
+            if field in unique and "." not in path:
+                try:
+                    if len(set(value)) != len(value):
+                        out.append(_violation(path, "duplicate", "duplicate items"))
+                except TypeError:
+                    pass
+            for i, item in enumerate(value):
+                if item_enum is not None and isinstance(item, str):
+                    if item not in item_enum:
+                        out.append(_violation(f"{path}[{i}]", "array_enum", f"{item!r} not in enum"))
+                    continue
+                if simple_type is not None and simple_type(item):
+                    continue
+                item_check(item, f"{path}[{i}]", out)
+        return check_array
+
+    def check_scalar(value, path, out):
+        if type_check is not None and not type_check(value):
+            out.append(_violation(path, "type", f"expected {type_name}, got {type(value).__name__}"))
+            return
+        if enum is not None and value not in enum:
+            out.append(_violation(path, "enum", f"{value!r} not in enum"))
+    return check_scalar
+
+
+class CompiledValidator:
+    """Validator compiled once from a structured-output schema"""
+
+    def __init__(self, response_format: dict, limits: dict = None, unique_arrays: list = None):
+        schema = response_format.get("schema", response_format)
+        if "json_schema" in response_format:
+            schema = response_format["json_schema"].get("schema", schema)
+        self.name = response_format.get("name") or response_format.get("json_schema", {}).get("name")
+        self.limits = dict(limits or {})
+        self.unique = set(UNIQUE_ARRAYS if unique_arrays is None else unique_arrays)
+        self._check = _compile(schema, self.limits, self.unique)
+
+        self.validated = 0
+        self.invalid = 0
+        self.total_ns = 0
+        self.violation_counts = {}   # "field:code" -> count
+
+    def validate(self, record) -> list:
+        """Return a list of violations (empty when valid)"""
+        started = time.perf_counter_ns()
+        out = []
+        self._check(record, "", out)
+        self.total_ns += time.perf_counter_ns() - started
+        self.validated += 1
+        if out:
+            self.invalid += 1
+            for v in out:
+                key = f"{v['field']}:{v['code']}"
+                self.violation_counts[key] = self.violation_counts.get(key, 0) + 1
+        return out
+
+    def report(self) -> dict:
+        """Validation cost and violation rates for this run"""
+        return {
+            "validated": self.validated,
+            "invalid": self.invalid,
+            "violation_rate": self.invalid / self.validated if self.validated else 0.0,
+            "mean_us": self.total_ns / self.validated / 1000 if self.validated else 0.0,
+            "total_ms": self.total_ns / 1e6,
+            "violations": dict(sorted(self.violation_counts.items(), key=lambda x: -x[1]))
+        }
+
+
+def load_validator(schema_path: Path, spec_csv: Path = DEFAULT_FIELD_SPEC) -> CompiledValidator:
+    """Load a response format file and compile it (call once at startup)"""
+    with open(schema_path, 'r') as f:
+        response_format = json.load(f)
+    return CompiledValidator(response_format, limits=load_field_limits(spec_csv))
+
+
+def needs_model_repair(violations: list) -> bool:
+    """True if any violation cannot be fixed locally"""
+    return any(v["code"] not in LOCALLY_REPAIRABLE for v in violations)
+
+
+def repair_locally(record: dict, violations: list, validator: CompiledValidator) -> dict:
+    """Fix duplicate, overlong and invalid-enum top-level arrays in place; returns the record"""
+    fields = {v["field"] for v in violations if v["code"] in LOCALLY_REPAIRABLE}
+    for field in fields:
+        value = record.get(field)
+        if not isinstance(value, list):
+            continue
+        bad_items = {record[field][int(m.group(1))]
+                     for v in violations if v["field"] == field and v["code"] == "array_enum"
+                     for m in [re.search(r"\[(\d+)\]$", v["path"])] if m}
+        cleaned = []
+        seen = set()
+        for item in value:
+            if item in bad_items:
+                continue
+            if field in validator.unique:
+                if item in seen:
+                    continue
+                seen.add(item)
+            cleaned.append(item)
+        limit = validator.limits.get(field)
+        if limit is not None:
+            cleaned = cleaned[:limit]
+        record[field] = cleaned
+    return record
+
+
+def repair_message(violations: list) -> str:
+    """Targeted follow-up instruction listing the violations to fix"""
+    lines = [f"- {v['path']}: {v['message']}" for v in violations[:20]]
+    return ("Your previous JSON output failed schema validation:\n" + "\n".join(lines) +
+            "\n\nReturn the complete corrected JSON. Change only what is needed to fix these issues.")
+
+
+def print_report(report: dict, title: str = "SCHEMA VALIDATION"):
+    """Print validation cost and violation rates"""
+    print(f"\n{'='*70}")
+    print(f"  {title}")
+    print(f"{'='*70}")
+    print(f"  Validated:      {report['validated']}")
+    print(f"  Invalid:        {report['invalid']} ({report['violation_rate']*100:.1f}%)")
+    print(f"  Cost:           {report['mean_us']:.1f} µs/response ({report['total_ms']:.2f} ms total)")
+    if report["violations"]:
+        print(f"\n  VIOLATIONS (field:code):")
+        for key, count in report["violations"].items():
+            print(f"    - {key}: {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate enriched outputs against a response schema")
+    parser.add_argument("--schema", type=Path, required=True, help="Response format JSON")
+    parser.add_argument("--input", type=Path, required=True, help="Directory of *_enriched.json files")
+    parser.add_argument("--spec", type=Path, default=DEFAULT_FIELD_SPEC, help="Enrichment schema CSV with item limits")
+    parser.add_argument("--details", action="store_true", help="Show each violation")
+    args = parser.parse_args()
+
+    for path in (args.schema, args.input):
+        if not path.exists():
+            print(f"❌ Not found: {path}")
+            sys.exit(1)
+
+    validator = load_validator(args.schema, args.spec)
+    for path in sorted(args.input.glob("*_enriched.json")):
+        with open(path, 'r') as f:
+            record = json.load(f)
+        violations = validator.validate(record)
+        if violations and args.details:
+            print(f"\n   {path.stem}:")
+            for v in violations:
+                print(f"      [{v['code']}] {v['path']}: {v['message']}")
+
+    print_report(validator.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Long-Post Segment Selection
+
+Long posts (edge_very_long_post, multi-page Reddit stories) are sent whole
+and dominate input tokens and latency. This stage splits the text into
+sentences and, when it exceeds a token budget, keeps only the sentences
+that carry signal:
+
+1. safety cues (self-harm / distress lexicons)         - always first
+2. dictionary entity hits (conditions, symptoms, treatments, companies)
+   and audience anchors
+3. topic hits and first-person statements ("I", "my", "me")
+4. the sentences either side of an entity hit, the opening sentence (what
+   the post is about) and the closing one (usually the ask)
+
+Sentences are added in that order (earliest first within a level) until the
+budget is full, then re-joined in original order with " [...] " where text
+was cut. Every dropped span is recorded (character offsets + tokens) so a
+run can be audited, and the original text is kept in the enriched output.
+
+Tokens are estimated at ~4 characters per token (no tokenizer dependency).
+
+Accuracy is measured by running the same posts with and without the budget
+(v7/testing/run_api_test.py --segment-budget N) and comparing Tier 1/Tier 2
+pass rates and per-field agreement on the posts that were actually cut.
+
+Usage:
+    python -m pbh_signal.segment --input v6/testing/normalized_inputs --budget 400
+    python -m pbh_signal.segment --run v7/testing/api_test_outputs/v7_segmented \\
+        --baseline v7/testing/api_test_outputs/v7 --expected v7/testing/expected_outputs
+"""
+
+import argparse
+import bisect
+import json
+import math
+import re
+import sys
+from pathlib import Path
+
+from pbh_signal.cascade import TIER1_FIELDS, TIER2_FIELDS, tier_pass_rates
+from pbh_signal.dictionary_artifact import load_compiled
+from pbh_signal.safety_lane import DISTRESS_TERMS
+from pbh_signal.scheduler import SELF_HARM_TERMS
+
+DEFAULT_BUDGET = 400
+CHARS_PER_TOKEN = 4
+SEGMENTS_LOG = "segments.json"
+GAP_MARKER = " [...] "
+
+ENTITY_CATEGORIES = {'conditions', 'symptoms', 'treatments', 'companies', 'audience_anchor'}
+
+# Selection levels, highest first
+SAFETY = 4
+ENTITY = 3
+SIGNAL = 2
+CONTEXT = 1
+
+_SENTENCE_RE = re.compile(r"[^.!?\n]+(?:[.!?]+[\"')\]]*|\n+|$)")
+_FIRST_PERSON_RE = re.compile(r"(?<!\w)(?:i|i'm|i've|i'd|i'll|im|ive|my|me|myself)(?!\w)", re.IGNORECASE)
+_SAFETY_RE = re.compile(r"(?<!\w)(?:" + "|".join(re.escape(t) for t in SELF_HARM_TERMS + DISTRESS_TERMS) +
+                        r")(?!\w)", re.IGNORECASE)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def split_sentences(text: str) -> list:
+    """Sentence spans [(start, end)] covering the non-blank text"""
+    spans = []
+    for m in _SENTENCE_RE.finditer(text):
+        start, end = m.start(), m.end()
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            spans.append((start, end))
+    return spans
+
+
+def sentence_levels(text: str, spans: list, matcher) -> list:
+    """Selection level per sentence (0 = drop first)"""
+    levels = [0] * len(spans)
+    starts = [s for s, _ in spans]
+    entity = set()
+    for hit in matcher.match(text):
+        # Sentence containing the hit start
+        i = max(0, bisect.bisect_right(starts, hit["start"]) - 1)
+        if hit["category"] in ENTITY_CATEGORIES:
+            levels[i] = max(levels[i], ENTITY)
+            entity.add(i)
+        else:
+            levels[i] = max(levels[i], SIGNAL)
+    for i, (start, end) in enumerate(spans):
+        sentence = text[start:end]
+        if _SAFETY_RE.search(sentence):
+            levels[i] = SAFETY
+        elif _FIRST_PERSON_RE.search(sentence):
+            levels[i] = max(levels[i], SIGNAL)
+    for i in entity:
+        for j in (i - 1, i + 1):
+            if 0 <= j < len(spans):
+                levels[j] = max(levels[j], CONTEXT)
+    if spans:
+        levels[0] = max(levels[0], CONTEXT)
+        levels[-1] = max(levels[-1], CONTEXT)
+    return levels
+
+
+def select_segments(post: dict, matcher=None, budget: int = DEFAULT_BUDGET) -> tuple:
+    """
+    Returns (post to send, segment record). The post is returned unchanged
+    when its text fits the budget; otherwise "text" holds the selected
+    sentences and the record lists what was dropped.
+    """
+    text = post.get("text") or ""
+    record = {
+        "source_id": post.get("source_id"),
+        "budget": budget,
+        "original_tokens": estimate_tokens(text),
+        "kept_tokens": estimate_tokens(text),
+        "dropped": [],
+    }
+    if record["original_tokens"] <= budget:
+        return post, record
+
+    matcher = matcher or load_compiled()
+    spans = split_sentences(text)
+    levels = sentence_levels(text, spans, matcher)
+    order = sorted(range(len(spans)), key=lambda i: (-levels[i], i))
+
+    kept = set()
+    used = 0
+    for i in order:
+        tokens = estimate_tokens(text[spans[i][0]:spans[i][1]] + GAP_MARKER)
+        # Safety sentences are kept even past the budget
+        if used + tokens <= budget or levels[i] == SAFETY:
+            kept.add(i)
+            used += tokens
+
+    parts = []
+    previous = None
+    for i, (start, end) in enumerate(spans):
+        if i not in kept:
+            record["dropped"].append({"start": start, "end": end, "level": levels[i],
+                                      "tokens": estimate_tokens(text[start:end])})
+            continue
+        if parts:
+            parts.append(" " if previous == i - 1 else GAP_MARKER)
+        elif i > 0:
+            parts.append(GAP_MARKER.lstrip())
+        parts.append(text[start:end])
+        previous = i
+    if previous is not None and previous < len(spans) - 1:
+        parts.append(GAP_MARKER.rstrip())
+
+    # Merge adjacent dropped sentences into spans
+    merged = []
+    for span in record["dropped"]:
+        if merged and not text[merged[-1]["end"]:span["start"]].strip():
+            merged[-1]["end"] = span["end"]
+            merged[-1]["tokens"] += span["tokens"]
+            merged[-1]["level"] = max(merged[-1]["level"], span["level"])
+        else:
+            merged.append(dict(span))
+    record["dropped"] = merged
+
+    selected = "".join(parts)
+    record["kept_tokens"] = estimate_tokens(selected)
+    record["sentences"] = len(spans)
+    record["kept_sentences"] = len(kept)
+    return {**post, "text": selected}, record
+
+
+def _agree(a, b) -> bool:
+    if isinstance(a, list) and isinstance(b, list):
+        return set(a) == set(b)
+    return a == b
+
+
+def segment_report(run_dir: Path, baseline_dir: Path, expected_dir: Path = None) -> dict:
+    """Token savings and accuracy of a segmented run versus a full-text run, on the posts that were cut"""
+    with open(Path(run_dir) / SEGMENTS_LOG, 'r') as f:
+        log = json.load(f)
+    cut = {sid for sid, r in log.items() if r["dropped"]}
+    original = sum(r["original_tokens"] for r in log.values())
+    kept = sum(r["kept_tokens"] for r in log.values())
+
+    fields = {field: [0, 0] for field in TIER1_FIELDS + TIER2_FIELDS}
+    for source_id in sorted(cut):
+        run_path = Path(run_dir) / f"{source_id}_enriched.json"
+        base_path = Path(baseline_dir) / f"{source_id}_enriched.json"
+        if not run_path.exists() or not base_path.exists():
+            continue
+        with open(run_path, 'r') as f:
+            run = json.load(f)
+        with open(base_path, 'r') as f:
+            base = json.load(f)
+        for field, counts in fields.items():
+            counts[0] += _agree(run.get(field), base.get(field))
+            counts[1] += 1
+
+    report = {
+        "posts": len(log),
+        "cut": len(cut),
+        "original_tokens": original,
+        "kept_tokens": kept,
+        "saved_pct": (1 - kept / original) * 100 if original else 0.0,
+        "agreement": {f: c[0] / c[1] for f, c in fields.items() if c[1]},
+    }
+    if expected_dir and Path(expected_dir).exists():
+        report["segmented"] = tier_pass_rates(run_dir, expected_dir, cut)
+        report["full_text"] = tier_pass_rates(baseline_dir, expected_dir, cut)
+    return report
+
+
+def print_segment_report(report: dict):
+    print(f"\n{'='*70}")
+    print(f"  SEGMENT SELECTION")
+    print(f"{'='*70}")
+    print(f"  Posts cut:   {report['cut']}/{report['posts']}")
+    print(f"  Text tokens: {report['kept_tokens']:,} of {report['original_tokens']:,} "
+          f"({report['saved_pct']:.1f}% saved, estimated)")
+    if report["agreement"]:
+        print(f"\n  Agreement with full-text run on cut posts:")
+        for field, rate in sorted(report["agreement"].items(), key=lambda x: x[1]):
+            print(f"    {field:<22} {rate*100:>6.1f}%")
+    if "segmented" in report:
+        seg, full = report["segmented"], report["full_text"]
+        print(f"\n  {'':<14} {'Tier 1':>8} {'Tier 2':>8}   (n={seg['total']} cut posts with expected outputs)")
+        print(f"  {'Segmented':<14} {seg['tier1_pct']:>7.1f}% {seg['tier2_pct']:>7.1f}%")
+        print(f"  {'Full text':<14} {full['tier1_pct']:>7.1f}% {full['tier2_pct']:>7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token-budgeted segment selection for long posts")
+    parser.add_argument("--input", type=Path, help="Directory of normalized posts to segment (dry run)")
+    parser.add_argument("--budget", type=int, default=DEFAULT_BUDGET, help="Text token budget per post")
+    parser.add_argument("--show", action="store_true", help="Print the selected text of cut posts")
+    parser.add_argument("--run", type=Path, help="Segmented run output directory (with segments.json)")
+    parser.add_argument("--baseline", type=Path, help="Full-text run output directory")
+    parser.add_argument("--expected", type=Path, help="Expected outputs directory")
+    args = parser.parse_args()
+
+    if args.run:
+        if not (args.run / SEGMENTS_LOG).exists() or not args.baseline:
+            print(f"❌ --run needs {SEGMENTS_LOG} in the run directory and --baseline")
+            sys.exit(1)
+        print_segment_report(segment_report(args.run, args.baseline, args.expected))
+        return
+
+    if not args.input or not args.input.exists():
+        print("❌ Must specify --input (directory of normalized posts) or --run")
+        sys.exit(1)
+
+    matcher = load_compiled()
+    log = {}
+    for path in sorted(args.input.glob("*.json")):
+        with open(path, 'r') as f:
+            post = json.load(f)
+        selected, record = select_segments(post, matcher, args.budget)
+        log[record["source_id"]] = record
+        if record["dropped"]:
+            print(f"  {record['source_id']:<14} {record['original_tokens']:>6} → {record['kept_tokens']:>5} tokens "
+                  f"({record['kept_sentences']}/{record['sentences']} sentences)")
+            if args.show:
+                print(f"    {selected['text']}\n")
+    original = sum(r["original_tokens"] for r in log.values())
+    kept = sum(r["kept_tokens"] for r in log.values())
+    cut = sum(1 for r in log.values() if r["dropped"])
+    print(f"\n  Cut {cut}/{len(log)} posts; text tokens {kept:,} of {original:,} "
+          f"({(1 - kept / original) * 100 if original else 0:.1f}% saved)")
+
+
+if __name__ == "__main__":
+    main()
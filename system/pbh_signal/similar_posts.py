@@ -0,0 +1,591 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - "More Like This" Similar-Post Index
+
+Local nearest-neighbour index over enriched posts, for "find posts like
+this AE report / this patient story". No embedding service; stdlib only.
+
+Vectors:
+- Terms are unigrams and bigrams of title + text (stopwords dropped) plus
+  key_phrases (weighted KEY_PHRASE_WEIGHT), hashed to 2^FEATURE_BITS features
+- Weights are (1 + log tf) * idf, with document frequencies kept
+  incrementally per hashed feature
+
+Random projection: each post is reduced to a SIGNATURE_BITS-bit SimHash
+(sign of the dot product with one pseudo-random ±1 hyperplane per bit,
+derived from the feature hash). The Hamming distance h between two
+signatures estimates their angle (cos ≈ cos(pi * h / SIGNATURE_BITS)). The
+projection is computed with packed-integer lanes: one big-int multiply-add
+per feature instead of one per feature and bit.
+
+ANN: an HNSW graph (Malkov & Yashunin) over the signatures with Hamming
+distance. Each post links to its M nearest posts per layer (2*M on the
+bottom layer, chosen with the diversity heuristic); a query descends the
+sparse upper layers greedily and runs a best-first search of width
+EF_SEARCH at the bottom, so it evaluates a few thousand distances however
+large the index is. (LSH banding suits near-duplicates only: related posts
+sit at cosine 0.4-0.7, where bands of a 128-bit SimHash rarely collide.)
+Indexes up to BRUTE_FORCE_LIMIT posts are scanned exactly instead.
+
+Replaced posts are tombstoned (kept as graph waypoints, never returned).
+
+Inserts are incremental. Signatures use the document frequencies known at
+insert time, so `rebuild` re-derives them after a large backfill.
+
+Usage:
+    python -m pbh_signal.similar_posts build --input v7/testing/api_test_outputs/v7
+    python -m pbh_signal.similar_posts query --source-id t3_1pakdxz
+    python -m pbh_signal.similar_posts query --text "shaky and sweaty an hour after eating"
+    python -m pbh_signal.similar_posts rebuild --input v7/testing/api_test_outputs/v7
+    python -m pbh_signal.similar_posts bench --posts 50000
+"""
+
+import argparse
+import base64
+import heapq
+import hashlib
+import itertools
+import json
+import math
+import random
+import re
+import sys
+import time
+from array import array
+from collections import Counter
+from pathlib import Path
+
+from pbh_signal.dictionary import post_text
+from pbh_signal.key_phrases import STOPWORDS
+from pbh_signal.records import iter_enriched_files, load_enriched
+
+BASE_DIR = Path(__file__).parent
+DEFAULT_INDEX_PATH = BASE_DIR.parent / "cache" / "similar_posts.json"
+
+INDEX_FORMAT_VERSION = 1
+
+FEATURE_BITS = 20
+SIGNATURE_BITS = 128
+M = 12                      # links per node on upper layers (2*M on layer 0)
+EF_CONSTRUCTION = 64
+EF_SEARCH = 128
+LEVEL_MULT = 1 / math.log(M)
+BRUTE_FORCE_LIMIT = 2_000
+KEY_PHRASE_WEIGHT = 2.0
+WEIGHT_SCALE = 6            # weights are quantized to integers 0-255 for the packed projection
+DEFAULT_TOP_K = 10
+FEATURE_CACHE_SIZE = 200_000
+
+# Packed projection: one LANE_BITS-bit counter per signature bit
+LANE_BITS = 24
+LANE_MASK = (1 << LANE_BITS) - 1
+# Byte value -> its 8 bits spread into 8 lanes
+_SPREAD = [sum(((b >> i) & 1) << (i * LANE_BITS) for i in range(8)) for b in range(256)]
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9'’]*")
+
+
+def tokenize(text: str) -> list:
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+def term_counts(record: dict) -> Counter:
+    """Weighted term frequencies: unigrams + bigrams of title/text, key_phrases boosted"""
+    tokens = tokenize(post_text(record))
+    counts = Counter(tokens)
+    counts.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    for phrase in record.get("key_phrases") or []:
+        counts[f"kp:{phrase.lower()}"] += KEY_PHRASE_WEIGHT
+    return counts
+
+
+def feature_hash(term: str) -> int:
+    """128-bit hash: low FEATURE_BITS bits pick the feature, all bits seed the hyperplanes"""
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=16).digest(), "little")
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def similarity(distance: int) -> float:
+    """Cosine similarity implied by a SimHash Hamming distance"""
+    return math.cos(math.pi * distance / SIGNATURE_BITS)
+
+
+class SimilarPostIndex:
+    """Incremental SimHash/HNSW index keyed by source_id"""
+
+    def __init__(self, seed: int = 1):
+        self.ids = []              # node -> source_id (None once replaced)
+        self.signatures = []       # node -> signature int
+        self.links = []            # node -> [neighbours on layer 0, layer 1, ...]
+        self.doc_numbers = {}      # source_id -> node
+        self.entry = None          # entry node on the top layer
+        self.df = Counter()        # hashed feature -> document frequency
+        self.documents = 0
+        self._rng = random.Random(seed)
+        self._patterns = {}        # term -> (feature, packed ±1 pattern)
+
+    # ------------------------------------------------------------------
+    # Vectors and signatures
+    # ------------------------------------------------------------------
+
+    def _pattern(self, term: str) -> tuple:
+        cached = self._patterns.get(term)
+        if cached is None:
+            h = feature_hash(term)
+            packed = 0
+            for i, byte in enumerate(h.to_bytes(16, "little")[:SIGNATURE_BITS // 8]):
+                packed |= _SPREAD[byte] << (i * 8 * LANE_BITS)
+            cached = (h & ((1 << FEATURE_BITS) - 1), packed)
+            if len(self._patterns) >= FEATURE_CACHE_SIZE:
+                self._patterns.clear()
+            self._patterns[term] = cached
+        return cached
+
+    def vector(self, counts: Counter) -> dict:
+        """Hashed TF-IDF vector {feature: (weight, pattern)}"""
+        vector = {}
+        n = self.documents + 1
+        for term, tf in counts.items():
+            feature, pattern = self._pattern(term)
+            idf = math.log((n + 1) / (self.df.get(feature, 0) + 1)) + 1
+            weight = (1 + math.log(tf)) * idf
+            if feature in vector:
+                weight += vector[feature][0]
+            vector[feature] = (weight, pattern)
+        return vector
+
+    @staticmethod
+    def signature(vector: dict) -> int:
+        """SimHash: bit j set when the weighted sum over features of ±1 hyperplane j is positive"""
+        packed = 0
+        total = 0
+        for weight, pattern in vector.values():
+            w = min(255, max(1, round(weight * WEIGHT_SCALE)))
+            packed += w * pattern
+            total += w
+        # Lane j holds the weight of features with bit j set; bit j is positive when that exceeds half
+        signature = 0
+        for j in range(SIGNATURE_BITS):
+            if 2 * ((packed >> (j * LANE_BITS)) & LANE_MASK) > total:
+                signature |= 1 << j
+        return signature
+
+    def signature_for(self, record: dict) -> int:
+        return self.signature(self.vector(term_counts(record)))
+
+    # ------------------------------------------------------------------
+    # Inserts
+    # ------------------------------------------------------------------
+
+    def add_record(self, record: dict, count_frequencies: bool = True) -> str:
+        """
+        Insert or replace a post; returns "added" or "updated". Document
+        frequencies are counted on first insert only (and not at all when
+        re-signing with frequencies collected beforehand).
+        """
+        source_id = record.get("source_id")
+        if not source_id:
+            raise ValueError("Record has no source_id")
+        counts = term_counts(record)
+        status = "added"
+        if source_id in self.doc_numbers:
+            self._remove(source_id)
+            status = "updated"
+        elif count_frequencies:
+            # Document frequencies count each post once, on first insert
+            self.count_frequencies(counts)
+        self._insert(source_id, self.signature(self.vector(counts)))
+        return status
+
+    def count_frequencies(self, counts: Counter):
+        """Count one document's features into the document frequencies"""
+        self.documents += 1
+        for feature in {self._pattern(term)[0] for term in counts}:
+            self.df[feature] += 1
+
+    def _insert(self, source_id: str, signature: int, level: int = None):
+        node = len(self.ids)
+        self.ids.append(source_id)
+        self.signatures.append(signature)
+        self.doc_numbers[source_id] = node
+        if level is None:
+            level = int(-math.log(1.0 - self._rng.random()) * LEVEL_MULT)
+        self.links.append([[] for _ in range(level + 1)])
+        if self.entry is None:
+            self.entry = node
+            return
+        top = len(self.links[self.entry]) - 1
+        entry = self.entry
+        for layer in range(top, level, -1):
+            entry = self._greedy(signature, entry, layer)
+        entries = [entry]
+        for layer in range(min(level, top), -1, -1):
+            found = self._search_layer(signature, entries, EF_CONSTRUCTION, layer)
+            limit = 2 * M if layer == 0 else M
+            neighbours = self._select(found, M)
+            self.links[node][layer] = neighbours
+            for other in neighbours:
+                links = self.links[other][layer]
+                links.append(node)
+                if len(links) > limit:
+                    base = self.signatures[other]
+                    ranked = sorted((hamming(base, self.signatures[n]), n) for n in links)
+                    links[:] = self._select(ranked, limit)
+            entries = [n for _, n in found]
+        if level > top:
+            self.entry = node
+
+    def _remove(self, source_id: str):
+        # Tombstone: the node stays in the graph as a waypoint
+        self.ids[self.doc_numbers.pop(source_id)] = None
+
+    def _greedy(self, signature: int, entry: int, layer: int) -> int:
+        """Closest node reachable by greedy descent on one layer"""
+        best = hamming(signature, self.signatures[entry])
+        improved = True
+        while improved:
+            improved = False
+            for n in self.links[entry][layer]:
+                d = hamming(signature, self.signatures[n])
+                if d < best:
+                    best, entry, improved = d, n, True
+        return entry
+
+    def _search_layer(self, signature: int, entries: list, ef: int, layer: int) -> list:
+        """Best-first search of width ef; returns [(distance, node)] nearest first"""
+        signatures, links = self.signatures, self.links
+        visited = set(entries)
+        candidates = [(hamming(signature, signatures[e]), e) for e in entries]
+        heapq.heapify(candidates)
+        results = [(-d, e) for d, e in candidates]
+        heapq.heapify(results)
+        while candidates:
+            d, node = heapq.heappop(candidates)
+            if d > -results[0][0] and len(results) >= ef:
+                break
+            for n in links[node][layer]:
+                if n in visited:
+                    continue
+                visited.add(n)
+                dn = hamming(signature, signatures[n])
+                if len(results) < ef or dn < -results[0][0]:
+                    heapq.heappush(candidates, (dn, n))
+                    heapq.heappush(results, (-dn, n))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        return sorted((-d, n) for d, n in results)
+
+    def _select(self, ranked: list, limit: int) -> list:
+        """
+        Neighbour-selection heuristic: keep a candidate only if it is closer to
+        the base than to every neighbour kept so far (spreads links across
+        clusters), then top up with the nearest of the rest.
+        """
+        signatures = self.signatures
+        kept, skipped = [], []
+        for d, n in ranked:
+            if len(kept) >= limit:
+                break
+            if all(d < hamming(signatures[n], signatures[k]) for k in kept):
+                kept.append(n)
+            else:
+                skipped.append(n)
+        return kept + skipped[:limit - len(kept)]
+
+    def frequencies_from_dir(self, directory: Path, seen: set) -> int:
+        """Count document frequencies of files whose source_id is not in `seen` (no inserts)"""
+        counted = 0
+        for path in iter_enriched_files(directory):
+            record = load_enriched(path)
+            source_id = record.get("source_id") or path.stem.replace('_enriched', '')
+            if source_id in seen:
+                continue
+            seen.add(source_id)
+            self.count_frequencies(term_counts(record))
+            counted += 1
+        return counted
+
+    def update_from_dir(self, directory: Path, since: int = 0, count_frequencies: bool = True) -> dict:
+        """Insert *_enriched.json files modified after `since` (mtime_ns)"""
+        stats = {"scanned": 0, "added": 0, "updated": 0, "skipped": 0, "newest": since}
+        for path in iter_enriched_files(directory):
+            stats["scanned"] += 1
+            mtime_ns = path.stat().st_mtime_ns
+            if mtime_ns <= since:
+                stats["skipped"] += 1
+                continue
+            record = load_enriched(path)
+            record.setdefault("source_id", path.stem.replace('_enriched', ''))
+            stats[self.add_record(record, count_frequencies)] += 1
+            stats["newest"] = max(stats["newest"], mtime_ns)
+        return stats
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def query_signature(self, signature: int, k: int = DEFAULT_TOP_K, exclude: str = None,
+                        exhaustive: bool = None, ef: int = EF_SEARCH) -> list:
+        if self.entry is None:
+            return []
+        if exhaustive is None:
+            exhaustive = len(self.ids) <= BRUTE_FORCE_LIMIT
+        if exhaustive:
+            scored = sorted((hamming(signature, s), n) for n, s in enumerate(self.signatures))
+        else:
+            entry = self.entry
+            for layer in range(len(self.links[entry]) - 1, 0, -1):
+                entry = self._greedy(signature, entry, layer)
+            scored = self._search_layer(signature, [entry], max(ef, k + 1), 0)
+        results = []
+        for d, n in scored:
+            source_id = self.ids[n]
+            if source_id is None or source_id == exclude:
+                continue
+            results.append({"source_id": source_id, "distance": d, "similarity": round(similarity(d), 3)})
+            if len(results) == k:
+                break
+        return results
+
+    def similar_to(self, source_id: str, k: int = DEFAULT_TOP_K, exhaustive: bool = None) -> list:
+        """Posts most similar to an indexed post"""
+        if source_id not in self.doc_numbers:
+            raise ValueError(f"Unknown source_id: {source_id}")
+        return self.query_signature(self.signatures[self.doc_numbers[source_id]], k, exclude=source_id,
+                                    exhaustive=exhaustive)
+
+    def similar_to_text(self, text: str, key_phrases: list = None, k: int = DEFAULT_TOP_K) -> list:
+        """Posts most similar to free text"""
+        return self.query_signature(self.signature_for({"text": text, "key_phrases": key_phrases}), k)
+
+    def query(self, request: dict) -> list:
+        """
+        JSON entry point for the chatbot tool.
+
+        request: {"source_id": "t3_xxx", "k": 10} or {"text": "...", "k": 10}
+        """
+        k = request.get("k", DEFAULT_TOP_K)
+        if request.get("source_id"):
+            return self.similar_to(request["source_id"], k)
+        if request.get("text"):
+            return self.similar_to_text(request["text"], request.get("key_phrases"), k)
+        raise ValueError("query requires 'source_id' or 'text'")
+
+    def __len__(self) -> int:
+        return len(self.doc_numbers)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def to_dict(self) -> dict:
+        width = SIGNATURE_BITS // 8
+        # Flat links: per node [layers, len, neighbours..., len, neighbours...]
+        flat = array("i")
+        for layers in self.links:
+            flat.append(len(layers))
+            for neighbours in layers:
+                flat.append(len(neighbours))
+                flat.extend(neighbours)
+        return {
+            "version": INDEX_FORMAT_VERSION,
+            "signature_bits": SIGNATURE_BITS,
+            "documents": self.documents,
+            "entry": self.entry,
+            "ids": self.ids,
+            "signatures": base64.b64encode(b"".join(s.to_bytes(width, "little")
+                                                    for s in self.signatures)).decode("ascii"),
+            "links": base64.b64encode(flat.tobytes()).decode("ascii"),
+            "df": base64.b64encode(b"".join(f.to_bytes(4, "little") + n.to_bytes(4, "little")
+                                            for f, n in self.df.items())).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SimilarPostIndex":
+        if data.get("version") != INDEX_FORMAT_VERSION or data.get("signature_bits") != SIGNATURE_BITS:
+            raise ValueError(f"Unsupported index format: version {data.get('version')}, "
+                             f"{data.get('signature_bits')} bits")
+        index = cls()
+        index.documents = data["documents"]
+        index.entry = data["entry"]
+        index.ids = data["ids"]
+        index.doc_numbers = {sid: n for n, sid in enumerate(index.ids) if sid is not None}
+        width = SIGNATURE_BITS // 8
+        raw = base64.b64decode(data["signatures"])
+        index.signatures = [int.from_bytes(raw[i:i + width], "little") for i in range(0, len(raw), width)]
+        flat = array("i")
+        flat.frombytes(base64.b64decode(data["links"]))
+        pos = 0
+        for _ in index.ids:
+            layers = []
+            for _ in range(flat[pos]):
+                size = flat[pos + 1]
+                layers.append(flat[pos + 2:pos + 2 + size].tolist())
+                pos += 1 + size
+            pos += 1
+            index.links.append(layers)
+        raw = base64.b64decode(data["df"])
+        for i in range(0, len(raw), 8):
+            index.df[int.from_bytes(raw[i:i + 4], "little")] = int.from_bytes(raw[i + 4:i + 8], "little")
+        return index
+
+    def save(self, path: Path = DEFAULT_INDEX_PATH, high_water_mark: int = 0):
+        """Write the index atomically"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({**self.to_dict(), "high_water_mark": high_water_mark}, f)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_INDEX_PATH) -> tuple:
+        """(index, high_water_mark); an empty index if none exists yet"""
+        path = Path(path)
+        if not path.exists():
+            return cls(), 0
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return cls.from_dict(data), data.get("high_water_mark", 0)
+
+
+def _synthetic_posts(n: int, seed: int = 11) -> list:
+    """Clusters of paraphrased posts over a Zipf-ish vocabulary"""
+    rng = random.Random(seed)
+    vocabulary = [f"w{i}" for i in range(20000)]
+    cumulative = list(itertools.accumulate(1 / (i + 1) for i in range(len(vocabulary))))
+    posts = []
+    clusters = max(1, n // 20)
+    bases = [rng.choices(vocabulary, cum_weights=cumulative, k=60) for _ in range(clusters)]
+    for i in range(n):
+        base = bases[i % clusters]
+        noise = iter(rng.choices(vocabulary, cum_weights=cumulative, k=len(base)))
+        words = [w if rng.random() > 0.3 else next(noise) for w in base]
+        posts.append({"source_id": f"s{i}", "text": " ".join(words)})
+    return posts
+
+
+def bench(posts: int, queries: int = 200) -> dict:
+    """Insert rate, query latency and recall@10 against brute-force Hamming ranking"""
+    data = _synthetic_posts(posts)
+    index = SimilarPostIndex()
+    started = time.perf_counter()
+    for record in data:
+        index.add_record(record)
+    insert_s = time.perf_counter() - started
+
+    rng = random.Random(5)
+    sample = rng.sample(range(posts), min(queries, posts))
+    latencies, scan_latencies, recalls = [], [], []
+    for i in sample:
+        source_id = data[i]["source_id"]
+        started = time.perf_counter()
+        found = index.similar_to(source_id, 10, exhaustive=False)
+        latencies.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        exact = index.similar_to(source_id, 10, exhaustive=True)
+        scan_latencies.append((time.perf_counter() - started) * 1000)
+        # Ties at the cutoff distance count as hits
+        cutoff = exact[-1]["distance"]
+        recalls.append(min(1.0, sum(1 for r in found if r["distance"] <= cutoff) / len(exact)))
+    latencies.sort()
+    return {
+        "posts": posts,
+        "us_per_insert": insert_s / posts * 1e6,
+        "query_p50_ms": latencies[len(latencies) // 2],
+        "query_p95_ms": latencies[int(len(latencies) * 0.95)],
+        "scan_p50_ms": sorted(scan_latencies)[len(scan_latencies) // 2],
+        "recall_at_10": sum(recalls) / len(recalls),
+        "neighbour_similarity": sum(r["similarity"] for r in exact) / len(exact),
+    }
+
+
+def _titles(directories: list) -> dict:
+    titles = {}
+    for directory in directories or []:
+        for path in iter_enriched_files(directory):
+            record = load_enriched(path)
+            titles[record.get("source_id") or path.stem.replace('_enriched', '')] = \
+                (record.get("title") or record.get("text") or "").replace("\n", " ")[:60]
+    return titles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Similar-post index (hashed TF-IDF, SimHash, HNSW)")
+    parser.add_argument("--index", type=Path, default=DEFAULT_INDEX_PATH, help="Index file path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("build", "Insert new or modified enriched outputs"),
+                            ("rebuild", "Rebuild from scratch (signatures with final document frequencies)")):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument("--input", type=Path, required=True, action="append",
+                         help="Directory of *_enriched.json files (repeatable)")
+
+    query = sub.add_parser("query", help="Top-k similar posts")
+    query.add_argument("--source-id", help="Indexed post to find neighbours of")
+    query.add_argument("--text", help="Free text to find neighbours of")
+    query.add_argument("-k", type=int, default=DEFAULT_TOP_K)
+    query.add_argument("--input", type=Path, action="append", help="Directory to show titles from")
+    query.add_argument("--json", action="store_true", help="Print raw JSON")
+
+    bench_cmd = sub.add_parser("bench", help="Synthetic insert/query/recall benchmark")
+    bench_cmd.add_argument("--posts", type=int, default=50_000)
+
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        result = bench(args.posts)
+        print(f"  {result['posts']:,} posts: {result['us_per_insert']:.0f} µs/insert")
+        print(f"  HNSW query: p50 {result['query_p50_ms']:.2f} ms, p95 {result['query_p95_ms']:.2f} ms")
+        print(f"  Full scan:  p50 {result['scan_p50_ms']:.2f} ms")
+        print(f"  recall@10 vs full scan: {result['recall_at_10'] * 100:.1f}% "
+              f"(neighbour cosine ~{result['neighbour_similarity']:.2f})")
+        return
+
+    if args.command in ("build", "rebuild"):
+        index, high_water_mark = (SimilarPostIndex(), 0) if args.command == "rebuild" else \
+            SimilarPostIndex.load(args.index)
+        if args.command == "rebuild":
+            # First pass only counts document frequencies; the second builds the graph with them
+            seen = set()
+            for directory in args.input:
+                index.frequencies_from_dir(directory, seen)
+        newest = high_water_mark
+        for directory in args.input:
+            if not directory.exists():
+                print(f"❌ Input directory not found: {directory}")
+                sys.exit(1)
+            stats = index.update_from_dir(directory, since=high_water_mark,
+                                          count_frequencies=args.command == "build")
+            newest = max(newest, stats["newest"])
+            print(f"  {directory}: {stats['added']} added, {stats['updated']} updated, "
+                  f"{stats['skipped']} unchanged ({stats['scanned']} scanned)")
+        index.save(args.index, newest)
+        print(f"✅ Index saved: {args.index} ({len(index):,} posts)")
+        return
+
+    index, _ = SimilarPostIndex.load(args.index)
+    if not len(index):
+        print(f"❌ No index found at {args.index} - run 'build' first")
+        sys.exit(1)
+    try:
+        results = index.query({"source_id": args.source_id, "text": args.text, "k": args.k})
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    titles = _titles(args.input)
+    print(f"\n{'='*70}")
+    print(f"  SIMILAR TO: {args.source_id or args.text[:50]}")
+    print(f"{'='*70}")
+    for r in results:
+        print(f"  {r['similarity']:>6.3f}  {r['source_id']:<16} {titles.get(r['source_id'], '')}")
+
+
+if __name__ == "__main__":
+    main()
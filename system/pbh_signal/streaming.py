@@ -0,0 +1,174 @@
+"""
+PBH SIGNAL - Streaming Structured Output
+
+Incremental parsing of a streamed JSON object so each top-level field is
+available as soon as its value is complete, instead of after the whole
+enrichment has been generated.
+
+Structured outputs are emitted in schema property order, so
+streaming_schema() moves the safety fields (flags, relevance_label,
+bariatric_context) to the front. Safety routing can then fire after a few
+dozen tokens. Note the prompt asks for bariatric_context to be evaluated
+after entity extraction; compare Tier 1 results (compare_v7.py) on the
+reordered schema before relying on it.
+"""
+
+import copy
+import json
+import math
+import time
+
+# Tier 1 fields, generated first in streaming mode
+SAFETY_FIELDS = ['flags', 'relevance_label', 'bariatric_context']
+
+# Flags that trigger safety routing
+ALERT_FLAGS = {'adverse_event', 'crisis'}
+
+
+def streaming_schema(response_format: dict, first: list = None) -> dict:
+    """Copy of a response format with `first` fields moved to the front of properties/required"""
+    first = list(first or SAFETY_FIELDS)
+    reordered = copy.deepcopy(response_format)
+    schema = reordered["schema"]
+
+    props = schema["properties"]
+    schema["properties"] = {**{k: props[k] for k in first if k in props},
+                            **{k: v for k, v in props.items() if k not in first}}
+    required = schema.get("required", [])
+    schema["required"] = [k for k in first if k in required] + [k for k in required if k not in first]
+    return reordered
+
+
+class IncrementalObjectParser:
+    """
+    Feed chunks of a JSON object; completed top-level (key, value) pairs are
+    returned from feed() as soon as the value's closing character arrives.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.expect = "key"     # key -> colon -> value
+        self.key_chars = []
+        self.value_chars = []
+        self.key = None
+        self.fields = {}
+        self.done = False
+
+    def feed(self, chunk: str) -> list:
+        completed = []
+        for ch in chunk:
+            if self.done:
+                break
+
+            if self.in_string:
+                if self.expect == "key" and self.depth == 1:
+                    if self.escape:
+                        self.key_chars.append(ch)
+                        self.escape = False
+                    elif ch == "\\":
+                        self.key_chars.append(ch)
+                        self.escape = True
+                    elif ch == '"':
+                        self.in_string = False
+                        self.key = json.loads('"' + "".join(self.key_chars) + '"')
+                        self.key_chars = []
+                        self.expect = "colon"
+                    else:
+                        self.key_chars.append(ch)
+                    continue
+                self.value_chars.append(ch)
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                continue
+
+            if self.depth == 0:
+                if ch == "{":
+                    self.depth = 1
+                continue
+
+            if self.expect == "key":
+                if ch == '"':
+                    self.in_string = True
+                elif ch == "}":
+                    self.done = True
+                continue
+
+            if self.expect == "colon":
+                if ch == ":":
+                    self.expect = "value"
+                continue
+
+            # expect == "value"
+            if self.depth == 1 and ch in ",}":
+                completed.append(self._finish_value())
+                if ch == "}":
+                    self.done = True
+                continue
+
+            if ch == '"':
+                self.in_string = True
+            elif ch in "[{":
+                self.depth += 1
+            elif ch in "]}":
+                self.depth -= 1
+            self.value_chars.append(ch)
+
+        return completed
+
+    def _finish_value(self) -> tuple:
+        value = json.loads("".join(self.value_chars))
+        key = self.key
+        self.fields[key] = value
+        self.value_chars = []
+        self.key = None
+        self.expect = "key"
+        return key, value
+
+
+def consume_stream(chunks, on_field=None, started: float = None) -> tuple:
+    """
+    Parse an iterable of text chunks. Calls on_field(key, value, elapsed_s) for
+    every completed top-level field. Returns (object, timings) where timings
+    has seconds to each safety field, to all safety fields, and to completion,
+    measured from `started` (time.perf_counter() when the request was sent).
+    """
+    if started is None:
+        started = time.perf_counter()
+    parser = IncrementalObjectParser()
+    timings = {}
+    pending_safety = set(SAFETY_FIELDS)
+    text = []
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        text.append(chunk)
+        now = time.perf_counter() - started
+        timings.setdefault("first_token", now)
+        for key, value in parser.feed(chunk):
+            if key in pending_safety:
+                timings[f"time_to_{key}"] = now
+                pending_safety.discard(key)
+                if not pending_safety:
+                    timings["time_to_tier1"] = now
+            if on_field is not None:
+                on_field(key, value, now)
+
+    timings["time_to_complete"] = time.perf_counter() - started
+    # The incremental parse is a fast path; the full document stays authoritative
+    return json.loads("".join(text)), timings
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Incremental Trends and Anomaly Alerts
+
+Answers "is dizziness chatter rising this week?" without re-reading every
+enriched post. Records are folded in as they are produced; each one touches
+only its own (facet, value) counters, so an update costs O(facets in the
+post), not O(history).
+
+State:
+- Per series ((facet, value), e.g. ("symptoms", "dizziness")): post counts
+  per time bucket of `published_at` (day or ISO week), pruned to the last
+  RETAIN_BUCKETS buckets
+- Per series: EWMA mean/variance of the bucket count and, for daily
+  buckets, a seasonal EWMA mean per weekday (chatter is lower at weekends)
+  plus an EWMA variance of the residuals from it, pooled over all weekdays
+
+A bucket is closed once a post ALLOWED_LATENESS buckets newer arrives.
+Closing scores every series' count against its EWMA (seasonal z-score once
+the weekday baseline is warm, plain z-score before) and then folds the count
+in. Cost per closed bucket is O(series). Posts that land in an already
+closed bucket are counted but do not revise its baseline (reported as late).
+
+Alerts: z >= Z_THRESHOLD with at least MIN_COUNT posts, after WARMUP closed
+buckets. The open (current) bucket is scored provisionally on request.
+
+Usage:
+    python -m pbh_signal.trends build --input v7/testing/api_test_outputs/v7
+    python -m pbh_signal.trends series --facet symptoms --value dizziness
+    python -m pbh_signal.trends alerts
+    python -m pbh_signal.trends bench --posts 50000
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from pbh_signal.records import facet_values, iter_enriched_files, load_enriched, parse_published_at
+
+BASE_DIR = Path(__file__).parent
+DEFAULT_TRENDS_PATH = BASE_DIR.parent / "cache" / "trends.json"
+
+TRENDS_FORMAT_VERSION = 1
+
+TREND_FACETS = ['symptoms', 'treatments', 'conditions', 'emotions', 'source']
+BUCKETS = ('day', 'week')
+DEFAULT_BUCKET = 'day'
+SEASON_LENGTH = {'day': 7, 'week': None}
+
+ALPHA = 0.2                 # EWMA weight of the newest bucket (mean)
+VAR_ALPHA = 0.05            # slower for the variance; a noisy spread estimate inflates z
+SEASONAL_ALPHA = 0.3        # per-weekday baselines see 1/7 of the buckets
+WARMUP = 7                  # closed buckets before a series can alert
+SEASONAL_WARMUP = 3         # closed buckets per weekday before the seasonal z is used
+VAR_FLOOR = 1.0             # keeps z finite for series that were flat
+Z_THRESHOLD = 3.0
+MIN_COUNT = 3
+ALLOWED_LATENESS = 1        # buckets a post may arrive late before its bucket closes
+RETAIN_BUCKETS = 120
+MAX_ALERTS = 1000
+
+
+def bucket_of(published_at: str, bucket: str = DEFAULT_BUCKET):
+    """Integer bucket for a published_at value (None if unparseable)"""
+    dt = parse_published_at(published_at)
+    if dt is None:
+        return None
+    ordinal = dt.date().toordinal()
+    # date.fromordinal(1) is a Monday, so weeks start on Monday like ISO weeks
+    return ordinal if bucket == 'day' else (ordinal - 1) // 7
+
+
+def bucket_label(index: int, bucket: str = DEFAULT_BUCKET) -> str:
+    """"2025-12-05" for days, "2025-W49" for weeks"""
+    if bucket == 'day':
+        return date.fromordinal(index).isoformat()
+    year, week, _ = date.fromordinal(index * 7 + 1).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _ewma(state: list, x: float, alpha: float):
+    """Fold x into [mean, var, n] (exponentially weighted mean and variance)"""
+    if state[2] == 0:
+        state[0] = x
+    diff = x - state[0]
+    state[0] += alpha * diff
+    state[1] = (1 - VAR_ALPHA) * state[1] + VAR_ALPHA * diff * diff
+    state[2] += 1
+
+
+def _variance(state: list) -> float:
+    """EWMA variance corrected for its zero start"""
+    if not state[2]:
+        return 0.0
+    return state[1] / (1 - (1 - VAR_ALPHA) ** state[2])
+
+
+def _z(state: list, x: float, mean: float = None) -> float:
+    return (x - (state[0] if mean is None else mean)) / math.sqrt(_variance(state) + VAR_FLOOR)
+
+
+class TrendEngine:
+    """Time-bucketed facet counters with incremental EWMA anomaly detection"""
+
+    def __init__(self, facets: list = None, bucket: str = DEFAULT_BUCKET):
+        if bucket not in BUCKETS:
+            raise ValueError(f"Unknown bucket: {bucket} (available: {', '.join(BUCKETS)})")
+        self.facets = list(facets or TREND_FACETS)
+        self.bucket = bucket
+        self.season = SEASON_LENGTH[bucket]
+        self.counts = {}        # (facet, value) -> {bucket: posts}
+        self.totals = {}        # bucket -> posts
+        self.baselines = {}     # (facet, value) -> [mean, var, closed buckets]
+        self.seasonal = {}      # (facet, value) -> {phase: [mean, var, n], "resid": [mean, var, n]}
+        self.records = {}       # source_id -> snapshot
+        self.watermark = None   # newest bucket seen
+        self.closed = None      # newest closed bucket
+        self.alerts = []
+        self.stats = {"added": 0, "updated": 0, "unchanged": 0, "late": 0, "undated": 0}
+
+    # ------------------------------------------------------------------
+    # Ingest
+    # ------------------------------------------------------------------
+
+    def snapshot(self, record: dict) -> dict:
+        """Reduce a record to its bucket and (facet, value) pairs"""
+        pairs = []
+        for field in self.facets:
+            for value in facet_values(record, field):
+                pairs.append([field, value])
+        return {"bucket": bucket_of(record.get("published_at"), self.bucket), "pairs": pairs}
+
+    def _apply(self, snap: dict, delta: int):
+        b = snap["bucket"]
+        _bump(self.totals, b, delta)
+        for field, value in snap["pairs"]:
+            key = (field, value)
+            series = self.counts.get(key)
+            if series is None:
+                series = self.counts[key] = {}
+                # A new series has been zero for every bucket closed so far
+                closed = self.baselines_closed()
+                self.baselines[key] = [0.0, 0.0, closed]
+                self.seasonal[key] = {}
+            _bump(series, b, delta)
+
+    def baselines_closed(self) -> int:
+        """Buckets closed so far (the history a brand-new series inherits as zeros)"""
+        return max((state[2] for state in self.baselines.values()), default=0)
+
+    def add_record(self, record: dict, mtime_ns: int = None) -> str:
+        """Add or replace a record; returns "added", "updated", "unchanged" or "undated" """
+        source_id = record.get("source_id")
+        if not source_id:
+            raise ValueError("Record has no source_id")
+        snap = self.snapshot(record)
+        if snap["bucket"] is None:
+            self.stats["undated"] += 1
+            return "undated"
+        snap["mtime_ns"] = mtime_ns
+
+        old = self.records.get(source_id)
+        if old is not None:
+            if old["bucket"] == snap["bucket"] and old["pairs"] == snap["pairs"]:
+                old["mtime_ns"] = mtime_ns
+                self.stats["unchanged"] += 1
+                return "unchanged"
+            self._apply(old, -1)
+            status = "updated"
+        else:
+            status = "added"
+
+        if self.closed is not None and snap["bucket"] <= self.closed:
+            self.stats["late"] += 1
+        self._apply(snap, 1)
+        self.records[source_id] = snap
+        self.stats[status] += 1
+        self._advance(snap["bucket"])
+        return status
+
+    def update_from_dir(self, directory: Path) -> dict:
+        """Fold new or modified *_enriched.json files in published_at order"""
+        stats = {"scanned": 0, "added": 0, "updated": 0, "unchanged": 0, "skipped": 0, "undated": 0}
+        known_mtimes = {sid: snap.get("mtime_ns") for sid, snap in self.records.items()}
+        pending = []
+        for path in iter_enriched_files(directory):
+            stats["scanned"] += 1
+            source_id = path.stem.replace('_enriched', '')
+            mtime_ns = path.stat().st_mtime_ns
+            if known_mtimes.get(source_id) == mtime_ns:
+                stats["skipped"] += 1
+                continue
+            record = load_enriched(path)
+            record.setdefault("source_id", source_id)
+            pending.append((record.get("published_at") or "", mtime_ns, record))
+        # A batch arrives together, so fold it oldest first to avoid spurious lateness
+        for _, mtime_ns, record in sorted(pending, key=lambda x: x[0]):
+            stats[self.add_record(record, mtime_ns=mtime_ns)] += 1
+        return stats
+
+    # ------------------------------------------------------------------
+    # Bucket closing and scoring
+    # ------------------------------------------------------------------
+
+    def _advance(self, b: int):
+        if self.watermark is None or b > self.watermark:
+            self.watermark = b
+        close_through = self.watermark - ALLOWED_LATENESS
+        if self.closed is None:
+            # Start closing from the first bucket with data
+            self.closed = min(self.totals) - 1
+        while self.closed < close_through:
+            self.closed += 1
+            self._close(self.closed)
+
+    def _close(self, b: int):
+        label = bucket_label(b, self.bucket)
+        for key, series in self.counts.items():
+            x = series.get(b, 0)
+            alert = self._score(key, x, b)
+            if alert is not None:
+                self.alerts.append({**alert, "bucket": label})
+            _ewma(self.baselines[key], x, ALPHA)
+            if self.season:
+                seasonal = self.seasonal[key]
+                phase = seasonal.setdefault(str(b % self.season), [0.0, 0.0, 0])
+                if phase[2]:
+                    _ewma(seasonal.setdefault("resid", [0.0, 0.0, 0]), x - phase[0], ALPHA)
+                _ewma(phase, x, SEASONAL_ALPHA)
+            # Prune history beyond the retention window
+            for old in [k for k in series if k <= b - RETAIN_BUCKETS]:
+                del series[old]
+        for old in [k for k in self.totals if k <= b - RETAIN_BUCKETS]:
+            del self.totals[old]
+        del self.alerts[:-MAX_ALERTS]
+
+    def _score(self, key: tuple, x: int, b: int):
+        """Alert dict if x is anomalous for the series at bucket b, else None"""
+        baseline = self.baselines[key]
+        if baseline[2] < WARMUP or x < MIN_COUNT:
+            return None
+        expected, z, method = baseline[0], _z(baseline, x), "ewma"
+        if self.season:
+            seasonal = self.seasonal[key]
+            phase = seasonal.get(str(b % self.season))
+            if phase is not None and phase[2] >= SEASONAL_WARMUP:
+                # Weekday mean, residual spread pooled across weekdays
+                resid = seasonal["resid"]
+                expected, method = phase[0], "seasonal"
+                z = _z(resid, x, phase[0] + resid[0])
+        if z < Z_THRESHOLD:
+            return None
+        return {"facet": key[0], "value": key[1], "count": x, "expected": round(expected, 2),
+                "z": round(z, 2), "method": method}
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def series(self, facet: str, value: str, last: int = 14) -> dict:
+        """Counts for the last `last` buckets (oldest first) with the current baseline"""
+        key = (facet, value)
+        if facet not in self.facets:
+            raise ValueError(f"Unknown facet: {facet} (available: {', '.join(self.facets)})")
+        counts = self.counts.get(key, {})
+        points = []
+        if self.watermark is not None:
+            for b in range(self.watermark - last + 1, self.watermark + 1):
+                points.append({"bucket": bucket_label(b, self.bucket), "count": counts.get(b, 0),
+                               "posts": self.totals.get(b, 0), "closed": b <= self.closed})
+        baseline = self.baselines.get(key, [0.0, 0.0, 0])
+        return {
+            "facet": facet,
+            "value": value,
+            "bucket": self.bucket,
+            "points": points,
+            "baseline": {"mean": round(baseline[0], 3), "std": round(math.sqrt(_variance(baseline)), 3),
+                         "closed_buckets": baseline[2]},
+        }
+
+    def current(self, facet: str = None) -> list:
+        """Provisional alerts for the open bucket (its count can still grow)"""
+        if self.watermark is None:
+            return []
+        alerts = []
+        for key, series in self.counts.items():
+            if facet and key[0] != facet:
+                continue
+            alert = self._score(key, series.get(self.watermark, 0), self.watermark)
+            if alert is not None:
+                alerts.append({**alert, "bucket": bucket_label(self.watermark, self.bucket),
+                               "provisional": True})
+        return sorted(alerts, key=lambda a: -a["z"])
+
+    def recent_alerts(self, facet: str = None, last: int = 7) -> list:
+        """Alerts raised on the last `last` closed buckets, plus provisional ones"""
+        if self.closed is None:
+            return []
+        since = bucket_label(self.closed - last + 1, self.bucket)
+        closed = [a for a in self.alerts if a["bucket"] >= since and (not facet or a["facet"] == facet)]
+        return self.current(facet) + sorted(closed, key=lambda a: (a["bucket"], -a["z"]), reverse=True)
+
+    def query(self, request: dict) -> dict:
+        """
+        JSON entry point for the chatbot tool.
+
+        request: {"facet": "symptoms", "value": "dizziness", "last": 14}  -> series
+                 {"alerts": true, "facet": "symptoms", "last": 7}          -> alerts
+        """
+        if request.get("alerts"):
+            return {"bucket": self.bucket,
+                    "alerts": self.recent_alerts(request.get("facet"), request.get("last", 7))}
+        if not request.get("facet") or not request.get("value"):
+            raise ValueError("query requires 'facet' and 'value' (or 'alerts': true)")
+        return self.series(request["facet"], request["value"], request.get("last", 14))
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def to_dict(self) -> dict:
+        return {
+            "version": TRENDS_FORMAT_VERSION,
+            "facets": self.facets,
+            "bucket": self.bucket,
+            "watermark": self.watermark,
+            "closed": self.closed,
+            "totals": [[b, n] for b, n in self.totals.items()],
+            "series": [[f, v, [[b, n] for b, n in s.items()], self.baselines[(f, v)], self.seasonal[(f, v)]]
+                       for (f, v), s in self.counts.items()],
+            "records": self.records,
+            "alerts": self.alerts,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TrendEngine":
+        if data.get("version") != TRENDS_FORMAT_VERSION:
+            raise ValueError(f"Unsupported trends format version: {data.get('version')}")
+        engine = cls(facets=data["facets"], bucket=data["bucket"])
+        engine.watermark = data["watermark"]
+        engine.closed = data["closed"]
+        engine.totals = {b: n for b, n in data["totals"]}
+        for field, value, counts, baseline, seasonal in data["series"]:
+            engine.counts[(field, value)] = {b: n for b, n in counts}
+            engine.baselines[(field, value)] = baseline
+            engine.seasonal[(field, value)] = seasonal
+        engine.records = data["records"]
+        engine.alerts = data["alerts"]
+        return engine
+
+    def save(self, path: Path = DEFAULT_TRENDS_PATH):
+        """Write state atomically"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_TRENDS_PATH, bucket: str = DEFAULT_BUCKET) -> "TrendEngine":
+        """Load state from disk, or return an empty engine if none exists yet"""
+        path = Path(path)
+        if not path.exists():
+            return cls(bucket=bucket)
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+
+def _bump(cells: dict, key, delta: int):
+    n = cells.get(key, 0) + delta
+    if n:
+        cells[key] = n
+    else:
+        cells.pop(key, None)
+
+
+def print_series(result: dict):
+    print(f"\n{'='*70}")
+    print(f"  {result['facet']}: {result['value']} (per {result['bucket']})")
+    print(f"{'='*70}")
+    peak = max((p["count"] for p in result["points"]), default=0) or 1
+    for p in result["points"]:
+        bar = "█" * round(30 * p["count"] / peak)
+        print(f"  {p['bucket']:<12} {p['count']:>5} / {p['posts']:<6} {bar}{'' if p['closed'] else '  (open)'}")
+    b = result["baseline"]
+    print(f"\n  Baseline: {b['mean']:.2f} ± {b['std']:.2f} posts/{result['bucket']} "
+          f"over {b['closed_buckets']} closed buckets")
+
+
+def print_alerts(alerts: list):
+    print(f"\n{'='*70}")
+    print(f"  TREND ALERTS (z >= {Z_THRESHOLD}, n >= {MIN_COUNT})")
+    print(f"{'='*70}")
+    if not alerts:
+        print("  None")
+    for a in alerts:
+        flag = " (provisional)" if a.get("provisional") else ""
+        print(f"  {a['bucket']:<12} {a['facet']:<12} {a['value']:<28} {a['count']:>4} vs {a['expected']:>6.2f} "
+              f"z={a['z']:>5.1f} {a['method']}{flag}")
+
+
+def bench(posts: int, days: int = 120, seed: int = 7) -> dict:
+    """Synthetic stream with weekly seasonality and an injected spike"""
+    rng = random.Random(seed)
+    symptoms = [f"symptom_{i}" for i in range(40)]
+    spike_day = days - 10
+    start = date(2025, 1, 6)
+    per_day = posts // days
+    engine = TrendEngine()
+    elapsed = 0.0
+    n = 0
+    for d in range(days):
+        day = start + timedelta(days=d)
+        volume = per_day // 2 if day.weekday() >= 5 else per_day
+        batch = []
+        for _ in range(volume):
+            picked = rng.sample(symptoms, 2)
+            if d == spike_day and rng.random() < 0.15:
+                picked.append("dizziness")
+            elif rng.random() < 0.01:
+                picked.append("dizziness")
+            batch.append({"source_id": f"p{n}", "published_at": f"{day.isoformat()} 12:00:00",
+                          "source": rng.choice(["reddit", "facebook"]), "symptoms": picked})
+            n += 1
+        started = time.perf_counter()
+        for record in batch:
+            engine.add_record(record)
+        elapsed += time.perf_counter() - started
+    spike = bucket_label(start.toordinal() + spike_day)
+    return {
+        "posts": n,
+        "us_per_post": elapsed / n * 1e6,
+        "series": len(engine.counts),
+        "alerts": len(engine.alerts),
+        "spike_detected": any(a["value"] == "dizziness" and a["bucket"] == spike for a in engine.alerts),
+        "false_alerts": sum(1 for a in engine.alerts if not (a["value"] == "dizziness" and a["bucket"] == spike)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental trend counters and anomaly alerts")
+    parser.add_argument("--state", type=Path, default=DEFAULT_TRENDS_PATH, help="Trend state path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Fold enriched outputs into the trend state")
+    build.add_argument("--input", type=Path, required=True, action="append",
+                       help="Directory of *_enriched.json files (repeatable)")
+    build.add_argument("--rebuild", action="store_true", help="Discard existing state first")
+    build.add_argument("--bucket", choices=BUCKETS, default=DEFAULT_BUCKET, help="Bucket size for a new state")
+
+    series = sub.add_parser("series", help="Show one series")
+    series.add_argument("--facet", required=True, help=f"One of: {', '.join(TREND_FACETS)}")
+    series.add_argument("--value", required=True, help="Facet value, e.g. dizziness")
+    series.add_argument("--last", type=int, default=14, help="Buckets to show")
+    series.add_argument("--json", action="store_true", help="Print raw JSON")
+
+    alerts = sub.add_parser("alerts", help="Show recent and provisional alerts")
+    alerts.add_argument("--facet", help="Limit to one facet")
+    alerts.add_argument("--last", type=int, default=7, help="Closed buckets to include")
+    alerts.add_argument("--json", action="store_true", help="Print raw JSON")
+
+    bench_cmd = sub.add_parser("bench", help="Synthetic stream: per-post cost and spike detection")
+    bench_cmd.add_argument("--posts", type=int, default=50000)
+
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        result = bench(args.posts)
+        print(f"  {result['posts']:,} posts, {result['series']} series: {result['us_per_post']:.1f} µs/post")
+        print(f"  Injected spike detected: {'yes' if result['spike_detected'] else 'no'}; "
+              f"other alerts: {result['false_alerts']}")
+        return
+
+    if args.command == "build":
+        engine = TrendEngine(bucket=args.bucket) if args.rebuild else TrendEngine.load(args.state, args.bucket)
+        for directory in args.input:
+            if not directory.exists():
+                print(f"❌ Input directory not found: {directory}")
+                sys.exit(1)
+            stats = engine.update_from_dir(directory)
+            print(f"  {directory}: {stats['added']} added, {stats['updated']} updated, "
+                  f"{stats['unchanged'] + stats['skipped']} unchanged, {stats['undated']} undated "
+                  f"({stats['scanned']} scanned)")
+        engine.save(args.state)
+        print(f"✅ Trend state saved: {args.state} ({len(engine.records)} posts, {len(engine.counts)} series, "
+              f"{engine.stats['late']} late)")
+        return
+
+    engine = TrendEngine.load(args.state)
+    if not engine.records:
+        print(f"❌ No trend state found at {args.state} - run 'build' first")
+        sys.exit(1)
+    try:
+        if args.command == "series":
+            result = engine.query({"facet": args.facet, "value": args.value, "last": args.last})
+        else:
+            result = engine.query({"alerts": True, "facet": args.facet, "last": args.last})
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    elif args.command == "series":
+        print_series(result)
+    else:
+        print_alerts(result["alerts"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+PBH SIGNAL - Enrichment Work Queue
+
+Lets any number of enrichment workers share one backlog, so throughput is
+not capped at one process and one API key's quota, and a lost worker does
+not lose (or double-bill) posts:
+
+- enqueue:    posts keyed by (queue, source_id); re-enqueueing a known post
+              is a no-op, so every worker can enqueue the same selection
+- lease:      hands out pending posts with a visibility timeout; each lease
+              carries a lease_id that fences later heartbeats/completions
+- heartbeat:  extends a lease while the API call runs (LeaseKeeper does it
+              for every lease a worker holds, from a background thread)
+- complete:   marks the post done only if the caller still holds the lease
+- fail:       returns the post to pending, or dead after MAX_ATTEMPTS
+- crash:      leases that expire without a heartbeat are leased again on
+              the next lease() call (counted as an attempt)
+
+WorkQueue is the interface; SQLiteWorkQueue (WAL mode, one file shared by
+worker processes on a host, default system/cache/work_queue.sqlite) is the
+local implementation. Workers on several hosts need a backend on a shared
+server (e.g. Postgres SELECT ... FOR UPDATE SKIP LOCKED) implementing the
+same methods - SQLite files must not be shared over network filesystems.
+
+Usage (workers are v7/testing/run_api_test.py --queue; start as many as wanted):
+    python -m pbh_signal.work_queue stats [--queue v7]
+    python -m pbh_signal.work_queue enqueue --input v6/testing/normalized_inputs --queue v7
+    python -m pbh_signal.work_queue requeue --queue v7 [--dead]
+    python -m pbh_signal.work_queue bench [--posts 2000] [--workers 4]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent
+DEFAULT_DB_PATH = BASE_DIR.parent / "cache" / "work_queue.sqlite"
+
+DEFAULT_QUEUE = "v7"
+VISIBILITY_TIMEOUT = 300.0      # seconds a lease lives without a heartbeat
+MAX_ATTEMPTS = 3                # leases (including expired ones) before a post is dead
+BUSY_TIMEOUT = 30.0             # seconds to wait on a locked database
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+DEAD = "dead"
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS items (
+    queue          TEXT NOT NULL,
+    source_id      TEXT NOT NULL,
+    payload        TEXT NOT NULL,
+    priority       REAL NOT NULL DEFAULT 0,
+    state          TEXT NOT NULL,
+    attempts       INTEGER NOT NULL DEFAULT 0,
+    lease_id       TEXT,
+    worker         TEXT,
+    lease_expires  REAL,
+    enqueued_at    REAL NOT NULL,
+    updated_at     REAL NOT NULL,
+    error          TEXT,
+    PRIMARY KEY (queue, source_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS items_ready ON items (queue, state, priority DESC, enqueued_at);
+CREATE INDEX IF NOT EXISTS items_expiry ON items (queue, state, lease_expires);
+"""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """Interface implemented by work-queue backends"""
+
+    def enqueue(self, posts: list, queue: str = DEFAULT_QUEUE, priority=None) -> dict:
+        """Add posts not yet known to the queue; priority(post) -> float, higher first"""
+        raise NotImplementedError
+
+    def lease(self, worker: str, queue: str = DEFAULT_QUEUE, limit: int = 1,
+              visibility: float = VISIBILITY_TIMEOUT) -> list:
+        """Up to limit posts as leases: {"queue", "source_id", "post", "lease_id", "attempts", "expires"}"""
+        raise NotImplementedError
+
+    def heartbeat(self, lease: dict, visibility: float = VISIBILITY_TIMEOUT) -> bool:
+        """Extend a lease; False if it was lost (expired and taken over, or finished)"""
+        raise NotImplementedError
+
+    def complete(self, lease: dict) -> bool:
+        """Mark the leased post done; False if the lease was lost"""
+        raise NotImplementedError
+
+    def fail(self, lease: dict, error: str) -> bool:
+        """Give the post back (pending, or dead after MAX_ATTEMPTS); False if the lease was lost"""
+        raise NotImplementedError
+
+    def requeue(self, queue: str = DEFAULT_QUEUE, dead: bool = False) -> int:
+        """Return expired leases (and dead posts if dead=True) to pending"""
+        raise NotImplementedError
+
+    def stats(self, queue: str = DEFAULT_QUEUE) -> dict:
+        """Post counts per state, plus active workers"""
+        raise NotImplementedError
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """WorkQueue on a local SQLite file in WAL mode, shared by worker processes"""
+
+    def __init__(self, path: Path = DEFAULT_DB_PATH, max_attempts: int = MAX_ATTEMPTS):
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn().executescript(SCHEMA_SQL)
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread (LeaseKeeper heartbeats from its own thread)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, fn):
+        """Run fn(conn) in a BEGIN IMMEDIATE transaction (serializes writers without deadlocks)"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def enqueue(self, posts: list, queue: str = DEFAULT_QUEUE, priority=None) -> dict:
+        now = time.time()
+        rows = [(queue, post["source_id"], json.dumps(post, ensure_ascii=False),
+                 float(priority(post)) if priority else 0.0, PENDING, now, now) for post in posts]
+
+        def insert(conn):
+            before = conn.total_changes
+            conn.executemany("""INSERT OR IGNORE INTO items
+                                (queue, source_id, payload, priority, state, enqueued_at, updated_at)
+                                VALUES (?, ?, ?, ?, ?, ?, ?)""", rows)
+            return conn.total_changes - before
+
+        added = self._write(insert)
+        return {"added": added, "duplicates": len(rows) - added}
+
+    def lease(self, worker: str, queue: str = DEFAULT_QUEUE, limit: int = 1,
+              visibility: float = VISIBILITY_TIMEOUT) -> list:
+        def take(conn):
+            now = time.time()
+            # Crashed workers: expired leases that used up their attempts are dead, the rest are ready again
+            conn.execute("""UPDATE items SET state = ?, error = 'lease expired', lease_id = NULL, updated_at = ?
+                            WHERE queue = ? AND state = ? AND lease_expires < ? AND attempts >= ?""",
+                         (DEAD, now, queue, LEASED, now, self.max_attempts))
+            rows = conn.execute("""SELECT source_id, payload, attempts FROM items
+                                   WHERE queue = ? AND (state = ? OR (state = ? AND lease_expires < ?))
+                                   ORDER BY priority DESC, enqueued_at, source_id LIMIT ?""",
+                                (queue, PENDING, LEASED, now, limit)).fetchall()
+            leases = []
+            for source_id, payload, attempts in rows:
+                lease_id = uuid.uuid4().hex
+                conn.execute("""UPDATE items SET state = ?, lease_id = ?, worker = ?, lease_expires = ?,
+                                attempts = attempts + 1, updated_at = ? WHERE queue = ? AND source_id = ?""",
+                             (LEASED, lease_id, worker, now + visibility, now, queue, source_id))
+                leases.append({"queue": queue, "source_id": source_id, "post": json.loads(payload),
+                               "lease_id": lease_id, "attempts": attempts + 1, "expires": now + visibility})
+            return leases
+
+        return self._write(take)
+
+    def _fenced(self, lease: dict, sql: str, params: tuple) -> bool:
+        def update(conn):
+            cursor = conn.execute(sql + " WHERE queue = ? AND source_id = ? AND lease_id = ? AND state = ?",
+                                  params + (lease["queue"], lease["source_id"], lease["lease_id"], LEASED))
+            return cursor.rowcount == 1
+        return self._write(update)
+
+    def heartbeat(self, lease: dict, visibility: float = VISIBILITY_TIMEOUT) -> bool:
+        now = time.time()
+        ok = self._fenced(lease, "UPDATE items SET lease_expires = ?, updated_at = ?", (now + visibility, now))
+        if ok:
+            lease["expires"] = now + visibility
+        return ok
+
+    def complete(self, lease: dict) -> bool:
+        return self._fenced(lease, "UPDATE items SET state = ?, lease_id = NULL, lease_expires = NULL, "
+                                   "error = NULL, updated_at = ?", (DONE, time.time()))
+
+    def fail(self, lease: dict, error: str) -> bool:
+        state = DEAD if lease["attempts"] >= self.max_attempts else PENDING
+        return self._fenced(lease, "UPDATE items SET state = ?, lease_id = NULL, lease_expires = NULL, "
+                                   "error = ?, updated_at = ?", (state, error[:500], time.time()))
+
+    def requeue(self, queue: str = DEFAULT_QUEUE, dead: bool = False) -> int:
+        def reset(conn):
+            now = time.time()
+            cursor = conn.execute("""UPDATE items SET state = ?, lease_id = NULL, lease_expires = NULL,
+                                     attempts = 0, updated_at = ?
+                                     WHERE queue = ? AND (state = ? AND lease_expires < ? OR state = ?)""",
+                                  (PENDING, now, queue, LEASED, now, DEAD if dead else ""))
+            return cursor.rowcount
+        return self._write(reset)
+
+    def stats(self, queue: str = DEFAULT_QUEUE) -> dict:
+        conn = self._conn()
+        now = time.time()
+        counts = dict(conn.execute("SELECT state, COUNT(*) FROM items WHERE queue = ? GROUP BY state", (queue,)))
+        expired = conn.execute("SELECT COUNT(*) FROM items WHERE queue = ? AND state = ? AND lease_expires < ?",
+                               (queue, LEASED, now)).fetchone()[0]
+        workers = [w for (w,) in conn.execute("""SELECT DISTINCT worker FROM items
+                                                 WHERE queue = ? AND state = ? AND lease_expires >= ?""",
+                                              (queue, LEASED, now))]
+        return {
+            "queue": queue,
+            **{state: counts.get(state, 0) for state in (PENDING, LEASED, DONE, DEAD)},
+            "expired_leases": expired,
+            "active_workers": workers,
+            "dead_posts": [dict(zip(("source_id", "attempts", "error"), row)) for row in conn.execute(
+                "SELECT source_id, attempts, error FROM items WHERE queue = ? AND state = ? ORDER BY source_id",
+                (queue, DEAD))],
+        }
+
+
+class LeaseKeeper:
+    """Heartbeats every lease a worker holds from a background thread"""
+
+    def __init__(self, queue: WorkQueue, visibility: float = VISIBILITY_TIMEOUT, interval: float = None):
+        self.queue = queue
+        self.visibility = visibility
+        self.interval = interval or visibility / 3
+        self.leases = {}            # lease_id -> lease
+        self.lost = set()           # lease_ids whose heartbeat failed
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def hold(self, lease: dict):
+        with self._lock:
+            self.leases[lease["lease_id"]] = lease
+
+    def release(self, lease: dict):
+        with self._lock:
+            self.leases.pop(lease["lease_id"], None)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                held = list(self.leases.values())
+            for lease in held:
+                if not self.queue.heartbeat(lease, self.visibility):
+                    with self._lock:
+                        self.leases.pop(lease["lease_id"], None)
+                        self.lost.add(lease["lease_id"])
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def print_stats(stats: dict):
+    print(f"\n{'='*70}")
+    print(f"  WORK QUEUE: {stats['queue']}")
+    print(f"{'='*70}")
+    for state in (PENDING, LEASED, DONE, DEAD):
+        print(f"  {state.capitalize():<10} {stats[state]:>8}")
+    print(f"  Expired leases (requeued on next lease): {stats['expired_leases']}")
+    print(f"  Active workers: {', '.join(stats['active_workers']) or 'none'}")
+    for post in stats["dead_posts"]:
+        print(f"  ☠ {post['source_id']:<20} after {post['attempts']} attempts: {post['error']}")
+
+
+def _bench_worker(path: str, queue: str, worker: str, crash_after: int, work_ms: float, results):
+    """Lease and complete posts until the queue is drained; crash_after > 0 abandons a lease"""
+    q = SQLiteWorkQueue(path)
+    completed = []
+    while True:
+        leases = q.lease(worker, queue, limit=1, visibility=0.5)
+        if not leases:
+            if q.stats(queue)[LEASED] == 0:
+                break
+            time.sleep(0.05)        # others' leases may still expire back to pending
+            continue
+        lease = leases[0]
+        if crash_after and len(completed) == crash_after:
+            break                   # simulated crash: lease is never completed
+        time.sleep(work_ms / 1000)
+        if q.complete(lease):
+            completed.append(lease["source_id"])
+    results.put((worker, completed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enrichment work queue (SQLite WAL, leases)")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB_PATH, help="Queue database path")
+    sub = parser.add_subparsers(dest="command", required=True)
+    stats = sub.add_parser("stats", help="Counts per state, active workers, dead posts")
+    stats.add_argument("--queue", default=DEFAULT_QUEUE)
+    enqueue = sub.add_parser("enqueue", help="Enqueue a directory of normalized posts")
+    enqueue.add_argument("--input", type=Path, required=True)
+    enqueue.add_argument("--queue", default=DEFAULT_QUEUE)
+    requeue = sub.add_parser("requeue", help="Return expired leases (and dead posts) to pending")
+    requeue.add_argument("--queue", default=DEFAULT_QUEUE)
+    requeue.add_argument("--dead", action="store_true", help="Also retry dead posts")
+    bench = sub.add_parser("bench", help="Multi-process drain with one simulated crash")
+    bench.add_argument("--posts", type=int, default=2000)
+    bench.add_argument("--workers", type=int, default=4)
+    bench.add_argument("--work-ms", type=float, default=1.0, help="Simulated work per post")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "bench.sqlite"
+            q = SQLiteWorkQueue(path)
+            posts = [{"source_id": f"t3_{i:06d}", "text": "x" * 200} for i in range(args.posts)]
+            started = time.perf_counter()
+            q.enqueue(posts, "bench")
+            again = q.enqueue(posts[: args.posts // 2], "bench")
+            enqueue_s = time.perf_counter() - started
+
+            results = multiprocessing.Queue()
+            procs = [multiprocessing.Process(target=_bench_worker,
+                                             args=(str(path), "bench", f"w{i}", 5 if i == 0 else 0,
+                                                   args.work_ms, results))
+                     for i in range(args.workers)]
+            started = time.perf_counter()
+            for p in procs:
+                p.start()
+            done = dict(results.get() for _ in range(args.workers))
+            for p in procs:
+                p.join()
+            drain_s = time.perf_counter() - started
+
+            completed = [sid for ids in done.values() for sid in ids]
+            final = q.stats("bench")
+            print(f"\n{'='*70}")
+            print(f"  WORK QUEUE BENCH ({args.posts} posts, {args.workers} workers, w0 crashes)")
+            print(f"{'='*70}")
+            print(f"  Enqueue:           {enqueue_s*1000:.0f} ms ({again['duplicates']} re-enqueued duplicates ignored)")
+            print(f"  Drain:             {drain_s:.2f} s ({args.posts / drain_s:,.0f} posts/s)")
+            for worker, ids in sorted(done.items()):
+                print(f"    {worker}: {len(ids)} completed")
+            print(f"  Completed:         {len(completed)} ({len(set(completed))} distinct)")
+            print(f"  Done / dead:       {final[DONE]} / {final[DEAD]}")
+            if len(completed) != len(set(completed)) or final[DONE] != args.posts - final[DEAD]:
+                print("❌ Posts completed twice or lost")
+                sys.exit(1)
+        return
+
+    q = SQLiteWorkQueue(args.db)
+    if args.command == "stats":
+        print_stats(q.stats(args.queue))
+    elif args.command == "enqueue":
+        if not args.input.exists():
+            print(f"❌ Not found: {args.input}")
+            sys.exit(1)
+        posts = []
+        for path in sorted(args.input.glob("*.json")):
+            with open(path, 'r') as f:
+                posts.append(json.load(f))
+        added = q.enqueue(posts, args.queue)
+        print(f"✅ Enqueued {added['added']} posts to {args.queue} ({added['duplicates']} already queued)")
+    else:
+        print(f"✅ Requeued {q.requeue(args.queue, args.dead)} posts")
+
+
+if __name__ == "__main__":
+    main()
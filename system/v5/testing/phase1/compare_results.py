@@ -8,9 +8,15 @@ Generates detailed comparison report and CSV results.
 
 import json
 import csv
+import sys
 from pathlib import Path
 from typing import Dict, List, Tuple, Any
 
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+from pbh_signal.config import VERSIONS
+
+V5_CONFIG = VERSIONS["v5"]
+
 
 class TestComparator:
     """Compares actual vs expected test outputs"""
@@ -271,16 +277,9 @@ class TestComparator:
         """Run comparison for all tests"""
 
         # Find all expected output files
-        expected_base = self.base_dir.parent.parent / "enrichment-test-data-v5" / "expected-outputs"
-
-        test_dirs = [
-            "ae-test-cases",
-            "platform-coverage",
-            "edge-cases",
-            "dictionary-tests",
-            "classification-tests",
-            "flag-tests"
-        ]
+        expected_base = V5_CONFIG["expected_dir"]
+
+        test_dirs = V5_CONFIG["test_sets"]
 
         expected_files = []
         for test_dir in test_dirs:
@@ -288,7 +287,7 @@ class TestComparator:
             if dir_path.exists():
                 expected_files.extend(sorted(dir_path.glob("*_expected.json")))
 
-        actual_dir = self.base_dir.parent / "actual_outputs"
+        actual_dir = V5_CONFIG["output_dir"]
 
         print(f"🔍 Comparing {len(expected_files)} test results...\n")
 
@@ -442,7 +441,7 @@ def main():
 
     comparator.run_comparison()
 
-    csv_path = base_dir.parent / "phase1_test_results.csv"
+    csv_path = V5_CONFIG["results_csv"]
     comparator.generate_csv(csv_path)
 
 
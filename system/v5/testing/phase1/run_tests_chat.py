@@ -17,6 +17,12 @@ import time
 import argparse
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+from pbh_signal.config import VERSIONS
+from pbh_signal.prompt_registry import get_registry
+
+V5_CONFIG = VERSIONS["v5"]
+
 try:
     from openai import OpenAI
 except ImportError:
@@ -38,14 +44,13 @@ class ChatCompletionsTestRunner:
     def __init__(self, base_dir: Path):
         self.base_dir = base_dir
         self.client = None
-        self.system_prompt_with_dict = None
-        self.response_format = None
+        self.template = None
 
     def load_configuration(self):
         """Load OpenAI configuration and v5 enrichment files"""
 
         # Load environment variables
-        env_path = self.base_dir / ".env"
+        env_path = V5_CONFIG["env_path"]
         if not env_path.exists():
             print(f"❌ Error: .env file not found at {env_path}")
             print(f"   Copy .env.example to .env and add your API key")
@@ -65,48 +70,16 @@ class ChatCompletionsTestRunner:
         else:
             self.client = OpenAI(api_key=api_key)
 
-        # Load system prompt
-        prompt_path = self.base_dir.parent.parent / "enrichment" / "openai_assistant_system_prompt_v5.3.4.md"
-        if not prompt_path.exists():
-            print(f"❌ Error: System prompt not found at {prompt_path}")
-            sys.exit(1)
-
-        with open(prompt_path, 'r') as f:
-            base_prompt = f.read()
-
-        # Load dictionary
-        dict_path = self.base_dir.parent.parent / "enrichment" / "PBH_SIGNAL_DICTIONARY_v5.txt"
-        if not dict_path.exists():
-            print(f"❌ Error: Dictionary not found at {dict_path}")
-            sys.exit(1)
-
-        with open(dict_path, 'r') as f:
-            dictionary_content = f.read()
-
-        # Combine prompt + dictionary
-        # Replace "File Search" reference with embedded dictionary
-        self.system_prompt_with_dict = base_prompt.replace(
-            "Dictionary-based entity extraction using PBH SIGNAL DICTIONARY (File Search)",
-            "Dictionary-based entity extraction using PBH SIGNAL DICTIONARY (embedded below)"
-        )
-
-        # Append dictionary to prompt
-        self.system_prompt_with_dict += "\n\n" + "=" * 80 + "\n"
-        self.system_prompt_with_dict += "PBH SIGNAL DICTIONARY (FOR ENTITY EXTRACTION)\n"
-        self.system_prompt_with_dict += "=" * 80 + "\n\n"
-        self.system_prompt_with_dict += dictionary_content
-
-        # Load response format schema (wrapped version)
-        schema_path = self.base_dir.parent.parent / "enrichment" / "openai_assistant_response_format_v5_wrapped.json"
-        if not schema_path.exists():
-            print(f"❌ Error: Response format not found at {schema_path}")
+        # Prompt with embedded dictionary + response format, built once as a request template
+        try:
+            self.template = get_registry().template("v5")
+        except (KeyError, FileNotFoundError) as e:
+            print(f"❌ Error: v5 enrichment file missing: {e}")
             sys.exit(1)
 
-        with open(schema_path, 'r') as f:
-            self.response_format = json.load(f)
-
         print("✅ Configuration loaded successfully")
-        print(f"   System prompt length: {len(self.system_prompt_with_dict)} chars")
+        print(f"   System prompt length: {len(self.template.system_prompt)} chars")
+        print(f"   Template: {self.template.template_id}")
         print(f"   Dictionary embedded: ✓")
         print()
 
@@ -114,21 +87,7 @@ class ChatCompletionsTestRunner:
         """Call Chat Completions API with structured output"""
 
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-2024-11-20",
-                temperature=0.3,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": self.system_prompt_with_dict
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Enrich this normalized post:\n\n{json.dumps(normalized_data, indent=2)}"
-                    }
-                ],
-                response_format=self.response_format
-            )
+            response = self.client.chat.completions.create(**self.template.request(normalized_data))
 
             # Parse response
             enriched_data = json.loads(response.choices[0].message.content)
@@ -143,25 +102,18 @@ class ChatCompletionsTestRunner:
         """Run enrichment tests"""
 
         # Create actual_outputs directory
-        actual_dir = self.base_dir.parent / "actual_outputs"
+        actual_dir = V5_CONFIG["output_dir"]
         actual_dir.mkdir(parents=True, exist_ok=True)
 
         # Collect test files
-        test_data_dir = self.base_dir.parent.parent / "enrichment-test-data-v5"
+        test_data_dir = V5_CONFIG["test_data_dir"]
 
         if not test_data_dir.exists():
             print(f"❌ Error: enrichment-test-data-v5 directory not found at {test_data_dir}")
             sys.exit(1)
 
         # Collect from all test subdirectories
-        test_dirs = [
-            test_data_dir / "ae-test-cases",
-            test_data_dir / "platform-coverage",
-            test_data_dir / "edge-cases",
-            test_data_dir / "dictionary-tests",
-            test_data_dir / "classification-tests",
-            test_data_dir / "flag-tests"
-        ]
+        test_dirs = [test_data_dir / name for name in V5_CONFIG["test_sets"]]
 
         test_files = []
         for test_dir in test_dirs:
@@ -6,17 +6,23 @@ Generates comprehensive success rate report with analysis and recommendations.
 """
 
 import csv
+import sys
 from pathlib import Path
 from collections import defaultdict
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+from pbh_signal.config import VERSIONS
+
+V5_CONFIG = VERSIONS["v5"]
+
 
 class ReportGenerator:
     """Generates Phase 1 test report"""
 
     def __init__(self, base_dir: Path):
         self.base_dir = base_dir
-        self.csv_path = base_dir.parent / "phase1_test_results.csv"
+        self.csv_path = V5_CONFIG["results_csv"]
         self.results = []
 
     def load_csv(self):
@@ -394,7 +400,7 @@ def main():
 
     generator.load_csv()
 
-    report_path = base_dir.parent / "phase1_test_report.md"
+    report_path = V5_CONFIG["report"]
     generator.generate_report(report_path)
 
 
@@ -10,16 +10,20 @@ Usage:
     python analyze_detailed.py
 """
 
-import json
 import csv
 import ast
+import sys
 from pathlib import Path
 from collections import defaultdict
 from typing import Any
 
-BASE_DIR = Path(__file__).parent
-EXPECTED_DIR = BASE_DIR / "expected_outputs"
-DEV_PIPELINE_DIR = BASE_DIR / "from-dev-pipeline"
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from pbh_signal.compact_records import load_compact
+from pbh_signal.config import VERSIONS
+
+BASE_DIR = VERSIONS["v6"]["testing_dir"]
+EXPECTED_DIR = VERSIONS["v6"]["expected_dir"]
+DEV_PIPELINE_DIR = VERSIONS["v6"]["dev_pipeline_dir"]
 
 # Fields to analyze
 LIST_FIELDS = ['themes', 'topics', 'symptoms', 'conditions', 'treatments', 'companies', 'flags', 'emotions', 'intent']
@@ -42,12 +46,7 @@ def parse_csv_array(value: str) -> list:
 
 def load_expected_outputs() -> dict:
     """Load all expected outputs keyed by source_id"""
-    expected = {}
-    for path in EXPECTED_DIR.glob("*_enriched.json"):
-        source_id = path.stem.replace('_enriched', '')
-        with open(path, 'r') as f:
-            expected[source_id] = json.load(f)
-    return expected
+    return load_compact(EXPECTED_DIR)
 
 
 def load_dev_pipeline_csv(filename: str) -> dict:
@@ -6,18 +6,29 @@ Automatically discovers all model_* directories in api_test_outputs/
 
 Usage:
     python compare_all_sources.py
+    python compare_all_sources.py --record    # Also record each model_* run in the run-history
+                                              # warehouse (pbh_signal.run_history); the dev
+                                              # pipeline CSV is not a run directory and is skipped
 """
 
-import json
+import argparse
 import csv
 import ast
+import sys
 from pathlib import Path
 from typing import Any
 
-BASE_DIR = Path(__file__).parent
-EXPECTED_DIR = BASE_DIR / "expected_outputs"
-DEV_PIPELINE_DIR = BASE_DIR / "from-dev-pipeline"
-API_OUTPUTS_DIR = BASE_DIR / "api_test_outputs"
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from pbh_signal.compact_records import load_compact
+from pbh_signal.config import VERSIONS
+
+BASE_DIR = VERSIONS["v6"]["testing_dir"]
+EXPECTED_DIR = VERSIONS["v6"]["expected_dir"]
+DEV_PIPELINE_DIR = VERSIONS["v6"]["dev_pipeline_dir"]
+API_OUTPUTS_DIR = VERSIONS["v6"]["output_dir"]
+# model_test runs (run_api_test.py --mode model_test) use the v6.1 prompt + schema
+PROMPT_FILE = VERSIONS["v6"]["enrichment_dir"] / VERSIONS["v6"]["prompt"]
+SCHEMA_FILE = VERSIONS["v6"]["enrichment_dir"] / VERSIONS["v6"]["schema"]
 
 # TIER 1: Critical/Safety Fields
 TIER1_FIELDS = ['flags', 'relevance_label', 'bariatric_context']
@@ -39,12 +50,7 @@ def parse_csv_array(value: str) -> list:
 
 def load_expected_outputs() -> dict:
     """Load all expected outputs keyed by source_id"""
-    expected = {}
-    for path in EXPECTED_DIR.glob("*_enriched.json"):
-        source_id = path.stem.replace('_enriched', '')
-        with open(path, 'r') as f:
-            expected[source_id] = json.load(f)
-    return expected
+    return load_compact(EXPECTED_DIR)
 
 
 def load_dev_pipeline_csv(filename: str) -> dict:
@@ -78,24 +84,25 @@ def load_dev_pipeline_csv(filename: str) -> dict:
 
 def load_api_test3_outputs() -> dict:
     """Load local API test3 outputs keyed by source_id"""
-    results = {}
-    for path in API_TEST3_DIR.glob("*_enriched.json"):
-        source_id = path.stem.replace('_enriched', '')
-        with open(path, 'r') as f:
-            results[source_id] = json.load(f)
-    return results
+    return load_compact(API_TEST3_DIR)
 
 
 def load_api_json_dir(dir_path: Path) -> dict:
     """Load API outputs from a directory keyed by source_id"""
-    results = {}
     if not dir_path.exists():
-        return results
-    for path in dir_path.glob("*_enriched.json"):
-        source_id = path.stem.replace('_enriched', '')
-        with open(path, 'r') as f:
-            results[source_id] = json.load(f)
-    return results
+        return {}
+    return load_compact(dir_path)
+
+
+def parse_model_dir(name: str) -> tuple:
+    """(model, temperature) from a model_test directory name, e.g. model_4o-dated_temp01"""
+    model_short, _, temp_str = name.replace("model_", "", 1).rpartition("_temp")
+    model = "gpt-" + model_short.replace("-dated", "-2024-11-20")
+    try:
+        temperature = float(f"{temp_str[:1]}.{temp_str[1:]}")
+    except ValueError:
+        temperature = None
+    return model, temperature
 
 
 def compare_value(expected: Any, actual: Any) -> bool:
@@ -225,6 +232,11 @@ def print_results(results: dict, show_failures: bool = False):
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Compare all enrichment sources against expected")
+    parser.add_argument("--record", action="store_true",
+                        help="Record each model_* run's per-case, per-field outcomes in the run-history warehouse")
+    args = parser.parse_args()
+
     print("\n" + "="*70)
     print("  V6.1 ENRICHMENT COMPARISON - ALL SOURCES")
     print("="*70)
@@ -249,6 +261,7 @@ def main():
         print(f"  Dev pipeline: ERROR - {e}")
 
     # Auto-discover all model_* directories
+    model_dirs = {}
     for model_dir in sorted(API_OUTPUTS_DIR.glob("model_*")):
         if model_dir.is_dir():
             # Count JSON files to skip empty dirs
@@ -262,6 +275,7 @@ def main():
 
             try:
                 sources[name] = load_api_json_dir(model_dir)
+                model_dirs[name] = model_dir
                 print(f"  {name}: {len(sources[name])} records")
             except Exception as e:
                 print(f"  {name}: ERROR - {e}")
@@ -287,6 +301,19 @@ def main():
 
     print()
 
+    if args.record and model_dirs:
+        from pbh_signal import run_history
+
+        conn = run_history.connect()
+        try:
+            for model_dir in model_dirs.values():
+                model, temperature = parse_model_dir(model_dir.name)
+                run = run_history.record_run(conn, model_dir.name, model_dir, EXPECTED_DIR, PROMPT_FILE,
+                                             SCHEMA_FILE, model, temperature)
+                print(f"📚 Recorded run #{run['run_id']} ({run['label']}) in {run_history.DEFAULT_DB_PATH}")
+        finally:
+            conn.close()
+
 
 if __name__ == "__main__":
     main()
@@ -7,23 +7,26 @@ Usage:
     python compare_v6_only.py --test 2    # Compare test2 results
     python compare_v6_only.py --test 3    # Compare test3 results
     python compare_v6_only.py --all       # Compare all 3 tests
+    python compare_v6_only.py --all --record   # Also record outcomes in the run-history
+                                               # warehouse (pbh_signal.run_history)
 """
 
 import argparse
 import json
+import sys
 from pathlib import Path
 from typing import Any
 
-BASE_DIR = Path(__file__).parent
-EXPECTED_DIR = BASE_DIR / "expected_outputs"
-OUTPUT_DIR = BASE_DIR / "api_test_outputs"
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from pbh_signal.config import VERSIONS
+
+BASE_DIR = VERSIONS["v6"]["testing_dir"]
+EXPECTED_DIR = VERSIONS["v6"]["expected_dir"]
+OUTPUT_DIR = VERSIONS["v6"]["output_dir"]
+ENRICHMENT_DIR = VERSIONS["v6"]["enrichment_dir"]
 
 # Test configurations
-TEST_CONFIGS = {
-    1: {"name": "test1_v6prompt_v6schema", "description": "v6 prompt + v6 schema"},
-    2: {"name": "test2_v61prompt_v6schema", "description": "v6.1 prompt + v6 schema"},
-    3: {"name": "test3_v61prompt_v61schema", "description": "v6.1 prompt + v6.1 schema"}
-}
+TEST_CONFIGS = VERSIONS["v6"]["runs"]
 
 # TIER 1: Critical/Safety Fields
 TIER1_FIELDS = ['flags', 'relevance_label', 'bariatric_context']
@@ -204,22 +207,44 @@ def main():
     parser.add_argument("--test", type=int, choices=[1, 2, 3], help="Test number to compare")
     parser.add_argument("--all", action="store_true", help="Compare all 3 tests")
     parser.add_argument("--details", action="store_true", help="Show detailed failures")
+    parser.add_argument("--record", action="store_true",
+                        help="Record per-case, per-field outcomes in the run-history warehouse")
+    parser.add_argument("--model", default=VERSIONS["v6"]["model"], help="Model used for the runs (for --record)")
+    parser.add_argument("--temperature", type=float, default=VERSIONS["v6"]["temperature"],
+                        help="Temperature used for the runs (for --record)")
     args = parser.parse_args()
 
     if not args.test and not args.all:
         print("❌ Specify --test <1|2|3> or --all")
         return
 
+    test_nums = [1, 2, 3] if args.all else [args.test]
+    results = []
+    for test_num in test_nums:
+        result = compare_test(test_num)
+        results.append(result)
+        print_result(result, show_details=args.details)
     if args.all:
-        results = []
-        for test_num in [1, 2, 3]:
-            result = compare_test(test_num)
-            results.append(result)
-            print_result(result, show_details=args.details)
         print_comparison_table(results)
-    else:
-        result = compare_test(args.test)
-        print_result(result, show_details=args.details)
+
+    if args.record:
+        from pbh_signal import run_history
+
+        conn = run_history.connect()
+        try:
+            for test_num, result in zip(test_nums, results):
+                if "error" in result:
+                    continue
+                config = TEST_CONFIGS[test_num]
+                # The v6 prompt/schema of tests 1-2 are no longer in the tree; record them unhashed
+                prompt, schema = (ENRICHMENT_DIR / config[k] for k in ("prompt", "schema"))
+                run = run_history.record_run(conn, config["name"], OUTPUT_DIR / config["name"], EXPECTED_DIR,
+                                             prompt if prompt.exists() else None,
+                                             schema if schema.exists() else None,
+                                             args.model, args.temperature)
+                print(f"\n📚 Recorded run #{run['run_id']} ({run['label']}) in {run_history.DEFAULT_DB_PATH}")
+        finally:
+            conn.close()
 
 
 if __name__ == "__main__":
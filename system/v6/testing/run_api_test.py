@@ -27,97 +27,30 @@ from pathlib import Path
 from openai import OpenAI
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from pbh_signal.config import VERSIONS, load_normalized_inputs
+from pbh_signal.prompt_registry import RequestTemplate, get_registry
+
+V6_CONFIG = VERSIONS["v6"]
+
 # Load environment variables
-env_path = Path(__file__).parent.parent.parent.parent / ".env"
+env_path = V6_CONFIG["env_path"]
 load_dotenv(env_path)
 
 # Paths
-BASE_DIR = Path(__file__).parent
-ENRICHMENT_DIR = BASE_DIR.parent / "enrichment"
-NORMALIZED_DIR = BASE_DIR / "normalized_inputs"
-OUTPUT_DIR = BASE_DIR / "api_test_outputs"
+BASE_DIR = V6_CONFIG["testing_dir"]
+ENRICHMENT_DIR = V6_CONFIG["enrichment_dir"]
+NORMALIZED_DIR = V6_CONFIG["normalized_dir"]
+OUTPUT_DIR = V6_CONFIG["output_dir"]
 
 # Test configurations
-TEST_CONFIGS = {
-    1: {
-        "name": "test1_v6prompt_v6schema",
-        "prompt": "openai_assistant_system_prompt_v6_with_dictionary.md",
-        "schema": "openai_assistant_response_format_v6.json",
-        "description": "v6 prompt + v6 schema"
-    },
-    2: {
-        "name": "test2_v61prompt_v6schema",
-        "prompt": "openai_assistant_system_prompt_v6.1_with_dictionary.md",
-        "schema": "openai_assistant_response_format_v6.json",
-        "description": "v6.1 prompt + v6 schema"
-    },
-    3: {
-        "name": "test3_v61prompt_v61schema",
-        "prompt": "openai_assistant_system_prompt_v6.1_with_dictionary.md",
-        "schema": "openai_assistant_response_format_v6.1.json",
-        "description": "v6.1 prompt + v6.1 schema"
-    }
-}
+TEST_CONFIGS = V6_CONFIG["runs"]
 
 
-def load_system_prompt(prompt_file: str) -> str:
-    """Load the system prompt"""
-    prompt_path = ENRICHMENT_DIR / prompt_file
-    if not prompt_path.exists():
-        print(f"❌ Prompt file not found: {prompt_path}")
-        sys.exit(1)
-    with open(prompt_path, 'r') as f:
-        return f.read()
+def call_openai_with_schema(client: OpenAI, template: RequestTemplate, normalized_input: dict) -> dict:
+    """Call OpenAI with structured output schema (model and temperature come from the template)"""
 
-
-def load_schema(schema_file: str) -> dict:
-    """Load the JSON schema for structured outputs"""
-    schema_path = ENRICHMENT_DIR / schema_file
-    if not schema_path.exists():
-        print(f"❌ Schema file not found: {schema_path}")
-        sys.exit(1)
-    with open(schema_path, 'r') as f:
-        return json.load(f)
-
-
-def load_normalized_inputs(count: int = None, source_id: str = None, run_all: bool = False) -> list:
-    """Load normalized input files"""
-    if source_id:
-        file_path = NORMALIZED_DIR / f"{source_id}.json"
-        if not file_path.exists():
-            print(f"❌ Input file not found: {file_path}")
-            sys.exit(1)
-        with open(file_path, 'r') as f:
-            return [json.load(f)]
-
-    files = sorted(NORMALIZED_DIR.glob("*.json"))
-    if count and not run_all:
-        files = files[:count]
-
-    inputs = []
-    for f in files:
-        with open(f, 'r') as fp:
-            inputs.append(json.load(fp))
-
-    return inputs
-
-
-def call_openai_with_schema(client: OpenAI, system_prompt: str, normalized_input: dict, schema: dict,
-                            model: str = "gpt-4o-2024-11-20", temperature: float = 0.1) -> dict:
-    """Call OpenAI with structured output schema"""
-
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Process this normalized post and return enriched JSON:\n\n{json.dumps(normalized_input, indent=2)}"}
-        ],
-        response_format={
-            "type": "json_schema",
-            "json_schema": schema
-        },
-        temperature=temperature
-    )
+    response = client.chat.completions.create(**template.request(normalized_input))
 
     return json.loads(response.choices[0].message.content)
 
@@ -162,8 +95,8 @@ def main():
         temp_str = str(args.temp).replace(".", "")
         config = {
             "name": f"model_{model_short}_temp{temp_str}",
-            "prompt": "openai_assistant_system_prompt_v6.1_with_dictionary.md",
-            "schema": "openai_assistant_response_format_v6.1.json",
+            "prompt": V6_CONFIG["prompt"],
+            "schema": V6_CONFIG["schema"],
             "description": f"{args.model} @ temp {args.temp}"
         }
         model = args.model
@@ -171,8 +104,8 @@ def main():
     else:
         # Standard test mode
         config = TEST_CONFIGS[args.test]
-        model = "gpt-4o-2024-11-20"  # Default for standard tests
-        temperature = 0.1
+        model = V6_CONFIG["model"]  # Default for standard tests
+        temperature = V6_CONFIG["temperature"]
 
     print(f"\n{'='*70}")
     if args.mode == "model_test":
@@ -185,13 +118,16 @@ def main():
     print(f"  Prompt: {config['prompt']}")
     print(f"  Schema: {config['schema']}")
 
-    # Load prompt and schema
-    system_prompt = load_system_prompt(config['prompt'])
-    schema = load_schema(config['schema'])
-    print(f"  Prompt loaded: {len(system_prompt):,} chars")
+    # Load prompt and schema as an immutable request template
+    try:
+        template = get_registry().template(config['prompt'], config['schema'], model, temperature)
+    except KeyError as e:
+        print(f"❌ {e.args[0]}")
+        sys.exit(1)
+    print(f"  Prompt loaded: {len(template.system_prompt):,} chars (template {template.template_id})")
 
     # Load inputs
-    inputs = load_normalized_inputs(count=args.count, source_id=args.source_id, run_all=args.all)
+    inputs = load_normalized_inputs(NORMALIZED_DIR, count=args.count, source_id=args.source_id, run_all=args.all)
     print(f"  Posts to process: {len(inputs)}")
 
     # Create output directory
@@ -222,8 +158,7 @@ def main():
         print(f"[{i+1}/{len(inputs)}] {source_id}...", end=" ", flush=True)
 
         try:
-            enriched = call_openai_with_schema(client, system_prompt, normalized_input, schema,
-                                               model=model, temperature=temperature)
+            enriched = call_openai_with_schema(client, template, normalized_input)
 
             # Merge input fields with enriched output
             full_output = {**normalized_input, **enriched}
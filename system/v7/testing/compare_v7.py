@@ -5,16 +5,25 @@ Compare v7 API test outputs against expected outputs.
 Usage:
     python compare_v7.py              # Compare v7 results
     python compare_v7.py --details    # Show detailed failures
+    python compare_v7.py --record     # Also record outcomes in the run-history
+                                      # warehouse (pbh_signal.run_history)
 """
 
 import argparse
 import json
+import sys
 from pathlib import Path
 from typing import Any
 
-BASE_DIR = Path(__file__).parent
-EXPECTED_DIR = BASE_DIR / "expected_outputs"
-OUTPUT_DIR = BASE_DIR / "api_test_outputs" / "v7"
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from pbh_signal.config import VERSIONS
+
+V7_CONFIG = VERSIONS["v7"]
+BASE_DIR = V7_CONFIG["testing_dir"]
+EXPECTED_DIR = V7_CONFIG["expected_dir"]
+OUTPUT_DIR = V7_CONFIG["output_dir"] / V7_CONFIG["name"]
+PROMPT_FILE = V7_CONFIG["enrichment_dir"] / V7_CONFIG["prompt"]
+SCHEMA_FILE = V7_CONFIG["enrichment_dir"] / V7_CONFIG["schema"]
 
 # TIER 1: Critical/Safety Fields
 TIER1_FIELDS = ['flags', 'relevance_label', 'bariatric_context']
@@ -158,11 +167,28 @@ def print_result(result: dict, show_details: bool = False):
 def main():
     parser = argparse.ArgumentParser(description="Compare v7 API test outputs against expected")
     parser.add_argument("--details", action="store_true", help="Show detailed failures")
+    parser.add_argument("--record", action="store_true",
+                        help="Record per-case, per-field outcomes in the run-history warehouse")
+    parser.add_argument("--label", default="v7", help="Run label for --record")
+    parser.add_argument("--model", default=V7_CONFIG["model"], help="Model used for the run (for --record)")
+    parser.add_argument("--temperature", type=float, default=V7_CONFIG["temperature"],
+                        help="Temperature used for the run (for --record)")
     args = parser.parse_args()
 
     result = compare_v7()
     print_result(result, show_details=args.details)
 
+    if args.record and "error" not in result:
+        from pbh_signal import run_history
+
+        conn = run_history.connect()
+        try:
+            run = run_history.record_run(conn, args.label, OUTPUT_DIR, EXPECTED_DIR, PROMPT_FILE,
+                                         SCHEMA_FILE, args.model, args.temperature)
+        finally:
+            conn.close()
+        print(f"\n📚 Recorded run #{run['run_id']} ({run['label']}) in {run_history.DEFAULT_DB_PATH}")
+
 
 if __name__ == "__main__":
     main()
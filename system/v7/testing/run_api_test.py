@@ -8,108 +8,297 @@ Usage:
     python run_api_test.py --all               # Test all posts
     python run_api_test.py --count 5           # Test first 5 posts
     python run_api_test.py --source-id t3_xxx  # Test specific post
+    python run_api_test.py --all --stream      # Stream; safety fields parsed first
+    python run_api_test.py --all --priority    # Highest local risk pre-score first
+    python run_api_test.py --all --safety-lane # AE/crisis fast lane + alerts.jsonl
+    python run_api_test.py --all --cascade     # gpt-4o-mini first, escalate to gpt-4o
+    python run_api_test.py --all --segment-budget 400  # long posts cut to their key sentences
+    python run_api_test.py --all --local-key-phrases   # key_phrases built locally, not by the model
+    python run_api_test.py --all --route-language      # non-English posts queued, not enriched
+    python run_api_test.py --all --trends              # fold outputs into trend counters + alerts
+    python run_api_test.py --all --author-sketches     # fold outputs into distinct-author sketches
+    python run_api_test.py --all --samples 5           # n completions per request, Tier 1 majority vote
+    python run_api_test.py --all --queue               # lease posts from the shared work queue (run N of these)
+
+Every response is checked by a validator compiled once from the v7 schema.
+Duplicate/overlong/invalid array items are repaired locally; other
+violations are queued and retried with a targeted repair request after the
+main pass (--repair-attempts). Validation cost and violation rates are
+printed and saved to validation_report.json in the output directory.
+
+--stream requests stream=True with the schema reordered so flags,
+relevance_label and bariatric_context are generated first. Each top-level
+field is parsed as soon as it completes; adverse_event/crisis flags are
+reported before the rest of the enrichment arrives (and, with --safety-lane,
+alerted from the stream). Time-to-flag and time-to-complete are saved to
+stream_timings.json.
+
+--priority dispatches posts from pbh_signal.scheduler (dictionary-based risk
+pre-score with aging) instead of filename order and reports latency per
+priority class (priority_latency.json).
+
+--safety-lane screens AE/crisis candidates through pbh_signal.safety_lane
+(tiny safety prompt) in parallel with full enrichment. Confirmed flags from
+either path (or the stream) are appended once to alerts.jsonl; ingest-to-alert
+latency and breaches of --alert-sla are saved to safety_lane.json.
+
+--cascade enriches with --small-model first and escalates to --large-model
+on validation failure, low relevance/audience confidence, any flags, or a
+borderline relevance_label (pbh_signal.cascade). Outputs go to
+api_test_outputs/cascade with cascade_log.json; escalation rate, cost saved
+and Tier 1/Tier 2 deltas versus api_test_outputs/v7 are printed at the end.
+The cascade makes non-streaming calls, so it cannot be combined with --stream.
+
+--segment-budget N sends only the key sentences of posts whose text exceeds
+~N tokens (pbh_signal.segment: dictionary hits, anchors, first-person and
+safety sentences). Outputs go to api_test_outputs/<mode>_segmented with the
+full original text; dropped spans are logged to segments.json and agreement
+with the full-text run (api_test_outputs/v7) is printed at the end.
+
+--local-key-phrases drops key_phrases from the response schema and fills it
+with pbh_signal.key_phrases (dictionary-anchored candidates, 5-category
+ranking) before validation. Outputs go to api_test_outputs/<mode>_local_key_phrases.
+
+--route-language fills/verifies `language` locally (pbh_signal.language_id)
+and only enriches posts routed to the English prompt; alternate-prompt,
+translate-later, review (no seeded language fits) and skip queues are saved
+to language_routing.json.
+
+--trends folds the saved outputs into the incremental trend state
+(pbh_signal.trends, system/cache/trends.json) at the end of the run and
+prints anomaly alerts.
+
+--author-sketches adds the saved outputs' authors to the HyperLogLog
+distinct-author sketches (pbh_signal.author_sketches,
+system/cache/author_sketches.json) at the end of the run.
+
+Both states are loaded, updated and saved under a file lock, so
+concurrent --queue workers add to each other's state instead of
+overwriting it.
+
+--samples N requests N completions in one call (prompt billed once) and
+majority-votes flags, relevance_label and bariatric_context
+(pbh_signal.consistency). Outputs go to api_test_outputs/<mode>_consistency
+with consistency.json; per-post agreement and a flakiness report listing
+unstable cases are printed at the end.
+
+--queue [NAME] enqueues the selected posts into pbh_signal.work_queue
+(system/cache/work_queue.sqlite, queue NAME, default the output mode name;
+posts already queued are ignored) and then leases them one at a time until
+none are pending or leased by other workers, so any number of workers
+started with the same arguments share the backlog. Leases are heartbeated in the background and completed
+once the output is written (after the repair pass if needed); errors give
+the post back for another attempt, and posts leased by a worker that died
+are leased again after --visibility seconds. With --priority the risk
+pre-score becomes the queue priority. Posts completed in a queue stay
+done - use a new queue name (or `work_queue requeue`) to run them again.
+Per-post logs (cascade_log.json, consistency.json, segments.json,
+stream_timings.json) are merged under a file lock; run-level reports are
+written per worker (validation_report.<worker>.json, safety_lane.<worker>.json).
 """
 
 import json
 import argparse
+import fcntl
 import os
+import re
 import sys
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from openai import OpenAI
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from pbh_signal.config import VERSIONS, load_normalized_inputs, load_schema
+from pbh_signal.schema_validator import (CompiledValidator, load_validator, needs_model_repair,
+                                         print_report, repair_locally, repair_message)
+from pbh_signal.alerts import FileAlertSink
+from pbh_signal.author_sketches import DEFAULT_SKETCH_PATH, AuthorSketches
+from pbh_signal.consistency import (CONSISTENCY_LOG, flakiness_report, majority_vote,
+                                    print_flakiness_report)
+from pbh_signal.cascade import (CASCADE_LOG, DEFAULT_LARGE_MODEL, DEFAULT_SMALL_MODEL, Cascade,
+                                cascade_report, print_cascade_report)
+from pbh_signal.key_phrases import KeyPhraseExtractor, drop_key_phrases
+from pbh_signal.prompt_registry import RequestTemplate, get_registry
+from pbh_signal.language_id import ENRICH, LANGUAGE_LOG, LanguageRouter, print_routing
+from pbh_signal.safety_lane import DEFAULT_ALERT_SLA, OpenAIScreen, SafetyLane, print_lane_report
+from pbh_signal.dictionary_artifact import load_compiled
+from pbh_signal.scheduler import PriorityScheduler, print_latency_report, risk_score
+from pbh_signal.segment import SEGMENTS_LOG, print_segment_report, segment_report, select_segments
+from pbh_signal.trends import DEFAULT_TRENDS_PATH, TrendEngine, print_alerts
+from pbh_signal.streaming import ALERT_FLAGS, consume_stream, percentile, streaming_schema
+from pbh_signal.work_queue import (LEASED, VISIBILITY_TIMEOUT, LeaseKeeper, SQLiteWorkQueue,
+                                   default_worker_id, print_stats)
+
+# v7 configuration (paths, prompt, schema) from the shared versioned config
+V7_CONFIG = VERSIONS["v7"]
+
 # Load environment variables
-env_path = Path(__file__).parent.parent.parent.parent / ".env"
+env_path = V7_CONFIG["env_path"]
 load_dotenv(env_path)
 
 # Paths
-BASE_DIR = Path(__file__).parent
-ENRICHMENT_DIR = BASE_DIR.parent / "enrichment"
-NORMALIZED_DIR = BASE_DIR / "normalized_inputs"
-OUTPUT_DIR = BASE_DIR / "api_test_outputs"
-
-# v7 configuration
-V7_CONFIG = {
-    "name": "v7",
-    "prompt": "openai_assistant_system_prompt_v7_with_dictionary.md",
-    "schema": "openai_assistant_response_format_v7.json",
-    "description": "v7 prompt + v7 schema"
-}
-
-
-def load_system_prompt(prompt_file: str) -> str:
-    """Load the system prompt"""
-    prompt_path = ENRICHMENT_DIR / prompt_file
-    if not prompt_path.exists():
-        print(f"❌ Prompt file not found: {prompt_path}")
-        sys.exit(1)
-    with open(prompt_path, 'r') as f:
-        return f.read()
+BASE_DIR = V7_CONFIG["testing_dir"]
+ENRICHMENT_DIR = V7_CONFIG["enrichment_dir"]
+NORMALIZED_DIR = V7_CONFIG["normalized_dir"]
+OUTPUT_DIR = V7_CONFIG["output_dir"]
 
 
-def load_schema(schema_file: str) -> dict:
-    """Load the JSON schema for structured outputs"""
-    schema_path = ENRICHMENT_DIR / schema_file
-    if not schema_path.exists():
-        print(f"❌ Schema file not found: {schema_path}")
-        sys.exit(1)
-    with open(schema_path, 'r') as f:
-        return json.load(f)
+def call_openai_with_schema(client: OpenAI, template: RequestTemplate, normalized_input: dict) -> dict:
+    """Call OpenAI with structured output schema"""
 
+    return call_openai_model(client, template, normalized_input)[0]
 
-def load_normalized_inputs(count: int = None, source_id: str = None, run_all: bool = False) -> list:
-    """Load normalized input files"""
-    if source_id:
-        file_path = NORMALIZED_DIR / f"{source_id}.json"
-        if not file_path.exists():
-            print(f"❌ Input file not found: {file_path}")
-            sys.exit(1)
-        with open(file_path, 'r') as f:
-            return [json.load(f)]
 
-    files = sorted(NORMALIZED_DIR.glob("*.json"))
-    if count and not run_all:
-        files = files[:count]
+def call_openai_model(client: OpenAI, template: RequestTemplate, normalized_input: dict,
+                      model: str = None) -> tuple:
+    """Call a model (default: the template's) with structured output schema; returns (enriched, token usage)"""
 
-    inputs = []
-    for f in files:
-        with open(f, 'r') as fp:
-            inputs.append(json.load(fp))
+    params = {"model": model} if model else {}
+    response = client.chat.completions.create(**template.request(normalized_input, **params))
 
-    return inputs
+    usage = response.usage
+    return json.loads(response.choices[0].message.content), {
+        "prompt_tokens": usage.prompt_tokens if usage else 0,
+        "completion_tokens": usage.completion_tokens if usage else 0
+    }
 
 
-def call_openai_with_schema(client: OpenAI, system_prompt: str, normalized_input: dict, schema: dict) -> dict:
-    """Call OpenAI with structured output schema"""
+def call_openai_samples(client: OpenAI, template: RequestTemplate, normalized_input: dict, n: int) -> tuple:
+    """
+    Request n completions in one call; returns (enriched samples, token usage).
+    Choices that are not valid JSON are skipped (counted as "unparseable").
+    """
+
+    response = client.chat.completions.create(**template.request(normalized_input, n=n))
+
+    samples = []
+    for choice in response.choices:
+        try:
+            samples.append(json.loads(choice.message.content))
+        except (TypeError, json.JSONDecodeError):
+            continue
+    if not samples:
+        raise ValueError(f"none of the {len(response.choices)} completions is valid JSON")
+
+    usage = response.usage
+    return samples, {
+        "prompt_tokens": usage.prompt_tokens if usage else 0,
+        "completion_tokens": usage.completion_tokens if usage else 0,
+        "unparseable": len(response.choices) - len(samples)
+    }
+
+
+def call_openai_streaming(client: OpenAI, template: RequestTemplate, normalized_input: dict,
+                          on_field=None) -> tuple:
+    """Call OpenAI with stream=True; returns (enriched, timings) with fields parsed as they complete"""
+
+    started = time.perf_counter()
+    stream = client.chat.completions.create(**template.request(normalized_input, stream=True))
 
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Process this normalized post and return enriched JSON:\n\n{json.dumps(normalized_input, indent=2)}"}
-        ],
-        response_format={
-            "type": "json_schema",
-            "json_schema": schema
-        },
-        temperature=0.1
-    )
+    chunks = (chunk.choices[0].delta.content for chunk in stream if chunk.choices)
+    return consume_stream(chunks, on_field=on_field, started=started)
+
+
+def call_openai_repair(client: OpenAI, template: RequestTemplate, normalized_input: dict,
+                       previous: dict, violations: list) -> dict:
+    """Re-request an enrichment, pointing the model at the specific schema violations"""
+
+    response = client.chat.completions.create(**template.request(normalized_input, followup=[
+        {"role": "assistant", "content": json.dumps(previous, ensure_ascii=False)},
+        {"role": "user", "content": repair_message(violations)}
+    ]))
 
     return json.loads(response.choices[0].message.content)
 
 
+def write_output(output_file: Path, normalized_input: dict, enriched: dict) -> dict:
+    """Merge input fields with enriched output and save; returns the saved record"""
+    full_output = {**normalized_input, **enriched}
+    with open(output_file, 'w') as f:
+        json.dump(full_output, f, indent=2, ensure_ascii=False)
+    return full_output
+
+
+@contextmanager
+def locked(path: Path):
+    """Exclusive lock on path (via a sibling .lock file) shared by all queue workers"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def merge_log(log_path: Path, entries: dict) -> dict:
+    """Add per-post entries to a run log under the lock; returns the merged log"""
+    with locked(log_path):
+        if log_path.exists():
+            with open(log_path, 'r') as f:
+                entries = {**json.load(f), **entries}
+        with open(log_path, 'w') as f:
+            json.dump(entries, f, indent=2)
+    return entries
+
+
 def main():
     parser = argparse.ArgumentParser(description="Test v7 enrichment")
     parser.add_argument("--count", type=int, help="Number of posts to test")
     parser.add_argument("--all", action="store_true", help="Test all posts")
     parser.add_argument("--source-id", type=str, help="Test specific source_id")
     parser.add_argument("--force", action="store_true", help="Overwrite existing outputs")
+    parser.add_argument("--repair-attempts", type=int, default=1,
+                        help="Targeted retries for responses failing validation (default: 1)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream responses with safety fields first; report time-to-flag")
+    parser.add_argument("--priority", action="store_true",
+                        help="Process posts by local risk pre-score instead of filename order")
+    parser.add_argument("--safety-lane", action="store_true",
+                        help="Screen AE/crisis candidates through the fast lane and write alerts.jsonl")
+    parser.add_argument("--alert-sla", type=float, default=DEFAULT_ALERT_SLA,
+                        help=f"Safety lane ingest-to-alert SLA in seconds (default: {DEFAULT_ALERT_SLA:.0f})")
+    parser.add_argument("--cascade", action="store_true",
+                        help="Small model first; escalate low-confidence/safety-relevant posts to the large model")
+    parser.add_argument("--small-model", default=DEFAULT_SMALL_MODEL,
+                        help=f"Cascade first-pass model (default: {DEFAULT_SMALL_MODEL})")
+    parser.add_argument("--large-model", default=DEFAULT_LARGE_MODEL,
+                        help=f"Cascade escalation model (default: {DEFAULT_LARGE_MODEL})")
+    parser.add_argument("--local-key-phrases", action="store_true",
+                        help="Build key_phrases locally and drop the field from the response schema")
+    parser.add_argument("--segment-budget", type=int,
+                        help="Send only key sentences of posts longer than this many (estimated) text tokens")
+    parser.add_argument("--route-language", action="store_true",
+                        help="Detect language locally and enrich only posts routed to the English prompt")
+    parser.add_argument("--trends", action="store_true",
+                        help="Fold outputs into the incremental trend state and print anomaly alerts")
+    parser.add_argument("--author-sketches", action="store_true",
+                        help="Fold output authors into the distinct-author HyperLogLog sketches")
+    parser.add_argument("--samples", type=int,
+                        help="Request N completions per post and majority-vote the Tier 1 fields")
+    parser.add_argument("--queue", nargs="?", const="", metavar="NAME",
+                        help="Share the posts with other workers through the work queue (default name: output mode)")
+    parser.add_argument("--worker-id", default=default_worker_id(),
+                        help="Worker name recorded on leases (default: host:pid)")
+    parser.add_argument("--visibility", type=float, default=VISIBILITY_TIMEOUT,
+                        help=f"Seconds before a lease without heartbeat is handed out again (default: {VISIBILITY_TIMEOUT:.0f})")
     args = parser.parse_args()
 
     # Validate args
     if not args.count and not args.all and not args.source_id:
         print("❌ Must specify --count, --all, or --source-id")
         sys.exit(1)
+    if args.samples is not None and args.samples < 2:
+        print("❌ --samples needs at least 2 completions to vote")
+        sys.exit(1)
+    if args.samples and (args.stream or args.cascade):
+        print("❌ --samples cannot be combined with --stream or --cascade")
+        sys.exit(1)
+    if args.stream and args.cascade:
+        print("❌ --stream cannot be combined with --cascade")
+        sys.exit(1)
 
     # Check API key
     api_key = os.getenv("OPENAI_API_KEY")
@@ -120,6 +309,15 @@ def main():
     client = OpenAI(api_key=api_key)
 
     config = V7_CONFIG
+    if args.cascade:
+        config = {**V7_CONFIG, "name": "cascade",
+                  "description": f"v7 cascade {args.small_model} → {args.large_model}"}
+    if args.segment_budget:
+        config = {**config, "name": f"{config['name']}_segmented"}
+    if args.local_key_phrases:
+        config = {**config, "name": f"{config['name']}_local_key_phrases"}
+    if args.samples:
+        config = {**config, "name": f"{config['name']}_consistency"}
 
     print(f"\n{'='*70}")
     print(f"  v7 ENRICHMENT TEST")
@@ -127,20 +325,119 @@ def main():
     print(f"  Prompt: {config['prompt']}")
     print(f"  Schema: {config['schema']}")
 
-    # Load prompt and schema
-    system_prompt = load_system_prompt(config['prompt'])
-    schema = load_schema(config['schema'])
-    print(f"  Prompt loaded: {len(system_prompt):,} chars")
+    # Load prompt and schema; requests are built from immutable registry templates
+    template = get_registry().template(config['prompt'], config['schema'])
+    schema = load_schema(ENRICHMENT_DIR / config['schema'])
+    validator = load_validator(ENRICHMENT_DIR / config['schema'])
+    extractor = KeyPhraseExtractor() if args.local_key_phrases else None
+    model_schema = drop_key_phrases(schema) if extractor else schema
+    model_template = template.derive(schema=model_schema) if extractor else template
+    request_template = model_template.derive(schema=streaming_schema(model_schema)) if args.stream else model_template
+
+    def local_fields(enriched: dict, post: dict) -> dict:
+        """Fill fields built locally instead of by the model"""
+        if extractor is not None:
+            enriched["key_phrases"] = extractor.extract(post)
+        return enriched
+
+    cascade = None
+    cascade_log = {}
+    if args.cascade:
+        def call_model(model, post):
+            return call_openai_model(client, model_template, post, model)
+
+        # Escalation judges the answer against the schema the model was given; local fields
+        # are filled once on the final answer, like every other mode
+        cascade = Cascade(call_model, CompiledValidator(model_schema, limits=validator.limits),
+                          small_model=args.small_model, large_model=args.large_model)
+        print(f"  Cascade: {args.small_model} → {args.large_model}")
+    print(f"  Prompt loaded: {len(template.system_prompt):,} chars (template {model_template.template_id})")
+    if args.segment_budget:
+        print(f"  Segment budget: {args.segment_budget} text tokens")
+    if extractor:
+        print(f"  key_phrases: local (dropped from response schema)")
+    if args.samples:
+        print(f"  Self-consistency: n={args.samples}, Tier 1 majority vote")
 
     # Load inputs
-    inputs = load_normalized_inputs(count=args.count, source_id=args.source_id, run_all=args.all)
+    inputs = load_normalized_inputs(NORMALIZED_DIR, count=args.count, source_id=args.source_id, run_all=args.all)
+    routing = None
+    if args.route_language:
+        queues, routing = LanguageRouter().route_batch(inputs)
+        inputs = queues[ENRICH]
+        print(f"  Language routing: " + ", ".join(f"{route} {len(posts)}" for route, posts in queues.items()))
     print(f"  Posts to process: {len(inputs)}")
 
+    scheduler = None
+    work = inputs
+    work_queue = None
+    leases = {}
+    if args.queue is not None:
+        queue_name = args.queue or config['name']
+        work_queue = SQLiteWorkQueue()
+        matcher = load_compiled() if args.priority else None
+        added = work_queue.enqueue(inputs, queue_name,
+                                   priority=(lambda post: risk_score(post, matcher)[0]) if matcher else None)
+        keeper = LeaseKeeper(work_queue, args.visibility)
+
+        def leased_posts():
+            while True:
+                leased = work_queue.lease(args.worker_id, queue_name, visibility=args.visibility)
+                if not leased:
+                    # Other workers' leases may still fail or expire back to pending
+                    if work_queue.stats(queue_name)[LEASED] <= len(leases):
+                        return
+                    time.sleep(min(1.0, args.visibility / 10))
+                    continue
+                lease = leased[0]
+                leases[lease["source_id"]] = lease
+                keeper.hold(lease)
+                if lane is not None:
+                    lane.submit(lease["post"])
+                yield lease["post"]
+
+        def finish(source_id, error=None):
+            """Complete (or give back) the post's lease once its output is written"""
+            lease = leases.pop(source_id, None)
+            if lease is None:
+                return
+            keeper.release(lease)
+            if not (work_queue.fail(lease, error) if error else work_queue.complete(lease)):
+                print(f"⚠️  lease on {source_id} was lost (expired and taken over)")
+
+        work = leased_posts()
+        print(f"  Work queue: {queue_name} as {args.worker_id} "
+              f"({added['added']} enqueued, {added['duplicates']} already queued)")
+    elif args.priority:
+        scheduler = PriorityScheduler()
+        for normalized_input in inputs:
+            scheduler.push(normalized_input)
+        work = scheduler.drain()
+        print(f"  Dispatch: priority (local risk pre-score + aging)")
+
     # Create output directory
     mode_output_dir = OUTPUT_DIR / config['name']
     mode_output_dir.mkdir(parents=True, exist_ok=True)
     print(f"  Output dir: {mode_output_dir}")
 
+    if routing is not None:
+        with open(mode_output_dir / LANGUAGE_LOG, 'w') as f:
+            json.dump({"queues": {route: [p.get("source_id") for p in posts] for route, posts in queues.items()},
+                       "posts": routing}, f, indent=2)
+
+    # (saved record, output file) for --trends / --author-sketches, folded in at the end
+    folded = []
+
+    lane = None
+    if args.safety_lane:
+        lane = SafetyLane(OpenAIScreen(client), FileAlertSink(mode_output_dir / "alerts.jsonl"),
+                          alert_sla=args.alert_sla)
+        if work_queue is None:
+            # Queue workers screen the posts they lease instead
+            for normalized_input in inputs:
+                lane.submit(normalized_input)
+            print(f"  Safety lane: {lane.stats['candidates']} AE/crisis candidates")
+
     print(f"\n{'='*70}")
     print(f"Processing...")
     print(f"{'='*70}\n")
@@ -149,10 +446,19 @@ def main():
         "total": len(inputs),
         "success": 0,
         "errors": 0,
-        "skipped": 0
+        "skipped": 0,
+        "repaired_locally": 0,
+        "repaired_by_retry": 0,
+        "invalid": 0
     }
-
-    for i, normalized_input in enumerate(inputs):
+    repair_queue = []
+    stream_timings = {}
+    segments = {}
+    # One compiled dictionary for every post cut to the segment budget
+    segment_matcher = load_compiled() if args.segment_budget else None
+    consistency_log = {}
+
+    for i, normalized_input in enumerate(work):
         source_id = normalized_input.get("source_id", f"unknown_{i}")
         output_file = mode_output_dir / f"{source_id}_enriched.json"
 
@@ -160,25 +466,195 @@ def main():
         if output_file.exists() and not args.force:
             print(f"[{i+1}/{len(inputs)}] {source_id} - skipped (exists)")
             results["skipped"] += 1
+            if work_queue is not None:
+                finish(source_id)
             continue
 
         print(f"[{i+1}/{len(inputs)}] {source_id}...", end=" ", flush=True)
 
-        try:
-            enriched = call_openai_with_schema(client, system_prompt, normalized_input, schema)
-
-            # Merge input fields with enriched output
-            full_output = {**normalized_input, **enriched}
+        # The model sees request_input; outputs keep the full normalized_input
+        request_input = normalized_input
+        if args.segment_budget:
+            request_input, segments[source_id] = select_segments(normalized_input, segment_matcher,
+                                                                 budget=args.segment_budget)
+            if segments[source_id]["dropped"]:
+                print(f"✂ {segments[source_id]['original_tokens']}→{segments[source_id]['kept_tokens']} tokens...",
+                      end=" ", flush=True)
 
-            with open(output_file, 'w') as f:
-                json.dump(full_output, f, indent=2, ensure_ascii=False)
+        try:
+            if args.stream:
+                def on_field(key, value, elapsed, post=normalized_input):
+                    if key == "flags" and ALERT_FLAGS.intersection(value or []):
+                        print(f"🚨 {', '.join(sorted(ALERT_FLAGS.intersection(value)))} "
+                              f"at {elapsed:.2f}s...", end=" ", flush=True)
+                        # Alert now; the sink drops the repeat from the finished enrichment
+                        if lane is not None:
+                            for flag in ALERT_FLAGS.intersection(value):
+                                lane.alert(post, flag, "stream")
+
+                enriched, timings = call_openai_streaming(client, request_template, request_input,
+                                                          on_field=on_field)
+                stream_timings[source_id] = timings
+            elif cascade is not None:
+                enriched, cascade_log[source_id] = cascade.enrich(request_input)
+                if cascade_log[source_id]["reasons"]:
+                    print(f"↑ {args.large_model} ({', '.join(cascade_log[source_id]['reasons'])})...",
+                          end=" ", flush=True)
+            elif args.samples:
+                samples, usage = call_openai_samples(client, model_template, request_input, args.samples)
+                enriched, consistency_log[source_id] = majority_vote(samples)
+                consistency_log[source_id]["usage"] = usage
+                if consistency_log[source_id]["agreement"] < 1.0:
+                    print(f"≠ {consistency_log[source_id]['agreement']*100:.0f}% agreement...",
+                          end=" ", flush=True)
+            else:
+                enriched = call_openai_with_schema(client, model_template, request_input)
+
+            local_fields(enriched, normalized_input)
+            violations = validator.validate(enriched)
+            if violations and not needs_model_repair(violations):
+                repair_locally(enriched, violations, validator)
+                results["repaired_locally"] += 1
+            elif violations:
+                print(f"⚠️  {len(violations)} schema violations - queued for repair")
+                repair_queue.append((normalized_input, request_input, output_file, enriched, violations))
+                continue
+
+            saved = write_output(output_file, normalized_input, enriched)
+            if args.trends or args.author_sketches:
+                folded.append((saved, output_file))
+            if lane is not None:
+                for flag in ALERT_FLAGS.intersection(enriched.get("flags", [])):
+                    lane.alert(normalized_input, flag, "enrichment")
 
             print("✅")
             results["success"] += 1
+            if work_queue is not None:
+                finish(source_id)
 
         except Exception as e:
             print(f"❌ Error: {e}")
             results["errors"] += 1
+            if work_queue is not None:
+                finish(source_id, str(e))
+
+    # Repair queue: targeted retries for responses that failed validation
+    if repair_queue:
+        print(f"\n{'='*70}")
+        print(f"Repairing {len(repair_queue)} invalid responses...")
+        print(f"{'='*70}\n")
+
+    for normalized_input, request_input, output_file, enriched, violations in repair_queue:
+        source_id = normalized_input.get("source_id")
+        print(f"[repair] {source_id}...", end=" ", flush=True)
+        for _ in range(args.repair_attempts):
+            try:
+                enriched = local_fields(call_openai_repair(client, model_template, request_input,
+                                                           enriched, violations), normalized_input)
+            except Exception as e:
+                print(f"❌ Error: {e}", end=" ")
+                break
+            violations = validator.validate(enriched)
+            if violations and not needs_model_repair(violations):
+                repair_locally(enriched, violations, validator)
+                violations = []
+            if not violations:
+                break
+
+        # Keep the post either way; remaining violations are reported, not fatal
+        saved = write_output(output_file, normalized_input, enriched)
+        if args.trends or args.author_sketches:
+            folded.append((saved, output_file))
+        if lane is not None:
+            for flag in ALERT_FLAGS.intersection(enriched.get("flags", [])):
+                lane.alert(normalized_input, flag, "enrichment")
+        if violations:
+            print(f"⚠️  still invalid ({', '.join(sorted({v['field'] for v in violations}))})")
+            results["invalid"] += 1
+        else:
+            print("✅")
+            results["repaired_by_retry"] += 1
+        results["success"] += 1
+        if work_queue is not None:
+            finish(source_id)
+
+    if work_queue is not None:
+        keeper.close()
+        print_stats(work_queue.stats(queue_name))
+
+    def report_path(name: str) -> Path:
+        """Run-level reports are per worker in queue mode (one worker's run is not the whole queue)"""
+        if work_queue is None:
+            return mode_output_dir / f"{name}.json"
+        worker = re.sub(r"[^\w.-]", "_", args.worker_id)
+        return mode_output_dir / f"{name}.{worker}.json"
+
+    validation = validator.report()
+    print_report(validation)
+    with open(report_path("validation_report"), 'w') as f:
+        json.dump({**validation, "template": model_template.metadata,
+                   "repair": {k: results[k] for k in
+                              ("repaired_locally", "repaired_by_retry", "invalid")}}, f, indent=2)
+
+    if cascade_log:
+        merge_log(mode_output_dir / CASCADE_LOG, cascade_log)
+        print_cascade_report(cascade_report(mode_output_dir, BASE_DIR / "expected_outputs", OUTPUT_DIR / "v7"))
+
+    if consistency_log:
+        consistency_log = merge_log(mode_output_dir / CONSISTENCY_LOG, consistency_log)
+        print_flakiness_report(flakiness_report(consistency_log, BASE_DIR / "expected_outputs"))
+
+    if segments:
+        merge_log(mode_output_dir / SEGMENTS_LOG, segments)
+        print_segment_report(segment_report(mode_output_dir, OUTPUT_DIR / config['name'].replace("_segmented", ""),
+                                            BASE_DIR / "expected_outputs"))
+
+    if routing is not None:
+        print_routing(routing)
+
+    # Load-merge-save: other queue workers may have saved since this run started
+    if args.author_sketches:
+        with locked(DEFAULT_SKETCH_PATH):
+            sketches = AuthorSketches.load()
+            for saved, output_file in folded:
+                sketches.add_record(saved, output_file.stat().st_mtime_ns)
+            sketches.save()
+        print(f"  Author sketches: {sketches.stats['posts']} posts, {len(sketches.sketches)} sketches")
+
+    if args.trends:
+        with locked(DEFAULT_TRENDS_PATH):
+            trends = TrendEngine.load()
+            # Oldest first, as trends build does, to avoid spurious lateness
+            for saved, output_file in sorted(folded, key=lambda f: f[0].get("published_at") or ""):
+                trends.add_record(saved, mtime_ns=output_file.stat().st_mtime_ns)
+            trends.save()
+        print_alerts(trends.recent_alerts())
+
+    if lane is not None:
+        lane.close()
+        safety = lane.report()
+        print_lane_report(safety)
+        with open(report_path("safety_lane"), 'w') as f:
+            json.dump(safety, f, indent=2)
+
+    if scheduler is not None:
+        latency = scheduler.report()
+        print_latency_report(latency)
+        with open(mode_output_dir / "priority_latency.json", 'w') as f:
+            json.dump(latency, f, indent=2)
+
+    if stream_timings:
+        to_flags = [t["time_to_flags"] for t in stream_timings.values() if "time_to_flags" in t]
+        to_tier1 = [t["time_to_tier1"] for t in stream_timings.values() if "time_to_tier1" in t]
+        to_complete = [t["time_to_complete"] for t in stream_timings.values()]
+        print(f"\n{'='*70}")
+        print(f"  STREAMING LATENCY (seconds, n={len(to_complete)})")
+        print(f"{'='*70}")
+        print(f"  {'':<18} {'p50':>8} {'p95':>8}")
+        for label, values in (("Time to flags", to_flags), ("Time to Tier 1", to_tier1),
+                              ("Time to complete", to_complete)):
+            print(f"  {label:<18} {percentile(values, 50):>8.2f} {percentile(values, 95):>8.2f}")
+        merge_log(mode_output_dir / "stream_timings.json", stream_timings)
 
     # Summary
     print(f"\n{'='*70}")
@@ -188,6 +664,8 @@ def main():
     print(f"Success: {results['success']} ✅")
     print(f"Skipped: {results['skipped']} (already exist)")
     print(f"Errors:  {results['errors']} ❌")
+    print(f"Repaired: {results['repaired_locally']} locally, {results['repaired_by_retry']} by retry")
+    print(f"Invalid:  {results['invalid']} (saved with violations)")
     print(f"\nOutputs: {mode_output_dir}")
 
 